@@ -0,0 +1,143 @@
+#!/usr/bin/env python2.7
+"""
+Benchmark of the analysis of a shared object with a large number of symbols
+
+A synthetic C++ library, made of many namespaces, classes and methods, is generated
+and compiled, with its debugging information, in a temporary directory. The time needed to
+build a SharedObjectAnalyser on it is then measured, without the library cache and then with a
+cache filled beforehand (in the temporary directory too), then the time needed to index its
+functions and to search them, and the time needed to read their prototypes in the debugging
+information.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+import dwarf_reader  # pylint: disable=wrong-import-position
+import shared_library_analysis  # pylint: disable=wrong-import-position
+
+# Queries timed on the index of the functions : a function name, a glob and a regular expression
+QUERIES = ("compute_7", "bench_ns_1::*", "re:Kernel1[0-9]*::compute_1\\(")
+
+
+def write_synthetic_source(path, nb_symbols, methods_per_class=50):
+    """
+    Write a C++ source file defining nb_symbols methods spread among namespaces and classes
+
+    :param path: path to the source file
+    :type path: str
+    :param nb_symbols: number of methods to define
+    :type nb_symbols: int
+    :param methods_per_class: number of methods of each class
+    :type methods_per_class: int
+    """
+    with open(path, 'w') as fo:
+        # std::string makes the library depend on libstdc++, as any real C++ library
+        fo.write("#include <string>\nstd::string bench_name() {{ return std::string(\"{:d}\"); }}\n"
+                 .format(nb_symbols))
+        for idx in range(nb_symbols):
+            cls_idx, meth_idx = divmod(idx, methods_per_class)
+            if meth_idx == 0:
+                if idx:
+                    fo.write("};\n}\n")
+                fo.write("namespace bench_ns_{:d} {{\nclass Kernel{:d} {{\npublic:\n".format(cls_idx, cls_idx))
+            fo.write("  double compute_{:d}(const double* data, int size) {{ return data[size] * {:d}; }}\n"
+                     .format(meth_idx, idx))
+        fo.write("};\n}\n")
+
+
+def build_synthetic_library(working_dir, nb_symbols):
+    """
+    Generate and compile the synthetic library
+
+    :param working_dir: directory where the library is built
+    :type working_dir: str
+    :param nb_symbols: number of methods in the library
+    :type nb_symbols: int
+    :return: path to the library
+    :rtype: str
+    """
+    src_path = os.path.join(working_dir, "libsynthetic.cpp")
+    lib_path = os.path.join(working_dir, "libsynthetic.so")
+    write_synthetic_source(src_path, nb_symbols)
+    # -fkeep-inline-functions forces the emission of the in-class defined methods
+    cmd = ["g++", "-O0", "-g", "-shared", "-fPIC", "-fkeep-inline-functions", src_path, "-o", lib_path]
+    print("Building the synthetic library ({:d} methods)...".format(nb_symbols))
+    start = time.time()
+    subprocess.check_call(cmd)
+    print("...done in {:.1f} s".format(time.time() - start))
+    return lib_path
+
+
+def main(argv=None):
+    """
+    Build the synthetic library and time its analysis
+    """
+    parser = ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('-n', '--nb-symbols', dest="nb_symbols", type=int, default=20000,
+                        help="number of methods in the synthetic library")
+    parser.add_argument('-r', '--repeat', dest="repeat", type=int, default=3,
+                        help="number of analysis to time")
+    parser.add_argument('-l', '--library', dest="library", default=None,
+                        help="analyse this library instead of building a synthetic one")
+    parser.add_argument('-v', '--verbose', dest="verbose", action="store_true",
+                        help="keep the log messages of the analysis")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(asctime)s:%(name)s:%(levelname)s:%(message)s')
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    working_dir = tempfile.mkdtemp(prefix="specprof_bench_")
+    # The cache of the user is neither read nor filled
+    os.environ["SPECPROF_CACHE_DIR"] = os.path.join(working_dir, "cache")
+    try:
+        lib_path = args.library or build_synthetic_library(working_dir, args.nb_symbols)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            analyser = shared_library_analysis.SharedObjectAnalyser(lib_path, use_cache=False)
+            timings.append(time.time() - start)
+        print("Library : {:s} ({:s})".format(lib_path, analyser.language))
+        print("Analysis time : best {:.3f} s, worst {:.3f} s over {:d} runs"
+              .format(min(timings), max(timings), len(timings)))
+        shared_library_analysis.SharedObjectAnalyser(lib_path)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            shared_library_analysis.SharedObjectAnalyser(lib_path)
+            timings.append(time.time() - start)
+        print("Cached analysis time : best {:.3f} s, worst {:.3f} s over {:d} runs"
+              .format(min(timings), max(timings), len(timings)))
+        start = time.time()
+        index = analyser.symbol_index
+        print("Index time : {:.3f} s ({:d} functions)".format(time.time() - start, len(index)))
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.time()
+                candidates = index.search(query, limit=0)
+                timings.append(time.time() - start)
+            print("Search '{:s}' : best {:.1f} ms, {:d} candidates".format(query, 1e3 * min(timings),
+                                                                           len(candidates)))
+        symbols = set(sym.name for sym in analyser.exported_functions)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            prototypes = dwarf_reader.read_prototypes(lib_path, symbols)
+            timings.append(time.time() - start)
+        print("Prototypes time : best {:.3f} s, {:d} prototypes".format(min(timings), len(prototypes)))
+    finally:
+        shutil.rmtree(working_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
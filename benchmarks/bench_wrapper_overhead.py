@@ -0,0 +1,418 @@
+#!/usr/bin/env python2.7
+"""
+Benchmark of the overhead of the wrapper libraries generated by SpecProf
+
+The TimeWaster C example, the MoveSemantics C++ example and synthetic libraries of empty
+functions are built in a temporary directory, with small drivers calling their functions in
+a loop. Each target is wrapped with every timer and sample period, and the time per call of
+the driver is measured with and without the wrapper : the difference is the overhead of the
+wrapper. The time reported by the wrapper for an empty function, minus its time without
+wrapper, is the part of the overhead seen inside the measured interval : with --calibrate,
+it is stored for each timer and subtracted from the results of the next wrappers. The driver
+is also run with the measures disabled (SPECPROF_ENABLED=0) : the cost of a wrapper left
+preloaded.
+
+The results are compared with a baseline, a JSON file kept in the repository, and the
+program fails if the overhead of a configuration has grown beyond the tolerance.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import subprocess
+from collections import namedtuple
+from argparse import ArgumentParser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, os.pardir)
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+import function_wrapper_writer  # pylint: disable=wrong-import-position
+import overhead_calibration  # pylint: disable=wrong-import-position
+import shared_library_analysis  # pylint: disable=wrong-import-position
+from stats_file import StatsFile  # pylint: disable=wrong-import-position
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "wrapper_overhead_baseline.json")
+# Target used to calibrate the part of the overhead seen by the wrapper
+CALIBRATION_TARGET = "empty_c"
+
+# A library to wrap and the driver calling one of its functions in a loop.
+#   - symbol : symbol of the function, or a function returning it from the unmangled names
+#   - calls_scale : fraction of the calls of the other targets (for the slow functions)
+BenchTarget = namedtuple("BenchTarget", ["name", "language", "library", "symbol", "signature", "namespace",
+                                         "headers", "driver", "calls_scale"])
+
+# Driver : calls the function N times, R times in a row, and prints the best time per call
+DRIVER_TEMPLATE = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+{includes}
+
+static double now_ns(void)
+{{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec * 1e9 + ts.tv_nsec;
+}}
+
+int main(int argc, char **argv)
+{{
+    long nb_calls = atol(argv[1]), call;
+    int nb_repeats = atoi(argv[2]), repeat;
+    double best = 1e300;
+    {setup}
+    for (repeat = 0; repeat < nb_repeats; ++repeat) {{
+        double start = now_ns();
+        for (call = 0; call < nb_calls; ++call) {{
+            {call};
+        }}
+        double per_call = (now_ns() - start) / nb_calls;
+        best = per_call < best ? per_call : best;
+    }}
+    printf("SPECPROF_BENCH %.3f\n", best);
+    return 0;
+}}
+"""
+
+
+def _run(cmd, cwd=None, env=None):
+    """
+    :param cmd: command to run
+    :type cmd: list
+    :param cwd: working directory of the command
+    :type cwd: str
+    :param env: environment of the command
+    :type env: dict
+    :return: the output of the command
+    :rtype: str
+    """
+    output = subprocess.check_output(cmd, cwd=cwd, env=env, stderr=subprocess.STDOUT)
+    return output.decode("utf-8", "replace")
+
+
+def _build_driver(working_dir, name, compiler, includes, setup, call, libraries):
+    """
+    Write and compile a driver, linked with the libraries of working_dir
+
+    :return: path to the driver
+    :rtype: str
+    """
+    src_path = os.path.join(working_dir, name + (".c" if compiler == "gcc" else ".cpp"))
+    exe_path = os.path.join(working_dir, name + ".exe")
+    with open(src_path, "w") as fo:
+        fo.write(DRIVER_TEMPLATE.format(includes=includes, setup=setup, call=call))
+    _run([compiler, "-O2", "-I", working_dir, src_path, "-o", exe_path, "-L", working_dir,
+          "-Wl,-rpath," + working_dir] + ["-l" + lib for lib in libraries])
+    return exe_path
+
+
+def build_empty_c(working_dir):
+    """
+    :param working_dir: directory where the target is built
+    :type working_dir: str
+    :return: a synthetic C library made of an empty function, and its driver
+    :rtype: BenchTarget
+    """
+    src_path = os.path.join(working_dir, "empty_c.c")
+    lib_path = os.path.join(working_dir, "libempty_c.so")
+    with open(src_path, "w") as fo:
+        fo.write("void specprof_bench_empty(void) {}\n")
+    _run(["gcc", "-O2", "-shared", "-fPIC", src_path, "-o", lib_path])
+    driver = _build_driver(working_dir, "empty_c_driver", "gcc", "void specprof_bench_empty(void);", "",
+                           "specprof_bench_empty()", ["empty_c"])
+    return BenchTarget("empty_c", "c", lib_path, "specprof_bench_empty", "void specprof_bench_empty()", None,
+                       None, driver, 1.)
+
+
+def build_empty_cpp(working_dir):
+    """
+    :param working_dir: directory where the target is built
+    :type working_dir: str
+    :return: a synthetic C++ library made of an empty function, and its driver
+    :rtype: BenchTarget
+    """
+    header = os.path.join(working_dir, "empty_cpp.h")
+    src_path = os.path.join(working_dir, "empty_cpp.cpp")
+    lib_path = os.path.join(working_dir, "libempty_cpp.so")
+    with open(header, "w") as fo:
+        fo.write("#include <string>\nnamespace specprof_bench {\nvoid empty();\nstd::string name();\n}\n")
+    with open(src_path, "w") as fo:
+        # std::string makes the library depend on libstdc++, as any real C++ library
+        fo.write("#include \"empty_cpp.h\"\nnamespace specprof_bench {\nvoid empty() {}\n"
+                 "std::string name() { return std::string(\"empty\"); }\n}\n")
+    _run(["g++", "-O2", "-shared", "-fPIC", src_path, "-o", lib_path])
+    driver = _build_driver(working_dir, "empty_cpp_driver", "g++", "#include \"empty_cpp.h\"",
+                           "", "specprof_bench::empty()", ["empty_cpp"])
+    return BenchTarget("empty_cpp", "cpp", lib_path, "_ZN14specprof_bench5emptyEv", "void empty()",
+                       "specprof_bench", [header], driver, 1.)
+
+
+def build_time_waster(working_dir):
+    """
+    :param working_dir: directory where the target is built
+    :type working_dir: str
+    :return: the library of the TimeWaster C example and a driver calling waste_time(0)
+    :rtype: BenchTarget
+    """
+    example_dir = os.path.join(REPO_DIR, "C_example", "TimeWaster")
+    lib_path = os.path.join(working_dir, "libtimewaster.so")
+    _run(["gcc", "-O2", "-shared", "-fPIC", os.path.join(example_dir, "TimeWaster.c"), "-o", lib_path])
+    driver = _build_driver(working_dir, "time_waster_driver", "gcc",
+                           "#include \"{:s}\"".format(os.path.join(example_dir, "TimeWaster.h")), "",
+                           "waste_time(0)", ["timewaster"])
+    return BenchTarget("time_waster", "c", lib_path, "waste_time", "void waste_time(int seconds)", None,
+                       None, driver, 0.01)
+
+
+def build_move_semantics(working_dir):
+    """
+    :param working_dir: directory where the target is built
+    :type working_dir: str
+    :return: the vector library of the MoveSemantics C++ example and a driver calling the
+     name getter of a vector
+    :rtype: BenchTarget
+    """
+    example_dir = os.path.join(REPO_DIR, "C++_example", "MoveSemantics")
+    lib_path = os.path.join(working_dir, "libvector.so")
+    sources = [os.path.join(example_dir, name)
+               for name in ("vector_without_move_sem.cc", "vector_with_move_sem.cc", "vector-Impl.cc")]
+    _run(["g++", "-O2", "-std=c++14", "-shared", "-fPIC"] + sources + ["-o", lib_path])
+    header = os.path.join(example_dir, "vector_without_move_sem.h")
+    driver = _build_driver(working_dir, "move_semantics_driver", "g++",
+                           "#include \"{:s}\"".format(os.path.join(example_dir, "vector_with_move_sem.h")),
+                           "move_semantics_test::VectorWithMoveSem vector(8, \"bench\");",
+                           "vector.getName()", ["vector"])
+    # The symbol carries an abi tag : it is looked up among the unmangled names of the library
+    mangling_map = shared_library_analysis.SharedObjectAnalyser(lib_path).mangling_map
+    symbol = [mangled for mangled, unmangled in mangling_map.items()
+              if unmangled.startswith("move_semantics_test::VectorWithoutMoveSem::getName")
+              and unmangled.endswith("()")][0]
+    return BenchTarget("move_semantics", "cpp", lib_path, symbol, "std::string VectorWithoutMoveSem::getName()",
+                       "move_semantics_test", [header], driver, 0.2)
+
+
+TARGET_BUILDERS = (("empty_c", build_empty_c), ("empty_cpp", build_empty_cpp),
+                   ("time_waster", build_time_waster), ("move_semantics", build_move_semantics))
+
+
+def run_driver(target, nb_calls, nb_repeats, env=None):
+    """
+    :return: the best time per call, in nanoseconds, measured by the driver
+    :rtype: float
+    """
+    output = _run([target.driver, str(max(int(nb_calls * target.calls_scale), 1)), str(nb_repeats)], env=env)
+    for line in output.splitlines():
+        if line.startswith("SPECPROF_BENCH "):
+            return float(line.split()[1])
+    raise ValueError("No measure in the output of {:s} :\n{:s}".format(target.driver, output))
+
+
+def build_wrapper(target, working_dir, timer, sample_period):
+    """
+    :return: path to the wrapper of the target for the timer and sample period (without
+     any overhead subtracted)
+    :rtype: str
+    """
+    wrapper_dir = os.path.join(working_dir, "{:s}_{:s}_{:d}".format(target.name, timer, sample_period))
+    os.mkdir(wrapper_dir)
+    writer = function_wrapper_writer.FunctionWrapperWriter(target.library, wrapper_dir, language=target.language,
+                                                           timer=timer, sample_period=sample_period)
+    function = function_wrapper_writer.WrappedFunction(target.symbol, target.signature, target.namespace)
+    writer.write_multi_src_file([function], target.headers)
+    writer.compile_src_file()
+    return os.path.join(wrapper_dir, os.path.splitext(os.path.basename(target.library))[0] + "_wrapper.so")
+
+
+def measure(target, working_dir, timers, sample_periods, nb_calls, nb_repeats):
+    """
+    :return: the measures of the target for each timer and sample period, by configuration name
+    :rtype: dict
+    """
+    results = {}
+    bare_ns = run_driver(target, nb_calls, nb_repeats)
+    for timer in timers:
+        for sample_period in sample_periods:
+            wrapper = build_wrapper(target, working_dir, timer, sample_period)
+            results_file = os.path.join(os.path.dirname(wrapper), "results.bin")
+            env = dict(os.environ, LD_PRELOAD=wrapper, SPECPROF_RESULTS_FILE=results_file)
+            wrapped_ns = run_driver(target, nb_calls, nb_repeats, env)
+            disabled_ns = run_driver(target, nb_calls, nb_repeats, dict(env, SPECPROF_ENABLED="0"))
+            with StatsFile(results_file) as stats_file:
+                stats = stats_file.function_stats(0)
+            # Time seen inside the measured interval that the function itself doesn't take
+            bias_ns = stats.mean_ns - bare_ns if stats.sampled_count else None
+            results["{:s}/{:s}/{:d}".format(target.name, timer, sample_period)] = {
+                "target": target.name, "timer": timer, "sample_period": sample_period,
+                "bare_ns": round(bare_ns, 2), "wrapped_ns": round(wrapped_ns, 2),
+                "overhead_ns": round(wrapped_ns - bare_ns, 2),
+                "disabled_overhead_ns": round(disabled_ns - bare_ns, 2),
+                "bias_ns": round(bias_ns, 2) if bias_ns is not None else None}
+    return results
+
+
+def compare(results, baseline, tolerance, slack_ns, noise):
+    """
+    :param results: measures by configuration name
+    :type results: dict
+    :param baseline: measures of the baseline by configuration name
+    :type baseline: dict
+    :param tolerance: relative growth of the overhead allowed
+    :type tolerance: float
+    :param slack_ns: absolute growth of the overhead allowed, in nanoseconds (for the noise
+     on the smallest overheads)
+    :type slack_ns: float
+    :param noise: fraction of the time per call without wrapper added to the growth allowed
+     (for the noise on the slowest functions)
+    :type noise: float
+    :return: the configurations whose overhead has grown beyond the tolerance
+    :rtype: list
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        limit = baseline[name]["overhead_ns"] * (1. + tolerance) + slack_ns + noise * results[name]["bare_ns"]
+        if results[name]["overhead_ns"] > limit:
+            regressions.append("{:s} : {:.1f} ns instead of {:.1f} ns (limit {:.1f} ns)"
+                               .format(name, results[name]["overhead_ns"], baseline[name]["overhead_ns"], limit))
+    return regressions
+
+
+def format_results(results, baseline):
+    """
+    :return: the table of the measures, with the overhead of the baseline
+    :rtype: str
+    """
+    line_format = "{:<16s} {:<15s} {:>6s} {:>10s} {:>12s} {:>12s} {:>10s} {:>12s} {:>12s}"
+    lines = [line_format.format("target", "timer", "period", "bare ns", "wrapped ns", "overhead ns", "bias ns",
+                                "disabled ns", "baseline ns")]
+    for name in sorted(results, key=lambda x: (results[x]["target"], results[x]["timer"],
+                                               results[x]["sample_period"])):
+        result = results[name]
+        bias = "-" if result["bias_ns"] is None else "{:.1f}".format(result["bias_ns"])
+        base = "{:.1f}".format(baseline[name]["overhead_ns"]) if name in baseline else "-"
+        lines.append(line_format.format(result["target"], result["timer"], str(result["sample_period"]),
+                                        "{:.1f}".format(result["bare_ns"]), "{:.1f}".format(result["wrapped_ns"]),
+                                        "{:.1f}".format(result["overhead_ns"]), bias,
+                                        "{:.1f}".format(result["disabled_overhead_ns"]), base))
+    return "\n".join(lines)
+
+
+def machine_description():
+    """
+    :return: the description of the machine, stored with the baseline
+    :rtype: dict
+    """
+    processor = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as stream:
+            models = [line.split(":", 1)[1].strip() for line in stream if line.startswith("model name")]
+        processor = "{:d} x {:s}".format(len(models), models[0]) if models else processor
+    except IOError:
+        pass
+    return {"machine": platform.machine(), "system": platform.system(), "release": platform.release(),
+            "processor": processor, "python": platform.python_version()}
+
+
+def main(argv=None):
+    """
+    Build the targets, measure the overhead of their wrappers and compare it with the baseline
+    """
+    parser = ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('-n', '--nb-calls', dest="nb_calls", type=int, default=1000000,
+                        help="number of calls of the empty functions in each timed loop")
+    parser.add_argument('-r', '--repeat', dest="repeat", type=int, default=5,
+                        help="number of timed loops, the best one is kept")
+    parser.add_argument('-t', '--timer', dest="timers", action="append",
+                        choices=function_wrapper_writer.TIMERS,
+                        help="timer to measure (may be repeated, default : all of them)")
+    parser.add_argument('-p', '--sample-period', dest="sample_periods", type=int, action="append",
+                        help="sample period to measure (may be repeated, default : 1 and 64)")
+    parser.add_argument('--target', dest="targets", action="append", choices=[x[0] for x in TARGET_BUILDERS],
+                        help="target to measure (may be repeated, default : all of them)")
+    parser.add_argument('-b', '--baseline', dest="baseline", default=DEFAULT_BASELINE,
+                        help="path to the baseline (default : {:s})".format(os.path.relpath(DEFAULT_BASELINE)))
+    parser.add_argument('-u', '--update-baseline', dest="update_baseline", action="store_true",
+                        help="write the measures in the baseline instead of comparing them")
+    parser.add_argument('--tolerance', dest="tolerance", type=float, default=0.25,
+                        help="relative growth of the overhead allowed before failing (default : 0.25)")
+    parser.add_argument('--slack-ns', dest="slack_ns", type=float, default=10.,
+                        help="absolute growth of the overhead, in ns, allowed before failing (default : 10)")
+    parser.add_argument('--noise', dest="noise", type=float, default=0.05,
+                        help="fraction of the time per call without wrapper added to the growth allowed "
+                             "(default : 0.05)")
+    parser.add_argument('-c', '--calibrate', dest="calibrate", action="store_true",
+                        help="store the overhead seen by the wrappers for each timer, subtracted from the "
+                             "results of the next wrappers")
+    parser.add_argument('-v', '--verbose', dest="verbose", action="store_true",
+                        help="keep the log messages of the generation of the wrappers")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(asctime)s:%(name)s:%(levelname)s:%(message)s')
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    timers = args.timers or list(function_wrapper_writer.TIMERS)
+    sample_periods = args.sample_periods or [1, 64]
+    targets = args.targets or [x[0] for x in TARGET_BUILDERS]
+    if args.calibrate and (CALIBRATION_TARGET not in targets or 1 not in sample_periods):
+        parser.error("the calibration needs the {:s} target and a sample period of 1".format(CALIBRATION_TARGET))
+
+    working_dir = tempfile.mkdtemp(prefix="specprof_bench_")
+    results = {}
+    try:
+        stdout = sys.stdout
+        for name, builder in TARGET_BUILDERS:
+            if name not in targets:
+                continue
+            print("Measuring {:s}...".format(name))
+            start = time.time()
+            target = builder(working_dir)
+            # The wrapper writer prints its usage : keep the table readable
+            sys.stdout = open(os.devnull, "w")
+            try:
+                results.update(measure(target, working_dir, timers, sample_periods, args.nb_calls, args.repeat))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            print("...done in {:.1f} s".format(time.time() - start))
+    except subprocess.CalledProcessError as error:
+        print("Command failed : {:s}\n{:s}".format(" ".join(error.cmd), error.output.decode("utf-8", "replace")))
+        return 1
+    finally:
+        shutil.rmtree(working_dir)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)["results"]
+    print(format_results(results, baseline))
+
+    if args.calibrate:
+        overheads = dict((timer, max(results["{:s}/{:s}/1".format(CALIBRATION_TARGET, timer)]["bias_ns"], 0.))
+                         for timer in timers)
+        overhead_calibration.store_calibration(overheads)
+        print("Calibration stored in {:s} : {:s}".format(
+            overhead_calibration.default_calibration_path(),
+            ", ".join("{:s} = {:.1f} ns".format(timer, overheads[timer]) for timer in sorted(overheads))))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as stream:
+            json.dump({"machine": machine_description(), "results": baseline}, stream, indent=2, sort_keys=True,
+                      separators=(",", ": "))
+            stream.write("\n")
+        print("Baseline written in {:s}".format(args.baseline))
+        return 0
+    regressions = compare(results, baseline, args.tolerance, args.slack_ns, args.noise)
+    for regression in regressions:
+        print("Overhead regression : {:s}".format(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
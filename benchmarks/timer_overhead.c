@@ -0,0 +1,50 @@
+// Measurement of the cost of one read of each timer backend available in the wrappers
+// generated by SpecProf (see the -t option of spec_prof.py).
+//
+// Build and run with :
+//     gcc -O2 -o timer_overhead timer_overhead.c && ./timer_overhead [nb_reads]
+#include <stdio.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <time.h>
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#endif
+
+static inline uint64_t clock_ns(clockid_t clock_id)
+{
+    struct timespec ts;
+    clock_gettime(clock_id, &ts);
+    return (uint64_t) ts.tv_sec * 1000000000ULL + (uint64_t) ts.tv_nsec;
+}
+
+static uint64_t read_monotonic(void) { return clock_ns(CLOCK_MONOTONIC); }
+static uint64_t read_thread_cputime(void) { return clock_ns(CLOCK_THREAD_CPUTIME_ID); }
+#if defined(__x86_64__) || defined(__i386__)
+static uint64_t read_tsc(void) { return __rdtsc(); }
+#endif
+
+// Mean cost, in nanoseconds, of a pair of reads as done around each wrapped call
+static double measure(uint64_t (*read_timer)(void), long nb_reads)
+{
+    volatile uint64_t sink = 0;
+    long i;
+    uint64_t start = clock_ns(CLOCK_MONOTONIC);
+    for (i = 0; i < nb_reads; ++i) {
+        uint64_t begin = read_timer();
+        sink += read_timer() - begin;
+    }
+    return (double) (clock_ns(CLOCK_MONOTONIC) - start) / (double) nb_reads;
+}
+
+int main(int argc, char **argv)
+{
+    long nb_reads = argc > 1 ? atol(argv[1]) : 10000000L;
+    printf("%-16s %12s\n", "timer", "ns per call");
+    printf("%-16s %12.1f\n", "monotonic", measure(read_monotonic, nb_reads));
+    printf("%-16s %12.1f\n", "thread_cputime", measure(read_thread_cputime, nb_reads));
+#if defined(__x86_64__) || defined(__i386__)
+    printf("%-16s %12.1f\n", "tsc", measure(read_tsc, nb_reads));
+#endif
+    return 0;
+}
@@ -0,0 +1,266 @@
+"""
+A module to aggregate the results files of many processes (forked children or ranks of an MPI
+job, see the %p and %r patterns of SPECPROF_RESULTS_FILE) : the totals of each function over
+all the processes, the imbalance of its time between the processes and the outlier processes.
+The files are loaded into NumPy arrays, one row per process and one column per function.
+"""
+from __future__ import print_function
+import os
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from stats_file import StatsFile, FILE_MAGIC
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed by the aggregation
+    numpy = None
+
+LOGGER = logging.getLogger("SpecProf.aggregate")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Modified z-score above which a process is an outlier (Iglewicz and Hoaglin)
+DEFAULT_THRESHOLD = 3.5
+# Name of the pseudo function holding the time of all the functions of a process
+ALL_FUNCTIONS = "(all functions)"
+
+# The calls of a function by all the processes. The times are in nanoseconds, without the overhead
+# of the wrapper : total time of all the processes, mean and maximum total time of a process, and
+# the imbalance, the maximum over the mean (None if no call was timed)
+FunctionSummary = namedtuple("FunctionSummary", ["function", "nb_processes", "call_count", "total_ns", "mean_ns",
+                                                 "mean_process_ns", "max_process_ns", "imbalance", "slowest"])
+# A process of which the total time of a function is far from the one of the other processes
+Outlier = namedtuple("Outlier", ["function", "process", "path", "total_ns", "score"])
+
+
+class ResultsSet(object):
+    """
+    The results files of many processes : the pid, rank and path of each process and, for each
+    process and each function, the number of calls and the total time in nanoseconds
+    """
+    def __init__(self, paths, pids, ranks, functions, call_count, total_ns):
+        """
+        :param paths: path of the results file of each process
+        :type paths: list
+        :param pids: pid of each process
+        :type pids: numpy.ndarray
+        :param ranks: rank of each process (-1 if unknown)
+        :type ranks: numpy.ndarray
+        :param functions: names of the functions
+        :type functions: list
+        :param call_count: number of calls, by process and function
+        :type call_count: numpy.ndarray
+        :param total_ns: total time in nanoseconds, by process and function
+        :type total_ns: numpy.ndarray
+        """
+        self.paths = paths
+        self.pids = pids
+        self.ranks = ranks
+        self.functions = functions
+        self.call_count = call_count
+        self.total_ns = total_ns
+
+    def process_name(self, index):
+        """
+        :param index: index of the process
+        :type index: int
+        :return: the name of the process : its rank if known, its pid otherwise
+        :rtype: str
+        """
+        if self.ranks[index] >= 0:
+            return "rank {:d}".format(int(self.ranks[index]))
+        return "pid {:d}".format(int(self.pids[index]))
+
+
+def _is_stats_file(path):
+    """
+    :return: True if the file starts with the magic of the statistics files
+    :rtype: bool
+    """
+    try:
+        with open(path, "rb") as stream:
+            return stream.read(len(FILE_MAGIC)) == FILE_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def find_results(paths):
+    """
+    :param paths: results files or directories holding them
+    :type paths: list
+    :return: the paths of the results files, the statistics files found in the directories
+     being sorted by name
+    :rtype: list
+    """
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        names = sorted(os.listdir(path))
+        found.extend(os.path.join(path, name) for name in names
+                     if os.path.isfile(os.path.join(path, name)) and _is_stats_file(os.path.join(path, name)))
+    return found
+
+
+def _read_results(path):
+    """
+    :param path: path to a results (or live statistics) file
+    :type path: str
+    :return: the header of the file, the names of its functions, and their number of calls and
+     total time in nanoseconds, summed over the rows of the file (None if it is a snapshot)
+    :rtype: tuple
+    """
+    with StatsFile(path) as stats_file:
+        header = stats_file.header
+        if header.snapshot:
+            return None
+        rows = numpy.frombuffer(stats_file.raw_rows(), dtype=numpy.uint64)
+        rows = rows.reshape(header.nb_rows, header.row_size // 8)
+        fields = [stats_file.fields.index(name) for name in ("call_count", "sampled_count", "total_ticks")]
+        columns = (numpy.arange(header.nb_functions) * (header.stats_size // 8))[:, None] + fields
+        call_count, sampled_count, total_ticks = rows[:, columns].sum(axis=0).T
+        # The overhead is subtracted from the mean of the timed calls, the total is extrapolated to all the calls
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            mean_ns = total_ticks * stats_file.ns_per_tick / sampled_count - header.overhead_ns
+        total_ns = numpy.where(sampled_count > 0, numpy.maximum(mean_ns, 0.) * call_count, 0.)
+        return header, stats_file.functions, call_count, total_ns
+
+
+def load_results(paths):
+    """
+    :param paths: paths to the results files, one per process
+    :type paths: list
+    :return: the results of all the processes, the functions being matched by name
+    :rtype: ResultsSet
+    """
+    if numpy is None:
+        msg = "NumPy is needed to aggregate the results files"
+        ADAPTER.error(msg)
+        raise ImportError(msg)
+    loaded, nb_snapshots, processes = [], 0, {}
+    for path in paths:
+        results = _read_results(path)
+        if results is None:
+            nb_snapshots += 1
+            continue
+        # The live statistics file of a process holds the same calls as its results file : the
+        # results file, of a single row, is kept
+        key = (results[0].pid, results[0].rank)
+        if key in processes:
+            ADAPTER.warning("{:s} and {:s} are files of the same process, only one is kept"
+                            .format(loaded[processes[key]][0], path))
+            if results[0].nb_rows != 1:
+                continue
+            loaded[processes[key]] = (path,) + results
+        else:
+            processes[key] = len(loaded)
+            loaded.append((path,) + results)
+    if nb_snapshots:
+        ADAPTER.warning("{:d} snapshots are skipped : only the results files are aggregated".format(nb_snapshots))
+    functions, columns = [], {}
+    for _, _, names, _, _ in loaded:
+        for name in names:
+            if name not in columns:
+                columns[name] = len(functions)
+                functions.append(name)
+    call_count = numpy.zeros((len(loaded), len(functions)), dtype=numpy.uint64)
+    total_ns = numpy.zeros((len(loaded), len(functions)))
+    for index, (_, _, names, calls, times) in enumerate(loaded):
+        indices = [columns[name] for name in names]
+        call_count[index, indices] = calls
+        total_ns[index, indices] = times
+    return ResultsSet([results[0] for results in loaded],
+                      numpy.array([results[1].pid for results in loaded], dtype=numpy.int64),
+                      numpy.array([results[1].rank for results in loaded], dtype=numpy.int64),
+                      functions, call_count, total_ns)
+
+
+def aggregate(results, threshold=DEFAULT_THRESHOLD):
+    """
+    Totals, imbalance and outliers of every function, and of all the functions together, in
+    one pass over the arrays. The outliers are found with the modified z-score of the total
+    time of each process, 0.6745 (time - median) / median absolute deviation, robust to the
+    outliers themselves (the mean absolute deviation is used when more than half the processes
+    have the median time).
+
+    :param results: results of the processes
+    :type results: ResultsSet
+    :param threshold: absolute modified z-score above which a process is an outlier
+    :type threshold: float
+    :return: the summary of each function and the outliers, the farthest first
+    :rtype: tuple
+    """
+    functions = results.functions + [ALL_FUNCTIONS]
+    total_ns = numpy.column_stack([results.total_ns, results.total_ns.sum(axis=1)])
+    call_count = numpy.column_stack([results.call_count, results.call_count.sum(axis=1)])
+    calls = call_count.sum(axis=0)
+    totals = total_ns.sum(axis=0)
+    nb_processes = (call_count > 0).sum(axis=0)
+    mean_process = total_ns.mean(axis=0)
+    max_process = total_ns.max(axis=0)
+    slowest = total_ns.argmax(axis=0)
+    median = numpy.median(total_ns, axis=0)
+    deviation = numpy.abs(total_ns - median)
+    scale = numpy.where(numpy.median(deviation, axis=0) > 0, numpy.median(deviation, axis=0) / 0.6745,
+                        1.253314 * deviation.mean(axis=0))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        scores = numpy.where(scale > 0, (total_ns - median) / scale, 0.)
+    summaries = []
+    for func, name in enumerate(functions):
+        timed = totals[func] > 0
+        summaries.append(FunctionSummary(name, int(nb_processes[func]), int(calls[func]), float(totals[func]),
+                                         float(totals[func] / calls[func]) if timed else None,
+                                         float(mean_process[func]), float(max_process[func]),
+                                         float(max_process[func] / mean_process[func]) if timed else None,
+                                         results.process_name(slowest[func]) if timed else None))
+    processes, funcs = numpy.nonzero(numpy.abs(scores) > threshold)
+    outliers = [Outlier(functions[func], results.process_name(process), results.paths[process],
+                        float(total_ns[process, func]), float(scores[process, func]))
+                for process, func in zip(processes, funcs)]
+    outliers.sort(key=lambda outlier: abs(outlier.score), reverse=True)
+    return summaries, outliers
+
+
+def format_aggregate(results, summaries, outliers, threshold=DEFAULT_THRESHOLD, top=20):
+    """
+    :param results: results of the processes
+    :type results: ResultsSet
+    :param summaries: summary of each function
+    :type summaries: list
+    :param outliers: outlier processes
+    :type outliers: list
+    :param threshold: absolute modified z-score above which a process is an outlier
+    :type threshold: float
+    :param top: maximum number of outliers printed (0 for all of them)
+    :type top: int
+    :return: the report of the totals and imbalance of each function, then of the outliers
+    :rtype: str
+    """
+    nb_ranked = int((results.ranks >= 0).sum())
+    lines = ["SpecProf aggregate of {:d} processes ({:d} with a rank)".format(len(results.paths), nb_ranked)]
+    line_format = "{:<32s} {:>9s} {:>14s} {:>14s} {:>12s} {:>16s} {:>16s} {:>9s}  {:s}"
+    lines.append(line_format.format("function", "processes", "calls", "total time s", "mean ns",
+                                    "mean/process s", "max/process s", "imbalance", "slowest"))
+    for summary in summaries:
+        timed = summary.imbalance is not None
+        lines.append(line_format.format(summary.function[:32], str(summary.nb_processes), str(summary.call_count),
+                                        "{:.6f}".format(summary.total_ns * 1e-9),
+                                        "{:.1f}".format(summary.mean_ns) if timed else "-",
+                                        "{:.6f}".format(summary.mean_process_ns * 1e-9),
+                                        "{:.6f}".format(summary.max_process_ns * 1e-9),
+                                        "{:.2f}".format(summary.imbalance) if timed else "-",
+                                        summary.slowest or "-"))
+    lines.append("OUTLIERS (modified z-score above {:.1f}) : {:d}".format(threshold, len(outliers)))
+    shown = outliers[:top] if top else outliers
+    if shown:
+        outlier_format = "{:<32s} {:>14s} {:>14s} {:>9s}  {:s}"
+        lines.append(outlier_format.format("function", "process", "total time s", "score", "file"))
+        for outlier in shown:
+            lines.append(outlier_format.format(outlier.function[:32], outlier.process,
+                                               "{:.6f}".format(outlier.total_ns * 1e-9),
+                                               "{:+.1f}".format(outlier.score), outlier.path))
+    if len(shown) < len(outliers):
+        lines.append("... {:d} other outliers".format(len(outliers) - len(shown)))
+    return "\n".join(lines)
@@ -0,0 +1,466 @@
+"""
+A module implementing the non-interactive generation of wrapper libraries for a whole tree
+of shared objects : the functions to wrap are selected by rules on their unmangled names and
+the libraries are analysed, rendered and compiled in parallel
+"""
+import os
+import re
+import time
+import fnmatch
+import logging
+import traceback
+import multiprocessing
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from shared_library_analysis import SharedObjectAnalyser
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction, split_parameters
+
+LOGGER = logging.getLogger("SpecProf.batch_pipeline")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# A rule selecting the functions to wrap : the functions whose unmangled name (without the
+# parameters) matches the regular expression are wrapped, with the given return type (taken from
+# the debugging information or derived from the unmangled name if None), namespace and parameters
+# (mandatory for C functions whose symbols don't carry their parameters, without debugging information)
+SymbolRule = namedtuple("SymbolRule", ["pattern", "regex", "return_type", "namespace", "parameters"])
+
+# The work of one library : wrapping options are the keyword arguments of FunctionWrapperWriter
+BatchTask = namedtuple("BatchTask", ["library", "working_dir", "rules", "headers", "writer_options",
+                                     "use_cache", "verbose"])
+
+# Status of a library : wrapped, without any function matching the rules, or failed
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "FAILED"
+
+
+class BatchResult(namedtuple("BatchResult", ["library", "status", "wrapper", "nb_functions", "skipped",
+                                             "elapsed", "error"])):
+    """
+    The outcome of the work on one library : its status, the path of its wrapper, the number of
+    wrapped functions, the (unmangled name, reason) of the functions that can't be wrapped, the
+    time spent and the error of a failed or skipped library
+    """
+    __slots__ = ()
+
+    @property
+    def success(self):
+        """
+        :return: False if the work on the library failed (a library without any function matching
+         the rules is not a failure)
+        :rtype: bool
+        """
+        return self.status != STATUS_FAILED
+
+
+def parse_rule(text):
+    """
+    :param text: a rule 'pattern [| return type [| namespace [| parameters]]]'. The pattern is
+     a glob or, if prefixed with 're:', a regular expression (where '|' is written '\\|'),
+     matched from the beginning of the unmangled name of the functions, without their parameters
+    :type text: str
+    :return: the rule
+    :rtype: SymbolRule
+
+    >>> parse_rule("solve*| double").return_type
+    'double'
+    >>> parse_rule("re:ns::(load\\|save)$ | | ns").regex
+    'ns::(load|save)$'
+    """
+    fields = [field.strip().replace("\\|", "|") for field in re.split(r"(?<!\\)\|", text)]
+    if not fields[0] or len(fields) > 4:
+        msg = "The rule '{:s}' should be 'pattern [| return type [| namespace [| parameters]]]'".format(text)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    fields += [""] * (4 - len(fields))
+    pattern, return_type, namespace, parameters = fields
+    if pattern.startswith("re:"):
+        regex = pattern[len("re:"):]
+    else:
+        regex = fnmatch.translate(pattern)
+    try:
+        re.compile(regex)
+    except re.error as error:
+        msg = "Invalid pattern in the rule '{:s}' : {:s}".format(text, str(error))
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    return SymbolRule(pattern, regex, return_type or None, namespace or None, parameters or None)
+
+
+def read_rules(path_to_rules):
+    """
+    Read a file of rules, one per line. Empty lines and lines beginning with '#' are ignored.
+
+    :param path_to_rules: path to the file
+    :type path_to_rules: str
+    :return: the rules
+    :rtype: list of SymbolRule
+    """
+    with open(path_to_rules) as stream:
+        return [parse_rule(line) for line in stream if line.strip() and not line.lstrip().startswith("#")]
+
+
+def find_libraries(paths):
+    """
+    :param paths: shared objects or directories searched recursively for shared objects
+    :type paths: list
+    :return: the real paths of the shared objects (.so files), without duplicates
+    :rtype: list
+    """
+    libraries = []
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isdir(path):
+            candidates = [os.path.join(root, name) for root, _, names in os.walk(path)
+                          for name in sorted(names) if name.endswith(".so")]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            candidate = os.path.realpath(candidate)
+            if candidate not in libraries:
+                libraries.append(candidate)
+    return libraries
+
+
+def _split_unmangled(unmangled):
+    """
+    :param unmangled: unmangled name of a function
+    :type unmangled: str
+    :return: the part before the parameters (return type and qualified name), the parameters
+     and what follows them (cv-qualifiers of a method) or None if the name has no parameters
+    :rtype: tuple
+
+    >>> _split_unmangled("ns::Vector<int>::norm(double, std::pair<int, int>) const")
+    ('ns::Vector<int>::norm', 'double, std::pair<int, int>', 'const')
+    """
+    depth = 0
+    for position, character in enumerate(unmangled):
+        if character == "<":
+            depth += 1
+        elif character == ">":
+            depth -= 1
+        elif character == "(" and depth == 0:
+            end = unmangled.rfind(")")
+            return (unmangled[:position].strip(), unmangled[position + 1:end].strip(),
+                    unmangled[end + 1:].strip())
+    return None
+
+
+# Words that can precede a prototype without being part of the return type
+_SPECIFIERS_RE = re.compile(r"\b(?:extern|static|inline|virtual|explicit|friend|public:|protected:|private:)\s*")
+_DECLARATION_RE = re.compile(r"^\s*(.*?)\b(\w+)\s*\(([^()]*)\)\s*(?:const\s*)?$", re.DOTALL)
+# Statements of function bodies that look like prototypes
+_NOT_TYPES = ("return", "else", "new", "delete", "throw", "case", "goto", "typedef", "using")
+
+
+def read_header_prototypes(headers):
+    """
+    Find the prototypes declared or defined in headers. The parsing is naive : it is meant
+    to give the return types and parameters of functions, not to understand C++.
+
+    :param headers: paths to the headers
+    :type headers: list
+    :return: the return types and parameters of the prototypes, by function name
+    :rtype: dict
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile("w", suffix=".h") as header:
+    ...     _ = header.write("#pragma once\\n// Solver\\nextern double solve(double *x, int n);\\n"
+    ...                      "class A {\\npublic:\\n  A();\\n  int size() const { return size_; }\\n};\\n")
+    ...     header.flush()
+    ...     prototypes = read_header_prototypes([header.name])
+    >>> sorted((name, sorted(declarations)) for name, declarations in prototypes.items())
+    [('size', [('int', '')]), ('solve', [('double', 'double *x, int n')])]
+    """
+    prototypes = {}
+    for header in headers or []:
+        with open(header) as stream:
+            text = stream.read()
+        text = re.sub(r"/\*.*?\*/", " ", text, flags=re.DOTALL)
+        text = re.sub(r"//[^\n]*|^\s*#[^\n]*", " ", text, flags=re.MULTILINE)
+        for statement in re.split(r"[;{}]", text):
+            match = _DECLARATION_RE.match(statement)
+            if match is None:
+                continue
+            return_type = " ".join(_SPECIFIERS_RE.sub("", match.group(1)).split())
+            if not return_type or return_type in _NOT_TYPES:
+                continue
+            prototypes.setdefault(match.group(2), set()).add((return_type, " ".join(match.group(3).split())))
+    return prototypes
+
+
+def derive_return_type(unmangled):
+    """
+    :param unmangled: unmangled name of a function
+    :type unmangled: str
+    :return: the return type found in the unmangled name (only the instances of function
+     templates have it) or None
+    :rtype: str
+
+    >>> derive_return_type("double scale<double>(double*, int)")
+    'double'
+    >>> derive_return_type("ns::solve(int)") is None
+    True
+    """
+    parts = _split_unmangled(unmangled)
+    head = parts[0] if parts is not None else unmangled
+    depth = 0
+    for position in range(len(head) - 1, -1, -1):
+        character = head[position]
+        if character == ">":
+            depth += 1
+        elif character == "<":
+            depth -= 1
+        elif character == " " and depth == 0:
+            return head[:position].strip()
+    return None
+
+
+def make_signature(unmangled, rule, prototypes=None):
+    """
+    Build the signature of the wrapper of a function from its unmangled name, naming its
+    parameters p0, p1... What the rule doesn't give and the unmangled name doesn't hold
+    (return type, parameters of a C function) is taken from the prototypes found in the
+    headers, if the name of the function is not ambiguous.
+
+    :param unmangled: unmangled name of the function
+    :type unmangled: str
+    :param rule: rule that selected the function
+    :type rule: SymbolRule
+    :param prototypes: the prototypes found in the headers (see read_header_prototypes)
+    :type prototypes: dict
+    :return: the signature and the namespace of the function
+    :rtype: tuple
+    :raise ValueError: if the function can't be wrapped from its unmangled name
+
+    >>> make_signature("ns::Solver::solve(double, int)", parse_rule("*|int|ns"))
+    ('int Solver::solve(double p0, int p1)', 'ns')
+    >>> make_signature("ns::Vec::norm() const", parse_rule("*|double|ns"))
+    ('double Vec::norm() const', 'ns')
+    >>> make_signature("add_ints", parse_rule("add_*|int||int a, int b"))
+    ('int add_ints(int a, int b)', None)
+    >>> make_signature("add_ints", parse_rule("add_*"), {'add_ints': set([('int', 'int a, int b')])})
+    ('int add_ints(int a, int b)', None)
+    """
+    parts = _split_unmangled(unmangled)
+    head = parts[0] if parts is not None else unmangled
+    declared = (prototypes or {}).get(head.split("::")[-1], set())
+    if parts is None:
+        if rule.parameters is None and len(declared) != 1:
+            raise ValueError("the symbol doesn't give the parameters, they should be given by the rule"
+                             " or by a header")
+        head, parameters, qualifiers = unmangled, rule.parameters or list(declared)[0][1], ""
+    else:
+        head, parameters, qualifiers = parts
+        if rule.parameters is not None:
+            parameters = rule.parameters
+        else:
+            parameters = ", ".join("{:s} p{:d}".format(parameter, index) for index, parameter
+                                   in enumerate(split_parameters(parameters)) if parameter != "void")
+    if qualifiers and (qualifiers != "const" or "::" not in head):
+        raise ValueError("the '{:s}' qualified methods are not supported".format(qualifiers))
+    if "<" in head or "operator" in head:
+        raise ValueError("templates and operators are not supported")
+    scopes = head.split("::")
+    if len(scopes) > 1 and scopes[-1] in (scopes[-2], "~" + scopes[-2]):
+        raise ValueError("constructors and destructors are not supported")
+    return_type = rule.return_type
+    if return_type is None and len(set(declaration[0] for declaration in declared)) == 1:
+        return_type = list(declared)[0][0]
+    if return_type is None:
+        return_type = derive_return_type(unmangled)
+    if return_type is None:
+        raise ValueError("the return type can't be derived, it should be given by the rule or by a header")
+    name = head
+    if rule.namespace is not None:
+        if not name.startswith(rule.namespace + "::"):
+            raise ValueError("the function is not in the namespace {:s}".format(rule.namespace))
+        name = name[len(rule.namespace) + 2:]
+    if name.count("::") > 1:
+        raise ValueError("the namespace of the function should be given by the rule")
+    return "{:s} {:s}({:s}){:s}".format(return_type, name, parameters,
+                                          " " + qualifiers if qualifiers else ""), rule.namespace
+
+
+def debug_function(prototype, rule):
+    """
+    :param prototype: prototype of a function given by the debugging information
+    :type prototype: dwarf_reader.Prototype
+    :param rule: rule that selected the function
+    :type rule: SymbolRule
+    :return: the function to wrap, with the signature and the namespace of the prototype
+    :rtype: function_wrapper_writer.WrappedFunction
+    :raise ValueError: if the function can't be wrapped or isn't in the namespace of the rule
+
+    >>> from dwarf_reader import Prototype
+    >>> prototype = Prototype("_ZN2ns6Solver5solveEPdi", "int", "ns", "Solver", "solve",
+    ...                       (("double *x", "x"), ("int n", "n")), "", ())
+    >>> debug_function(prototype, parse_rule("ns::*")).signature
+    'int Solver::solve(double *x, int n)'
+    """
+    prototype.check_wrappable()
+    if rule.namespace is not None and rule.namespace != prototype.namespace:
+        raise ValueError("the function is not in the namespace {:s}".format(rule.namespace))
+    return WrappedFunction(prototype.symbol, prototype.signature, prototype.namespace, None, prototype)
+
+
+def select_functions(analyser, rules, prototypes=None):
+    """
+    :param analyser: analyser of the library
+    :type analyser: shared_library_analysis.SharedObjectAnalyser
+    :param rules: the rules, the first matching one applies to a function
+    :type rules: list of SymbolRule
+    :param prototypes: the prototypes found in the headers (see read_header_prototypes)
+    :type prototypes: dict
+    :return: the functions to wrap and the (unmangled name, reason) of the selected functions
+     that can't be wrapped. The prototypes given by the debugging information of the library are
+     used for the functions whose rule gives neither the return type nor the parameters.
+    :rtype: tuple
+    """
+    regexes = [re.compile(rule.regex) for rule in rules]
+    mangling_map = analyser.mangling_map
+    functions, skipped, seen = [], [], set()
+    for symbol in analyser.exported_functions:
+        unmangled = mangling_map.get(symbol.name, symbol.name)
+        parts = _split_unmangled(unmangled)
+        name = parts[0] if parts is not None else unmangled
+        for regex, rule in zip(regexes, rules):
+            if regex.match(name):
+                break
+        else:
+            continue
+        # Complete and base object constructors (C1/C2...) share the same unmangled name
+        if unmangled in seen:
+            continue
+        seen.add(unmangled)
+        debug_prototype = analyser.prototypes.get(symbol.name)
+        try:
+            if debug_prototype is not None and rule.return_type is None and rule.parameters is None:
+                functions.append(debug_function(debug_prototype, rule))
+                continue
+            signature, namespace = make_signature(unmangled, rule, prototypes)
+        except ValueError as error:
+            skipped.append((unmangled, str(error)))
+            continue
+        functions.append(WrappedFunction(symbol.name, signature, namespace))
+    return functions, skipped
+
+
+def wrap_library(task):
+    """
+    Analyse a library, then render and compile the wrapper of the functions selected by the rules
+
+    :param task: the work to do
+    :type task: BatchTask
+    :return: the outcome
+    :rtype: BatchResult
+    """
+    if not task.verbose:
+        logging.disable(logging.INFO)
+    start = time.time()
+    functions, skipped = [], []
+    try:
+        analyser = SharedObjectAnalyser(task.library, use_cache=task.use_cache)
+        functions, skipped = select_functions(analyser, task.rules, read_header_prototypes(task.headers))
+        if not functions and not skipped:
+            return BatchResult(task.library, STATUS_SKIPPED, None, 0, skipped, time.time() - start,
+                               "no function of the library matches the rules")
+        if not functions:
+            raise ValueError("none of the functions matching the rules can be wrapped")
+        if not os.path.isdir(task.working_dir):
+            os.makedirs(task.working_dir)
+        writer = FunctionWrapperWriter(task.library, task.working_dir, language=analyser.language,
+                                       use_cache=task.use_cache, **task.writer_options)
+        writer.write_multi_src_file(functions, task.headers)
+        writer.compile_src_file()
+        wrapper = os.path.join(task.working_dir,
+                               os.path.splitext(os.path.basename(task.library))[0] + "_wrapper.so")
+        return BatchResult(task.library, STATUS_OK, wrapper, len(functions), skipped, time.time() - start, None)
+    except Exception as error:  # pylint: disable=broad-except
+        ADAPTER.debug(traceback.format_exc())
+        return BatchResult(task.library, STATUS_FAILED, None, len(functions), skipped, time.time() - start,
+                           "{:s}: {:s}".format(type(error).__name__, str(error)))
+
+
+def make_tasks(libraries, working_dir, rules, headers=None, writer_options=None, use_cache=True,
+               verbose=False):
+    """
+    :param libraries: paths to the libraries
+    :type libraries: list
+    :param working_dir: directory where a subdirectory is created for each library
+    :type working_dir: str
+    :param rules: rules selecting the functions
+    :type rules: list of SymbolRule
+    :param headers: headers included in every wrapper
+    :type headers: list
+    :param writer_options: keyword arguments of FunctionWrapperWriter (timer, sampling...)
+    :type writer_options: dict
+    :param use_cache: if True, the analysis and compile caches are used
+    :type use_cache: bool
+    :param verbose: if True, the workers log their progress
+    :type verbose: bool
+    :return: the tasks, one per library
+    :rtype: list of BatchTask
+    """
+    tasks, names = [], set()
+    for library in libraries:
+        base = os.path.splitext(os.path.basename(library))[0]
+        name, index = base, 1
+        # Libraries with the same name in different directories get distinct directories
+        while name in names:
+            index += 1
+            name = "{:s}_{:d}".format(base, index)
+        names.add(name)
+        tasks.append(BatchTask(library, os.path.join(working_dir, name), rules, headers,
+                               writer_options or {}, use_cache, verbose))
+    return tasks
+
+
+def run_batch(tasks, jobs=None):
+    """
+    Run the tasks on a pool of processes
+
+    :param tasks: the tasks
+    :type tasks: list of BatchTask
+    :param jobs: maximum number of tasks run in parallel (number of processors by default)
+    :type jobs: int
+    :return: the results, in the order of the tasks
+    :rtype: list of BatchResult
+    """
+    jobs = max(1, min(jobs or multiprocessing.cpu_count(), len(tasks)))
+    ADAPTER.info("Wrapping {:d} libraries with at most {:d} parallel processes...".format(len(tasks), jobs))
+    if jobs == 1:
+        return [wrap_library(task) for task in tasks]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        # A timeout keeps the wait interruptible by Ctrl-C under python 2
+        return pool.map_async(wrap_library, tasks, chunksize=1).get(365 * 24 * 3600)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def format_report(results):
+    """
+    :param results: the results of the batch
+    :type results: list of BatchResult
+    :return: the report of the status, the number of wrapped and skipped functions and the time
+     spent on each library
+    :rtype: str
+    """
+    line_format = "{:<7s} {:>9s} {:>8s} {:>9s}  {:s}"
+    lines = [line_format.format("status", "functions", "skipped", "time (s)", "library")]
+    for result in results:
+        lines.append(line_format.format(result.status, str(result.nb_functions), str(len(result.skipped)),
+                                        "{:.2f}".format(result.elapsed), result.library))
+        # The error may hold the output of the compiler, indented under the library
+        lines.append("        -> {:s}".format(result.wrapper if result.status == STATUS_OK
+                                              else result.error.replace("\n", "\n           ")))
+        for unmangled, reason in result.skipped:
+            lines.append("        skipped {:s} : {:s}".format(unmangled, reason))
+    counts = dict((status, sum(1 for result in results if result.status == status))
+                  for status in (STATUS_OK, STATUS_SKIPPED, STATUS_FAILED))
+    lines.append("{:d} libraries wrapped, {:d} skipped (no function matching the rules), {:d} failed"
+                 .format(counts[STATUS_OK], counts[STATUS_SKIPPED], counts[STATUS_FAILED]))
+    return "\n".join(lines)
@@ -0,0 +1,305 @@
+"""
+A module to read the call sites files written by the wrappers generated by SpecProf with the
+call sites option (see the SPECPROF_CALL_SITES_FILE environment variable) and to turn their
+return addresses into the names of the calling functions, read in the ELF symbol tables of
+the modules
+"""
+from __future__ import print_function
+import os
+import bisect
+import struct
+import sqlite3
+import logging
+import subprocess
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from elf_reader import ElfReader
+from demangler import demangle_symbols
+from library_cache import LibraryCache, LibraryIdentity
+from stats_file import TIMER_NAMES
+
+LOGGER = logging.getLogger("SpecProf.call_sites")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Layout of struct specprof_sites_header and specprof_site_record in jinja_templates/runtime/call_sites.h
+SITES_HEADER_FORMAT = "=8sIIIIIIQQdd"
+SITES_HEADER_SIZE = struct.calcsize(SITES_HEADER_FORMAT)
+RECORD_STRUCT = struct.Struct("=IIQQQQ")
+SITES_MAGIC = b"SPECSITE"
+SITES_VERSION = 1
+
+SitesHeader = namedtuple("SitesHeader", ["magic", "version", "header_size", "timer", "pid", "nb_functions",
+                                         "nb_modules", "nb_sites", "unattributed_calls", "ns_per_tick",
+                                         "overhead_ns"])
+
+
+class CallSite(namedtuple("CallSite", ["function", "module", "offset", "call_count", "sampled_count",
+                                       "total_ns"])):
+    """
+    The calls of a wrapped function from one call site : the module holding the return address
+    (None if unknown) and the return address relative to the load address of the module. As in
+    the results of the wrapper, total_ns is extrapolated from the timed calls, without the
+    overhead of the wrapper.
+    """
+    __slots__ = ()
+
+    @property
+    def mean_ns(self):
+        """
+        :return: the mean time per call, in nanoseconds (None if no call was timed)
+        :rtype: float
+        """
+        if not self.sampled_count:
+            return None
+        return self.total_ns / self.call_count
+
+
+class CallSitesFile(object):
+    """
+    A call sites file written by a wrapper
+    """
+    def __init__(self, path):
+        """
+        :param path: path to the file
+        :type path: str
+        """
+        with open(path, "rb") as stream:
+            data = stream.read()
+        if len(data) < SITES_HEADER_SIZE:
+            ADAPTER.error("{:s} is too small to be a SpecProf call sites file!".format(path))
+            raise IOError("{:s} is too small to be a SpecProf call sites file!".format(path))
+        self._header = SitesHeader._make(struct.unpack_from(SITES_HEADER_FORMAT, data, 0))
+        if self._header.magic != SITES_MAGIC or self._header.version != SITES_VERSION:
+            ADAPTER.error("{:s} is not a SpecProf call sites file of version {:d}!".format(path, SITES_VERSION))
+            raise IOError("{:s} is not a SpecProf call sites file of version {:d}!".format(path, SITES_VERSION))
+        header = self._header
+        strings = data[header.header_size:].split(b"\0", header.nb_functions + header.nb_modules)
+        names = [name.decode("iso-8859-1") for name in strings[:header.nb_functions + header.nb_modules]]
+        self._functions = names[:header.nb_functions]
+        self._modules = names[header.nb_functions:]
+        records_offset = len(data) - header.nb_sites * RECORD_STRUCT.size
+        if records_offset < header.header_size:
+            ADAPTER.error("{:s} is truncated!".format(path))
+            raise IOError("{:s} is truncated!".format(path))
+        self._sites = [self._call_site(*RECORD_STRUCT.unpack_from(data, records_offset + index * RECORD_STRUCT.size))
+                       for index in range(header.nb_sites)]
+
+    def _call_site(self, func, module, offset, call_count, sampled_count, total_ticks):
+        """
+        :return: the call site of a record of the file
+        :rtype: CallSite
+        """
+        total_ns = 0.
+        if sampled_count:
+            mean_ns = total_ticks * self._header.ns_per_tick / sampled_count
+            total_ns = max(mean_ns - self._header.overhead_ns, 0.) * call_count
+        return CallSite(self._functions[func], self._modules[module] if module < len(self._modules) else None,
+                        offset, call_count, sampled_count, total_ns)
+
+    @property
+    def header(self):
+        """
+        :return: the header of the file
+        :rtype: SitesHeader
+        """
+        return self._header
+
+    @property
+    def functions(self):
+        """
+        :return: the names of the wrapped functions
+        :rtype: list
+        """
+        return self._functions
+
+    @property
+    def timer(self):
+        """
+        :return: the name of the timer used by the wrapper
+        :rtype: str
+        """
+        return TIMER_NAMES[self._header.timer]
+
+    @property
+    def sites(self):
+        """
+        :return: the call sites of all the functions
+        :rtype: list
+        """
+        return self._sites
+
+
+class Symbolizer(object):
+    """
+    Turn addresses relative to the load address of a module into the name of the function
+    holding them, with the symbol tables of the module (.symtab if the module isn't stripped,
+    .dynsym otherwise). The sorted functions of each module are kept in the library cache.
+    """
+    def __init__(self, use_cache=True):
+        """
+        :param use_cache: if True, the functions of the modules are taken from (or stored in)
+         the library cache
+        :type use_cache: bool
+        """
+        self._use_cache = use_cache
+        # Start addresses, end addresses and symbols of the functions of each module
+        self._modules = {}
+        self._demangled = {}
+
+    @staticmethod
+    def _read_functions(elf_reader):
+        """
+        :param elf_reader: reader of the module
+        :type elf_reader: ElfReader
+        :return: the start address, end address and symbol of the functions, sorted by address
+        :rtype: list
+        """
+        table = '.symtab' if elf_reader.has_symbol_table('.symtab') else '.dynsym'
+        functions = set()
+        for symbol in elf_reader.iter_symbols(table):
+            if symbol.type in ("FUNC", "GNU_IFUNC") and symbol.is_defined and symbol.value:
+                functions.add((symbol.value, symbol.value + max(symbol.size, 1), symbol.name))
+        return sorted(functions)
+
+    def _functions(self, module):
+        """
+        :param module: path to the module
+        :type module: str
+        :return: the start addresses, the end addresses and the symbols of the functions of
+         the module, sorted by address (empty if the module can't be read)
+        :rtype: list
+        """
+        if module in self._modules:
+            return self._modules[module]
+        columns = [[], [], []]
+        try:
+            with ElfReader(module) as elf_reader:
+                identity = LibraryIdentity.of(module, elf_reader)
+                cached = self._load_from_cache(identity)
+                if cached is not None:
+                    columns = cached
+                else:
+                    columns = [list(column) for column in zip(*self._read_functions(elf_reader))] or columns
+                    self._store_in_cache(identity, columns)
+        except (IOError, OSError, ValueError) as error:
+            ADAPTER.warning("Unable to read the symbols of {:s} : {:s}".format(module, str(error)))
+        self._modules[module] = columns
+        return columns
+
+    def _load_from_cache(self, identity):
+        """
+        :param identity: identity of the module
+        :type identity: LibraryIdentity
+        :return: the functions of the module found in the cache, or None
+        :rtype: list
+        """
+        if not self._use_cache:
+            return None
+        try:
+            cache = LibraryCache()
+            try:
+                return cache.get(identity, "functions")
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError, ValueError) as error:
+            ADAPTER.warning("Unable to read the library cache : {:s}".format(str(error)))
+            return None
+
+    def _store_in_cache(self, identity, columns):
+        """
+        Store the functions of a module in the cache, by columns (start addresses, end
+        addresses and symbols)
+
+        :param identity: identity of the module
+        :type identity: LibraryIdentity
+        :param columns: functions of the module
+        :type columns: list
+        """
+        if not self._use_cache:
+            return
+        try:
+            cache = LibraryCache()
+            try:
+                cache.put(identity, "functions", columns)
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError) as error:
+            ADAPTER.warning("Unable to write in the library cache : {:s}".format(str(error)))
+
+    def _lookup(self, module, offset):
+        """
+        :return: the symbol of the function holding the address and the offset of the address
+         in the function, or None if the address isn't in a known function
+        :rtype: tuple
+        """
+        starts, ends, symbols = self._functions(module)
+        # A return address follows the call : the call itself is one byte before
+        index = bisect.bisect_right(starts, offset - 1) - 1
+        if index < 0 or offset - 1 >= ends[index]:
+            return None
+        return symbols[index], offset - starts[index]
+
+    def symbolize(self, sites):
+        """
+        :param sites: call sites
+        :type sites: list
+        :return: the name of the calling function of each call site, as "function+0xoffset"
+         ("module+0xoffset" if the function is unknown, "0xaddress" if the module is unknown)
+        :rtype: list
+        """
+        found = [self._lookup(site.module, site.offset) if site.module else None for site in sites]
+        symbols = sorted(set(result[0] for result in found if result and result[0] not in self._demangled))
+        try:
+            self._demangled.update(zip(symbols, demangle_symbols(symbols)))
+        except (subprocess.CalledProcessError, RuntimeError, OSError) as error:
+            ADAPTER.warning("Unable to demangle the symbols : {:s}".format(str(error)))
+            self._demangled.update(zip(symbols, symbols))
+        names = []
+        for site, result in zip(sites, found):
+            if result:
+                names.append("{:s}+0x{:x}".format(self._demangled[result[0]], result[1]))
+            elif site.module:
+                names.append("{:s}+0x{:x}".format(os.path.basename(site.module), site.offset))
+            else:
+                names.append("0x{:x}".format(site.offset))
+        return names
+
+
+def format_call_sites(sites_file, symbolizer=None, top=10):
+    """
+    :param sites_file: call sites file
+    :type sites_file: CallSitesFile
+    :param symbolizer: symbolizer of the return addresses (a new one by default)
+    :type symbolizer: Symbolizer
+    :param top: maximum number of call sites printed for each function (0 for all of them)
+    :type top: int
+    :return: the report of the call sites of each function, sorted by total time (or by
+     number of calls if no call was timed)
+    :rtype: str
+    """
+    symbolizer = symbolizer or Symbolizer()
+    line_format = "  {:>12s} {:>7s} {:>14s} {:>12s}  {:s}"
+    lines = ["SpecProf call sites (timer : {:s}, pid : {:d})".format(sites_file.timer, sites_file.header.pid)]
+    if sites_file.header.unattributed_calls:
+        lines.append("{:d} calls not attributed : the call sites tables were full (see SPECPROF_CALL_SITES_SLOTS)"
+                     .format(sites_file.header.unattributed_calls))
+    for function in sites_file.functions:
+        sites = [site for site in sites_file.sites if site.function == function]
+        if not sites:
+            continue
+        sites.sort(key=lambda site: (site.total_ns, site.call_count), reverse=True)
+        total_ns = sum(site.total_ns for site in sites)
+        total_calls = sum(site.call_count for site in sites)
+        shown = sites[:top] if top else sites
+        lines.append("CALL SITES OF FUNCTION : {:s} ({:d} call sites, {:d} calls)"
+                     .format(function, len(sites), total_calls))
+        lines.append(line_format.format("calls", "time %", "total time s", "mean ns", "caller"))
+        for site, name in zip(shown, symbolizer.symbolize(shown)):
+            share = 100. * site.total_ns / total_ns if total_ns else 100. * site.call_count / total_calls
+            mean = "{:.1f}".format(site.mean_ns) if site.mean_ns is not None else "-"
+            lines.append(line_format.format("{:d}".format(site.call_count), "{:.1f}".format(share),
+                                            "{:.6f}".format(site.total_ns * 1e-9), mean, name))
+        if len(shown) < len(sites):
+            lines.append("  ... {:d} other call sites".format(len(sites) - len(shown)))
+    return "\n".join(lines)
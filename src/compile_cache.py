@@ -0,0 +1,243 @@
+"""
+A module implementing the CompileCache class, a content-addressed cache of the compiled
+wrapper libraries
+"""
+import os
+import re
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+import subprocess
+from colored_logger import ColoredLoggerAdapter
+from library_cache import default_cache_dir
+try:
+    from shutil import which
+except ImportError:  # python 2
+    from distutils.spawn import find_executable as which
+
+LOGGER = logging.getLogger("SpecProf.compile_cache")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# Changed when the way the keys are computed changes
+KEY_FORMAT = b"specprof-compile-3"
+# Options of a compilation command changing the headers found by the preprocessor
+PREPROCESSOR_OPTIONS = ("-D", "-U", "-I", "-std", "-include", "-isystem", "-iquote", "-idirafter")
+
+
+def compiler_identity(compiler):
+    """
+    :param compiler: name or path of the compiler
+    :type compiler: str
+    :return: the identity of the compiler executable (its real path, size and modification time),
+     obtained without running it
+    :rtype: str
+    """
+    path = which(compiler)
+    if path is None:
+        return compiler
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return "{:s}:{:d}:{:d}".format(path, stat.st_size, int(stat.st_mtime * 1e9))
+
+
+def dependencies(path_to_src, command):
+    """
+    :param path_to_src: path to the source file
+    :type path_to_src: str
+    :param command: compilation command, the compiler first
+    :type command: list
+    :return: the paths of the source file and of the headers it includes, directly or not, as
+     listed by the preprocessor of the compiler (-MM : the headers of the system directories are
+     left out, the compiler identity standing for them)
+    :rtype: list
+    :raise OSError: if the preprocessor can't be run
+    :raise subprocess.CalledProcessError: if the preprocessor fails
+    """
+    directory = os.path.dirname(os.path.abspath(path_to_src))
+    options = [option for option in command[1:] if option.startswith(PREPROCESSOR_OPTIONS)]
+    output = subprocess.check_output([command[0]] + options + ["-MM", os.path.abspath(path_to_src)],
+                                     cwd=directory, stderr=subprocess.STDOUT)
+    return parse_make_rule(output.decode("utf-8", "replace"), directory)
+
+
+def parse_make_rule(rule, directory="/"):
+    """
+    :param rule: make rule written by the preprocessor (-M or -MM)
+    :type rule: str
+    :param directory: directory of the relative paths
+    :type directory: str
+    :return: the absolute paths of the prerequisites of the rule
+    :rtype: list
+
+    >>> parse_make_rule("wrapper.o: /tmp/wrapper.c my\\\\ dir/a.h \\\\\\n /usr/b.h\\n", "/src")
+    ['/tmp/wrapper.c', '/src/my dir/a.h', '/usr/b.h']
+    """
+    prerequisites = rule.replace("\\\n", " ").split(":", 1)[-1]
+    return [os.path.normpath(os.path.join(directory, path.replace("\\ ", " ")))
+            for path in re.split(r"(?<!\\)\s+", prerequisites.strip()) if path]
+
+
+class CompileCache(object):
+    """
+    A cache of compiled shared objects, stored as files named by the hash of everything
+    the compilation depends on : the rendered source, the compiler, its flags and the
+    contents of all the headers included by the source, directly or not, as listed by the
+    preprocessor.
+
+    Entries are written in a temporary file then renamed, so that concurrent runs sharing
+    the cache never see a partially written library. When the total size of the entries
+    exceeds the maximum size, the least recently used ones are evicted.
+    """
+    def __init__(self, cache_dir=None, max_size=None):
+        """
+        :param cache_dir: directory of the cache (the 'compiled' subdirectory of
+         default_cache_dir() by default)
+        :type cache_dir: str
+        :param max_size: maximum size in bytes of the cached libraries (environment variable
+         SPECPROF_COMPILE_CACHE_MAX_SIZE or 256 MiB by default)
+        :type max_size: int
+        """
+        self._cache_dir = cache_dir or os.path.join(default_cache_dir(), "compiled")
+        if max_size is None:
+            max_size = int(os.environ.get("SPECPROF_COMPILE_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE))
+        self._max_size = max_size
+        try:
+            os.makedirs(self._cache_dir)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    @property
+    def path(self):
+        """
+        :return: the directory of the cache
+        :rtype: str
+        """
+        return self._cache_dir
+
+    @staticmethod
+    def key(path_to_src, command, headers=None):
+        """
+        :param path_to_src: path to the source file
+        :type path_to_src: str
+        :param command: compilation command, the compiler first
+        :type command: list
+        :param headers: paths to the headers given to the source file, hashed as well when the
+         preprocessor can't list the dependencies (the compilation then fails anyway)
+        :type headers: list
+        :return: the key of the compiled library
+        :rtype: str
+        """
+        digest = hashlib.sha256(KEY_FORMAT)
+        digest.update(b"\0" + compiler_identity(command[0]).encode("utf-8"))
+        digest.update(b"\0" + "\0".join(command).encode("utf-8"))
+        try:
+            paths = dependencies(path_to_src, command)
+        except subprocess.CalledProcessError:
+            ADAPTER.warning("The headers included by {:s} can't be listed by the preprocessor".format(path_to_src))
+            paths = [path_to_src] + list(headers or [])
+        for index, path in enumerate(paths):
+            # The source is hashed under its name : the same wrapper generated in another working
+            # directory has the same key
+            name = os.path.basename(path) if index == 0 else path
+            digest.update(b"\0" + name.encode("utf-8") + b"\0")
+            with open(path, "rb") as stream:
+                digest.update(stream.read())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        """
+        :param key: key of the library
+        :type key: str
+        :return: path of the cached library
+        :rtype: str
+        """
+        return os.path.join(self._cache_dir, key + ".so")
+
+    def fetch(self, key, destination):
+        """
+        Copy the cached library to the destination
+
+        :param key: key of the library
+        :type key: str
+        :param destination: path where the library is copied
+        :type destination: str
+        :return: True if the library was in the cache
+        :rtype: bool
+        """
+        entry = self._entry_path(key)
+        try:
+            # The access time is the modification time of the entry, used to evict the oldest ones
+            os.utime(entry, None)
+            self._atomic_copy(entry, destination)
+        except (IOError, OSError) as error:
+            if error.errno != errno.ENOENT:
+                raise
+            ADAPTER.info("No compiled library in the cache for key {:s}".format(key))
+            return False
+        ADAPTER.info("Compiled library found in the cache for key {:s}".format(key))
+        return True
+
+    def store(self, key, library):
+        """
+        Store a compiled library and evict the least recently used ones if the cache is full
+
+        :param key: key of the library
+        :type key: str
+        :param library: path to the compiled library
+        :type library: str
+        """
+        self._atomic_copy(library, self._entry_path(key))
+        ADAPTER.info("Compiled library of {:d} bytes stored in the cache for key {:s}"
+                     .format(os.path.getsize(library), key))
+        self._evict()
+
+    @staticmethod
+    def _atomic_copy(source, destination):
+        """
+        Copy a file through a temporary file renamed at the end
+
+        :param source: path to the file to copy
+        :type source: str
+        :param destination: path to the copy
+        :type destination: str
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destination)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file, open(source, "rb") as src:
+                shutil.copyfileobj(src, tmp_file)
+            shutil.copymode(source, tmp_path)
+            os.rename(tmp_path, destination)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _evict(self):
+        """
+        Remove the least recently used libraries until the total size of the cache fits
+        in the maximum size
+        """
+        entries = []
+        for name in os.listdir(self._cache_dir):
+            if not name.endswith(".so"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._cache_dir, name))
+            except OSError:
+                # Evicted by a concurrent run
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            try:
+                os.remove(os.path.join(self._cache_dir, name))
+            except OSError:
+                pass
+            total_size -= size
+            ADAPTER.info("Compiled library {:s} evicted from the cache".format(name))
@@ -0,0 +1,58 @@
+"""
+A module implementing the demangling of C++ symbols in a single pass
+"""
+import logging
+import subprocess
+import time
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.demangler")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+DEMANGLER_CMD = ["c++filt", "-i", "-t"]
+
+
+def demangle_symbols(symbols, cmd=None, encoding='iso-8859-1'):
+    """
+    Demangle all the symbols through one demangler process.
+
+    The symbols are streamed, one per line, on the standard input of the demangler
+    and the unmangled names are read back, in the same order, on its standard output.
+    Whatever the number of symbols, only one process is launched.
+
+    :param symbols: symbols to demangle
+    :type symbols: list
+    :param cmd: command line of the demangler (c++filt by default)
+    :type cmd: list
+    :param encoding: encoding of the symbols and of the demangler output
+    :type encoding: str
+    :return: the unmangled names, in the same order as the symbols
+    :rtype: list
+    :raise subprocess.CalledProcessError: if the demangler doesn't succeed
+    :raise RuntimeError: if the demangler doesn't return one line per symbol
+    """
+    if not symbols:
+        return []
+    if cmd is None:
+        cmd = DEMANGLER_CMD
+    start = time.time()
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    input_bytes = "\n".join(symbols).encode(encoding) + b"\n"
+    output_bytes, error_bytes = process.communicate(input_bytes)
+    if process.returncode != 0:
+        ADAPTER.error("""The command {:s} doesn't succeed!"""
+                      """ Return code is : {:d}""".format(" ".join(cmd), process.returncode))
+        ADAPTER.error("{:s}".format(error_bytes.decode(encoding)))
+        raise subprocess.CalledProcessError(process.returncode, " ".join(cmd))
+    unmangled = output_bytes.decode(encoding).splitlines()
+    if len(unmangled) != len(symbols):
+        msg = ("The demangler returned {:d} names for {:d} symbols!"
+               .format(len(unmangled), len(symbols)))
+        ADAPTER.error(msg)
+        raise RuntimeError(msg)
+    nb_changed = sum(1 for _sym, _name in zip(symbols, unmangled) if _sym != _name)
+    ADAPTER.info("{:d} symbols demangled ({:d} were mangled) in {:.3f} s by a single < {:s} > process"
+                 .format(len(symbols), nb_changed, time.time() - start, " ".join(cmd)))
+    return unmangled
@@ -0,0 +1,1015 @@
+"""
+A module implementing the DwarfReader class, a pure python reader of the DWARF debugging
+information of ELF shared objects giving the prototypes of their functions : return type,
+parameters with their names, namespace, class and headers declaring them
+"""
+from __future__ import print_function
+import os
+import time
+import struct
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from elf_reader import ElfReader
+
+LOGGER = logging.getLogger("SpecProf.dwarf_reader")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Tags of the debugging information entries
+DW_TAG_array_type = 0x01
+DW_TAG_class_type = 0x02
+DW_TAG_enumeration_type = 0x04
+DW_TAG_formal_parameter = 0x05
+DW_TAG_pointer_type = 0x0f
+DW_TAG_reference_type = 0x10
+DW_TAG_compile_unit = 0x11
+DW_TAG_structure_type = 0x13
+DW_TAG_subroutine_type = 0x15
+DW_TAG_typedef = 0x16
+DW_TAG_union_type = 0x17
+DW_TAG_unspecified_parameters = 0x18
+DW_TAG_ptr_to_member_type = 0x1f
+DW_TAG_subrange_type = 0x21
+DW_TAG_base_type = 0x24
+DW_TAG_const_type = 0x26
+DW_TAG_subprogram = 0x2e
+DW_TAG_volatile_type = 0x35
+DW_TAG_restrict_type = 0x37
+DW_TAG_namespace = 0x39
+DW_TAG_unspecified_type = 0x3b
+DW_TAG_partial_unit = 0x3c
+DW_TAG_rvalue_reference_type = 0x42
+DW_TAG_atomic_type = 0x47
+
+# Attributes
+DW_AT_sibling = 0x01
+DW_AT_name = 0x03
+DW_AT_stmt_list = 0x10
+DW_AT_language = 0x13
+DW_AT_comp_dir = 0x1b
+DW_AT_upper_bound = 0x2f
+DW_AT_abstract_origin = 0x31
+DW_AT_artificial = 0x34
+DW_AT_count = 0x37
+DW_AT_decl_file = 0x3a
+DW_AT_declaration = 0x3c
+DW_AT_external = 0x3f
+DW_AT_specification = 0x47
+DW_AT_type = 0x49
+DW_AT_linkage_name = 0x6e
+DW_AT_str_offsets_base = 0x72
+DW_AT_MIPS_linkage_name = 0x2007
+
+# Forms of the attributes
+DW_FORM_addr = 0x01
+DW_FORM_block2 = 0x03
+DW_FORM_block4 = 0x04
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_string = 0x08
+DW_FORM_block = 0x09
+DW_FORM_block1 = 0x0a
+DW_FORM_data1 = 0x0b
+DW_FORM_flag = 0x0c
+DW_FORM_sdata = 0x0d
+DW_FORM_strp = 0x0e
+DW_FORM_udata = 0x0f
+DW_FORM_ref_addr = 0x10
+DW_FORM_ref1 = 0x11
+DW_FORM_ref2 = 0x12
+DW_FORM_ref4 = 0x13
+DW_FORM_ref8 = 0x14
+DW_FORM_ref_udata = 0x15
+DW_FORM_indirect = 0x16
+DW_FORM_sec_offset = 0x17
+DW_FORM_exprloc = 0x18
+DW_FORM_flag_present = 0x19
+DW_FORM_strx = 0x1a
+DW_FORM_addrx = 0x1b
+DW_FORM_ref_sup4 = 0x1c
+DW_FORM_strp_sup = 0x1d
+DW_FORM_data16 = 0x1e
+DW_FORM_line_strp = 0x1f
+DW_FORM_ref_sig8 = 0x20
+DW_FORM_implicit_const = 0x21
+DW_FORM_loclistx = 0x22
+DW_FORM_rnglistx = 0x23
+DW_FORM_ref_sup8 = 0x24
+DW_FORM_strx1 = 0x25
+DW_FORM_strx2 = 0x26
+DW_FORM_strx3 = 0x27
+DW_FORM_strx4 = 0x28
+DW_FORM_addrx1 = 0x29
+DW_FORM_addrx2 = 0x2a
+DW_FORM_addrx3 = 0x2b
+DW_FORM_addrx4 = 0x2c
+DW_FORM_GNU_addr_index = 0x1f01
+DW_FORM_GNU_str_index = 0x1f02
+DW_FORM_GNU_ref_alt = 0x1f20
+DW_FORM_GNU_strp_alt = 0x1f21
+
+# Unit types of DWARF 5
+DW_UT_type = 0x02
+DW_UT_skeleton = 0x04
+DW_UT_split_compile = 0x05
+DW_UT_split_type = 0x06
+
+# Contents of the entries of the directories and files tables of DWARF 5 line programs
+DW_LNCT_path = 0x1
+DW_LNCT_directory_index = 0x2
+
+# Languages of the C family (the struct, union and enum types are named with their keyword)
+C_LANGUAGES = (0x01, 0x02, 0x0c, 0x1d, 0x2c)
+
+# Entries kept : the scopes, the types and the functions. The parameters are only kept for the
+# functions and the function types, the subranges for the arrays
+_KEPT_TAGS = frozenset([DW_TAG_compile_unit, DW_TAG_partial_unit, DW_TAG_namespace, DW_TAG_subprogram,
+                        DW_TAG_class_type, DW_TAG_structure_type, DW_TAG_union_type, DW_TAG_enumeration_type,
+                        DW_TAG_typedef, DW_TAG_base_type, DW_TAG_unspecified_type, DW_TAG_pointer_type,
+                        DW_TAG_reference_type, DW_TAG_rvalue_reference_type, DW_TAG_ptr_to_member_type,
+                        DW_TAG_const_type, DW_TAG_volatile_type, DW_TAG_restrict_type, DW_TAG_atomic_type,
+                        DW_TAG_array_type, DW_TAG_subroutine_type])
+_CHILD_TAGS = {DW_TAG_formal_parameter: (DW_TAG_subprogram, DW_TAG_subroutine_type),
+               DW_TAG_unspecified_parameters: (DW_TAG_subprogram, DW_TAG_subroutine_type),
+               DW_TAG_subrange_type: (DW_TAG_array_type,)}
+_KEPT_ATTRIBUTES = frozenset([DW_AT_sibling, DW_AT_name, DW_AT_stmt_list, DW_AT_language, DW_AT_comp_dir,
+                              DW_AT_upper_bound, DW_AT_abstract_origin, DW_AT_artificial, DW_AT_count,
+                              DW_AT_decl_file, DW_AT_declaration, DW_AT_external, DW_AT_specification,
+                              DW_AT_type, DW_AT_linkage_name, DW_AT_str_offsets_base, DW_AT_MIPS_linkage_name])
+_SCOPE_TAGS = (DW_TAG_namespace, DW_TAG_class_type, DW_TAG_structure_type, DW_TAG_union_type)
+_CLASS_TAGS = (DW_TAG_class_type, DW_TAG_structure_type, DW_TAG_union_type)
+_NAMED_TAGS = {DW_TAG_class_type: "class", DW_TAG_structure_type: "struct", DW_TAG_union_type: "union",
+               DW_TAG_enumeration_type: "enum", DW_TAG_typedef: None, DW_TAG_base_type: None,
+               DW_TAG_unspecified_type: None}
+_MODIFIERS = {DW_TAG_pointer_type: "*", DW_TAG_reference_type: "&", DW_TAG_rvalue_reference_type: "&&"}
+_QUALIFIERS = {DW_TAG_const_type: "const", DW_TAG_volatile_type: "volatile", DW_TAG_restrict_type: "__restrict",
+               DW_TAG_atomic_type: "_Atomic"}
+_REFERENCE_FORMS = (DW_FORM_ref1, DW_FORM_ref2, DW_FORM_ref4, DW_FORM_ref8, DW_FORM_ref_udata)
+_LEB_FORMS = (DW_FORM_sdata, DW_FORM_udata, DW_FORM_ref_udata, DW_FORM_strx, DW_FORM_addrx, DW_FORM_loclistx,
+              DW_FORM_rnglistx, DW_FORM_GNU_addr_index, DW_FORM_GNU_str_index)
+_STRX_FORMS = {DW_FORM_strx1: 1, DW_FORM_strx2: 2, DW_FORM_strx3: 3, DW_FORM_strx4: 4}
+# Maximum number of levels of the declaration of a type (protection against cyclic information)
+_MAX_TYPE_DEPTH = 64
+
+# Only the headers of the library are included by a wrapper : those of the system are included by them
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".h++")
+SYSTEM_INCLUDE_DIRS = ("/usr/include/", "/usr/lib/")
+# Directories searched for the separate debugging information of a stripped library
+DEBUG_DIRS = ("/usr/lib/debug",)
+
+
+class Prototype(namedtuple("Prototype", ["symbol", "return_type", "namespace", "class_name", "name",
+                                         "parameters", "qualifiers", "headers"])):
+    """
+    The prototype of a function given by the debugging information : its symbol, its return type,
+    its namespace (or None) and its class ('' for a free function), its name, its parameters as
+    (declaration, name) pairs, the qualifiers of a method ('const', 'static'... or '') and the
+    headers of the library declaring the function and the types of its parameters
+    """
+    __slots__ = ()
+
+    @property
+    def parameters_declaration(self):
+        """
+        :return: the declaration of the parameters
+        :rtype: str
+
+        >>> prototype = Prototype("solve", "int", None, "", "solve", (("double *x", "x"), ("int n", "n")), "", ())
+        >>> prototype.parameters_declaration
+        'double *x, int n'
+        """
+        return ", ".join(declaration for declaration, _ in self.parameters)
+
+    @property
+    def parameters_names(self):
+        """
+        :return: the names of the parameters
+        :rtype: list
+        """
+        return [name for _, name in self.parameters]
+
+    @property
+    def signature(self):
+        """
+        :return: the signature of the function, without its namespace
+        :rtype: str
+
+        >>> Prototype("_ZN2ns3Vec4dataEv", "double *", "ns", "Vec", "data", (), "", ()).signature
+        'double *Vec::data()'
+        """
+        separator = "" if self.return_type.endswith(("*", "&")) else " "
+        scope = self.class_name + "::" if self.class_name else ""
+        qualifiers = " " + self.qualifiers if self.qualifiers else ""
+        return "{:s}{:s}{:s}{:s}({:s}){:s}".format(self.return_type, separator, scope, self.name,
+                                                   self.parameters_declaration, qualifiers)
+
+    def check_wrappable(self):
+        """
+        Check that a wrapper can define the function from its prototype
+
+        :raise ValueError: if the function can't be wrapped
+
+        >>> Prototype("_ZNK3Vec4normEv", "double", None, "Vec", "norm", (), "const", ()).check_wrappable()
+        >>> Prototype("_ZNV3Vec4normEv", "double", None, "Vec", "norm", (), "volatile", ()).check_wrappable()
+        Traceback (most recent call last):
+        ...
+        ValueError: the 'volatile' qualified methods are not supported
+        """
+        if self.qualifiers == "static":
+            raise ValueError("static methods are not supported")
+        if self.qualifiers not in ("", "const"):
+            raise ValueError("the '{:s}' qualified methods are not supported".format(self.qualifiers))
+        if "<" in self.name or self.name.startswith("operator"):
+            raise ValueError("templates and operators are not supported")
+        if self.class_name and self.name in (self.class_name.split("<")[0], "~" + self.class_name.split("<")[0]):
+            raise ValueError("constructors and destructors are not supported")
+        if "::" in self.class_name:
+            raise ValueError("the methods of nested classes are not supported")
+        if "(" in self.return_type or "[" in self.return_type:
+            raise ValueError("functions returning a function pointer are not supported")
+        if any(declaration == "..." for declaration, _ in self.parameters):
+            raise ValueError("variadic functions are not supported")
+
+
+class _Unit(object):
+    """
+    A unit of the debugging information : its header, its abbreviations, its files and its language
+    """
+    __slots__ = ("offset", "end", "version", "offset_size", "address_size", "abbreviations", "die_offset",
+                 "sizes", "str_offsets_base", "files", "is_c")
+
+    def __init__(self, offset, end, version, offset_size, address_size, abbreviations, die_offset):
+        self.offset, self.end, self.version = offset, end, version
+        self.offset_size, self.address_size = offset_size, address_size
+        self.abbreviations, self.die_offset = abbreviations, die_offset
+        # Sizes of the forms of fixed size
+        self.sizes = {DW_FORM_addr: address_size, DW_FORM_data1: 1, DW_FORM_ref1: 1, DW_FORM_flag: 1,
+                      DW_FORM_strx1: 1, DW_FORM_addrx1: 1, DW_FORM_data2: 2, DW_FORM_ref2: 2, DW_FORM_strx2: 2,
+                      DW_FORM_addrx2: 2, DW_FORM_strx3: 3, DW_FORM_addrx3: 3, DW_FORM_data4: 4, DW_FORM_ref4: 4,
+                      DW_FORM_strx4: 4, DW_FORM_addrx4: 4, DW_FORM_ref_sup4: 4, DW_FORM_data8: 8, DW_FORM_ref8: 8,
+                      DW_FORM_ref_sig8: 8, DW_FORM_ref_sup8: 8, DW_FORM_data16: 16, DW_FORM_strp: offset_size,
+                      DW_FORM_sec_offset: offset_size, DW_FORM_line_strp: offset_size,
+                      DW_FORM_strp_sup: offset_size, DW_FORM_GNU_ref_alt: offset_size,
+                      DW_FORM_GNU_strp_alt: offset_size, DW_FORM_flag_present: 0, DW_FORM_implicit_const: 0,
+                      DW_FORM_ref_addr: offset_size if version >= 3 else address_size}
+        # Offset of the string offsets of the unit, after the header of the .debug_str_offsets contribution
+        self.str_offsets_base = 2 * offset_size
+        self.files = []
+        self.is_c = False
+
+
+def _uleb128(data, offset):
+    """
+    :param data: bytes
+    :type data: bytearray
+    :param offset: offset of an unsigned LEB128 number
+    :type offset: int
+    :return: the number and the offset following it
+    :rtype: tuple
+
+    >>> _uleb128(bytearray(b"\\xe5\\x8e\\x26"), 0)
+    (624485, 3)
+    """
+    result, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _sleb128(data, offset):
+    """
+    :param data: bytes
+    :type data: bytearray
+    :param offset: offset of a signed LEB128 number
+    :type offset: int
+    :return: the number and the offset following it
+    :rtype: tuple
+
+    >>> _sleb128(bytearray(b"\\xc0\\xbb\\x78"), 0)
+    (-123456, 3)
+    """
+    result, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            if byte & 0x40:
+                result -= 1 << shift
+            return result, offset
+
+
+def _cstring(data, offset):
+    """
+    :param data: bytes
+    :type data: bytearray
+    :param offset: offset of a null terminated string
+    :type offset: int
+    :return: the string as a native string and the offset following it
+    :rtype: tuple
+    """
+    end = data.find(b"\0", offset)
+    raw = bytes(data[offset:end])
+    return (raw if isinstance(raw, str) else raw.decode('iso-8859-1')), end + 1
+
+
+def is_library_header(path):
+    """
+    :param path: path to a file
+    :type path: str
+    :return: True if the file is a header which is not a header of the system
+    :rtype: bool
+
+    >>> is_library_header("/opt/hydro/include/pressure.hpp"), is_library_header("/usr/include/stdio.h")
+    (True, False)
+    """
+    return path.endswith(HEADER_EXTENSIONS) and not path.startswith(SYSTEM_INCLUDE_DIRS)
+
+
+def find_debug_file(path, elf_reader):
+    """
+    :param path: path to a shared object
+    :type path: str
+    :param elf_reader: reader of the shared object
+    :type elf_reader: elf_reader.ElfReader
+    :return: the path to the file holding the debugging information of the shared object : the
+     object itself, or, if it is stripped, the separate debugging file found by build-id or by
+     debug link ; None if there is no debugging information
+    :rtype: str
+    """
+    if elf_reader.section_by_name('.debug_info') is not None:
+        return path
+    candidates = []
+    build_id = elf_reader.build_id()
+    if build_id:
+        candidates.extend(os.path.join(debug_dir, ".build-id", build_id[:2], build_id[2:] + ".debug")
+                          for debug_dir in DEBUG_DIRS)
+    debuglink = elf_reader.debuglink()
+    if debuglink:
+        directory = os.path.dirname(os.path.realpath(path))
+        candidates.append(os.path.join(directory, debuglink))
+        candidates.append(os.path.join(directory, ".debug", debuglink))
+        candidates.extend(os.path.join(debug_dir, directory.lstrip(os.sep), debuglink) for debug_dir in DEBUG_DIRS)
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class DwarfReader(object):
+    """
+    A class reading the DWARF debugging information (versions 2 to 5) of an ELF file.
+
+    The units of the .debug_info section are scanned once : only the entries describing the
+    scopes, the types and the functions, with their parameters, are decoded and kept. The rest of
+    the body of a function is skipped thanks to its sibling, as are the subtrees of the other
+    entries. The prototypes are then built from the kept entries.
+    """
+    def __init__(self, elf_reader):
+        """
+        :param elf_reader: reader of the ELF file holding the debugging information
+        :type elf_reader: elf_reader.ElfReader
+        """
+        self._info = self._section(elf_reader, '.debug_info')
+        self._abbrev = self._section(elf_reader, '.debug_abbrev')
+        self._str = self._section(elf_reader, '.debug_str')
+        self._line_str = self._section(elf_reader, '.debug_line_str')
+        self._str_offsets = self._section(elf_reader, '.debug_str_offsets')
+        self._line = self._section(elf_reader, '.debug_line')
+        byte_order = elf_reader.byte_order
+        self._little_endian = byte_order == "<"
+        self._u16 = struct.Struct(byte_order + "H").unpack_from
+        self._u32 = struct.Struct(byte_order + "I").unpack_from
+        self._u64 = struct.Struct(byte_order + "Q").unpack_from
+        # The kept entries : tag, attributes, offset of the parent and unit, by offset
+        self._dies = {}
+        # The offsets of the parameters of the functions and of the subranges of the arrays
+        self._children = {}
+        self._functions = []
+        self._abbreviations_cache = {}
+        offset = 0
+        while offset + 11 <= len(self._info):
+            offset = self._scan_unit(offset)
+
+    @staticmethod
+    def _section(elf_reader, name):
+        """
+        :return: the contents of the section or empty bytes if the file has no such section
+        :rtype: bytearray
+        """
+        return bytearray(elf_reader.section_data(name) or b"")
+
+    def _offset(self, data, offset, offset_size):
+        """
+        :return: the section offset (32 or 64 bits) at the offset
+        :rtype: int
+        """
+        return self._u32(data, offset)[0] if offset_size == 4 else self._u64(data, offset)[0]
+
+    def _abbreviations(self, offset):
+        """
+        :param offset: offset of the abbreviations table of a unit in .debug_abbrev
+        :type offset: int
+        :return: the tag, the children flag and the attributes (attribute, form, implicit value)
+         of each abbreviation, by code
+        :rtype: dict
+        """
+        if offset in self._abbreviations_cache:
+            return self._abbreviations_cache[offset]
+        abbrev, abbreviations, start = self._abbrev, {}, offset
+        while offset < len(abbrev):
+            code, offset = _uleb128(abbrev, offset)
+            if code == 0:
+                break
+            tag, offset = _uleb128(abbrev, offset)
+            has_children = bool(abbrev[offset])
+            offset += 1
+            attributes = []
+            while True:
+                attribute, offset = _uleb128(abbrev, offset)
+                form, offset = _uleb128(abbrev, offset)
+                implicit = None
+                if form == DW_FORM_implicit_const:
+                    implicit, offset = _sleb128(abbrev, offset)
+                if attribute == 0 and form == 0:
+                    break
+                attributes.append((attribute, form, implicit))
+            abbreviations[code] = (tag, has_children, attributes)
+        self._abbreviations_cache[start] = abbreviations
+        return abbreviations
+
+    def _scan_unit(self, offset):
+        """
+        Read the header of a unit and scan its entries
+
+        :param offset: offset of the unit in .debug_info
+        :type offset: int
+        :return: the offset of the next unit
+        :rtype: int
+        """
+        info = self._info
+        unit_length, offset_size, header = self._u32(info, offset)[0], 4, offset + 4
+        if unit_length == 0xffffffff:
+            unit_length, offset_size, header = self._u64(info, offset + 4)[0], 8, offset + 12
+        end = header + unit_length
+        version = self._u16(info, header)[0]
+        if version >= 5:
+            unit_type, address_size = info[header + 2], info[header + 3]
+            abbrev_offset = self._offset(info, header + 4, offset_size)
+            die_offset = header + 4 + offset_size
+            if unit_type in (DW_UT_skeleton, DW_UT_split_compile):
+                die_offset += 8
+            elif unit_type in (DW_UT_type, DW_UT_split_type):
+                die_offset += 8 + offset_size
+        else:
+            abbrev_offset = self._offset(info, header + 2, offset_size)
+            address_size = info[header + 2 + offset_size]
+            die_offset = header + 3 + offset_size
+        if not 2 <= version <= 5:
+            ADAPTER.warning("The DWARF version {:d} of the unit at 0x{:x} is not supported".format(version, offset))
+            return end
+        unit = _Unit(offset, end, version, offset_size, address_size, self._abbreviations(abbrev_offset),
+                     die_offset)
+        try:
+            self._scan_entries(unit)
+        except (KeyError, IndexError, ValueError, struct.error) as error:
+            ADAPTER.warning("The unit at 0x{:x} can't be read : {:s}".format(offset, repr(error)))
+        return end
+
+    def _scan_entries(self, unit):
+        """
+        Decode the entries of a unit and keep those describing the scopes, the types and the functions
+
+        :param unit: the unit
+        :type unit: _Unit
+        """
+        info, dies, children, abbreviations = self._info, self._dies, self._children, unit.abbreviations
+        sizes, skip_form, read_form = unit.sizes, self._skip_form, self._read_form
+        # Offset, tag and sibling of the ancestors of the current entry
+        stack = []
+        offset = unit.die_offset
+        while offset < unit.end:
+            die_offset = offset
+            code, offset = _uleb128(info, offset)
+            if code == 0:
+                if not stack:
+                    break
+                stack.pop()
+                continue
+            tag, has_children, attributes = abbreviations[code]
+            parent_offset, parent_tag, parent_sibling = stack[-1] if stack else (None, None, None)
+            if tag in _CHILD_TAGS:
+                keep = parent_tag in _CHILD_TAGS[tag]
+            else:
+                keep = tag in _KEPT_TAGS
+            if parent_tag == DW_TAG_subprogram and not keep and parent_sibling is not None:
+                # The parameters come first : the rest of the body of the function is skipped
+                offset = parent_sibling
+                stack.pop()
+                continue
+            if not keep:
+                sibling = None
+                for attribute, form, _ in attributes:
+                    if attribute == DW_AT_sibling:
+                        sibling, offset = read_form(unit, form, offset)
+                    elif form in sizes:
+                        offset += sizes[form]
+                    else:
+                        offset = skip_form(unit, form, offset)
+                if has_children:
+                    if sibling is not None:
+                        offset = sibling
+                    else:
+                        stack.append((die_offset, tag, None))
+                continue
+            if tag in (DW_TAG_compile_unit, DW_TAG_partial_unit):
+                # The string offsets base is needed to read the other attributes of the unit
+                values = self._read_attributes(unit, attributes, offset, (DW_AT_str_offsets_base,))
+                unit.str_offsets_base = values.get(DW_AT_str_offsets_base, unit.str_offsets_base)
+            values = {}
+            for attribute, form, implicit in attributes:
+                if attribute in _KEPT_ATTRIBUTES:
+                    values[attribute], offset = read_form(unit, form, offset, implicit)
+                elif form in sizes:
+                    offset += sizes[form]
+                else:
+                    offset = skip_form(unit, form, offset)
+            if tag in (DW_TAG_compile_unit, DW_TAG_partial_unit):
+                self._read_unit_attributes(unit, values)
+            elif tag == DW_TAG_subprogram:
+                self._functions.append(die_offset)
+            dies[die_offset] = (tag, values, parent_offset, unit)
+            if tag in _CHILD_TAGS:
+                children.setdefault(parent_offset, []).append(die_offset)
+            if has_children:
+                stack.append((die_offset, tag, values.get(DW_AT_sibling)))
+
+    def _read_attributes(self, unit, attributes, offset, wanted):
+        """
+        :return: the values of the wanted attributes of the entry whose attributes begin at the offset
+        :rtype: dict
+        """
+        values = {}
+        for attribute, form, implicit in attributes:
+            if attribute in wanted:
+                values[attribute], offset = self._read_form(unit, form, offset, implicit)
+            else:
+                offset = self._skip_form(unit, form, offset)
+        return values
+
+    def _read_unit_attributes(self, unit, values):
+        """
+        Read the language of a unit and the names of its files
+
+        :param unit: the unit
+        :type unit: _Unit
+        :param values: the attributes of the entry of the unit
+        :type values: dict
+        """
+        unit.is_c = values.get(DW_AT_language) in C_LANGUAGES
+        if DW_AT_stmt_list in values and values[DW_AT_stmt_list] < len(self._line):
+            unit.files = self._file_names(unit, values[DW_AT_stmt_list], values.get(DW_AT_comp_dir) or "")
+
+    def _skip_form(self, unit, form, offset):
+        """
+        :return: the offset following the value of the given form at the offset
+        :rtype: int
+        :raise ValueError: if the form is unknown
+        """
+        info = self._info
+        size = unit.sizes.get(form)
+        if size is not None:
+            return offset + size
+        if form == DW_FORM_string:
+            return info.find(b"\0", offset) + 1
+        if form in _LEB_FORMS:
+            while info[offset] & 0x80:
+                offset += 1
+            return offset + 1
+        if form in (DW_FORM_block, DW_FORM_exprloc):
+            length, offset = _uleb128(info, offset)
+            return offset + length
+        if form == DW_FORM_block1:
+            return offset + 1 + info[offset]
+        if form == DW_FORM_block2:
+            return offset + 2 + self._u16(info, offset)[0]
+        if form == DW_FORM_block4:
+            return offset + 4 + self._u32(info, offset)[0]
+        if form == DW_FORM_indirect:
+            form, offset = _uleb128(info, offset)
+            return self._skip_form(unit, form, offset)
+        raise ValueError("unknown form 0x{:x}".format(form))
+
+    def _read_form(self, unit, form, offset, implicit=None, data=None):
+        """
+        :return: the value of the given form at the offset (the references are converted to offsets
+         in .debug_info, the strings are read, the blocks and the forms referencing other sections
+         are None) and the offset following it
+        :rtype: tuple
+        """
+        data = self._info if data is None else data
+        if form in _REFERENCE_FORMS:
+            if form == DW_FORM_ref_udata:
+                value, offset = _uleb128(data, offset)
+            else:
+                value, offset = self._read_unsigned(data, offset, unit.sizes[form])
+            return unit.offset + value, offset
+        if form in (DW_FORM_data1, DW_FORM_data2, DW_FORM_data4, DW_FORM_data8, DW_FORM_flag, DW_FORM_ref_addr,
+                    DW_FORM_sec_offset, DW_FORM_addr):
+            return self._read_unsigned(data, offset, unit.sizes[form])
+        if form == DW_FORM_udata:
+            return _uleb128(data, offset)
+        if form == DW_FORM_sdata:
+            return _sleb128(data, offset)
+        if form == DW_FORM_flag_present:
+            return True, offset
+        if form == DW_FORM_implicit_const:
+            return implicit, offset
+        if form == DW_FORM_string:
+            return _cstring(data, offset)
+        if form in (DW_FORM_strp, DW_FORM_line_strp):
+            value, offset = self._read_unsigned(data, offset, unit.offset_size)
+            strings = self._str if form == DW_FORM_strp else self._line_str
+            return _cstring(strings, value)[0] if value < len(strings) else None, offset
+        if form in _STRX_FORMS or form in (DW_FORM_strx, DW_FORM_GNU_str_index):
+            if form in _STRX_FORMS:
+                index, offset = self._read_unsigned(data, offset, _STRX_FORMS[form])
+            else:
+                index, offset = _uleb128(data, offset)
+            position = unit.str_offsets_base + index * unit.offset_size
+            if position + unit.offset_size > len(self._str_offsets):
+                return None, offset
+            return _cstring(self._str, self._offset(self._str_offsets, position, unit.offset_size))[0], offset
+        return None, self._skip_form(unit, form, offset)
+
+    def _read_unsigned(self, data, offset, size):
+        """
+        :return: the unsigned integer of the given size at the offset and the offset following it
+        :rtype: tuple
+        """
+        if size == 1:
+            return data[offset], offset + 1
+        if size == 2:
+            return self._u16(data, offset)[0], offset + 2
+        if size == 4:
+            return self._u32(data, offset)[0], offset + 4
+        if size == 8:
+            return self._u64(data, offset)[0], offset + 8
+        value = 0
+        for index in range(size):
+            value |= data[offset + index] << (8 * index if self._little_endian else 8 * (size - 1 - index))
+        return value, offset + size
+
+    def _file_names(self, unit, offset, comp_dir):
+        """
+        :param unit: the unit
+        :type unit: _Unit
+        :param offset: offset of the line program of the unit in .debug_line
+        :type offset: int
+        :param comp_dir: compilation directory of the unit
+        :type comp_dir: str
+        :return: the paths of the files of the line program, by index (the first file has the
+         index 1 before DWARF 5, the unused index 0 is None)
+        :rtype: list
+        """
+        line = self._line
+        offset_size, header = 4, offset + 4
+        if self._u32(line, offset)[0] == 0xffffffff:
+            offset_size, header = 8, offset + 12
+        version = self._u16(line, header)[0]
+        offset = header + 2
+        if version >= 5:
+            offset += 2
+        # header_length, minimum_instruction_length, maximum_operations_per_instruction (since DWARF 4),
+        # default_is_stmt, line_base and line_range
+        offset += offset_size + (5 if version >= 4 else 4)
+        opcode_base = line[offset]
+        offset += opcode_base
+        if version < 5:
+            directories = [comp_dir]
+            while line[offset]:
+                directory, offset = _cstring(line, offset)
+                directories.append(directory)
+            offset += 1
+            files = [None]
+            while line[offset]:
+                name, offset = _cstring(line, offset)
+                directory, offset = _uleb128(line, offset)
+                _, offset = _uleb128(line, offset)
+                _, offset = _uleb128(line, offset)
+                files.append(os.path.join(comp_dir, directories[directory] if directory < len(directories) else "",
+                                          name))
+            return files
+        line_unit = _Unit(unit.offset, unit.end, version, offset_size, line[header + 2], {}, 0)
+        directories, offset = self._line_entries(line_unit, offset)
+        directories = [os.path.join(comp_dir, entry.get(DW_LNCT_path) or "") for entry in directories]
+        files, offset = self._line_entries(line_unit, offset)
+        return [os.path.join(directories[entry.get(DW_LNCT_directory_index, 0)]
+                             if entry.get(DW_LNCT_directory_index, 0) < len(directories) else comp_dir,
+                             entry.get(DW_LNCT_path) or "") for entry in files]
+
+    def _line_entries(self, unit, offset):
+        """
+        :return: the entries (contents by type) of a directories or files table of a DWARF 5 line
+         program and the offset following the table
+        :rtype: tuple
+        """
+        line = self._line
+        nb_formats = line[offset]
+        offset += 1
+        formats = []
+        for _ in range(nb_formats):
+            content, offset = _uleb128(line, offset)
+            form, offset = _uleb128(line, offset)
+            formats.append((content, form))
+        nb_entries, offset = _uleb128(line, offset)
+        entries = []
+        for _ in range(nb_entries):
+            entry = {}
+            for content, form in formats:
+                if form == DW_FORM_data16:
+                    value, offset = None, offset + 16
+                else:
+                    value, offset = self._read_form(unit, form, offset, data=line)
+                entry[content] = value
+            entries.append(entry)
+        return entries, offset
+
+    def _origins(self, offset):
+        """
+        :param offset: offset of an entry
+        :type offset: int
+        :return: the offsets of the entry and of the entries it completes (abstract origins and
+         specifications), the last one being the declaration
+        :rtype: list
+        """
+        chain = [offset]
+        while len(chain) < 8:
+            values = self._dies[chain[-1]][1]
+            origin = values.get(DW_AT_abstract_origin, values.get(DW_AT_specification))
+            if origin is None or origin not in self._dies or origin in chain:
+                break
+            chain.append(origin)
+        return chain
+
+    def _attribute(self, chain, attribute):
+        """
+        :return: the value of the attribute on the first entry of the chain having it and this entry
+        :rtype: tuple
+        """
+        for offset in chain:
+            values = self._dies[offset][1]
+            if attribute in values:
+                return values[attribute], offset
+        return None, None
+
+    def _decl_file(self, offset):
+        """
+        :return: the path to the file declaring the entry or None
+        :rtype: str
+        """
+        tag, values, _, unit = self._dies[offset]
+        index = values.get(DW_AT_decl_file)
+        if index is None or index >= len(unit.files):
+            return None
+        return unit.files[index]
+
+    def _add_header(self, offset, headers):
+        """
+        Add the header declaring an entry to the headers if it is a header of the library
+
+        :param offset: offset of an entry
+        :type offset: int
+        :param headers: the headers declaring the function and its types
+        :type headers: list
+        """
+        header = self._decl_file(offset)
+        if header is not None and is_library_header(header) and header not in headers:
+            headers.append(header)
+
+    def _scopes(self, offset):
+        """
+        :param offset: offset of an entry
+        :type offset: int
+        :return: the (offset, tag, name) of the namespaces and classes enclosing the entry, from the
+         outermost
+        :rtype: list
+        :raise ValueError: if the entry is in an anonymous namespace or class or in a function
+        """
+        scopes = []
+        parent = self._dies[offset][2]
+        while parent is not None:
+            tag, values, grand_parent, _ = self._dies[parent]
+            if tag in (DW_TAG_compile_unit, DW_TAG_partial_unit):
+                break
+            if tag not in _SCOPE_TAGS:
+                raise ValueError("local types and functions are not supported")
+            if not values.get(DW_AT_name):
+                raise ValueError("the anonymous namespaces and classes are not supported")
+            scopes.append((parent, tag, values[DW_AT_name]))
+            parent = grand_parent
+        return scopes[::-1]
+
+    def _type_name(self, offset, headers):
+        """
+        :param offset: offset of a named type
+        :type offset: int
+        :param headers: the headers declaring the types, completed with the header of this one
+        :type headers: list
+        :return: the qualified name of the type
+        :rtype: str
+        :raise ValueError: if the type has no name
+        """
+        chain = self._origins(offset)
+        tag, values, _, unit = self._dies[offset]
+        name = self._attribute(chain, DW_AT_name)[0]
+        if not name:
+            raise ValueError("the anonymous types are not supported")
+        declaration = chain[-1]
+        self._add_header(declaration, headers)
+        name = "::".join([scope for _, _, scope in self._scopes(declaration)] + [name])
+        if unit.is_c and _NAMED_TAGS[tag] in ("struct", "union", "enum"):
+            name = "{:s} {:s}".format(_NAMED_TAGS[tag], name)
+        return name
+
+    def _declaration(self, offset, declarator, headers, depth=0):
+        """
+        :param offset: offset of a type (None for void)
+        :type offset: int
+        :param declarator: the declarator of the declaration ('' for the type alone)
+        :type declarator: str
+        :param headers: the headers declaring the types, completed with those of this one
+        :type headers: list
+        :return: the declaration of the declarator with the type, in C syntax : 'double const *x',
+         'void (*callback)(int)'
+        :rtype: str
+        :raise ValueError: if the type can't be declared
+        """
+        if depth > _MAX_TYPE_DEPTH:
+            raise ValueError("the type is too deep")
+        if offset is None:
+            return "void" + (" " + declarator if declarator else "")
+        if offset not in self._dies:
+            raise ValueError("the type at 0x{:x} is unknown".format(offset))
+        tag, values, _, _ = self._dies[offset]
+        target = values.get(DW_AT_type)
+        if tag in _NAMED_TAGS:
+            return self._type_name(offset, headers) + (" " + declarator if declarator else "")
+        if tag in _MODIFIERS:
+            return self._declaration(target, _MODIFIERS[tag] + declarator, headers, depth + 1)
+        if tag in _QUALIFIERS:
+            return self._declaration(target, _QUALIFIERS[tag] + (" " + declarator if declarator else ""),
+                                     headers, depth + 1)
+        if declarator.startswith(("*", "&")):
+            declarator = "(" + declarator + ")"
+        if tag == DW_TAG_array_type:
+            bounds = []
+            for child in self._children.get(offset, []):
+                child_values = self._dies[child][1]
+                if isinstance(child_values.get(DW_AT_count), int):
+                    bounds.append("[{:d}]".format(child_values[DW_AT_count]))
+                elif isinstance(child_values.get(DW_AT_upper_bound), int):
+                    bounds.append("[{:d}]".format(child_values[DW_AT_upper_bound] + 1))
+                else:
+                    bounds.append("[]")
+            return self._declaration(target, declarator + "".join(bounds or ["[]"]), headers, depth + 1)
+        if tag == DW_TAG_subroutine_type:
+            parameters = []
+            for child in self._children.get(offset, []):
+                child_tag, child_values, _, _ = self._dies[child]
+                if child_tag == DW_TAG_unspecified_parameters:
+                    parameters.append("...")
+                else:
+                    parameters.append(self._declaration(child_values.get(DW_AT_type), "", headers, depth + 1))
+            return self._declaration(target, "{:s}({:s})".format(declarator, ", ".join(parameters) or "void"),
+                                     headers, depth + 1)
+        raise ValueError("the types of tag 0x{:x} are not supported".format(tag))
+
+    def _symbol(self, offset):
+        """
+        :param offset: offset of a function
+        :type offset: int
+        :return: the symbol of the function : its linkage name or, for an external function without
+         linkage name (C or extern "C" function), its name ; None if it has no symbol
+        :rtype: str
+        """
+        chain = self._origins(offset)
+        symbol = self._attribute(chain, DW_AT_linkage_name)[0] or self._attribute(chain, DW_AT_MIPS_linkage_name)[0]
+        if symbol is None and self._attribute(chain, DW_AT_external)[0]:
+            symbol = self._attribute(chain, DW_AT_name)[0]
+        return symbol
+
+    def _prototype(self, symbol, offset):
+        """
+        :param symbol: symbol of the function
+        :type symbol: str
+        :param offset: offset of the function
+        :type offset: int
+        :return: the prototype of the function
+        :rtype: Prototype
+        :raise ValueError: if a type of the function can't be declared
+        """
+        chain = self._origins(offset)
+        declaration = chain[-1]
+        name = self._attribute(chain, DW_AT_name)[0]
+        if not name:
+            raise ValueError("the function has no name")
+        # The declaration of a function in its namespace or its class may be attributed to the source
+        # file defining it : the headers declaring its class and its namespace are added too
+        headers = []
+        for origin in chain[::-1]:
+            self._add_header(origin, headers)
+        scopes = self._scopes(declaration)
+        for scope_offset, _, _ in scopes[::-1]:
+            for origin in self._origins(scope_offset)[::-1]:
+                self._add_header(origin, headers)
+        namespaces = [scope for _, tag, scope in scopes if tag == DW_TAG_namespace]
+        classes = [scope for _, tag, scope in scopes if tag in _CLASS_TAGS]
+        return_type = self._declaration(self._attribute(chain, DW_AT_type)[0], "", headers)
+        # The parameters of the definition have names, those of the declaration may not
+        parameters_offsets = next((self._children[origin] for origin in chain if origin in self._children), [])
+        parameters, qualifiers, is_method = [], "", False
+        for parameter in parameters_offsets:
+            parameter_tag, _, _, _ = self._dies[parameter]
+            if parameter_tag == DW_TAG_unspecified_parameters:
+                parameters.append(("...", ""))
+                continue
+            parameter_chain = self._origins(parameter)
+            parameter_type = self._attribute(parameter_chain, DW_AT_type)[0]
+            if self._attribute(parameter_chain, DW_AT_artificial)[0]:
+                # The this pointer of a method (const in a definition), to a const object for a const method
+                is_method = True
+                pointer = self._dies.get(parameter_type, (None, {}))
+                if pointer[0] == DW_TAG_const_type:
+                    pointer = self._dies.get(pointer[1].get(DW_AT_type), (None, {}))
+                if self._dies.get(pointer[1].get(DW_AT_type), (None,))[0] == DW_TAG_const_type:
+                    qualifiers = "const"
+                continue
+            parameter_name = self._attribute(parameter_chain, DW_AT_name)[0] or "p{:d}".format(len(parameters))
+            parameters.append((self._declaration(parameter_type, parameter_name, headers), parameter_name))
+        if classes and not is_method:
+            qualifiers = "static"
+        return Prototype(symbol, return_type, "::".join(namespaces) or None, "::".join(classes), name,
+                         tuple(parameters), qualifiers, tuple(headers))
+
+    def prototypes(self, symbols=None):
+        """
+        :param symbols: the symbols of the functions (all the functions with a symbol if None)
+        :type symbols: set
+        :return: the prototypes of the functions described by the debugging information, by symbol.
+         The definition of a function is preferred to its declarations.
+        :rtype: dict
+        """
+        best = {}
+        for offset in self._functions:
+            symbol = self._symbol(offset)
+            if symbol is None or (symbols is not None and symbol not in symbols):
+                continue
+            is_definition = DW_AT_declaration not in self._dies[offset][1]
+            if symbol not in best or (is_definition and not best[symbol][1]):
+                best[symbol] = (offset, is_definition)
+        prototypes = {}
+        for symbol, (offset, _) in best.items():
+            try:
+                prototypes[symbol] = self._prototype(symbol, offset)
+            except ValueError as error:
+                ADAPTER.debug("No prototype for {:s} : {:s}".format(symbol, str(error)))
+        return prototypes
+
+
+def read_prototypes(path, symbols=None):
+    """
+    :param path: path to a shared object
+    :type path: str
+    :param symbols: the symbols of the functions (all the functions with a symbol if None)
+    :type symbols: set
+    :return: the prototypes of the functions given by the debugging information of the shared
+     object (or of its separate debugging file), by symbol ; empty if it has no debugging information
+    :rtype: dict
+    """
+    start = time.time()
+    with ElfReader(path) as elf_reader:
+        debug_path = find_debug_file(path, elf_reader)
+    if debug_path is None:
+        ADAPTER.info("No debugging information found for {:s}".format(path))
+        return {}
+    ADAPTER.info("Reading the debugging information of {:s}...".format(debug_path))
+    with ElfReader(debug_path) as elf_reader:
+        prototypes = DwarfReader(elf_reader).prototypes(symbols)
+    ADAPTER.info("{:d} prototypes read in {:.3f} s".format(len(prototypes), time.time() - start))
+    return prototypes
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(format='%(asctime)s:%(name)s:%(levelname)s:%(message)s', level=logging.INFO)
+    for found in sorted(read_prototypes(sys.argv[1]).values()):
+        print("{:s} <==> {:s}{:s}".format(found.symbol, found.namespace + "::" if found.namespace else "",
+                                          found.signature))
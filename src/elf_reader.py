@@ -0,0 +1,442 @@
+"""
+A module implementing the ElfReader class, a pure python reader of ELF shared objects
+"""
+from __future__ import print_function
+import os
+import mmap
+import zlib
+import binascii
+import struct
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.elf_reader")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS32, ELFCLASS64 = 1, 2
+ELFDATA2LSB, ELFDATA2MSB = 1, 2
+
+# Section types
+SHT_DYNAMIC = 6
+SHT_NOTE = 7
+SHT_DYNSYM = 11
+SHT_GNU_VERDEF = 0x6ffffffd
+SHT_GNU_VERNEED = 0x6ffffffe
+SHT_GNU_VERSYM = 0x6fffffff
+
+# Section flags
+SHF_COMPRESSED = 0x800
+ELFCOMPRESS_ZLIB = 1
+
+# Special section indexes
+SHN_UNDEF = 0
+SHN_XINDEX = 0xffff
+
+# Dynamic tags
+DT_NULL = 0
+DT_NEEDED = 1
+DT_SONAME = 14
+
+# Note types
+NT_GNU_BUILD_ID = 3
+
+# Symbol versions
+VER_NDX_LOCAL = 0
+VER_NDX_GLOBAL = 1
+VERSYM_HIDDEN = 0x8000
+
+SYMBOL_TYPES = {0: "NOTYPE", 1: "OBJECT", 2: "FUNC", 3: "SECTION", 4: "FILE",
+                5: "COMMON", 6: "TLS", 10: "GNU_IFUNC"}
+SYMBOL_BINDINGS = {0: "LOCAL", 1: "GLOBAL", 2: "WEAK", 10: "GNU_UNIQUE"}
+
+# Layouts of the ELF structures (without byte order) for 32 and 64 bits classes
+_LAYOUTS = {
+    ELFCLASS32: {'header': "HHIIIIIHHHHHH", 'section': "IIIIIIIIII", 'symbol': "IIIBBH",
+                 'dynamic': "iI", 'compression': "III"},
+    ELFCLASS64: {'header': "HHIQQQIHHHHHH", 'section': "IIQQQQIIQQ", 'symbol': "IBBHQQ",
+                 'dynamic': "qQ", 'compression': "IIQQ"},
+}
+
+ElfSection = namedtuple("ElfSection", ["name", "type", "flags", "addr", "offset", "size",
+                                       "link", "info", "addralign", "entsize"])
+
+
+class ElfSymbol(namedtuple("ElfSymbol", ["name", "value", "size", "type", "binding",
+                                         "section_index", "version"])):
+    """
+    A symbol of an ELF symbol table
+    """
+    __slots__ = ()
+
+    @property
+    def is_defined(self):
+        """
+        :return: True if the symbol is defined in the shared object
+        :rtype: bool
+        """
+        return self.section_index != SHN_UNDEF
+
+
+def _to_str(raw):
+    """
+    Return the raw bytes read in the file as a native string
+    """
+    if isinstance(raw, str):
+        return raw
+    return raw.decode('iso-8859-1')
+
+
+class ElfReader(object):
+    """
+    A class reading the ELF structures of a shared object directly from the file.
+
+    The file is memory mapped and the structures are unpacked in place: the sections
+    are never copied as a whole.
+    """
+    def __init__(self, path):
+        """
+        :param path: path to the ELF file
+        :type path: str
+        :raise IOError: if the file is not an ELF file
+        """
+        self._path = path
+        self._file = open(path, 'rb')
+        self._map = None
+        try:
+            if os.fstat(self._file.fileno()).st_size < 64:
+                self._raise_format_error("file is too small")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+            self._sections = self._parse_sections()
+        except Exception:
+            self.close()
+            raise
+        self._versions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Unmap and close the file
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _raise_format_error(self, reason):
+        """
+        Log and raise the error corresponding to a malformed ELF file
+
+        :param reason: what is wrong with the file
+        :type reason: str
+        :raise IOError: always
+        """
+        msg = "The file {:s} doesn't seem to be a valid ELF file ({:s})!".format(self._path, reason)
+        ADAPTER.error(msg)
+        raise IOError(msg)
+
+    def _struct(self, kind):
+        """
+        :param kind: kind of ELF structure ('header'|'section'|'symbol'|'dynamic'|'compression')
+        :type kind: str
+        :return: the compiled structure for the class and byte order of the file
+        :rtype: struct.Struct
+        """
+        return struct.Struct(self._byte_order + _LAYOUTS[self._elf_class][kind])
+
+    def _parse_header(self):
+        """
+        Read the ELF header
+        """
+        if self._map[0:4] != ELF_MAGIC:
+            self._raise_format_error("bad magic number")
+        self._elf_class = ord(self._map[4:5])
+        data_encoding = ord(self._map[5:6])
+        if self._elf_class not in _LAYOUTS or data_encoding not in (ELFDATA2LSB, ELFDATA2MSB):
+            self._raise_format_error("unknown class or data encoding")
+        self._byte_order = "<" if data_encoding == ELFDATA2LSB else ">"
+        (_, _, _, _, _, self._shoff, _, _, _, _, self._shentsize, self._shnum,
+         self._shstrndx) = self._struct('header').unpack_from(self._map, 16)
+        self._section_struct = self._struct('section')
+        self._symbol_struct = self._struct('symbol')
+
+    def _read_section_header(self, index):
+        """
+        :param index: index of the section
+        :type index: int
+        :return: the raw fields of the section header
+        :rtype: tuple
+        """
+        return self._section_struct.unpack_from(self._map, self._shoff + index * self._shentsize)
+
+    def _parse_sections(self):
+        """
+        Read the section header table
+
+        :return: the sections of the file
+        :rtype: list
+        """
+        if self._shoff == 0:
+            return []
+        shnum, shstrndx = self._shnum, self._shstrndx
+        if shnum == 0 or shstrndx == SHN_XINDEX:
+            # Extended numbering : real values are stored in the first section header
+            first = self._read_section_header(0)
+            shnum = shnum or first[5]
+            if shstrndx == SHN_XINDEX:
+                shstrndx = first[6]
+        if self._shoff + shnum * self._shentsize > len(self._map):
+            self._raise_format_error("truncated section header table")
+        raw_sections = [self._read_section_header(idx) for idx in range(shnum)]
+        names_offset = raw_sections[shstrndx][4]
+        return [ElfSection(self._read_cstring(names_offset + raw[0]), *raw[1:])
+                for raw in raw_sections]
+
+    def _read_cstring(self, offset):
+        """
+        :param offset: offset of the string in the file
+        :type offset: int
+        :return: the null terminated string found at the offset
+        :rtype: str
+        """
+        end = self._map.find(b"\0", offset)
+        if end < 0:
+            end = len(self._map)
+        return _to_str(self._map[offset:end])
+
+    @property
+    def byte_order(self):
+        """
+        :return: the byte order of the file, as a struct module prefix ('<'|'>')
+        :rtype: str
+        """
+        return self._byte_order
+
+    @property
+    def sections(self):
+        """
+        :return: the sections of the file
+        :rtype: list
+        """
+        return self._sections
+
+    def section_by_name(self, name):
+        """
+        :param name: name of the section (for example '.dynsym')
+        :type name: str
+        :return: the section or None if the file has no such section
+        :rtype: ElfSection
+        """
+        for section in self._sections:
+            if section.name == name:
+                return section
+        return None
+
+    def section_data(self, name):
+        """
+        :param name: name of the section (for example '.debug_info')
+        :type name: str
+        :return: the contents of the section, uncompressed if it is compressed, or None if the file
+         has no such section
+        :rtype: bytes
+        :raise IOError: if the section is compressed in an unknown format
+        """
+        section = self.section_by_name(name)
+        if section is None:
+            return None
+        data = self._map[section.offset:section.offset + section.size]
+        if not section.flags & SHF_COMPRESSED:
+            return data
+        compression = self._struct('compression')
+        ch_type = compression.unpack_from(data, 0)[0]
+        if ch_type != ELFCOMPRESS_ZLIB:
+            self._raise_format_error("section {:s} compressed in the unknown format {:d}".format(name, ch_type))
+        return zlib.decompress(data[compression.size:])
+
+    def debuglink(self):
+        """
+        :return: the name of the file holding the debugging information of the stripped file
+         (.gnu_debuglink section) or None
+        :rtype: str
+        """
+        section = self.section_by_name('.gnu_debuglink')
+        if section is None:
+            return None
+        return self._read_cstring(section.offset)
+
+    def _sections_of_type(self, sh_type):
+        """
+        :param sh_type: type of the sections
+        :type sh_type: int
+        :return: the sections of the given type
+        :rtype: list
+        """
+        return [section for section in self._sections if section.type == sh_type]
+
+    def has_symbol_table(self, table='.symtab'):
+        """
+        :param table: name of the symbol table ('.symtab'|'.dynsym')
+        :type table: str
+        :return: True if the file holds the symbol table
+        :rtype: bool
+        """
+        return self.section_by_name(table) is not None
+
+    def iter_symbols(self, table='.dynsym'):
+        """
+        Iterate over the symbols of a symbol table
+
+        The null symbol at index 0 is skipped. The version is only known for the
+        symbols of the dynamic symbol table.
+
+        :param table: name of the symbol table ('.symtab'|'.dynsym')
+        :type table: str
+        :return: an iterator over the symbols
+        :rtype: iterator of ElfSymbol
+        """
+        section = self.section_by_name(table)
+        if section is None:
+            return
+        strtab_offset = self._sections[section.link].offset
+        versions = self._symbol_versions() if section.type == SHT_DYNSYM else {}
+        entsize = section.entsize or self._symbol_struct.size
+        is_64 = self._elf_class == ELFCLASS64
+        for index in range(1, section.size // entsize):
+            fields = self._symbol_struct.unpack_from(self._map, section.offset + index * entsize)
+            if is_64:
+                st_name, st_info, _, st_shndx, st_value, st_size = fields
+            else:
+                st_name, st_value, st_size, st_info, _, st_shndx = fields
+            yield ElfSymbol(self._read_cstring(strtab_offset + st_name), st_value, st_size,
+                            SYMBOL_TYPES.get(st_info & 0xf, str(st_info & 0xf)),
+                            SYMBOL_BINDINGS.get(st_info >> 4, str(st_info >> 4)),
+                            st_shndx, versions.get(index))
+
+    def _iter_dynamic(self):
+        """
+        Iterate over the entries of the dynamic section
+
+        :return: an iterator over the (tag, value) pairs and the offset of the dynamic string table
+        :rtype: iterator of (int, int, int)
+        """
+        dynamic_struct = self._struct('dynamic')
+        for section in self._sections_of_type(SHT_DYNAMIC):
+            strtab_offset = self._sections[section.link].offset
+            for offset in range(section.offset, section.offset + section.size, dynamic_struct.size):
+                tag, value = dynamic_struct.unpack_from(self._map, offset)
+                if tag == DT_NULL:
+                    break
+                yield tag, value, strtab_offset
+
+    def needed_libraries(self):
+        """
+        :return: the libraries the shared object directly depends on (DT_NEEDED entries)
+        :rtype: list
+        """
+        return [self._read_cstring(strtab + value)
+                for tag, value, strtab in self._iter_dynamic() if tag == DT_NEEDED]
+
+    def soname(self):
+        """
+        :return: the soname of the shared object (DT_SONAME entry) or None
+        :rtype: str
+        """
+        for tag, value, strtab in self._iter_dynamic():
+            if tag == DT_SONAME:
+                return self._read_cstring(strtab + value)
+        return None
+
+    def build_id(self):
+        """
+        :return: the GNU build-id of the file, as an hexadecimal string, or None
+         if the file has no build-id note
+        :rtype: str
+        """
+        note_header = struct.Struct(self._byte_order + "III")
+        for section in self._sections_of_type(SHT_NOTE):
+            offset, end = section.offset, section.offset + section.size
+            while offset + note_header.size <= end:
+                namesz, descsz, note_type = note_header.unpack_from(self._map, offset)
+                name_offset = offset + note_header.size
+                desc_offset = name_offset + ((namesz + 3) & ~3)
+                if note_type == NT_GNU_BUILD_ID and self._map[name_offset:name_offset + 4] == b"GNU\0":
+                    return binascii.hexlify(self._map[desc_offset:desc_offset + descsz]).decode('ascii')
+                offset = desc_offset + ((descsz + 3) & ~3)
+        return None
+
+    def _version_names(self):
+        """
+        :return: the mapping between version indexes and version names, built from the
+         version definitions and the version requirements
+        :rtype: dict
+        """
+        names = {}
+        half = self._byte_order + "H"
+        word = self._byte_order + "I"
+        for section in self._sections_of_type(SHT_GNU_VERDEF):
+            strtab_offset = self._sections[section.link].offset
+            offset = section.offset
+            for _ in range(section.info):
+                vd_ndx = struct.unpack_from(half, self._map, offset + 4)[0]
+                vd_aux, vd_next = struct.unpack_from(self._byte_order + "II", self._map, offset + 12)
+                vda_name = struct.unpack_from(word, self._map, offset + vd_aux)[0]
+                names[vd_ndx] = self._read_cstring(strtab_offset + vda_name)
+                if not vd_next:
+                    break
+                offset += vd_next
+        for section in self._sections_of_type(SHT_GNU_VERNEED):
+            strtab_offset = self._sections[section.link].offset
+            offset = section.offset
+            for _ in range(section.info):
+                vn_cnt = struct.unpack_from(half, self._map, offset + 2)[0]
+                vn_aux, vn_next = struct.unpack_from(self._byte_order + "II", self._map, offset + 8)
+                aux_offset = offset + vn_aux
+                for _ in range(vn_cnt):
+                    vna_other, vna_name, vna_next = struct.unpack_from(self._byte_order + "HII",
+                                                                       self._map, aux_offset + 6)
+                    names[vna_other] = self._read_cstring(strtab_offset + vna_name)
+                    if not vna_next:
+                        break
+                    aux_offset += vna_next
+                if not vn_next:
+                    break
+                offset += vn_next
+        return names
+
+    def _symbol_versions(self):
+        """
+        :return: the mapping between the indexes of the dynamic symbols and the name
+         of their version (local and global symbols are not versioned)
+        :rtype: dict
+        """
+        if self._versions is None:
+            self._versions = {}
+            versym_sections = self._sections_of_type(SHT_GNU_VERSYM)
+            if versym_sections:
+                names = self._version_names()
+                versym = versym_sections[0]
+                half = struct.Struct(self._byte_order + "H")
+                for index in range(versym.size // 2):
+                    ndx = half.unpack_from(self._map, versym.offset + 2 * index)[0] & ~VERSYM_HIDDEN
+                    if ndx not in (VER_NDX_LOCAL, VER_NDX_GLOBAL) and ndx in names:
+                        self._versions[index] = names[ndx]
+        return self._versions
+
+
+if __name__ == "__main__":
+    import sys
+    with ElfReader(sys.argv[1]) as reader:
+        print("Build-id : {}".format(reader.build_id()))
+        print("Needed libraries : {:s}".format(", ".join(reader.needed_libraries())))
+        for table_name in ('.dynsym', '.symtab'):
+            all_symbols = list(reader.iter_symbols(table_name))
+            print("{:s} : {:d} symbols ({:d} defined)".format(
+                table_name, len(all_symbols), sum(1 for sym in all_symbols if sym.is_defined)))
@@ -9,8 +9,10 @@ import subprocess
 import os
 import jinja2
 import re
+from collections import namedtuple
 from sys import stderr
 from colored_logger import ColoredLoggerAdapter
+from compile_cache import CompileCache
 
 logger = logging.getLogger("SpecProf.function_wrapper_writer")
 logger.setLevel(logging.DEBUG)
@@ -21,25 +23,96 @@ JINJA_ENVIRONMENT = jinja2.Environment(loader=jinja2.FileSystemLoader(PATH_TO_TE
                                        extensions=['jinja2.ext.autoescape'],
                                        autoescape=True)
 
+# Timer backends available in the generated wrappers
+TIMERS = ('monotonic', 'thread_cputime', 'tsc')
+# Ways of choosing the timed calls when only one call in sample_period is timed
+SAMPLINGS = ('stride', 'random')
+
+# A function to wrap : its symbol in the target library, its signature, its namespace (or None),
+# the name of its integer parameter giving the size of the problem (or None) and its prototype
+# given by the debugging information (dwarf_reader.Prototype or None), whose parts are used
+# instead of those parsed from the signature
+WrappedFunction = namedtuple("WrappedFunction", ["symbol", "signature", "namespace", "size_param", "prototype"])
+WrappedFunction.__new__.__defaults__ = (None, None)
+# Integer types accepted for a size parameter
+SIZE_TYPE_PATTERN = re.compile(r"\b(?:char|short|int|long|signed|unsigned|size_t|ssize_t|ptrdiff_t|"
+                               r"u?int(?:8|16|32|64)_t|u?intptr_t)\b")
+
 
 class FunctionWrapperWriter(object):
     """
     A class that creates a c or c++ file that wrapps the call to a specific function inside a shared object
     """
-    def __init__(self, target_library, path_to_working_dir, language='c'):
+    def __init__(self, target_library, path_to_working_dir, language='c', timer='monotonic',
+                 sample_period=1, sampling='stride', use_cache=True, overhead_ns=0., call_sites=False,
+                 counters=False, allocations=False, call_graph=False):
         """
         :param target_library: path to the library to wrap
         :param path_to_working_dir: path to the directory where sources are generated and compiled
         :param language: chosen language (should be the same that the one used to build the target library)
+        :param timer: timer used by the wrapper to measure the calls :
+            - 'monotonic' : elapsed time given by clock_gettime(CLOCK_MONOTONIC)
+            - 'thread_cputime' : cpu time of the calling thread given by clock_gettime(CLOCK_THREAD_CPUTIME_ID)
+            - 'tsc' : time stamp counter of x86 processors, the cheapest to read
+        :param sample_period: every call is counted but only one call in sample_period is timed,
+            the total time is extrapolated from the timed calls
+        :param sampling: way of choosing the timed calls :
+            - 'stride' : the last call of every sample_period calls of a function by a thread
+            - 'random' : each call with a probability 1 / sample_period (per-thread xorshift generator)
+        :param overhead_ns: time, in nanoseconds, added by the wrapper itself to each measured call,
+            subtracted from the reported times (see benchmarks/bench_wrapper_overhead.py)
+        :param call_sites: if True, the calls and times are also broken down by call site
+        :param counters: if True, the timed calls also accumulate the deltas of the performance
+            counters of the thread (perf_event_open)
+        :param allocations: if True, the wrapper also interposes the allocator and accounts the
+            allocations made by the threads while they are inside a wrapped function
+        :param call_graph: if True, each thread keeps a stack of its wrapped calls in progress : the self
+            and inclusive times, the recursion and the caller -> callee counts are also measured
         :type target_library: str
         :type path_to_working_dir: str
         :type language: str ('c'|'cpp'|'c++')
+        :type timer: str ('monotonic'|'thread_cputime'|'tsc')
+        :param use_cache: if True, the compiled library is taken from (or stored in) the compile cache
+        :type sample_period: int
+        :type sampling: str ('stride'|'random')
+        :type use_cache: bool
+        :type overhead_ns: float
+        :type call_sites: bool
+        :type counters: bool
+        :type allocations: bool
+        :type call_graph: bool
         """
         self._target_library = target_library
         if language not in ['c', 'cpp', 'c++']:
             msg = "Available languages are C ('c') or C++ ('cpp'|'c++')"
             adapter.error(msg)
             raise ValueError(msg)
+        if timer not in TIMERS:
+            msg = "Available timers are : {:s}".format(", ".join(TIMERS))
+            adapter.error(msg)
+            raise ValueError(msg)
+        self._timer = timer
+        if sampling not in SAMPLINGS:
+            msg = "Available samplings are : {:s}".format(", ".join(SAMPLINGS))
+            adapter.error(msg)
+            raise ValueError(msg)
+        if int(sample_period) < 1:
+            msg = "The sample period should be a positive integer, not {}!".format(sample_period)
+            adapter.error(msg)
+            raise ValueError(msg)
+        self._sample_period = int(sample_period)
+        self._sampling = sampling
+        if float(overhead_ns) < 0.:
+            msg = "The overhead should be a positive number of nanoseconds, not {}!".format(overhead_ns)
+            adapter.error(msg)
+            raise ValueError(msg)
+        self._overhead_ns = float(overhead_ns)
+        self._call_sites = call_sites
+        self._counters = counters
+        self._allocations = allocations
+        self._call_graph = call_graph
+        self._use_cache = use_cache
+        self._opt_includes = None
         if os.path.isdir(path_to_working_dir):
             self._path_to_working_dir = path_to_working_dir
         else:
@@ -54,7 +127,8 @@ class FunctionWrapperWriter(object):
             self._src_filename = os.path.splitext(os.path.basename(self._target_library))[0] + "_wrapper.cpp"
         self._src_file_path = os.path.join(self._path_to_working_dir, self._src_filename)
 
-    def write_src_file(self, function_symbol, function_signature, namespace=None, opt_includes=None):
+    def write_src_file(self, function_symbol, function_signature, namespace=None, opt_includes=None,
+                       size_param=None, prototype=None):
         """
         Write c file wrapper using jinja and template
         
@@ -62,6 +136,40 @@ class FunctionWrapperWriter(object):
         :type function_symbol: str
         :param function_signature: signature of the function to wrap
         :type function_signature: str
+        :param namespace: namespace of the function to wrap
+        :type namespace: str
+        :param opt_includes: optional includes
+        :type opt_includes: list
+        :param size_param: name of the integer parameter giving the size of the problem : the
+         calls are also accumulated by power of two of its value
+        :type size_param: str
+        :param prototype: prototype of the function given by the debugging information
+        :type prototype: dwarf_reader.Prototype
+        """
+        self.write_multi_src_file([WrappedFunction(function_symbol, function_signature, namespace, size_param,
+                                                   prototype)], opt_includes)
+
+    def write_manifest_src_file(self, path_to_manifest, opt_includes=None, prototypes=None):
+        """
+        Write a single c file wrapping all the functions listed in a manifest
+
+        :param path_to_manifest: path to the manifest (see read_manifest)
+        :type path_to_manifest: str
+        :param opt_includes: optional includes
+        :type opt_includes: list
+        :param prototypes: prototypes of the functions given by the debugging information, by symbol
+        :type prototypes: dict
+        """
+        self.write_multi_src_file(read_manifest(path_to_manifest, prototypes), opt_includes)
+
+    def write_multi_src_file(self, functions, opt_includes=None):
+        """
+        Write c file wrapping several functions using jinja and template.
+        Each function gets its own index in the tables of counters and timers of the wrapper.
+        The headers of the prototypes of the functions are included after the optional includes.
+
+        :param functions: functions to wrap
+        :type functions: list of WrappedFunction
         :param opt_includes: optional includes
         :type opt_includes: list
         """
@@ -69,69 +177,243 @@ class FunctionWrapperWriter(object):
             template = JINJA_ENVIRONMENT.get_template('template_cfile.c')
         elif self._language in ['c++', 'cpp']:
             template = JINJA_ENVIRONMENT.get_template('template_cppfile.cpp')
-        r_type, class_name, func_name, func_params = split_function_prototype(function_signature)
-        func_full_decl = class_name
-        if not func_full_decl.endswith("::"):
-            func_full_decl += "::"
-        if func_full_decl == "::":
-            func_full_decl = ""
+        # The names of the prototypes are fully qualified. The namespaces of the signatures are used
+        # by a using-directive, if headers declaring them are included.
+        namespaces = []
+        for function in functions:
+            if (function.prototype is None and opt_includes and function.namespace
+                    and function.namespace not in namespaces):
+                namespaces.append(function.namespace)
+        for function in functions:
+            for header in function.prototype.headers if function.prototype is not None else ():
+                if header not in (opt_includes or []):
+                    opt_includes = (opt_includes or []) + [header]
+        self._opt_includes = opt_includes
+        functions_values = []
+        nb_sized_functions = 0
+        for index, function in enumerate(functions):
+            functions_values.append(self._function_template_values(
+                index, function, nb_sized_functions if function.size_param else -1))
+            nb_sized_functions += 1 if function.size_param else 0
         template_values = {'opt_includes': opt_includes,
-                           'func_signature': function_signature,
                            'target_library': self._target_library,
-                           'target_symbol': function_symbol,
-                           'return_type': r_type,
-                           'namespace': namespace,
-                           'func_name': func_name,
-                           'class_name': class_name,
-                           'func_full_decl': func_full_decl,
-                           'func_params': func_params,
-                           'func_params_names': ", ".join(get_function_parameters_names(func_params))}
+                           'functions': functions_values,
+                           'namespaces': namespaces,
+                           'timer': self._timer,
+                           'sample_period': self._sample_period,
+                           'sampling': self._sampling,
+                           'overhead_ns': repr(self._overhead_ns),
+                           'call_sites': self._call_sites,
+                           'counters': self._counters,
+                           'allocations': self._allocations,
+                           'call_graph': self._call_graph,
+                           'nb_sized_functions': nb_sized_functions}
         adapter.info("Writing file with following parameters : ")
-        adapter.info("Optional includes : '{:s}'".format(template_values['opt_includes']))
-        adapter.info("Function signature : '{:s}'".format(template_values['func_signature']))
+        adapter.info("Optional includes : '{}'".format(template_values['opt_includes']))
         adapter.info("Target library : '{:s}'".format(template_values['target_library']))
-        adapter.info("Target symbol : '{:s}'".format(template_values['target_symbol']))
-        adapter.info("Function return type : '{:s}'".format(template_values["return_type"]))
-        adapter.info("Class name : {:s}".format(template_values['class_name']))
-        adapter.info("Function name : '{:s}'".format(template_values['func_name']))
-        adapter.info("Function full declaration : '{:s}'".format(template_values['func_full_decl']))
-        adapter.info("Function parameters : '{:s}'".format(template_values['func_params']))
-        adapter.info("Function parameters names : '{:s}'".format(template_values['func_params_names']))
+        adapter.info("Number of wrapped functions : {:d}".format(len(functions_values)))
+        adapter.info("Timer : '{:s}'".format(self._timer))
+        if self._sample_period > 1:
+            adapter.info("Sampling : one call in {:d} timed ('{:s}')".format(self._sample_period, self._sampling))
+        if self._overhead_ns:
+            adapter.info("Overhead subtracted : {:.1f} ns per call".format(self._overhead_ns))
+        if self._call_sites:
+            adapter.info("Calls broken down by call site")
+        if self._counters:
+            adapter.info("Performance counters read around the timed calls")
+        if self._allocations:
+            adapter.info("Allocations accounted inside the wrapped calls")
+        if self._call_graph:
+            adapter.info("Nested wrapped calls followed on a stack of each thread")
         with open(self._src_file_path, 'w') as fo:
             fo.write(template.render(template_values))
-            
+
+    @staticmethod
+    def _function_template_values(index, function, size_slot=-1):
+        """
+        :param index: index of the function in the tables of the wrapper
+        :type index: int
+        :param function: function to wrap
+        :type function: WrappedFunction
+        :param size_slot: index of the size statistics of the function (-1 if it has no size parameter)
+        :type size_slot: int
+        :return: the values describing the function in the templates
+        :rtype: dict
+        :raise ValueError: if the size parameter isn't an integer parameter of the function
+        """
+        if function.prototype is not None:
+            prototype = function.prototype
+            r_type, class_name, func_name = prototype.return_type, prototype.class_name, prototype.name
+            func_params, func_params_names = prototype.parameters_declaration, prototype.parameters_names
+            qualifiers = prototype.qualifiers
+        else:
+            r_type, class_name, func_name, func_params = split_function_prototype(function.signature)
+            func_params_names = get_function_parameters_names(func_params)
+            # The qualifiers of a method follow its parameters list
+            qualifiers = function.signature.rsplit(")", 1)[1].strip()
+        if function.size_param:
+            check_size_parameter(func_params, function.size_param)
+        func_full_decl = class_name
+        if function.prototype is not None and class_name and function.namespace:
+            func_full_decl = "{:s}::{:s}".format(function.namespace, class_name)
+        if not func_full_decl.endswith("::"):
+            func_full_decl += "::"
+        if func_full_decl == "::":
+            func_full_decl = ""
+        values = {'index': index,
+                  'func_signature': function.signature,
+                  'target_symbol': function.symbol,
+                  'return_type': r_type,
+                  'namespace': function.namespace,
+                  'func_name': func_name,
+                  'class_name': class_name,
+                  'func_full_decl': func_full_decl,
+                  'func_params': func_params,
+                  'func_params_names': ", ".join(func_params_names),
+                  'qualifiers': qualifiers if class_name else "",
+                  'size_param': function.size_param,
+                  'size_slot': size_slot}
+        adapter.info("Function #{:d} :".format(index))
+        adapter.info("Function signature : '{:s}'".format(values['func_signature']))
+        adapter.info("Target symbol : '{:s}'".format(values['target_symbol']))
+        adapter.info("Function return type : '{:s}'".format(values["return_type"]))
+        adapter.info("Class name : {:s}".format(values['class_name']))
+        adapter.info("Function name : '{:s}'".format(values['func_name']))
+        adapter.info("Function full declaration : '{:s}'".format(values['func_full_decl']))
+        adapter.info("Function parameters : '{:s}'".format(values['func_params']))
+        adapter.info("Function parameters names : '{:s}'".format(values['func_params_names']))
+        if values['qualifiers']:
+            adapter.info("Method qualifiers : '{:s}'".format(values['qualifiers']))
+        if function.size_param:
+            adapter.info("Size parameter : '{:s}'".format(function.size_param))
+        return values
+
     def compile_src_file(self, std="c++11"):
         """
         Compile the src file into a shared object that will wrap the call to the function
-        of the original library
+        of the original library. If the same source, compiler, flags and headers were already
+        compiled, the library is taken from the compile cache without running the compiler.
         """
         shared_object_name = os.path.splitext(self._src_filename)[0] + ".so"
-        common_opts = "-D_GNU_SOURCE  -g -Wall -shared -fPIC -ldl {:s} -o {:s}".format(self._src_filename,
-                                                                                       shared_object_name)
+        # Libraries are given after the source file, otherwise they are dropped by linkers using --as-needed
+        common_opts = ["-D_GNU_SOURCE", "-O2", "-g", "-Wall", "-shared", "-fPIC", self._src_filename,
+                       "-o", shared_object_name, "-ldl", "-lpthread", "-lm"]
         if self._language == 'c':
-            cmd = " ".join(["gcc", common_opts])
+            cmd = ["gcc"] + common_opts
         else:
-            cmd = " ".join(["g++", "-std={:s}".format(std), "-fpermissive", common_opts])
-        saved_dir = os.getcwd()
-        os.chdir(self._path_to_working_dir)
+            cmd = ["g++", "-std={:s}".format(std), "-fpermissive"] + common_opts
+        path_to_so = os.path.join(self._path_to_working_dir, shared_object_name)
+        cache, key = None, None
+        if self._use_cache:
+            try:
+                cache = CompileCache()
+                key = cache.key(self._src_file_path, cmd, self._opt_includes)
+                if cache.fetch(key, path_to_so):
+                    self._print_usage(path_to_so)
+                    return
+            except (IOError, OSError) as error:
+                adapter.warning("Unable to read the compile cache : {:s}".format(str(error)))
+                cache = None
         try:
-            msg = "Launching command :\n{:s}".format(cmd)
+            msg = "Launching command :\n{:s}".format(" ".join(cmd))
             adapter.info(msg)
-            subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT)
+            subprocess.check_output(cmd, cwd=self._path_to_working_dir, stderr=subprocess.STDOUT)
         except subprocess.CalledProcessError as sub_error:
-            adapter.error("Problem encountered when executing command : {:s}".format(cmd))
+            adapter.error("Problem encountered when executing command : {:s}".format(" ".join(cmd)))
             adapter.error("Return code : {:d}".format(sub_error.returncode))
-            adapter.error("Available output : {:s}".format(sub_error.output))
-            raise StandardError("Compilation failed!")
-        finally:
-            os.chdir(saved_dir)
+            output = sub_error.output
+            if not isinstance(output, str):
+                output = output.decode("utf-8", "replace")
+            adapter.error("Available output : {:s}".format(output))
+            # The error lines of the compiler are kept in the exception, for the batch report
+            errors = [line for line in output.splitlines() if ": error:" in line or ": fatal error:" in line]
+            raise RuntimeError("Compilation failed!\n{:s}".format("\n".join(errors) or output.strip()))
+        if cache is not None:
+            try:
+                cache.store(key, path_to_so)
+            except (IOError, OSError) as error:
+                adapter.warning("Unable to write in the compile cache : {:s}".format(str(error)))
         adapter.info("Compilation terminated successfully")
+        self._print_usage(path_to_so)
+
+    @staticmethod
+    def _print_usage(path_to_so):
+        """
+        Print how to use the wrapper library
+
+        :param path_to_so: path to the wrapper library
+        :type path_to_so: str
+        """
         print("To launch your program with the wrapper library intercepting original one type :")
-        ld_preload = os.path.join(self._path_to_working_dir, shared_object_name)
-        print("LD_PRELOAD={:s} /path/to/your/program".format(ld_preload))
+        print("LD_PRELOAD={:s} /path/to/your/program".format(path_to_so))
         print("Bye!")
 
 
+def read_manifest(path_to_manifest, prototypes=None):
+    """
+    Read a manifest listing the functions to wrap.
+
+    Each line of the manifest describes one function with two to four fields separated by '|' :
+    the symbol of the function, its signature and, optionally, its namespace and the name of its
+    size parameter, prefixed by 'size='. Empty lines and lines beginning with '#' are ignored.
+    The signature (and the namespace) of a function whose prototype is given by the debugging
+    information may be left empty, or the line reduced to the symbol. For example ::
+
+        # symbol | signature [| namespace] [| size=parameter]
+        waste_time | void waste_time(int seconds) | size=seconds
+        _ZNK19move_semantics_test20VectorWithoutMoveSem10computeSumEv | double VectorWithoutMoveSem::computeSum() | move_semantics_test
+        # prototype given by the debugging information
+        solveVolumeEnergy | | size=nb_cells
+
+    :param path_to_manifest: path to the manifest
+    :type path_to_manifest: str
+    :param prototypes: prototypes of the functions given by the debugging information, by symbol
+    :type prototypes: dict
+    :return: the functions to wrap
+    :rtype: list of WrappedFunction
+    :raise ValueError: if a line of the manifest is malformed, if a prototype can't be wrapped or if
+     the manifest is empty
+    """
+    functions = []
+    with open(path_to_manifest, 'r') as fi:
+        for line_number, line in enumerate(fi, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.split("|")]
+            prototype = (prototypes or {}).get(fields[0])
+            if len(fields) == 1 and prototype is not None:
+                fields.append("")
+            size_params = [field[len("size="):].strip() for field in fields[2:] if field.startswith("size=")]
+            namespaces = [field for field in fields[2:] if not field.startswith("size=")]
+            if (len(fields) not in (2, 3, 4) or not fields[0] or not (fields[1] or prototype is not None)
+                    or not all(fields[2:]) or len(size_params) > 1 or len(namespaces) > 1 or not all(size_params)):
+                msg = ("Line {:d} of the manifest {:s} should be 'symbol | signature [| namespace] "
+                       "[| size=parameter]'".format(line_number, path_to_manifest))
+                adapter.error(msg)
+                raise ValueError(msg)
+            namespace = namespaces[0] if namespaces else None
+            if fields[1]:
+                # The signature given by the manifest prevails over the debugging information
+                prototype = None
+            else:
+                try:
+                    prototype.check_wrappable()
+                except ValueError as error:
+                    msg = "Line {:d} of the manifest {:s} : {:s}".format(line_number, path_to_manifest, str(error))
+                    adapter.error(msg)
+                    raise ValueError(msg)
+                fields[1], namespace = prototype.signature, namespace or prototype.namespace
+            functions.append(WrappedFunction(fields[0], fields[1], namespace,
+                                             size_params[0] if size_params else None, prototype))
+    if not functions:
+        msg = "The manifest {:s} doesn't list any function!".format(path_to_manifest)
+        adapter.error(msg)
+        raise ValueError(msg)
+    adapter.info("{:d} functions read in the manifest {:s}".format(len(functions), path_to_manifest))
+    return functions
+
+
 def split_function_prototype(func_prototype):
     """
     Return a tuple made of the :
@@ -145,14 +427,23 @@ def split_function_prototype(func_prototype):
     :return: a tuple containing the namespace, the class name, the name of the function
      and the parameters list of the function
     :rtype: tuple
+
+    >>> split_function_prototype("void waste_time(int seconds)")
+    ('void', '', 'waste_time', 'int seconds')
+    >>> split_function_prototype("std::string VectorWithoutMoveSem::getName()")
+    ('std::string', 'VectorWithoutMoveSem', 'getName', '')
+    >>> split_function_prototype("const std::vector<int, int>& f(int a)")
+    ('const std::vector<int, int>&', '', 'f', 'int a')
     """
     namespace, class_name, func_name = [''] * 3
     param_extractor_pattern = r"^(.*)\s*\((.*)\)"
     param_extractor_po = re.compile(param_extractor_pattern)
-    left_part_splitter_pattern = r"^\s*(\w+\s*[\*\s*&]*)?\s*(.*)"
+    # The return type is everything before the (qualified) name of the function
+    left_part_splitter_pattern = r"^\s*(?:(.*[\s\*&]))?\s*([\w:~]+)\s*$"
     left_part_splitter_po = re.compile(left_part_splitter_pattern)
     left_part, parameters = re.search(param_extractor_po, func_prototype).groups()
     namespace, all_names = re.search(left_part_splitter_po, left_part).groups()
+    namespace = namespace or ''
     all_names = all_names.lstrip(":")
     try:
         class_name, func_name = [s.strip() for s in all_names.split("::")]
@@ -161,6 +452,65 @@ def split_function_prototype(func_prototype):
     return namespace.strip(), class_name, func_name, parameters
 
 
+def split_parameters(func_parameters):
+    """
+    :param func_parameters: parameters of the function
+    :type func_parameters: str
+    :return: the parameters of the function, split on the commas that are not inside
+     template arguments or parentheses
+    :rtype: list
+
+    >>> split_parameters("std::map<int, double> const& table, int size")
+    ['std::map<int, double> const& table', 'int size']
+    >>> split_parameters(" ")
+    []
+    """
+    parameters, depth, start = [], 0, 0
+    for position, character in enumerate(func_parameters):
+        if character in "<([":
+            depth += 1
+        elif character in ">)]":
+            depth -= 1
+        elif character == "," and depth == 0:
+            parameters.append(func_parameters[start:position].strip())
+            start = position + 1
+    last = func_parameters[start:].strip()
+    if last:
+        parameters.append(last)
+    return parameters
+
+
+def check_size_parameter(func_parameters, size_param):
+    """
+    Check that a parameter, giving the size of the problem, is an integer parameter of a function
+
+    :param func_parameters: parameters of the function
+    :type func_parameters: str
+    :param size_param: name of the size parameter
+    :type size_param: str
+    :raise ValueError: if the parameter isn't a parameter of the function or isn't an integer
+
+    >>> check_size_parameter("const size_t pb_size, double *data", "pb_size")
+    >>> check_size_parameter("double *data, int size", "data")
+    Traceback (most recent call last):
+    ...
+    ValueError: The size parameter data should be an integer, not 'double *data'!
+    """
+    for parameter in split_parameters(func_parameters):
+        match = re.search(r"(\w+)\s*$", parameter)
+        if match is None or match.group(1) != size_param:
+            continue
+        declaration = parameter[:match.start()]
+        if "*" in declaration or "[" in declaration or not SIZE_TYPE_PATTERN.search(declaration):
+            msg = "The size parameter {:s} should be an integer, not '{:s}'!".format(size_param, parameter)
+            adapter.error(msg)
+            raise ValueError(msg)
+        return
+    msg = "{:s} is not a parameter of the function ({:s})!".format(size_param, func_parameters)
+    adapter.error(msg)
+    raise ValueError(msg)
+
+
 def get_function_parameters_names(func_parameters):
     """
     :param func_parameters: parameters of the function as return by the method _getParameters
@@ -184,10 +534,20 @@ def get_function_parameters_names(func_parameters):
     >>> test_params += ",const move_semantics_test::VectorWithMoveSem& vec_b"
     >>> get_function_parameters_names(test_params)
     ['vec_a', 'vec_b']
+    >>> get_function_parameters_names("unsigned long int count, std::pair<int, int> const& bounds")
+    ['count', 'bounds']
+    >>> get_function_parameters_names("void")
+    []
     """
-    func_paramater_pattern = "\s*(?:const)?\s*\w+(?:\:\:\w+)?\s*(?:const)?\s*[\*|\&]*\s*(\w+)"
-    func_paramater_po = re.compile(func_paramater_pattern)
-    results = re.findall(func_paramater_po, func_parameters)
+    if func_parameters.strip() == "void":
+        return []
+    # The name of a parameter is the last identifier of its declaration
+    func_paramater_po = re.compile(r"(\w+)\s*$")
+    results = []
+    for parameter in split_parameters(func_parameters):
+        match = re.search(func_paramater_po, parameter)
+        if match:
+            results.append(match.group(1))
     return results
 
 if __name__ == "__main__":
@@ -0,0 +1,301 @@
+// --------------------------------------------------------------
+// -- ALLOCATIONS
+// -- With SPECPROF_ALLOCATIONS, the wrapper interposes the allocator
+// -- of the C library (and so operator new and delete, which call
+// -- it). Each thread counts the allocations it makes while it is
+// -- inside a wrapped function : outside, an allocation only costs a
+// -- test of a thread-local depth more. The live bytes are measured
+// -- with the usable sizes of the blocks, the bytes with the sizes
+// -- requested.
+// --------------------------------------------------------------
+// Allocation statistics of a function in a row
+static inline struct specprof_alloc_stats *specprof_alloc_stats(struct specprof_stats *row, unsigned func)
+{
+    return (struct specprof_alloc_stats *) ((char *) row + SPECPROF_ALLOCATIONS_OFFSET) + func;
+}
+
+#if SPECPROF_ALLOCATIONS
+// Allocations of a thread inside the wrapped calls : number of wrapped calls in progress, counts
+// and bytes, live bytes (allocated minus freed) and highest live bytes since the start of the
+// innermost call in progress
+struct specprof_alloc_state {
+    unsigned depth;
+    uint64_t allocations;
+    uint64_t frees;
+    uint64_t bytes;
+    int64_t live;
+    int64_t peak;
+};
+// State of the thread when a wrapped call starts
+struct specprof_alloc_mark {
+    uint64_t allocations;
+    uint64_t frees;
+    uint64_t bytes;
+    int64_t live;
+    int64_t peak;
+};
+static SPECPROF_TLS struct specprof_alloc_state specprof_tls_allocs;
+
+// Next definitions of the allocation functions (those of the C library or of an allocator
+// preloaded after the wrapper), resolved at the first allocation
+static void *(*specprof_next_malloc)(size_t) = NULL;
+static void *(*specprof_next_calloc)(size_t, size_t) = NULL;
+static void *(*specprof_next_realloc)(void *, size_t) = NULL;
+static void (*specprof_next_free)(void *) = NULL;
+static int (*specprof_next_posix_memalign)(void **, size_t, size_t) = NULL;
+static void *(*specprof_next_aligned_alloc)(size_t, size_t) = NULL;
+// Set while the thread resolves the allocation functions : the other threads resolve them too
+// instead of taking their blocks from the static buffer
+static SPECPROF_TLS int specprof_resolving_allocator = 0;
+// dlsym may allocate while the allocation functions are resolved : these allocations are taken
+// from a static buffer and never freed. Each block starts with its size.
+#define SPECPROF_BOOTSTRAP_SIZE 8192
+static char specprof_bootstrap_heap[SPECPROF_BOOTSTRAP_SIZE] __attribute__((aligned(16)));
+static size_t specprof_bootstrap_used = 0;
+
+static void *specprof_bootstrap_malloc(size_t size)
+{
+    size_t block = (size + 2 * sizeof(size_t) + 15) / 16 * 16;
+    size_t offset = __atomic_fetch_add(&specprof_bootstrap_used, block, __ATOMIC_RELAXED);
+    if (offset + block > SPECPROF_BOOTSTRAP_SIZE) {
+        errno = ENOMEM;
+        return NULL;
+    }
+    *(size_t *) (specprof_bootstrap_heap + offset) = size;
+    return specprof_bootstrap_heap + offset + 2 * sizeof(size_t);
+}
+
+static inline int specprof_is_bootstrap(const void *pointer)
+{
+    return (const char *) pointer >= specprof_bootstrap_heap
+           && (const char *) pointer < specprof_bootstrap_heap + SPECPROF_BOOTSTRAP_SIZE;
+}
+
+// Slow path : resolution of the allocation functions
+static void specprof_resolve_allocator(void)
+{
+    specprof_resolving_allocator = 1;
+    specprof_next_calloc = (void *(*)(size_t, size_t)) dlsym(RTLD_NEXT, "calloc");
+    specprof_next_realloc = (void *(*)(void *, size_t)) dlsym(RTLD_NEXT, "realloc");
+    specprof_next_free = (void (*)(void *)) dlsym(RTLD_NEXT, "free");
+    specprof_next_posix_memalign = (int (*)(void **, size_t, size_t)) dlsym(RTLD_NEXT, "posix_memalign");
+    specprof_next_aligned_alloc = (void *(*)(size_t, size_t)) dlsym(RTLD_NEXT, "aligned_alloc");
+    void *(*next_malloc)(size_t) = (void *(*)(size_t)) dlsym(RTLD_NEXT, "malloc");
+    if (next_malloc == NULL || specprof_next_calloc == NULL || specprof_next_realloc == NULL ||
+        specprof_next_free == NULL) {
+        static const char msg[] = "SpecProf : unable to find the allocation functions of the C library\n";
+        ssize_t written = write(STDERR_FILENO, msg, sizeof(msg) - 1);
+        (void) written;
+        abort();
+    }
+    // Published last : the other functions are resolved once it is set
+    __atomic_store_n(&specprof_next_malloc, next_malloc, __ATOMIC_RELEASE);
+    specprof_resolving_allocator = 0;
+}
+
+// Returns 0 if the allocation functions can be called, -1 if the thread is resolving them
+static inline int specprof_allocator_ready(void)
+{
+    if (SPECPROF_LIKELY(__atomic_load_n(&specprof_next_malloc, __ATOMIC_ACQUIRE) != NULL)) {
+        return 0;
+    }
+    if (specprof_resolving_allocator) {
+        return -1;
+    }
+    specprof_resolve_allocator();
+    return 0;
+}
+
+// Hot path : accounting of an allocated block of the given requested size
+static inline void specprof_count_allocation(void *pointer, size_t size)
+{
+    struct specprof_alloc_state *state = &specprof_tls_allocs;
+    if (SPECPROF_LIKELY(state->depth == 0) || pointer == NULL) {
+        return;
+    }
+    state->allocations += 1;
+    state->bytes += size;
+    state->live += (int64_t) malloc_usable_size(pointer);
+    if (state->live > state->peak) {
+        state->peak = state->live;
+    }
+}
+
+// Hot path : accounting of a freed block of the given usable size
+static inline void specprof_count_free(size_t usable_size)
+{
+    struct specprof_alloc_state *state = &specprof_tls_allocs;
+    state->frees += 1;
+    state->live -= (int64_t) usable_size;
+}
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+void *malloc(size_t size) SPECPROF_NOTHROW
+{
+    if (SPECPROF_UNLIKELY(specprof_allocator_ready() != 0)) {
+        return specprof_bootstrap_malloc(size);
+    }
+    void *pointer = specprof_next_malloc(size);
+    specprof_count_allocation(pointer, size);
+    return pointer;
+}
+
+void *calloc(size_t count, size_t size) SPECPROF_NOTHROW
+{
+    if (SPECPROF_UNLIKELY(specprof_allocator_ready() != 0)) {
+        // The static buffer is zeroed
+        return size != 0 && count > SIZE_MAX / size ? NULL : specprof_bootstrap_malloc(count * size);
+    }
+    void *pointer = specprof_next_calloc(count, size);
+    specprof_count_allocation(pointer, count * size);
+    return pointer;
+}
+
+void *realloc(void *pointer, size_t size) SPECPROF_NOTHROW
+{
+    if (SPECPROF_UNLIKELY(specprof_is_bootstrap(pointer))) {
+        // A bootstrap block is copied to a new one
+        void *copy = malloc(size);
+        size_t old_size = ((const size_t *) pointer)[-2];
+        if (copy != NULL) {
+            memcpy(copy, pointer, old_size < size ? old_size : size);
+        }
+        return copy;
+    }
+    if (SPECPROF_UNLIKELY(specprof_allocator_ready() != 0)) {
+        return pointer == NULL ? specprof_bootstrap_malloc(size) : NULL;
+    }
+    if (SPECPROF_LIKELY(specprof_tls_allocs.depth == 0)) {
+        return specprof_next_realloc(pointer, size);
+    }
+    // Accounted as the free of the old block and the allocation of the new one
+    size_t old_usable = pointer != NULL ? malloc_usable_size(pointer) : 0;
+    void *result = specprof_next_realloc(pointer, size);
+    if (pointer != NULL && (result != NULL || size == 0)) {
+        specprof_count_free(old_usable);
+    }
+    specprof_count_allocation(result, size);
+    return result;
+}
+
+void free(void *pointer) SPECPROF_NOTHROW
+{
+    if (SPECPROF_UNLIKELY(pointer == NULL || specprof_is_bootstrap(pointer))) {
+        return;
+    }
+    if (SPECPROF_UNLIKELY(specprof_allocator_ready() != 0)) {
+        return;
+    }
+    if (SPECPROF_UNLIKELY(specprof_tls_allocs.depth != 0)) {
+        specprof_count_free(malloc_usable_size(pointer));
+    }
+    specprof_next_free(pointer);
+}
+
+int posix_memalign(void **pointer, size_t alignment, size_t size) SPECPROF_NOTHROW
+{
+    if (specprof_allocator_ready() != 0 || specprof_next_posix_memalign == NULL) {
+        return ENOMEM;
+    }
+    int error = specprof_next_posix_memalign(pointer, alignment, size);
+    if (error == 0) {
+        specprof_count_allocation(*pointer, size);
+    }
+    return error;
+}
+
+void *aligned_alloc(size_t alignment, size_t size) SPECPROF_NOTHROW
+{
+    if (specprof_allocator_ready() != 0 || specprof_next_aligned_alloc == NULL) {
+        errno = ENOMEM;
+        return NULL;
+    }
+    void *pointer = specprof_next_aligned_alloc(alignment, size);
+    specprof_count_allocation(pointer, size);
+    return pointer;
+}
+
+#ifdef __cplusplus
+}
+#endif
+
+// Hot path : start of a wrapped call (every call, timed or not)
+static inline void specprof_allocs_enter(struct specprof_alloc_mark *mark)
+{
+    struct specprof_alloc_state *state = &specprof_tls_allocs;
+    mark->allocations = state->allocations;
+    mark->frees = state->frees;
+    mark->bytes = state->bytes;
+    mark->live = state->live;
+    mark->peak = state->peak;
+    state->peak = state->live;
+    state->depth += 1;
+}
+
+// Hot path : accumulation of the allocations of a call started by specprof_allocs_enter. The
+// allocations of the nested wrapped calls are also those of the enclosing ones.
+static inline void specprof_allocs_leave(struct specprof_stats *stats, const struct specprof_alloc_mark *mark)
+{
+    struct specprof_alloc_state *state = &specprof_tls_allocs;
+    state->depth -= 1;
+    uint64_t peak = (uint64_t) (state->peak - mark->live);
+    struct specprof_alloc_stats *allocs = specprof_alloc_stats(specprof_tls_row, (unsigned) (stats - specprof_tls_row));
+    if (SPECPROF_UNLIKELY(specprof_tls_shared)) {
+        __atomic_fetch_add(&allocs->allocations, state->allocations - mark->allocations, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&allocs->frees, state->frees - mark->frees, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&allocs->bytes, state->bytes - mark->bytes, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&allocs->peak_sum, peak, __ATOMIC_RELAXED);
+        specprof_atomic_max(&allocs->peak_max, peak);
+    } else {
+        allocs->allocations += state->allocations - mark->allocations;
+        allocs->frees += state->frees - mark->frees;
+        allocs->bytes += state->bytes - mark->bytes;
+        allocs->peak_sum += peak;
+        if (peak > allocs->peak_max) {
+            allocs->peak_max = peak;
+        }
+    }
+    // The peak of the enclosing call includes the one of this call
+    if (mark->peak > state->peak) {
+        state->peak = mark->peak;
+    }
+}
+
+// Merge of the allocation statistics of a function over the rows of all the threads
+static void specprof_merge_allocations(unsigned func, struct specprof_alloc_stats *merged)
+{
+    unsigned row;
+    memset(merged, 0, sizeof(struct specprof_alloc_stats));
+    pthread_once(&specprof_init_once, specprof_init);
+    unsigned nb_rows = __atomic_load_n(&specprof_nb_rows, __ATOMIC_ACQUIRE);
+    for (row = 0; row <= nb_rows; ++row) {
+        // The shared row is always merged
+        struct specprof_alloc_stats *allocs =
+            specprof_alloc_stats(specprof_row(row < nb_rows ? row : specprof_max_threads - 1), func);
+        merged->allocations += __atomic_load_n(&allocs->allocations, __ATOMIC_RELAXED);
+        merged->frees += __atomic_load_n(&allocs->frees, __ATOMIC_RELAXED);
+        merged->bytes += __atomic_load_n(&allocs->bytes, __ATOMIC_RELAXED);
+        merged->peak_sum += __atomic_load_n(&allocs->peak_sum, __ATOMIC_RELAXED);
+        uint64_t peak_max = __atomic_load_n(&allocs->peak_max, __ATOMIC_RELAXED);
+        if (peak_max > merged->peak_max) {
+            merged->peak_max = peak_max;
+        }
+    }
+}
+
+// Report of the allocations made inside the calls of a function : allocations, frees and bytes
+// per call, and mean and highest peak of the live bytes
+static void specprof_report_allocations(FILE *stream, unsigned func, uint64_t call_count)
+{
+    struct specprof_alloc_stats merged;
+    specprof_merge_allocations(func, &merged);
+    fprintf(stream, "Allocations per call = %.2f (%.2f frees), bytes allocated per call = %.1f\n",
+            (double) merged.allocations / (double) call_count, (double) merged.frees / (double) call_count,
+            (double) merged.bytes / (double) call_count);
+    fprintf(stream, "Peak live bytes per call : mean = %.1f, max = %llu\n",
+            (double) merged.peak_sum / (double) call_count, (unsigned long long) merged.peak_max);
+}
+#endif
@@ -0,0 +1,246 @@
+// --------------------------------------------------------------
+// -- CALL GRAPH
+// -- With SPECPROF_CALL_GRAPH, each thread pushes its wrapped calls
+// -- on a shadow stack. The time of a callee is subtracted from the
+// -- self time of its caller, and a call is timed if it is sampled or
+// -- if its caller is timed : the self time of a sampled call is exact.
+// -- Only the sampled calls are accumulated and extrapolated to all
+// -- the calls, the others are timed for the self time of their
+// -- caller only. The caller -> callee pairs are counted in a hash
+// -- table of each thread, with the same slots as the call sites, and
+// -- printed with the report.
+// --------------------------------------------------------------
+// Highest number of wrapped calls in progress in a thread kept on its stack : the deeper calls are
+// measured but left out of the call graph
+#define SPECPROF_STACK_DEPTH 256
+// Default number of slots of a table (SPECPROF_CALL_GRAPH_SLOTS in the environment)
+#define SPECPROF_GRAPH_DEFAULT_SLOTS 1024
+
+// Nesting statistics of a function in a row
+static inline struct specprof_graph_stats *specprof_graph_stats(struct specprof_stats *row, unsigned func)
+{
+    return (struct specprof_graph_stats *) ((char *) row + SPECPROF_GRAPH_OFFSET) + func;
+}
+
+#if SPECPROF_CALL_GRAPH
+// Wrapped call in progress : the index of the function, 1 if it is timed, 1 if it is sampled and
+// the time of its timed callees
+struct specprof_frame {
+    unsigned func;
+    int timed;
+    int sampled;
+    uint64_t callee_ticks;
+};
+static SPECPROF_TLS struct specprof_frame specprof_tls_frames[SPECPROF_STACK_DEPTH];
+static SPECPROF_TLS unsigned specprof_tls_depth = 0;
+// Number of calls of each function in progress in the current thread
+static SPECPROF_TLS uint64_t specprof_tls_active[SPECPROF_NB_FUNCTIONS];
+// Number of slots of a table, a power of two
+static uint64_t specprof_edges_capacity = 0;
+static unsigned specprof_edges_shift = 0;
+// Table of each row, reused by the threads taking the row
+static struct specprof_site **specprof_edge_tables = NULL;
+static uint64_t specprof_unattributed_edges = 0;
+static uint64_t specprof_deep_calls = 0;
+// Table of the current thread
+static SPECPROF_TLS struct specprof_site *specprof_tls_edges = NULL;
+
+static void specprof_init_graph(void)
+{
+    const char *nb_slots = getenv("SPECPROF_CALL_GRAPH_SLOTS");
+    uint64_t capacity = nb_slots ? (uint64_t) atol(nb_slots) : 0;
+    if (capacity < 2) {
+        capacity = SPECPROF_GRAPH_DEFAULT_SLOTS;
+    }
+    specprof_edges_capacity = 2;
+    specprof_edges_shift = 63;
+    while (specprof_edges_capacity < capacity) {
+        specprof_edges_capacity <<= 1;
+        --specprof_edges_shift;
+    }
+    specprof_edge_tables = (struct specprof_site **) calloc(specprof_max_threads, sizeof(struct specprof_site *));
+}
+
+// Table of a row, given to the thread taking the row
+static struct specprof_site *specprof_edge_table(unsigned row)
+{
+    if (specprof_edge_tables[row] == NULL) {
+        specprof_edge_tables[row] = (struct specprof_site *) calloc(specprof_edges_capacity,
+                                                                    sizeof(struct specprof_site));
+    }
+    return specprof_edge_tables[row];
+}
+
+// Hot path : push of a call on the stack of the current thread. A call is timed if it is sampled
+// or if its caller is timed. Every call is sampled independently of its caller. Returns 1 if the
+// call is timed.
+static inline int specprof_graph_enter(int func_index)
+{
+    unsigned depth = specprof_tls_depth++;
+    int sampled = specprof_sampled(func_index);
+    specprof_tls_active[func_index] += 1;
+    if (SPECPROF_UNLIKELY(depth >= SPECPROF_STACK_DEPTH)) {
+        // Left out of the call graph, its time isn't subtracted from its caller : timed only if sampled
+        __atomic_fetch_add(&specprof_deep_calls, 1, __ATOMIC_RELAXED);
+        return sampled;
+    }
+    int timed = sampled || (depth > 0 && specprof_tls_frames[depth - 1].timed);
+    specprof_tls_frames[depth].func = (unsigned) func_index;
+    specprof_tls_frames[depth].timed = timed;
+    specprof_tls_frames[depth].sampled = sampled;
+    specprof_tls_frames[depth].callee_ticks = 0;
+    return timed;
+}
+
+// Hot path : 1 if the innermost call in progress in the current thread is sampled
+static inline int specprof_graph_sampled(void)
+{
+    unsigned depth = specprof_tls_depth;
+    return depth == 0 || depth > SPECPROF_STACK_DEPTH || specprof_tls_frames[depth - 1].sampled;
+}
+
+// Hot path : pop of a call of the given time (0 if it isn't timed) from the stack of the current
+// thread, accumulation of its nesting statistics and of its caller -> callee pair. The time of a
+// call timed only because its caller is timed is only subtracted from the self time of its caller.
+// Returns 1 if the call is sampled.
+static inline int specprof_graph_leave(unsigned func_index, uint64_t ticks)
+{
+    unsigned depth = --specprof_tls_depth;
+    uint64_t active = specprof_tls_active[func_index]--;
+    if (SPECPROF_UNLIKELY(depth >= SPECPROF_STACK_DEPTH)) {
+        return 1;
+    }
+    const struct specprof_frame *frame = specprof_tls_frames + depth;
+    struct specprof_graph_stats *graph = specprof_graph_stats(specprof_tls_row, func_index);
+    unsigned caller = depth > 0 ? specprof_tls_frames[depth - 1].func : SPECPROF_NB_FUNCTIONS;
+    uint64_t key = (uint64_t) (caller + 1) << 32 | (uint64_t) (func_index + 1);
+    if (frame->timed && depth > 0) {
+        specprof_tls_frames[depth - 1].callee_ticks += ticks;
+    }
+    if (SPECPROF_UNLIKELY(specprof_tls_shared)) {
+        if (frame->sampled) {
+            __atomic_fetch_add(&graph->self_ticks, ticks - frame->callee_ticks, __ATOMIC_RELAXED);
+            if (active == 1) {
+                __atomic_fetch_add(&graph->inclusive_ticks, ticks, __ATOMIC_RELAXED);
+                __atomic_fetch_add(&graph->outer_sampled, 1, __ATOMIC_RELAXED);
+            }
+        }
+        if (active > 1) {
+            __atomic_fetch_add(&graph->recursive_calls, 1, __ATOMIC_RELAXED);
+        }
+        specprof_atomic_max(&graph->max_depth, active);
+    } else {
+        if (frame->sampled) {
+            graph->self_ticks += ticks - frame->callee_ticks;
+            if (active == 1) {
+                graph->inclusive_ticks += ticks;
+                graph->outer_sampled += 1;
+            }
+        }
+        if (active > 1) {
+            graph->recursive_calls += 1;
+        }
+        if (active > graph->max_depth) {
+            graph->max_depth = active;
+        }
+    }
+    if (SPECPROF_LIKELY(specprof_tls_edges != NULL) &&
+        specprof_slot_record(specprof_tls_edges, specprof_edges_shift, specprof_tls_shared, key, ticks,
+                             frame->sampled) != 0) {
+        __atomic_fetch_add(&specprof_unattributed_edges, 1, __ATOMIC_RELAXED);
+    }
+    return frame->sampled;
+}
+
+// Reset of the caller -> callee pairs of all the threads, the rows being locked. The stacks of the
+// calls in progress are kept : these calls are accumulated when they end. The pairs of the other
+// threads recorded while their tables are cleared may be lost or counted for another pair.
+static void specprof_reset_graph(void)
+{
+    unsigned row;
+    for (row = 0; row < specprof_max_threads; ++row) {
+        if (specprof_edge_tables[row] != NULL) {
+            memset(specprof_edge_tables[row], 0, specprof_edges_capacity * sizeof(struct specprof_site));
+        }
+    }
+    __atomic_store_n(&specprof_unattributed_edges, 0, __ATOMIC_RELAXED);
+    __atomic_store_n(&specprof_deep_calls, 0, __ATOMIC_RELAXED);
+}
+
+// Merge of the nesting statistics of a function over the rows of all the threads
+static void specprof_merge_graph(unsigned func, struct specprof_graph_stats *merged)
+{
+    unsigned row;
+    memset(merged, 0, sizeof(struct specprof_graph_stats));
+    pthread_once(&specprof_init_once, specprof_init);
+    unsigned nb_rows = __atomic_load_n(&specprof_nb_rows, __ATOMIC_ACQUIRE);
+    for (row = 0; row <= nb_rows; ++row) {
+        // The shared row is always merged
+        struct specprof_graph_stats *graph =
+            specprof_graph_stats(specprof_row(row < nb_rows ? row : specprof_max_threads - 1), func);
+        merged->self_ticks += __atomic_load_n(&graph->self_ticks, __ATOMIC_RELAXED);
+        merged->inclusive_ticks += __atomic_load_n(&graph->inclusive_ticks, __ATOMIC_RELAXED);
+        merged->outer_sampled += __atomic_load_n(&graph->outer_sampled, __ATOMIC_RELAXED);
+        merged->recursive_calls += __atomic_load_n(&graph->recursive_calls, __ATOMIC_RELAXED);
+        uint64_t max_depth = __atomic_load_n(&graph->max_depth, __ATOMIC_RELAXED);
+        if (max_depth > merged->max_depth) {
+            merged->max_depth = max_depth;
+        }
+    }
+}
+
+// Report of the nesting of a function : self time, time of the outermost calls and recursion, the
+// time of the sampled calls extrapolated to all the calls
+static void specprof_report_graph(FILE *stream, unsigned func, const struct specprof_stats *merged,
+                                  double ns_per_tick)
+{
+    struct specprof_graph_stats graph;
+    specprof_merge_graph(func, &graph);
+    uint64_t outer_calls = merged->call_count - graph.recursive_calls;
+    if (merged->sampled_count > 0) {
+        double self_ns = (double) graph.self_ticks * ns_per_tick / (double) merged->sampled_count;
+        fprintf(stream, "Self time = %.6f seconds (%.1f nanoseconds per call)\n",
+                specprof_corrected_ns(self_ns) * (double) merged->call_count * 1e-9, specprof_corrected_ns(self_ns));
+    }
+    if (graph.outer_sampled > 0) {
+        double inclusive_ns = (double) graph.inclusive_ticks * ns_per_tick / (double) graph.outer_sampled;
+        fprintf(stream, "Outermost calls = %llu, inclusive time = %.6f seconds\n", (unsigned long long) outer_calls,
+                specprof_corrected_ns(inclusive_ns) * (double) outer_calls * 1e-9);
+    }
+    fprintf(stream, "Recursive calls = %llu, max recursion depth = %llu\n",
+            (unsigned long long) graph.recursive_calls, (unsigned long long) graph.max_depth);
+}
+
+// Report of the caller -> callee pairs of all the threads, <root> being the caller of the calls
+// made outside any wrapped function
+static void specprof_report_edges(FILE *stream, double ns_per_tick)
+{
+    size_t nb_edges = 0, edge;
+    struct specprof_site *edges = specprof_merge_slots(specprof_edge_tables, specprof_edges_capacity, &nb_edges);
+    fprintf(stream, "***********************************************\n");
+    fprintf(stream, "CALL GRAPH (caller -> callee : calls, time)\n");
+    for (edge = 0; edge < nb_edges; ++edge) {
+        unsigned caller = (unsigned) (edges[edge].key >> 32) - 1;
+        unsigned callee = (unsigned) (edges[edge].key & 0xFFFFFFFFULL) - 1;
+        fprintf(stream, "%s -> %s : %llu calls, ",
+                caller < SPECPROF_NB_FUNCTIONS ? specprof_func_names[caller] : "<root>",
+                specprof_func_names[callee], (unsigned long long) edges[edge].call_count);
+        if (edges[edge].sampled_count > 0) {
+            double mean_ns = (double) edges[edge].total_ticks * ns_per_tick / (double) edges[edge].sampled_count;
+            fprintf(stream, "%.6f seconds\n",
+                    specprof_corrected_ns(mean_ns) * (double) edges[edge].call_count * 1e-9);
+        } else {
+            fprintf(stream, "unknown time\n");
+        }
+    }
+    if (specprof_deep_calls > 0) {
+        fprintf(stream, "Calls deeper than %u wrapped calls, left out = %llu\n", SPECPROF_STACK_DEPTH,
+                (unsigned long long) specprof_deep_calls);
+    }
+    if (specprof_unattributed_edges > 0) {
+        fprintf(stream, "Calls left out, the tables being full (SPECPROF_CALL_GRAPH_SLOTS) = %llu\n",
+                (unsigned long long) specprof_unattributed_edges);
+    }
+    free(edges);
+}
+#endif
@@ -0,0 +1,304 @@
+// --------------------------------------------------------------
+// -- CALL SITES
+// -- Each thread counts the calls and times of every (function,
+// -- return address) pair in its own open addressing hash table.
+// -- The tables are merged at the end and written in the call sites
+// -- file (SPECPROF_CALL_SITES_FILE in the environment), where the
+// -- addresses are given relative to their module : src/call_sites.py
+// -- turns them into symbols.
+// --------------------------------------------------------------
+#define SPECPROF_SITES_MAGIC "SPECSITE"
+#define SPECPROF_SITES_VERSION 1
+// Default number of slots of a table (SPECPROF_CALL_SITES_SLOTS in the environment)
+#define SPECPROF_SITES_DEFAULT_SLOTS 1024
+
+// Slot of a call site table. Key : the return address, with the index of the function (plus one)
+// in the high bits (user space addresses fit in 48 bits). 0 for an empty slot. The call graph
+// tables have the same slots.
+struct specprof_site {
+    uint64_t key;
+    uint64_t call_count;
+    uint64_t sampled_count;
+    uint64_t total_ticks;
+};
+
+struct specprof_sites_header {
+    char magic[8];
+    uint32_t version;
+    uint32_t header_size;
+    uint32_t timer;
+    uint32_t pid;
+    uint32_t nb_functions;
+    uint32_t nb_modules;
+    uint64_t nb_sites;
+    // Calls not attributed to a call site because the table of their thread was full
+    uint64_t unattributed_calls;
+    double ns_per_tick;
+    double overhead_ns;
+};
+
+// Call site in the file : the index of the function, of the module holding the return address
+// (nb_modules if unknown) and the address relative to the load address of the module
+struct specprof_site_record {
+    uint32_t func;
+    uint32_t module;
+    uint64_t offset;
+    uint64_t call_count;
+    uint64_t sampled_count;
+    uint64_t total_ticks;
+};
+
+#if SPECPROF_CALL_SITES || SPECPROF_CALL_GRAPH
+// Hot path : accumulation of a call (timed if sampled) in the slot of a key of an open addressing
+// hash table of 2^(64 - shift) slots, updated atomically if shared. Returns -1 if the table is full.
+static inline int specprof_slot_record(struct specprof_site *table, unsigned shift, int shared, uint64_t key,
+                                       uint64_t ticks, int sampled)
+{
+    uint64_t mask = (1ULL << (64 - shift)) - 1;
+    uint64_t index = (key * 0x9E3779B97F4A7C15ULL) >> shift;
+    uint64_t probe;
+    for (probe = 0; probe <= mask; ++probe, index = (index + 1) & mask) {
+        struct specprof_site *site = table + index;
+        if (SPECPROF_UNLIKELY(shared)) {
+            uint64_t current = __atomic_load_n(&site->key, __ATOMIC_RELAXED);
+            if (current == 0 &&
+                !__atomic_compare_exchange_n(&site->key, &current, key, 0, __ATOMIC_RELAXED, __ATOMIC_RELAXED) &&
+                current != key) {
+                continue;
+            }
+            if (current != 0 && current != key) {
+                continue;
+            }
+            __atomic_fetch_add(&site->call_count, 1, __ATOMIC_RELAXED);
+            if (sampled) {
+                __atomic_fetch_add(&site->sampled_count, 1, __ATOMIC_RELAXED);
+                __atomic_fetch_add(&site->total_ticks, ticks, __ATOMIC_RELAXED);
+            }
+            return 0;
+        }
+        if (site->key != key) {
+            if (site->key != 0) {
+                continue;
+            }
+            site->key = key;
+        }
+        site->call_count += 1;
+        if (sampled) {
+            site->sampled_count += 1;
+            site->total_ticks += ticks;
+        }
+        return 0;
+    }
+    return -1;
+}
+
+static int specprof_compare_sites(const void *left, const void *right)
+{
+    uint64_t left_key = ((const struct specprof_site *) left)->key;
+    uint64_t right_key = ((const struct specprof_site *) right)->key;
+    return left_key < right_key ? -1 : (left_key > right_key ? 1 : 0);
+}
+
+// Merge of the tables of capacity slots of all the rows : returns the slots sorted by key
+static struct specprof_site *specprof_merge_slots(struct specprof_site **tables, uint64_t capacity, size_t *nb_slots)
+{
+    unsigned row;
+    uint64_t slot;
+    size_t count = 0, merged = 0;
+    for (row = 0; row < specprof_max_threads; ++row) {
+        for (slot = 0; tables[row] != NULL && slot < capacity; ++slot) {
+            count += __atomic_load_n(&tables[row][slot].key, __ATOMIC_RELAXED) != 0;
+        }
+    }
+    struct specprof_site *sites = (struct specprof_site *) calloc(count + 1, sizeof(struct specprof_site));
+    count = 0;
+    for (row = 0; row < specprof_max_threads; ++row) {
+        for (slot = 0; tables[row] != NULL && slot < capacity; ++slot) {
+            const struct specprof_site *site = tables[row] + slot;
+            if (__atomic_load_n(&site->key, __ATOMIC_RELAXED) != 0) {
+                sites[count].key = site->key;
+                sites[count].call_count = __atomic_load_n(&site->call_count, __ATOMIC_RELAXED);
+                sites[count].sampled_count = __atomic_load_n(&site->sampled_count, __ATOMIC_RELAXED);
+                sites[count++].total_ticks = __atomic_load_n(&site->total_ticks, __ATOMIC_RELAXED);
+            }
+        }
+    }
+    qsort(sites, count, sizeof(struct specprof_site), specprof_compare_sites);
+    for (slot = 0; slot < count; ++slot) {
+        if (merged > 0 && sites[merged - 1].key == sites[slot].key) {
+            sites[merged - 1].call_count += sites[slot].call_count;
+            sites[merged - 1].sampled_count += sites[slot].sampled_count;
+            sites[merged - 1].total_ticks += sites[slot].total_ticks;
+        } else {
+            sites[merged++] = sites[slot];
+        }
+    }
+    *nb_slots = merged;
+    return sites;
+}
+#endif
+
+#if SPECPROF_CALL_SITES
+// Number of slots of a table, a power of two
+static uint64_t specprof_sites_capacity = 0;
+static unsigned specprof_sites_shift = 0;
+// Table of each row, reused by the threads taking the row
+static struct specprof_site **specprof_site_tables = NULL;
+static uint64_t specprof_unattributed_calls = 0;
+// Table of the current thread
+static SPECPROF_TLS struct specprof_site *specprof_tls_sites = NULL;
+
+static void specprof_init_sites(void)
+{
+    const char *nb_slots = getenv("SPECPROF_CALL_SITES_SLOTS");
+    uint64_t capacity = nb_slots ? (uint64_t) atol(nb_slots) : 0;
+    if (capacity < 2) {
+        capacity = SPECPROF_SITES_DEFAULT_SLOTS;
+    }
+    specprof_sites_capacity = 2;
+    specprof_sites_shift = 63;
+    while (specprof_sites_capacity < capacity) {
+        specprof_sites_capacity <<= 1;
+        --specprof_sites_shift;
+    }
+    specprof_site_tables = (struct specprof_site **) calloc(specprof_max_threads, sizeof(struct specprof_site *));
+}
+
+// Table of a row, given to the thread taking the row
+static struct specprof_site *specprof_site_table(unsigned row)
+{
+    if (specprof_site_tables[row] == NULL) {
+        specprof_site_tables[row] = (struct specprof_site *) calloc(specprof_sites_capacity,
+                                                                    sizeof(struct specprof_site));
+    }
+    return specprof_site_tables[row];
+}
+
+// Hot path : accumulation of a call (timed if sampled) in the table of the current thread
+static inline void specprof_site_record(unsigned func_index, void *caller, uint64_t ticks, int sampled)
+{
+    struct specprof_site *table = specprof_tls_sites;
+    uint64_t key = (uint64_t) (uintptr_t) caller | (uint64_t) (func_index + 1) << 48;
+    if (SPECPROF_UNLIKELY(table == NULL)) {
+        return;
+    }
+    if (specprof_slot_record(table, specprof_sites_shift, specprof_tls_shared, key, ticks, sampled) != 0) {
+        __atomic_fetch_add(&specprof_unattributed_calls, 1, __ATOMIC_RELAXED);
+    }
+}
+
+// Reset of the tables of all the threads, the rows being locked. The calls of the other threads
+// ending while their tables are cleared may be lost or counted for another call site.
+static void specprof_reset_sites(void)
+{
+    unsigned row;
+    for (row = 0; row < specprof_max_threads; ++row) {
+        if (specprof_site_tables[row] != NULL) {
+            memset(specprof_site_tables[row], 0, specprof_sites_capacity * sizeof(struct specprof_site));
+        }
+    }
+    __atomic_store_n(&specprof_unattributed_calls, 0, __ATOMIC_RELAXED);
+}
+
+// Merge of the tables of all the threads : returns the call sites sorted by key
+static struct specprof_site *specprof_merge_sites(size_t *nb_sites)
+{
+    return specprof_merge_slots(specprof_site_tables, specprof_sites_capacity, nb_sites);
+}
+
+// Path of the module holding an address and the address relative to the load address of the
+// module (the value of the symbols in its ELF file). Returns NULL if the address is unknown.
+static const char *specprof_site_module(uint64_t address, uint64_t *offset)
+{
+    Dl_info info;
+    struct link_map *map = NULL;
+    static char executable[4096];
+    if (dladdr1((void *) (uintptr_t) address, &info, (void **) &map, RTLD_DL_LINKMAP) == 0 || map == NULL) {
+        return NULL;
+    }
+    *offset = address - (uint64_t) map->l_addr;
+    if (map->l_name != NULL && map->l_name[0] != '\0') {
+        return map->l_name;
+    }
+    // The main program has no name in the link map
+    ssize_t length = readlink("/proc/self/exe", executable, sizeof(executable) - 1);
+    if (length <= 0) {
+        return NULL;
+    }
+    executable[length] = '\0';
+    return executable;
+}
+
+// Write the merged call sites in the file named by SPECPROF_CALL_SITES_FILE. Returns the number
+// of call sites of each function in nb_sites_by_func.
+static void specprof_write_sites(double ns_per_tick, unsigned *nb_sites_by_func)
+{
+    char path_buffer[4096];
+    const char *path = specprof_process_path("SPECPROF_CALL_SITES_FILE", path_buffer, sizeof(path_buffer));
+    struct specprof_sites_header header;
+    const char **modules = NULL;
+    size_t nb_sites = 0, site;
+    unsigned func, module, nb_modules = 0;
+    struct specprof_site *sites = specprof_merge_sites(&nb_sites);
+    struct specprof_site_record *records = (struct specprof_site_record *) calloc(nb_sites + 1, sizeof(*records));
+    modules = (const char **) calloc(nb_sites + 1, sizeof(const char *));
+    for (site = 0; site < nb_sites; ++site) {
+        const char *name = specprof_site_module(sites[site].key & ((1ULL << 48) - 1), &records[site].offset);
+        records[site].func = (uint32_t) (sites[site].key >> 48) - 1;
+        records[site].module = UINT32_MAX;
+        if (name == NULL) {
+            records[site].offset = sites[site].key & ((1ULL << 48) - 1);
+        } else {
+            for (module = 0; module < nb_modules && strcmp(modules[module], name) != 0; ++module) {
+            }
+            if (module == nb_modules) {
+                modules[nb_modules++] = strdup(name);
+            }
+            records[site].module = module;
+        }
+        records[site].call_count = sites[site].call_count;
+        records[site].sampled_count = sites[site].sampled_count;
+        records[site].total_ticks = sites[site].total_ticks;
+        nb_sites_by_func[records[site].func] += 1;
+    }
+    // The unknown addresses get the index following the last module
+    for (site = 0; site < nb_sites; ++site) {
+        if (records[site].module == UINT32_MAX) {
+            records[site].module = nb_modules;
+        }
+    }
+    FILE *stream = path != NULL ? fopen(path, "wb") : NULL;
+    if (path != NULL && stream == NULL) {
+        perror("SpecProf : unable to open the call sites file");
+    }
+    if (stream != NULL) {
+        memset(&header, 0, sizeof(header));
+        memcpy(header.magic, SPECPROF_SITES_MAGIC, 8);
+        header.version = SPECPROF_SITES_VERSION;
+        header.header_size = sizeof(header);
+        header.timer = SPECPROF_TIMER;
+        header.pid = (uint32_t) getpid();
+        header.nb_functions = SPECPROF_NB_FUNCTIONS;
+        header.nb_modules = nb_modules;
+        header.nb_sites = nb_sites;
+        header.unattributed_calls = __atomic_load_n(&specprof_unattributed_calls, __ATOMIC_RELAXED);
+        header.ns_per_tick = ns_per_tick;
+        header.overhead_ns = SPECPROF_OVERHEAD_NS;
+        fwrite(&header, sizeof(header), 1, stream);
+        for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+            fwrite(specprof_func_names[func], 1, strlen(specprof_func_names[func]) + 1, stream);
+        }
+        for (module = 0; module < nb_modules; ++module) {
+            fwrite(modules[module], 1, strlen(modules[module]) + 1, stream);
+        }
+        fwrite(records, sizeof(*records), nb_sites, stream);
+        fclose(stream);
+    }
+    for (module = 0; module < nb_modules; ++module) {
+        free((void *) modules[module]);
+    }
+    free(modules);
+    free(records);
+    free(sites);
+}
+#endif
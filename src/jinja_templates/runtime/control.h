@@ -0,0 +1,137 @@
+// --------------------------------------------------------------
+// -- CONTROL
+// -- The calls are measured from the start unless SPECPROF_ENABLED
+// -- is 0. When SPECPROF_CONTROL_FILE names a file, SIGUSR2 makes the
+// -- wrapper apply the commands written in it (enable, disable,
+// -- toggle, reset), or toggle the measures if it is empty. The
+// -- commands are applied by the next wrapped call, outside of the
+// -- signal handler. While the measures are disabled, a wrapped call
+// -- only tests the control word before calling its target.
+// --------------------------------------------------------------
+#define SPECPROF_CONTROL_ENABLED 1
+#define SPECPROF_CONTROL_PENDING 2
+static int specprof_control = 0;
+// 1 once the measures have been enabled : the report of a process where they never were is not printed
+static int specprof_ever_enabled = 0;
+static const char *specprof_control_file = NULL;
+
+static void specprof_control_signal(int signum)
+{
+    (void) signum;
+    __atomic_fetch_or(&specprof_control, SPECPROF_CONTROL_PENDING, __ATOMIC_RELAXED);
+}
+
+// Initial state of the measures, read by the constructor of the wrapper
+static void specprof_init_control(void)
+{
+    const char *enabled = getenv("SPECPROF_ENABLED");
+    if (enabled == NULL || strcmp(enabled, "0") != 0) {
+        __atomic_store_n(&specprof_control, SPECPROF_CONTROL_ENABLED, __ATOMIC_RELAXED);
+        __atomic_store_n(&specprof_ever_enabled, 1, __ATOMIC_RELAXED);
+    }
+    specprof_control_file = getenv("SPECPROF_CONTROL_FILE");
+    if (specprof_control_file != NULL && specprof_control_file[0] != '\0') {
+        struct sigaction action, previous_action;
+        memset(&action, 0, sizeof(action));
+        action.sa_handler = specprof_control_signal;
+        action.sa_flags = SA_RESTART;
+        sigemptyset(&action.sa_mask);
+        if (sigaction(SIGUSR2, NULL, &previous_action) == 0 && previous_action.sa_handler == SIG_DFL) {
+            sigaction(SIGUSR2, &action, NULL);
+        } else {
+            fprintf(stderr, "SpecProf : SIGUSR2 is already handled, no control of the measures on signal\n");
+        }
+    }
+}
+
+// Reset of the statistics of all the threads, of the last snapshot, and of the trace, call sites
+// and call graph of the process. The other threads are not stopped : the rows, tables and rings
+// they update without any lock are cleared under their feet, so that the measures of the calls
+// ending meanwhile may be partly kept or lost.
+static void specprof_reset(void)
+{
+    unsigned row;
+    if (__atomic_load_n(&specprof_table, __ATOMIC_ACQUIRE) == NULL) {
+        // Nothing measured yet
+        return;
+    }
+    pthread_mutex_lock(&specprof_snapshot_mutex);
+    pthread_mutex_lock(&specprof_rows_mutex);
+    for (row = 0; row < specprof_nb_rows; ++row) {
+        memset(specprof_row(row), 0, SPECPROF_MERGED_ROW_SIZE);
+    }
+    memset(specprof_row(specprof_max_threads - 1), 0, SPECPROF_MERGED_ROW_SIZE);
+    if (specprof_snapshot_previous != NULL) {
+        memset(specprof_snapshot_previous, 0, SPECPROF_MERGED_ROW_SIZE);
+    }
+    specprof_reset_trace();
+#if SPECPROF_CALL_SITES
+    specprof_reset_sites();
+#endif
+#if SPECPROF_CALL_GRAPH
+    specprof_reset_graph();
+#endif
+    pthread_mutex_unlock(&specprof_rows_mutex);
+    pthread_mutex_unlock(&specprof_snapshot_mutex);
+}
+
+// Commands of the control file, applied in order
+static void specprof_apply_control(void)
+{
+    char commands[256];
+    char *saveptr = NULL;
+    ssize_t size = -1;
+    int fd = open(specprof_control_file, O_RDONLY | O_CLOEXEC);
+    if (fd >= 0) {
+        size = read(fd, commands, sizeof(commands) - 1);
+        close(fd);
+    }
+    if (size <= 0) {
+        // No command : the measures are toggled
+        strcpy(commands, "toggle");
+    } else {
+        commands[size] = '\0';
+    }
+    const char *command;
+    for (command = strtok_r(commands, " \t\r\n,;", &saveptr); command != NULL;
+         command = strtok_r(NULL, " \t\r\n,;", &saveptr)) {
+        if (strcmp(command, "enable") == 0) {
+            __atomic_fetch_or(&specprof_control, SPECPROF_CONTROL_ENABLED, __ATOMIC_RELAXED);
+            __atomic_store_n(&specprof_ever_enabled, 1, __ATOMIC_RELAXED);
+        } else if (strcmp(command, "disable") == 0) {
+            __atomic_fetch_and(&specprof_control, ~SPECPROF_CONTROL_ENABLED, __ATOMIC_RELAXED);
+        } else if (strcmp(command, "toggle") == 0) {
+            if (__atomic_xor_fetch(&specprof_control, SPECPROF_CONTROL_ENABLED, __ATOMIC_RELAXED)
+                & SPECPROF_CONTROL_ENABLED) {
+                __atomic_store_n(&specprof_ever_enabled, 1, __ATOMIC_RELAXED);
+            }
+        } else if (strcmp(command, "reset") == 0) {
+            specprof_reset();
+        } else {
+            fprintf(stderr, "SpecProf : unknown command '%s' in %s\n", command, specprof_control_file);
+        }
+    }
+}
+
+// Slow path : the measures are disabled or commands are pending. Returns 1 if the call is measured.
+static int specprof_control_slow(int control)
+{
+    // A single thread applies the pending commands
+    if ((control & SPECPROF_CONTROL_PENDING) &&
+        (__atomic_fetch_and(&specprof_control, ~SPECPROF_CONTROL_PENDING, __ATOMIC_RELAXED)
+         & SPECPROF_CONTROL_PENDING)) {
+        specprof_apply_control();
+        control = __atomic_load_n(&specprof_control, __ATOMIC_RELAXED);
+    }
+    return (control & SPECPROF_CONTROL_ENABLED) != 0;
+}
+
+// Hot path : 1 if the call is measured
+static inline int specprof_measuring(void)
+{
+    int control = __atomic_load_n(&specprof_control, __ATOMIC_RELAXED);
+    if (SPECPROF_LIKELY(control == SPECPROF_CONTROL_ENABLED)) {
+        return 1;
+    }
+    return control != 0 && specprof_control_slow(control);
+}
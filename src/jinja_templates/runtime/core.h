@@ -0,0 +1,219 @@
+// --------------------------------------------------------------
+// -- CORE
+// -- Configuration chosen at generation time, layout of the rows of
+// -- the statistics table and state shared by all the features.
+// --------------------------------------------------------------
+#include <math.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <errno.h>
+#include <signal.h>
+#include <unistd.h>
+#include <pthread.h>
+#include <semaphore.h>
+#include <fcntl.h>
+#include <dlfcn.h>
+#include <link.h>
+#include <sys/mman.h>
+#include <sys/syscall.h>
+#include <sys/uio.h>
+
+#define SPECPROF_LIKELY(x) __builtin_expect(!!(x), 1)
+#define SPECPROF_UNLIKELY(x) __builtin_expect(!!(x), 0)
+#define SPECPROF_TLS __thread __attribute__((tls_model("initial-exec")))
+
+// Number of wrapped functions
+#define SPECPROF_NB_FUNCTIONS {{ functions|length }}
+// Every call is counted but only one call in SPECPROF_SAMPLE_PERIOD is timed, chosen with a fixed
+// stride or, if SPECPROF_SAMPLING_RANDOM, at random
+#define SPECPROF_SAMPLE_PERIOD {{ sample_period }}U
+#define SPECPROF_SAMPLING_RANDOM {{ 1 if sampling == 'random' else 0 }}
+// Time, in nanoseconds, added by the wrapper itself to each measured call (reading the timer,
+// recording the measure), as calibrated by benchmarks/bench_wrapper_overhead.py. It is subtracted
+// from the reported times, the raw measures are kept in the statistics files.
+#define SPECPROF_OVERHEAD_NS {{ overhead_ns }}
+// If SPECPROF_CALL_SITES, the calls and times are also broken down by call site (return address)
+#define SPECPROF_CALL_SITES {{ 1 if call_sites else 0 }}
+// If SPECPROF_CALL_GRAPH, each thread keeps a shadow stack of its wrapped calls in progress : the
+// inclusive and self times, the recursion and the caller -> callee counts are also accumulated
+#define SPECPROF_CALL_GRAPH {{ 1 if call_graph else 0 }}
+// If SPECPROF_COUNTERS, the timed calls also accumulate the deltas of performance counters
+#define SPECPROF_COUNTERS {{ 1 if counters else 0 }}
+#if SPECPROF_COUNTERS
+#include <linux/perf_event.h>
+#endif
+// If SPECPROF_ALLOCATIONS, the allocator is interposed and the allocations made inside the wrapped
+// calls are accounted
+#define SPECPROF_ALLOCATIONS {{ 1 if allocations else 0 }}
+#if SPECPROF_ALLOCATIONS
+#include <malloc.h>
+#ifdef __cplusplus
+// The interposed functions are declared non throwing by the C library
+#define SPECPROF_NOTHROW __THROW
+#else
+#define SPECPROF_NOTHROW
+#endif
+#endif
+// Number of wrapped functions of which the calls are also accumulated by value of a size parameter
+#define SPECPROF_NB_SIZED_FUNCTIONS {{ nb_sized_functions }}
+// Default number of rows of the statistics table (SPECPROF_MAX_THREADS in the environment).
+// The last row is shared by the threads arriving when all the other rows are taken.
+#define SPECPROF_DEFAULT_MAX_THREADS 256
+#define SPECPROF_CACHE_LINE 64
+
+// Latency histograms are log-linear : values below 2^SPECPROF_HIST_SUB_BITS ticks have their
+// own bucket, above each power of two is split into 2^SPECPROF_HIST_SUB_BITS buckets, so that
+// the relative error on a value is below 1 / 2^SPECPROF_HIST_SUB_BITS whatever its magnitude.
+#define SPECPROF_HIST_SUB_BITS 4
+#define SPECPROF_HIST_SUB_COUNT (1U << SPECPROF_HIST_SUB_BITS)
+#define SPECPROF_HIST_BUCKETS ((64 - SPECPROF_HIST_SUB_BITS + 1) * SPECPROF_HIST_SUB_COUNT)
+
+// Measures of one function by one thread
+struct specprof_stats {
+    uint64_t call_count;
+    // Number of timed calls : the durations below are those of the timed calls only
+    uint64_t sampled_count;
+    uint64_t total_ticks;
+    // Shortest call (0 while unset) and longest call
+    uint64_t min_ticks;
+    uint64_t max_ticks;
+    uint64_t hist[SPECPROF_HIST_BUCKETS];
+};
+// Names of the scalar fields of specprof_stats, in order, as written in the results file.
+// Fields named min_* or max_* are merged by min or max, the others are summed.
+#define SPECPROF_STATS_FIELDS "call_count,sampled_count,total_ticks,min_ticks,max_ticks"
+#define SPECPROF_NB_STATS_FIELDS 5
+
+// Calls of a function with a size parameter, by power of two of the size : bucket 0 holds the
+// sizes below 1, bucket k > 0 the sizes in [2^(k-1), 2^k - 1]
+#define SPECPROF_SIZE_BUCKETS 65
+struct specprof_size_bucket {
+    uint64_t call_count;
+    uint64_t sampled_count;
+    uint64_t total_ticks;
+    // Sum of the sizes of the timed calls
+    uint64_t size_sum;
+};
+struct specprof_size_stats {
+    struct specprof_size_bucket buckets[SPECPROF_SIZE_BUCKETS];
+};
+
+// Performance counters, hardware then software ones. The task clock is in nanoseconds.
+#define SPECPROF_NB_COUNTERS 6
+#define SPECPROF_NB_HARDWARE_COUNTERS 3
+#define SPECPROF_COUNTER_NAMES "cycles,instructions,cache_misses,task_clock_ns,page_faults,context_switches"
+// Deltas of the counters accumulated over the timed calls of a function. The calls during which
+// the counters were not all scheduled (multiplexed with other events) are only counted.
+struct specprof_counter_stats {
+    uint64_t measured_calls;
+    uint64_t unmeasured_calls;
+    uint64_t values[SPECPROF_NB_COUNTERS];
+};
+
+// Allocations made inside the calls of a function : number of allocations and of frees, bytes
+// requested, and peak of the live bytes above their level at the start of each call, summed and
+// highest over the calls
+#define SPECPROF_ALLOC_FIELDS "allocations,frees,bytes,peak_sum,peak_max"
+#define SPECPROF_NB_ALLOC_FIELDS 5
+struct specprof_alloc_stats {
+    uint64_t allocations;
+    uint64_t frees;
+    uint64_t bytes;
+    uint64_t peak_sum;
+    uint64_t peak_max;
+};
+
+// Nesting of the timed calls of a function : self time (the time of the wrapped callees
+// subtracted), time and number of the outermost calls (the recursive calls, made while the
+// function is already in progress in the thread, are included in the time of the outermost one),
+// number of recursive calls and highest number of calls of the function in progress in a thread
+#define SPECPROF_GRAPH_FIELDS "self_ticks,inclusive_ticks,outer_sampled,recursive_calls,max_depth"
+#define SPECPROF_NB_GRAPH_FIELDS 5
+struct specprof_graph_stats {
+    uint64_t self_ticks;
+    uint64_t inclusive_ticks;
+    uint64_t outer_sampled;
+    uint64_t recursive_calls;
+    uint64_t max_depth;
+};
+
+// Statistics of a row : the statistics of all the functions, the size statistics of the
+// functions with a size parameter, if SPECPROF_COUNTERS the counters of all the functions, if
+// SPECPROF_ALLOCATIONS their allocations and if SPECPROF_CALL_GRAPH their nesting
+#define SPECPROF_COUNTERS_OFFSET (SPECPROF_NB_FUNCTIONS * sizeof(struct specprof_stats) \
+                                  + SPECPROF_NB_SIZED_FUNCTIONS * sizeof(struct specprof_size_stats))
+#define SPECPROF_ALLOCATIONS_OFFSET (SPECPROF_COUNTERS_OFFSET \
+                                     + SPECPROF_COUNTERS * SPECPROF_NB_FUNCTIONS * sizeof(struct specprof_counter_stats))
+#define SPECPROF_GRAPH_OFFSET (SPECPROF_ALLOCATIONS_OFFSET \
+                               + SPECPROF_ALLOCATIONS * SPECPROF_NB_FUNCTIONS * sizeof(struct specprof_alloc_stats))
+#define SPECPROF_MERGED_ROW_SIZE (SPECPROF_GRAPH_OFFSET \
+                                  + SPECPROF_CALL_GRAPH * SPECPROF_NB_FUNCTIONS * sizeof(struct specprof_graph_stats))
+
+// Names of the wrapped functions
+static const char *specprof_func_names[SPECPROF_NB_FUNCTIONS] = {
+{% for func in functions %}
+    "{{ func.func_name }}",
+{% endfor %}
+};
+// Names of the size parameters of the wrapped functions ("" if none)
+static const char *specprof_size_params[SPECPROF_NB_FUNCTIONS] = {
+{% for func in functions %}
+    "{{ func.size_param or '' }}",
+{% endfor %}
+};
+// Slots of the size statistics of the wrapped functions in a row (-1 if no size parameter)
+static const int specprof_size_slots[SPECPROF_NB_FUNCTIONS] = {
+{% for func in functions %}
+    {{ func.size_slot }},
+{% endfor %}
+};
+
+// Table of [max_threads][SPECPROF_NB_FUNCTIONS] statistics, each row followed by the size
+// statistics of the functions with a size parameter. Rows are padded to a cache line to avoid
+// false sharing. The table is an anonymous mapping, or a shared mapping of the live
+// statistics file : the rows of unused threads never consume memory.
+static char *specprof_table = NULL;
+static size_t specprof_row_size = 0;
+static unsigned specprof_max_threads = 0;
+// Number of rows ever given to a thread
+static unsigned specprof_nb_rows = 0;
+// Rows released by terminated threads, ready to be reused
+static unsigned *specprof_free_rows = NULL;
+static unsigned specprof_nb_free_rows = 0;
+static pthread_mutex_t specprof_rows_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_once_t specprof_init_once = PTHREAD_ONCE_INIT;
+static pthread_key_t specprof_thread_key;
+
+// Row of the current thread
+static SPECPROF_TLS struct specprof_stats *specprof_tls_row = NULL;
+// True if the row of the current thread is shared because all rows are taken
+static SPECPROF_TLS int specprof_tls_shared = 0;
+
+// Row of the given index in the table
+static inline struct specprof_stats *specprof_row(unsigned index)
+{
+    return (struct specprof_stats *) (specprof_table + (size_t) index * specprof_row_size);
+}
+
+// Minimum and maximum updated in the shared row (a minimum of 0 is unset)
+static inline void specprof_atomic_min(uint64_t *target, uint64_t value)
+{
+    uint64_t current = __atomic_load_n(target, __ATOMIC_RELAXED);
+    while ((current == 0 || value < current) &&
+           !__atomic_compare_exchange_n(target, &current, value, 1, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {
+    }
+}
+
+static inline void specprof_atomic_max(uint64_t *target, uint64_t value)
+{
+    uint64_t current = __atomic_load_n(target, __ATOMIC_RELAXED);
+    while (value > current &&
+           !__atomic_compare_exchange_n(target, &current, value, 1, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {
+    }
+}
+
+// Initialization of the runtime, defined with the rows : the merges of the features call it
+static void specprof_init(void);
@@ -0,0 +1,269 @@
+// --------------------------------------------------------------
+// -- PERFORMANCE COUNTERS
+// -- With SPECPROF_COUNTERS, each thread opens a group of counters
+// -- with perf_event_open, and the counters are read before and after
+// -- each timed call. The hardware counters refused by the kernel (no
+// -- PMU in a virtual machine, perf_event_paranoid, seccomp filter of
+// -- a container) are left out of the group : the software counters
+// -- remain. Each read is a system call : sampling keeps the cost low.
+// --------------------------------------------------------------
+// Values of the counters of a thread : the enabled and running times of the group and the values
+// of the nb_values counters opened by the thread (nb_values is 0 if they were not read)
+struct specprof_counter_values {
+    uint64_t nb_values;
+    uint64_t time_enabled;
+    uint64_t time_running;
+    uint64_t values[SPECPROF_NB_COUNTERS];
+};
+
+// Counter statistics of a function in a row
+static inline struct specprof_counter_stats *specprof_counter_stats(struct specprof_stats *row, unsigned func)
+{
+    return (struct specprof_counter_stats *) ((char *) row + SPECPROF_COUNTERS_OFFSET) + func;
+}
+
+#if SPECPROF_COUNTERS
+static const uint32_t specprof_counter_types[SPECPROF_NB_COUNTERS] = {
+    PERF_TYPE_HARDWARE, PERF_TYPE_HARDWARE, PERF_TYPE_HARDWARE, PERF_TYPE_SOFTWARE, PERF_TYPE_SOFTWARE,
+    PERF_TYPE_SOFTWARE
+};
+static const uint64_t specprof_counter_configs[SPECPROF_NB_COUNTERS] = {
+    PERF_COUNT_HW_CPU_CYCLES, PERF_COUNT_HW_INSTRUCTIONS, PERF_COUNT_HW_CACHE_MISSES, PERF_COUNT_SW_TASK_CLOCK,
+    PERF_COUNT_SW_PAGE_FAULTS, PERF_COUNT_SW_CONTEXT_SWITCHES
+};
+// Closes the counters of a thread when it ends
+static pthread_key_t specprof_counters_key;
+// Counters of the current thread : file descriptor of each counter (-1 if not opened), the first
+// opened one leading the group
+static SPECPROF_TLS int specprof_tls_counter_fds[SPECPROF_NB_COUNTERS];
+static SPECPROF_TLS int specprof_tls_counters_fd = -1;
+// Smallest delta of each counter between two reads, the cost of the reads themselves (the task
+// clock and the kernel counts include the system calls), subtracted from the deltas of the calls
+static uint64_t specprof_counters_baseline[SPECPROF_NB_COUNTERS];
+static int specprof_counters_calibrated = 0;
+
+static int specprof_open_counter(unsigned counter, int group_fd)
+{
+    struct perf_event_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = specprof_counter_types[counter];
+    attr.config = specprof_counter_configs[counter];
+    attr.read_format = PERF_FORMAT_GROUP | PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING;
+    attr.exclude_hv = 1;
+    int fd = (int) syscall(SYS_perf_event_open, &attr, 0, -1, group_fd, PERF_FLAG_FD_CLOEXEC);
+    if (fd < 0 && (errno == EACCES || errno == EPERM)) {
+        // perf_event_paranoid may only allow counting in user space
+        attr.exclude_kernel = 1;
+        fd = (int) syscall(SYS_perf_event_open, &attr, 0, -1, group_fd, PERF_FLAG_FD_CLOEXEC);
+    }
+    return fd;
+}
+
+// Close the counters of the current thread
+static void specprof_close_counters(void *unused)
+{
+    unsigned counter;
+    (void) unused;
+    for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+        if (specprof_tls_counter_fds[counter] >= 0) {
+            close(specprof_tls_counter_fds[counter]);
+        }
+        specprof_tls_counter_fds[counter] = -1;
+    }
+    specprof_tls_counters_fd = -1;
+}
+
+// Read of the counters of the current thread. Returns 0 on success.
+static inline int specprof_counters_read(struct specprof_counter_values *values)
+{
+    uint64_t buffer[3 + SPECPROF_NB_COUNTERS];
+    ssize_t size = read(specprof_tls_counters_fd, buffer, sizeof(buffer));
+    if (size < (ssize_t) (3 * sizeof(uint64_t)) || size < (ssize_t) ((3 + buffer[0]) * sizeof(uint64_t))) {
+        values->nb_values = 0;
+        return -1;
+    }
+    memcpy(values, buffer, (size_t) size);
+    return 0;
+}
+
+// Calibration of the baseline with the counters of the current thread, once per process
+static void specprof_calibrate_counters(void)
+{
+    struct specprof_counter_values before, after;
+    uint64_t baseline[SPECPROF_NB_COUNTERS];
+    unsigned trial, counter, value;
+    memset(baseline, 0xff, sizeof(baseline));
+    for (trial = 0; trial < 64; ++trial) {
+        // Same reads as around a timed call
+        if (specprof_counters_read(&before) != 0) {
+            continue;
+        }
+        specprof_now();
+        specprof_now();
+        if (specprof_counters_read(&after) != 0 || after.nb_values != before.nb_values) {
+            continue;
+        }
+        for (counter = 0, value = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+            if (specprof_tls_counter_fds[counter] >= 0) {
+                uint64_t delta = after.values[value] - before.values[value];
+                baseline[counter] = delta < baseline[counter] ? delta : baseline[counter];
+                ++value;
+            }
+        }
+    }
+    for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+        specprof_counters_baseline[counter] = baseline[counter] == UINT64_MAX ? 0 : baseline[counter];
+    }
+    __atomic_store_n(&specprof_counters_calibrated, 1, __ATOMIC_RELEASE);
+}
+
+// Slow path : group of the counters of a new thread
+static void specprof_open_counters(void)
+{
+    unsigned counter;
+    uint32_t opened = 0;
+    specprof_tls_counters_fd = -1;
+    for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+        specprof_tls_counter_fds[counter] = specprof_open_counter(counter, specprof_tls_counters_fd);
+        if (specprof_tls_counter_fds[counter] >= 0) {
+            opened |= 1U << counter;
+            if (specprof_tls_counters_fd < 0) {
+                specprof_tls_counters_fd = specprof_tls_counter_fds[counter];
+            }
+        }
+    }
+    if (opened == 0) {
+        return;
+    }
+    if ((__atomic_fetch_or(&specprof_counters_available, opened, __ATOMIC_RELAXED) & opened) != opened &&
+        specprof_stats_header != NULL) {
+        __atomic_fetch_or(&specprof_stats_header->counters_available, opened, __ATOMIC_RELAXED);
+    }
+    pthread_setspecific(specprof_counters_key, &specprof_tls_counters_fd);
+    if (!__atomic_load_n(&specprof_counters_calibrated, __ATOMIC_ACQUIRE)) {
+        specprof_calibrate_counters();
+    }
+}
+
+// Hot path : start of a call timed from the given value of the timer (0 if the call isn't timed).
+// The counters are read first : the returned value of the timer, read again, doesn't include
+// their read.
+static inline uint64_t specprof_counters_start(uint64_t start, struct specprof_counter_values *before)
+{
+    before->nb_values = 0;
+#if SPECPROF_CALL_GRAPH
+    // A call timed only because its caller is timed isn't measured
+    if (!specprof_graph_sampled()) {
+        return start;
+    }
+#endif
+    if (start == 0 || specprof_tls_counters_fd < 0 || specprof_counters_read(before) != 0) {
+        return start;
+    }
+    return specprof_now();
+}
+
+// Hot path : accumulation of the deltas of the counters of a call started by specprof_counters_start
+static inline void specprof_counters_stop(struct specprof_stats *stats, const struct specprof_counter_values *before)
+{
+    struct specprof_counter_values after;
+    unsigned counter, value = 0;
+    if (before->nb_values == 0 || specprof_counters_read(&after) != 0 || after.nb_values != before->nb_values) {
+        return;
+    }
+    struct specprof_counter_stats *counters = specprof_counter_stats(specprof_tls_row,
+                                                                     (unsigned) (stats - specprof_tls_row));
+    int shared = specprof_tls_shared;
+    if (after.time_running - before->time_running != after.time_enabled - before->time_enabled) {
+        if (shared) {
+            __atomic_fetch_add(&counters->unmeasured_calls, 1, __ATOMIC_RELAXED);
+        } else {
+            counters->unmeasured_calls += 1;
+        }
+        return;
+    }
+    if (shared) {
+        __atomic_fetch_add(&counters->measured_calls, 1, __ATOMIC_RELAXED);
+    } else {
+        counters->measured_calls += 1;
+    }
+    for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+        if (specprof_tls_counter_fds[counter] < 0) {
+            continue;
+        }
+        uint64_t delta = after.values[value] - before->values[value];
+        delta = delta > specprof_counters_baseline[counter] ? delta - specprof_counters_baseline[counter] : 0;
+        ++value;
+        if (shared) {
+            __atomic_fetch_add(&counters->values[counter], delta, __ATOMIC_RELAXED);
+        } else {
+            counters->values[counter] += delta;
+        }
+    }
+}
+
+// Merge of the counter statistics of a function over the rows of all the threads
+static void specprof_merge_counters(unsigned func, struct specprof_counter_stats *merged)
+{
+    unsigned row, counter;
+    memset(merged, 0, sizeof(struct specprof_counter_stats));
+    pthread_once(&specprof_init_once, specprof_init);
+    unsigned nb_rows = __atomic_load_n(&specprof_nb_rows, __ATOMIC_ACQUIRE);
+    for (row = 0; row <= nb_rows; ++row) {
+        // The shared row is always merged
+        struct specprof_counter_stats *counters =
+            specprof_counter_stats(specprof_row(row < nb_rows ? row : specprof_max_threads - 1), func);
+        merged->measured_calls += __atomic_load_n(&counters->measured_calls, __ATOMIC_RELAXED);
+        merged->unmeasured_calls += __atomic_load_n(&counters->unmeasured_calls, __ATOMIC_RELAXED);
+        for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+            merged->values[counter] += __atomic_load_n(&counters->values[counter], __ATOMIC_RELAXED);
+        }
+    }
+}
+
+// Report of the counters of a function : mean value of each counter per call, instructions per
+// cycle and cache misses per thousand instructions
+static void specprof_report_counters(FILE *stream, unsigned func)
+{
+    struct specprof_counter_stats merged;
+    static const char *names[SPECPROF_NB_COUNTERS] = {"cycles", "instructions", "cache misses", "task clock ns",
+                                                      "page faults", "context switches"};
+    uint32_t available = __atomic_load_n(&specprof_counters_available, __ATOMIC_RELAXED);
+    unsigned counter;
+    specprof_merge_counters(func, &merged);
+    if (available == 0) {
+        fprintf(stream, "Counters : unavailable (perf_event_open refused, see /proc/sys/kernel/perf_event_paranoid)\n");
+        return;
+    }
+    fprintf(stream, "Counters per call (%llu calls measured", (unsigned long long) merged.measured_calls);
+    if (merged.unmeasured_calls > 0) {
+        fprintf(stream, ", %llu calls dropped : counters multiplexed", (unsigned long long) merged.unmeasured_calls);
+    }
+    if ((available & ((1U << SPECPROF_NB_HARDWARE_COUNTERS) - 1)) == 0) {
+        fprintf(stream, ", software counters only");
+    }
+    fprintf(stream, ") :");
+    if (merged.measured_calls == 0) {
+        fprintf(stream, " -\n");
+        return;
+    }
+    const char *separator = " ";
+    for (counter = 0; counter < SPECPROF_NB_COUNTERS; ++counter) {
+        if (available & (1U << counter)) {
+            fprintf(stream, "%s%s = %.2f", separator, names[counter],
+                    (double) merged.values[counter] / (double) merged.measured_calls);
+            separator = ", ";
+        }
+    }
+    fprintf(stream, "\n");
+    if ((available & 3U) == 3U && merged.values[0] > 0) {
+        fprintf(stream, "IPC = %.2f instructions per cycle", (double) merged.values[1] / (double) merged.values[0]);
+        if ((available & 4U) && merged.values[1] > 0) {
+            fprintf(stream, ", %.2f cache misses per 1000 instructions",
+                    1000. * (double) merged.values[2] / (double) merged.values[1]);
+        }
+        fprintf(stream, "\n");
+    }
+}
+#endif
@@ -0,0 +1,96 @@
+// --------------------------------------------------------------
+// -- FORK
+// -- A forked child inherits the statistics of its parent and only
+// -- its forking thread : the locks are held across the fork so that
+// -- the child gets them in a consistent state, then the child starts
+// -- again from empty statistics, trace, call sites, call graph and
+// -- snapshots, written in its own files.
+// --------------------------------------------------------------
+static void specprof_atfork_prepare(void)
+{
+    pthread_mutex_lock(&specprof_snapshot_mutex);
+    pthread_mutex_lock(&specprof_rows_mutex);
+    pthread_mutex_lock(&specprof_trace_mutex);
+}
+
+static void specprof_atfork_parent(void)
+{
+    pthread_mutex_unlock(&specprof_trace_mutex);
+    pthread_mutex_unlock(&specprof_rows_mutex);
+    pthread_mutex_unlock(&specprof_snapshot_mutex);
+}
+
+static void specprof_atfork_child(void)
+{
+    unsigned row;
+    pthread_mutex_init(&specprof_trace_mutex, NULL);
+    pthread_mutex_init(&specprof_rows_mutex, NULL);
+    pthread_mutex_init(&specprof_snapshot_mutex, NULL);
+    specprof_parent_pid = (uint32_t) getppid();
+    // The rows of the parent's threads are dropped : the forking thread takes a new one on its
+    // next call
+    size_t table_size = specprof_row_size * specprof_max_threads;
+    if (specprof_stats_header != NULL) {
+        munmap(specprof_stats_header, (size_t) (specprof_table - (char *) specprof_stats_header) + table_size);
+        specprof_stats_header = NULL;
+    } else {
+        munmap(specprof_table, table_size);
+    }
+    specprof_create_table();
+    specprof_nb_rows = 0;
+    specprof_nb_free_rows = 0;
+    specprof_tls_row = NULL;
+    specprof_tls_shared = 0;
+    pthread_setspecific(specprof_thread_key, NULL);
+#if SPECPROF_COUNTERS
+    // The counters of the forking thread count the parent : the thread opens its own ones with its new row
+    specprof_close_counters(NULL);
+    pthread_setspecific(specprof_counters_key, NULL);
+#endif
+    if (specprof_trace_fd >= 0) {
+        close(specprof_trace_fd);
+        specprof_trace_fd = -1;
+        for (row = 0; row < specprof_max_threads; ++row) {
+            if (specprof_trace_buffers[row] != NULL) {
+                free(specprof_trace_buffers[row]->events);
+                free(specprof_trace_buffers[row]);
+            }
+        }
+        free(specprof_trace_buffers);
+        specprof_trace_buffers = NULL;
+        specprof_untraced_threads = 0;
+        specprof_tls_trace = NULL;
+        specprof_open_trace();
+    }
+#if SPECPROF_CALL_SITES
+    for (row = 0; row < specprof_max_threads; ++row) {
+        free(specprof_site_tables[row]);
+    }
+    free(specprof_site_tables);
+    specprof_unattributed_calls = 0;
+    specprof_tls_sites = NULL;
+    specprof_init_sites();
+#endif
+#if SPECPROF_CALL_GRAPH
+    // The calls in progress in the forking thread stay on its stack and end in the child
+    for (row = 0; row < specprof_max_threads; ++row) {
+        free(specprof_edge_tables[row]);
+    }
+    free(specprof_edge_tables);
+    specprof_unattributed_edges = 0;
+    specprof_deep_calls = 0;
+    specprof_tls_edges = NULL;
+    specprof_init_graph();
+#endif
+    // The snapshot thread of the parent doesn't exist in the child. The handler of SIGUSR1 is
+    // inherited : it wakes up the new thread.
+    if (specprof_snapshot_dir != NULL && !specprof_snapshots_closed) {
+        memset(specprof_snapshot_previous, 0, SPECPROF_MERGED_ROW_SIZE);
+        memset(specprof_snapshot_current, 0, SPECPROF_MERGED_ROW_SIZE);
+        specprof_nb_snapshots = 0;
+        specprof_snapshot_end_ns = specprof_clock_ns(CLOCK_MONOTONIC) - specprof_start_ns;
+        sem_destroy(&specprof_snapshot_sem);
+        sem_init(&specprof_snapshot_sem, 0, 0);
+        specprof_start_snapshot_thread();
+    }
+}
@@ -0,0 +1,84 @@
+// --------------------------------------------------------------
+// -- HISTOGRAMS
+// -- Log-linear latency histograms, and the percentiles and the
+// -- confidence interval of the total time estimated from them.
+// --------------------------------------------------------------
+// Index of the histogram bucket of a value
+static inline unsigned specprof_hist_index(uint64_t ticks)
+{
+    if (ticks < SPECPROF_HIST_SUB_COUNT) {
+        return (unsigned) ticks;
+    }
+    unsigned shift = 63 - __builtin_clzll(ticks) - SPECPROF_HIST_SUB_BITS;
+    return (shift + 1) * SPECPROF_HIST_SUB_COUNT + (unsigned) ((ticks >> shift) - SPECPROF_HIST_SUB_COUNT);
+}
+
+// Lowest value of a histogram bucket
+static inline uint64_t specprof_hist_low(unsigned index)
+{
+    if (index < SPECPROF_HIST_SUB_COUNT) {
+        return index;
+    }
+    unsigned shift = index / SPECPROF_HIST_SUB_COUNT - 1;
+    return (uint64_t) (index % SPECPROF_HIST_SUB_COUNT + SPECPROF_HIST_SUB_COUNT) << shift;
+}
+
+// Highest value of a histogram bucket
+static inline uint64_t specprof_hist_high(unsigned index)
+{
+    return index + 1 < SPECPROF_HIST_BUCKETS ? specprof_hist_low(index + 1) - 1 : UINT64_MAX;
+}
+
+// Value, in ticks, under which the given fraction of the calls lie. The value is the middle
+// of the histogram bucket, bounded by the shortest and the longest calls.
+static double specprof_percentile(const struct specprof_stats *stats, double fraction)
+{
+    uint64_t cumulated = 0;
+    double rank = fraction * (double) stats->sampled_count;
+    unsigned bucket;
+    for (bucket = 0; bucket < SPECPROF_HIST_BUCKETS; ++bucket) {
+        cumulated += stats->hist[bucket];
+        if (cumulated > 0 && (double) cumulated >= rank) {
+            break;
+        }
+    }
+    if (bucket == SPECPROF_HIST_BUCKETS) {
+        return (double) stats->max_ticks;
+    }
+    double value = 0.5 * ((double) specprof_hist_low(bucket) + (double) specprof_hist_high(bucket));
+    if (value < (double) stats->min_ticks) {
+        value = (double) stats->min_ticks;
+    }
+    if (value > (double) stats->max_ticks) {
+        value = (double) stats->max_ticks;
+    }
+    return value;
+}
+
+// Total time of the calls, in ticks, extrapolated from the timed calls, and half width of its
+// 95% confidence interval. The spread of the durations is estimated from the histogram.
+static void specprof_total_estimate(const struct specprof_stats *stats, double *total, double *half_width)
+{
+    double nb_timed = (double) stats->sampled_count;
+    double nb_calls = (double) stats->call_count;
+    double mean = (double) stats->total_ticks / nb_timed;
+    double sum_sq = 0.;
+    unsigned bucket;
+    *total = mean * nb_calls;
+    *half_width = 0.;
+    if (stats->sampled_count < 2 || stats->sampled_count == stats->call_count) {
+        return;
+    }
+    for (bucket = 0; bucket < SPECPROF_HIST_BUCKETS; ++bucket) {
+        if (stats->hist[bucket] == 0) {
+            continue;
+        }
+        double value = 0.5 * ((double) specprof_hist_low(bucket) + (double) specprof_hist_high(bucket));
+        value = value < (double) stats->min_ticks ? (double) stats->min_ticks : value;
+        value = value > (double) stats->max_ticks ? (double) stats->max_ticks : value;
+        sum_sq += (double) stats->hist[bucket] * (value - mean) * (value - mean);
+    }
+    double std_dev = sqrt(sum_sq / (nb_timed - 1.));
+    // Finite population correction : the interval vanishes when every call is timed
+    *half_width = 1.96 * nb_calls * std_dev / sqrt(nb_timed) * sqrt(1. - nb_timed / nb_calls);
+}
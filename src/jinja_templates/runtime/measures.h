@@ -0,0 +1,105 @@
+// --------------------------------------------------------------
+// -- MEASURES
+// -- Hot path of a wrapped call : start and end of the call and
+// -- accumulation of its measures.
+// --------------------------------------------------------------
+// Hot path : accumulation of one measure
+static inline void specprof_record(struct specprof_stats *stats, uint64_t ticks)
+{
+    unsigned bucket = specprof_hist_index(ticks);
+    if (SPECPROF_UNLIKELY(specprof_tls_shared)) {
+        __atomic_fetch_add(&stats->call_count, 1, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&stats->sampled_count, 1, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&stats->total_ticks, ticks, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&stats->hist[bucket], 1, __ATOMIC_RELAXED);
+        specprof_atomic_min(&stats->min_ticks, ticks);
+        specprof_atomic_max(&stats->max_ticks, ticks);
+    } else {
+        stats->call_count += 1;
+        stats->sampled_count += 1;
+        stats->total_ticks += ticks;
+        stats->hist[bucket] += 1;
+        if (stats->min_ticks == 0 || ticks < stats->min_ticks) {
+            stats->min_ticks = ticks;
+        }
+        if (ticks > stats->max_ticks) {
+            stats->max_ticks = ticks;
+        }
+    }
+}
+
+// Hot path : start of a call. Returns the value of the timer or 0 if the call isn't timed.
+static inline uint64_t specprof_start(int func_index)
+{
+#if SPECPROF_CALL_GRAPH
+    if (!specprof_graph_enter(func_index)) {
+        return 0;
+    }
+#else
+    if (!specprof_sampled(func_index)) {
+        return 0;
+    }
+#endif
+    return specprof_now();
+}
+
+#if SPECPROF_SAMPLE_PERIOD > 1
+// Hot path : accumulation of a call which isn't sampled : only counted
+static inline void specprof_record_count(struct specprof_stats *stats, void *caller, int size_slot, int64_t size)
+{
+    if (SPECPROF_UNLIKELY(specprof_tls_shared)) {
+        __atomic_fetch_add(&stats->call_count, 1, __ATOMIC_RELAXED);
+    } else {
+        stats->call_count += 1;
+    }
+#if SPECPROF_CALL_SITES
+    specprof_site_record((unsigned) (stats - specprof_tls_row), caller, 0, 0);
+#else
+    (void) caller;
+#endif
+    if (size_slot >= 0) {
+        specprof_size_record(size_slot, size, 0, 0);
+    }
+}
+#endif
+
+// Hot path : end of a call started by specprof_start. caller is the return address of the
+// wrapper, used only if SPECPROF_CALL_SITES. size_slot is the slot of the size statistics of
+// the function and size the value of its size parameter, or -1 and 0 if it has none.
+static inline void specprof_stop(struct specprof_stats *stats, uint64_t start, void *caller, int size_slot,
+                                 int64_t size)
+{
+#if SPECPROF_SAMPLE_PERIOD > 1
+    if (start == 0) {
+#if SPECPROF_CALL_GRAPH
+        specprof_graph_leave((unsigned) (stats - specprof_tls_row), 0);
+#endif
+        specprof_record_count(stats, caller, size_slot, size);
+        return;
+    }
+#endif
+    uint64_t end = specprof_now();
+#if SPECPROF_CALL_GRAPH
+#if SPECPROF_SAMPLE_PERIOD > 1
+    // A call timed only because its caller is timed is left out of the extrapolated measures
+    if (!specprof_graph_leave((unsigned) (stats - specprof_tls_row), end - start)) {
+        specprof_record_count(stats, caller, size_slot, size);
+        return;
+    }
+#else
+    specprof_graph_leave((unsigned) (stats - specprof_tls_row), end - start);
+#endif
+#endif
+    specprof_record(stats, end - start);
+#if SPECPROF_CALL_SITES
+    specprof_site_record((unsigned) (stats - specprof_tls_row), caller, end - start, 1);
+#else
+    (void) caller;
+#endif
+    if (size_slot >= 0) {
+        specprof_size_record(size_slot, size, end - start, 1);
+    }
+    if (SPECPROF_UNLIKELY(specprof_tls_trace != NULL)) {
+        specprof_trace_record((unsigned) (stats - specprof_tls_row), start, end);
+    }
+}
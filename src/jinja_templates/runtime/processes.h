@@ -0,0 +1,59 @@
+// --------------------------------------------------------------
+// -- PROCESSES
+// -- Every process loading the wrapper, forked children and ranks of
+// -- an MPI job included, has its own statistics. In the paths of its
+// -- files, %p is replaced by its pid and %r by its rank (its pid if
+// -- the rank is unknown), so that the processes don't overwrite the
+// -- files of each other.
+// --------------------------------------------------------------
+// Rank of the process in its MPI job, read in the environment of the launcher (-1 if unknown)
+static int32_t specprof_rank = -1;
+// Pid of the profiled process this one was forked from (0 if none)
+static uint32_t specprof_parent_pid = 0;
+// Pid of the process which loaded the wrapper
+static uint32_t specprof_loader_pid = 0;
+// Performance counters opened by at least one thread (bit i for the counter i)
+static uint32_t specprof_counters_available = 0;
+
+static int32_t specprof_find_rank(void)
+{
+    static const char *variables[] = {"OMPI_COMM_WORLD_RANK", "PMIX_RANK", "PMI_RANK", "MV2_COMM_WORLD_RANK",
+                                      "SLURM_PROCID"};
+    unsigned index;
+    for (index = 0; index < sizeof(variables) / sizeof(variables[0]); ++index) {
+        const char *value = getenv(variables[index]);
+        if (value != NULL && value[0] >= '0' && value[0] <= '9') {
+            return (int32_t) atoi(value);
+        }
+    }
+    return -1;
+}
+
+// Path of a file of the process, named by an environment variable, with %p and %r replaced.
+// A forked child appends its pid to a path without %p, which is the path of its parent's file.
+// Returns NULL if the variable is not set.
+static const char *specprof_process_path(const char *variable, char *path, size_t size)
+{
+    const char *pattern = getenv(variable);
+    size_t length = 0;
+    int has_pid = 0;
+    if (pattern == NULL || pattern[0] == '\0') {
+        return NULL;
+    }
+    for (; *pattern != '\0' && length + 1 < size; ++pattern) {
+        if (pattern[0] == '%' && (pattern[1] == 'p' || pattern[1] == 'r')) {
+            int value = pattern[1] == 'p' || specprof_rank < 0 ? (int) getpid() : (int) specprof_rank;
+            has_pid |= pattern[1] == 'p';
+            length += (size_t) snprintf(path + length, size - length, "%d", value);
+            ++pattern;
+        } else {
+            path[length++] = *pattern;
+        }
+        length = length < size ? length : size - 1;
+    }
+    path[length] = '\0';
+    if (specprof_parent_pid != 0 && !has_pid) {
+        snprintf(path + length, size - length, ".%d", (int) getpid());
+    }
+    return path;
+}
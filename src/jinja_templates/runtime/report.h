@@ -0,0 +1,129 @@
+// --------------------------------------------------------------
+// -- REPORT
+// -- Report of the merged statistics printed at the end of the
+// -- program.
+// --------------------------------------------------------------
+// Write the whole report at once on the standard output : the reports of the processes sharing
+// it (forked children, ranks of a job) are not interleaved
+static void specprof_write_report(const char *report, size_t size)
+{
+    while (size > 0) {
+        ssize_t written = write(STDOUT_FILENO, report, size);
+        if (written < 0 && errno == EINTR) {
+            continue;
+        }
+        if (written <= 0) {
+            return;
+        }
+        report += written;
+        size -= (size_t) written;
+    }
+}
+
+// Report of the merged statistics (none if the measures were never enabled)
+static void specprof_report(void)
+{
+    if (!__atomic_load_n(&specprof_ever_enabled, __ATOMIC_RELAXED)) {
+        return;
+    }
+    struct specprof_stats *merged = (struct specprof_stats *) calloc(1, sizeof(struct specprof_stats));
+    unsigned func;
+    char *report = NULL;
+    size_t report_size = 0;
+    double ns_per_tick = specprof_ns_per_tick();
+#if SPECPROF_CALL_SITES
+    unsigned nb_sites[SPECPROF_NB_FUNCTIONS] = {0};
+    pthread_once(&specprof_init_once, specprof_init);
+    specprof_write_sites(ns_per_tick, nb_sites);
+#endif
+    FILE *stream = open_memstream(&report, &report_size);
+    if (stream == NULL) {
+        stream = stdout;
+    }
+    fprintf(stream, "***********************************************\n");
+    fprintf(stream, "SpecProf results (timer : %s, pid : %d", specprof_timer_name(), (int) getpid());
+    if (specprof_rank >= 0) {
+        fprintf(stream, ", rank : %d", (int) specprof_rank);
+    }
+    if (specprof_parent_pid != 0) {
+        fprintf(stream, ", forked from : %u", specprof_parent_pid);
+    }
+    fprintf(stream, ")\n");
+    if (SPECPROF_OVERHEAD_NS > 0.) {
+        fprintf(stream, "Overhead subtracted = %.1f nanoseconds per call\n", SPECPROF_OVERHEAD_NS);
+    }
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        specprof_merge(func, merged);
+        double total_ns = 0., half_width_ns = 0.;
+        if (merged->sampled_count > 0) {
+            specprof_total_estimate(merged, &total_ns, &half_width_ns);
+            total_ns *= ns_per_tick;
+            half_width_ns *= ns_per_tick;
+            total_ns = specprof_corrected_ns(total_ns / (double) merged->call_count) * (double) merged->call_count;
+        }
+        fprintf(stream, "***********************************************\n");
+        fprintf(stream, "RESULTS FOR FUNCTION : %s\n", specprof_func_names[func]);
+        fprintf(stream, "Call count = %llu\n", (unsigned long long) merged->call_count);
+#if SPECPROF_CALL_SITES
+        fprintf(stream, "Call sites = %u\n", nb_sites[func]);
+#endif
+        if (merged->sampled_count != merged->call_count) {
+            fprintf(stream, "Timed calls = %llu (one in %u)\n", (unsigned long long) merged->sampled_count,
+                    SPECPROF_SAMPLE_PERIOD);
+        }
+        if (merged->sampled_count == 0 && merged->call_count > 0) {
+            fprintf(stream, "Total time consumed = unknown (no timed call)\n");
+        } else if (merged->sampled_count != merged->call_count) {
+            fprintf(stream, "Total time consumed = %.6f +/- %.6f seconds (95%% confidence)\n",
+                    total_ns * 1e-9, half_width_ns * 1e-9);
+        } else {
+            fprintf(stream, "Total time consumed = %.6f seconds\n", total_ns * 1e-9);
+        }
+        if (merged->sampled_count > 0) {
+            fprintf(stream, "Mean time per call = %.1f nanoseconds\n",
+                    total_ns / (double) merged->call_count);
+            fprintf(stream, "Latency (ns) : min = %.0f, p50 = %.0f, p90 = %.0f, p99 = %.0f, p99.9 = %.0f, max = %.0f\n",
+                    specprof_corrected_ns((double) merged->min_ticks * ns_per_tick),
+                    specprof_corrected_ns(specprof_percentile(merged, 0.5) * ns_per_tick),
+                    specprof_corrected_ns(specprof_percentile(merged, 0.9) * ns_per_tick),
+                    specprof_corrected_ns(specprof_percentile(merged, 0.99) * ns_per_tick),
+                    specprof_corrected_ns(specprof_percentile(merged, 0.999) * ns_per_tick),
+                    specprof_corrected_ns((double) merged->max_ticks * ns_per_tick));
+        }
+        if (specprof_size_slots[func] >= 0 && merged->call_count > 0) {
+            specprof_report_sizes(stream, func, ns_per_tick);
+        }
+#if SPECPROF_COUNTERS
+        if (merged->sampled_count > 0) {
+            specprof_report_counters(stream, func);
+        }
+#endif
+#if SPECPROF_ALLOCATIONS
+        if (merged->call_count > 0) {
+            specprof_report_allocations(stream, func, merged->call_count);
+        }
+#endif
+#if SPECPROF_CALL_GRAPH
+        if (merged->call_count > 0) {
+            specprof_report_graph(stream, func, merged, ns_per_tick);
+        }
+#endif
+    }
+#if SPECPROF_CALL_GRAPH
+    specprof_report_edges(stream, ns_per_tick);
+#endif
+    fprintf(stream, "***********************************************\n");
+    if (stream != stdout && fclose(stream) == 0) {
+        fflush(stdout);
+        specprof_write_report(report, report_size);
+    }
+    fflush(stdout);
+    free(report);
+    free(merged);
+    if (specprof_stats_header != NULL) {
+        specprof_stats_header->ns_per_tick = ns_per_tick;
+    }
+    specprof_write_results(ns_per_tick);
+    specprof_close_snapshots();
+    specprof_close_trace();
+}
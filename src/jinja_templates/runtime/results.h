@@ -0,0 +1,112 @@
+// --------------------------------------------------------------
+// -- RESULTS
+// -- Merge of the rows of all the threads and results file written
+// -- at the end of the program.
+// --------------------------------------------------------------
+// Merge of the statistics of a function over the rows of all the threads
+static void specprof_merge(unsigned func, struct specprof_stats *merged)
+{
+    unsigned row, bucket;
+    memset(merged, 0, sizeof(struct specprof_stats));
+    pthread_once(&specprof_init_once, specprof_init);
+    unsigned nb_rows = __atomic_load_n(&specprof_nb_rows, __ATOMIC_ACQUIRE);
+    for (row = 0; row <= nb_rows; ++row) {
+        // The shared row is always merged
+        const struct specprof_stats *stats = specprof_row(row < nb_rows ? row : specprof_max_threads - 1) + func;
+        uint64_t call_count = __atomic_load_n(&stats->call_count, __ATOMIC_RELAXED);
+        if (call_count == 0) {
+            continue;
+        }
+        uint64_t min_ticks = __atomic_load_n(&stats->min_ticks, __ATOMIC_RELAXED);
+        uint64_t max_ticks = __atomic_load_n(&stats->max_ticks, __ATOMIC_RELAXED);
+        // A row may hold calls of which none was timed : its minimum is unset
+        if (min_ticks != 0 && (merged->min_ticks == 0 || min_ticks < merged->min_ticks)) {
+            merged->min_ticks = min_ticks;
+        }
+        if (max_ticks > merged->max_ticks) {
+            merged->max_ticks = max_ticks;
+        }
+        merged->call_count += call_count;
+        merged->sampled_count += __atomic_load_n(&stats->sampled_count, __ATOMIC_RELAXED);
+        merged->total_ticks += __atomic_load_n(&stats->total_ticks, __ATOMIC_RELAXED);
+        for (bucket = 0; bucket < SPECPROF_HIST_BUCKETS; ++bucket) {
+            merged->hist[bucket] += __atomic_load_n(&stats->hist[bucket], __ATOMIC_RELAXED);
+        }
+    }
+    // A minimum of 0 tick is not distinguishable from an unset one
+    if (merged->hist[0] > 0) {
+        merged->min_ticks = 0;
+    }
+}
+
+// Write the field names, the function names and the size parameter names following the header
+static void specprof_write_names(FILE *stream)
+{
+    unsigned func;
+    fwrite(SPECPROF_STATS_FIELDS, 1, sizeof(SPECPROF_STATS_FIELDS), stream);
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        fwrite(specprof_func_names[func], 1, strlen(specprof_func_names[func]) + 1, stream);
+    }
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        fwrite(specprof_size_params[func], 1, strlen(specprof_size_params[func]) + 1, stream);
+    }
+}
+
+// Merge of the statistics of all the functions over the rows of all the threads
+static void specprof_merge_row(char *merged)
+{
+    unsigned func;
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        specprof_merge(func, (struct specprof_stats *) merged + func);
+        if (specprof_size_slots[func] >= 0) {
+            specprof_merge_sizes(specprof_size_slots[func],
+                                 specprof_size_stats((struct specprof_stats *) merged, specprof_size_slots[func]));
+        }
+#if SPECPROF_COUNTERS
+        specprof_merge_counters(func, specprof_counter_stats((struct specprof_stats *) merged, func));
+#endif
+#if SPECPROF_ALLOCATIONS
+        specprof_merge_allocations(func, specprof_alloc_stats((struct specprof_stats *) merged, func));
+#endif
+#if SPECPROF_CALL_GRAPH
+        specprof_merge_graph(func, specprof_graph_stats((struct specprof_stats *) merged, func));
+#endif
+    }
+}
+
+// Write a merged row in a statistics file. Returns 0 on success.
+static int specprof_write_merged(const char *path, const struct specprof_file_header *header, const char *merged)
+{
+    FILE *stream = fopen(path, "wb");
+    if (stream == NULL) {
+        return -1;
+    }
+    fwrite(header, sizeof(*header), 1, stream);
+    specprof_write_names(stream);
+    while ((uint64_t) ftell(stream) < header->rows_offset) {
+        fputc(0, stream);
+    }
+    fwrite(merged, SPECPROF_MERGED_ROW_SIZE, 1, stream);
+    int failed = fflush(stream) != 0 || ferror(stream);
+    return fclose(stream) != 0 || failed ? -1 : 0;
+}
+
+// Write the merged statistics (a single row) in the file named by SPECPROF_RESULTS_FILE
+static void specprof_write_results(double ns_per_tick)
+{
+    char path_buffer[4096];
+    const char *path = specprof_process_path("SPECPROF_RESULTS_FILE", path_buffer, sizeof(path_buffer));
+    struct specprof_file_header header;
+    if (path == NULL) {
+        return;
+    }
+    char *merged = (char *) calloc(1, SPECPROF_MERGED_ROW_SIZE);
+    specprof_file_header(&header, 1, SPECPROF_MERGED_ROW_SIZE);
+    header.ns_per_tick = ns_per_tick;
+    header.period_end_ns = specprof_clock_ns(CLOCK_MONOTONIC) - specprof_start_ns;
+    specprof_merge_row(merged);
+    if (specprof_write_merged(path, &header, merged) != 0) {
+        perror("SpecProf : unable to write the results file");
+    }
+    free(merged);
+}
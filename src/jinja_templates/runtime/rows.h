@@ -0,0 +1,129 @@
+// --------------------------------------------------------------
+// -- ROWS
+// -- Initialization of the runtime and rows of the statistics table
+// -- taken by the threads at their first measure.
+// --------------------------------------------------------------
+static void specprof_release_row(void *row);
+static void specprof_start_snapshots(void);
+static void specprof_atfork_prepare(void);
+static void specprof_atfork_parent(void);
+static void specprof_atfork_child(void);
+
+// Statistics table : a shared mapping of the live statistics file or an anonymous mapping
+static void specprof_create_table(void)
+{
+    size_t table_size = specprof_row_size * specprof_max_threads;
+    specprof_table = specprof_map_stats_file(table_size);
+    if (specprof_table == NULL) {
+        void *table = mmap(NULL, table_size, PROT_READ | PROT_WRITE,
+                           MAP_PRIVATE | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+        if (table == MAP_FAILED) {
+            perror("SpecProf : unable to allocate the statistics table");
+            abort();
+        }
+        specprof_table = (char *) table;
+    }
+}
+
+static void specprof_init(void)
+{
+    const char *max_threads = getenv("SPECPROF_MAX_THREADS");
+    specprof_max_threads = max_threads ? (unsigned) atoi(max_threads) : 0;
+    if (specprof_max_threads < 2) {
+        specprof_max_threads = SPECPROF_DEFAULT_MAX_THREADS;
+    }
+    specprof_row_size = (SPECPROF_MERGED_ROW_SIZE + SPECPROF_CACHE_LINE - 1) / SPECPROF_CACHE_LINE
+                        * SPECPROF_CACHE_LINE;
+    specprof_rank = specprof_find_rank();
+    // A process forked before the first measure initializes its own statistics : its files are
+    // named as the ones of a child forked afterwards
+    if ((uint32_t) getpid() != specprof_loader_pid) {
+        specprof_parent_pid = specprof_loader_pid;
+    }
+    specprof_start_ns = specprof_clock_ns(CLOCK_MONOTONIC);
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+    specprof_start_ticks = __rdtsc();
+#endif
+    specprof_create_table();
+    specprof_free_rows = (unsigned *) calloc(specprof_max_threads, sizeof(unsigned));
+    specprof_open_trace();
+#if SPECPROF_CALL_SITES
+    specprof_init_sites();
+#endif
+#if SPECPROF_CALL_GRAPH
+    specprof_init_graph();
+#endif
+    pthread_key_create(&specprof_thread_key, specprof_release_row);
+#if SPECPROF_COUNTERS
+    pthread_key_create(&specprof_counters_key, specprof_close_counters);
+#endif
+    specprof_start_snapshots();
+    pthread_atfork(specprof_atfork_prepare, specprof_atfork_parent, specprof_atfork_child);
+}
+
+// Slow path : first measure of a thread
+static struct specprof_stats *specprof_register_thread(void)
+{
+    unsigned index;
+    pthread_once(&specprof_init_once, specprof_init);
+    pthread_mutex_lock(&specprof_rows_mutex);
+    if (specprof_nb_free_rows > 0) {
+        index = specprof_free_rows[--specprof_nb_free_rows];
+    } else if (specprof_nb_rows < specprof_max_threads - 1) {
+        index = specprof_nb_rows++;
+    } else {
+        // All the rows are taken : the last one is shared and updated atomically
+        index = specprof_max_threads - 1;
+        specprof_tls_shared = 1;
+    }
+    if (specprof_trace_fd >= 0) {
+        if (specprof_tls_shared) {
+            ++specprof_untraced_threads;
+        } else {
+            specprof_tls_trace = specprof_trace_buffer(index);
+        }
+    }
+#if SPECPROF_CALL_SITES
+    specprof_tls_sites = specprof_site_table(index);
+#endif
+#if SPECPROF_CALL_GRAPH
+    specprof_tls_edges = specprof_edge_table(index);
+#endif
+    pthread_mutex_unlock(&specprof_rows_mutex);
+#if SPECPROF_SAMPLE_PERIOD > 1 && SPECPROF_SAMPLING_RANDOM
+    // Distinct non null seed for each thread
+    specprof_tls_rng = ((uint64_t) (uintptr_t) &specprof_tls_rng ^ specprof_clock_ns(CLOCK_MONOTONIC))
+                       * 0x9E3779B97F4A7C15ULL | 1;
+#endif
+    specprof_tls_row = specprof_row(index);
+    if (!specprof_tls_shared) {
+        pthread_setspecific(specprof_thread_key, specprof_tls_row);
+    }
+#if SPECPROF_COUNTERS
+    specprof_open_counters();
+#endif
+    return specprof_tls_row;
+}
+
+// Called at thread exit : the row, and what it has accumulated, is handed to the next thread
+static void specprof_release_row(void *row)
+{
+    if (specprof_tls_trace != NULL) {
+        specprof_trace_flush(specprof_tls_trace);
+        specprof_tls_trace = NULL;
+    }
+    pthread_mutex_lock(&specprof_rows_mutex);
+    specprof_free_rows[specprof_nb_free_rows++] =
+        (unsigned) (((char *) row - specprof_table) / specprof_row_size);
+    pthread_mutex_unlock(&specprof_rows_mutex);
+}
+
+// Hot path : statistics of a function for the current thread
+static inline struct specprof_stats *specprof_thread_stats(int func_index)
+{
+    struct specprof_stats *row = specprof_tls_row;
+    if (SPECPROF_UNLIKELY(row == NULL)) {
+        row = specprof_register_thread();
+    }
+    return row + func_index;
+}
@@ -0,0 +1,39 @@
+// --------------------------------------------------------------
+// -- SAMPLING
+// -- Choice of the timed calls when only one call in
+// -- SPECPROF_SAMPLE_PERIOD is timed.
+// --------------------------------------------------------------
+#if SPECPROF_SAMPLE_PERIOD > 1
+#if SPECPROF_SAMPLING_RANDOM
+// State of the xorshift generator of the current thread
+static SPECPROF_TLS uint64_t specprof_tls_rng = 0;
+#else
+// Calls of each function by the current thread since its last timed call
+static SPECPROF_TLS unsigned specprof_tls_stride[SPECPROF_NB_FUNCTIONS];
+#endif
+#endif
+
+// Hot path : 1 if a call of the function is sampled
+static inline int specprof_sampled(int func_index)
+{
+#if SPECPROF_SAMPLE_PERIOD > 1
+#if SPECPROF_SAMPLING_RANDOM
+    uint64_t rng = specprof_tls_rng;
+    rng ^= rng << 13;
+    rng ^= rng >> 7;
+    rng ^= rng << 17;
+    specprof_tls_rng = rng;
+    // The high bits are the best ones of xorshift
+    if (((rng >> 32) * SPECPROF_SAMPLE_PERIOD) >> 32 != 0) {
+        return 0;
+    }
+#else
+    if (++specprof_tls_stride[func_index] < SPECPROF_SAMPLE_PERIOD) {
+        return 0;
+    }
+    specprof_tls_stride[func_index] = 0;
+#endif
+#endif
+    (void) func_index;
+    return 1;
+}
@@ -0,0 +1,120 @@
+// --------------------------------------------------------------
+// -- SIZES
+// -- Calls and times of the functions with a size parameter, by
+// -- power of two of the size, and the scaling reported from them.
+// --------------------------------------------------------------
+// Size statistics of the function with a size parameter of the given slot, in a row
+static inline struct specprof_size_stats *specprof_size_stats(struct specprof_stats *row, int size_slot)
+{
+    return (struct specprof_size_stats *) (row + SPECPROF_NB_FUNCTIONS) + size_slot;
+}
+
+// Index of the size bucket of a value
+static inline unsigned specprof_size_index(int64_t size)
+{
+    return size < 1 ? 0 : 64 - (unsigned) __builtin_clzll((uint64_t) size);
+}
+
+// Hot path : accumulation of a call (timed if sampled) by value of its size parameter
+static inline void specprof_size_record(int size_slot, int64_t size, uint64_t ticks, int sampled)
+{
+    struct specprof_size_bucket *bucket =
+        specprof_size_stats(specprof_tls_row, size_slot)->buckets + specprof_size_index(size);
+    uint64_t size_sum = size < 1 ? 0 : (uint64_t) size;
+    if (SPECPROF_UNLIKELY(specprof_tls_shared)) {
+        __atomic_fetch_add(&bucket->call_count, 1, __ATOMIC_RELAXED);
+        if (sampled) {
+            __atomic_fetch_add(&bucket->sampled_count, 1, __ATOMIC_RELAXED);
+            __atomic_fetch_add(&bucket->total_ticks, ticks, __ATOMIC_RELAXED);
+            __atomic_fetch_add(&bucket->size_sum, size_sum, __ATOMIC_RELAXED);
+        }
+    } else {
+        bucket->call_count += 1;
+        if (sampled) {
+            bucket->sampled_count += 1;
+            bucket->total_ticks += ticks;
+            bucket->size_sum += size_sum;
+        }
+    }
+}
+
+// Merge of the size statistics of a function over the rows of all the threads
+static void specprof_merge_sizes(int size_slot, struct specprof_size_stats *merged)
+{
+    unsigned row, index;
+    memset(merged, 0, sizeof(struct specprof_size_stats));
+    pthread_once(&specprof_init_once, specprof_init);
+    unsigned nb_rows = __atomic_load_n(&specprof_nb_rows, __ATOMIC_ACQUIRE);
+    for (row = 0; row <= nb_rows; ++row) {
+        // The shared row is always merged
+        struct specprof_size_stats *sizes =
+            specprof_size_stats(specprof_row(row < nb_rows ? row : specprof_max_threads - 1), size_slot);
+        for (index = 0; index < SPECPROF_SIZE_BUCKETS; ++index) {
+            struct specprof_size_bucket *bucket = sizes->buckets + index;
+            merged->buckets[index].call_count += __atomic_load_n(&bucket->call_count, __ATOMIC_RELAXED);
+            merged->buckets[index].sampled_count += __atomic_load_n(&bucket->sampled_count, __ATOMIC_RELAXED);
+            merged->buckets[index].total_ticks += __atomic_load_n(&bucket->total_ticks, __ATOMIC_RELAXED);
+            merged->buckets[index].size_sum += __atomic_load_n(&bucket->size_sum, __ATOMIC_RELAXED);
+        }
+    }
+}
+
+// Report of the cost of the calls of a function by size : mean time and time per unit of size
+// of each power of two of the size, exponent of the cost between successive sizes and exponent
+// of the power law fitted (least squares on the logarithms) over all the sizes
+static void specprof_report_sizes(FILE *stream, unsigned func, double ns_per_tick)
+{
+    struct specprof_size_stats *merged = (struct specprof_size_stats *) calloc(1, sizeof(*merged));
+    double sum_x = 0., sum_y = 0., sum_xx = 0., sum_xy = 0., last_x = 0., last_y = 0.;
+    unsigned index, nb_points = 0;
+    char range[64], exponent[16];
+    specprof_merge_sizes(specprof_size_slots[func], merged);
+    fprintf(stream, "Scaling with %s :\n", specprof_size_params[func]);
+    fprintf(stream, "  %-27s %12s %14s %14s %14s %9s\n", "size range", "calls", "mean size", "mean ns",
+            "ns per unit", "exponent");
+    for (index = 0; index < SPECPROF_SIZE_BUCKETS; ++index) {
+        const struct specprof_size_bucket *bucket = merged->buckets + index;
+        if (bucket->call_count == 0) {
+            continue;
+        }
+        if (index == 0) {
+            snprintf(range, sizeof(range), "< 1");
+        } else {
+            snprintf(range, sizeof(range), "[%llu, %llu]", 1ULL << (index - 1),
+                     index < 64 ? (1ULL << index) - 1 : (unsigned long long) INT64_MAX);
+        }
+        if (bucket->sampled_count == 0) {
+            fprintf(stream, "  %-27s %12llu %14s %14s %14s %9s\n", range,
+                    (unsigned long long) bucket->call_count, "-", "-", "-", "-");
+            continue;
+        }
+        double mean_size = (double) bucket->size_sum / (double) bucket->sampled_count;
+        double mean_ns = specprof_corrected_ns((double) bucket->total_ticks * ns_per_tick
+                                               / (double) bucket->sampled_count);
+        snprintf(exponent, sizeof(exponent), "-");
+        if (mean_size > 0. && mean_ns > 0.) {
+            double x = log(mean_size), y = log(mean_ns);
+            if (nb_points > 0 && x > last_x) {
+                snprintf(exponent, sizeof(exponent), "%.2f", (y - last_y) / (x - last_x));
+            }
+            sum_x += x;
+            sum_y += y;
+            sum_xx += x * x;
+            sum_xy += x * y;
+            last_x = x;
+            last_y = y;
+            ++nb_points;
+        }
+        fprintf(stream, "  %-27s %12llu %14.1f %14.1f %14.3f %9s\n", range,
+                (unsigned long long) bucket->call_count, mean_size, mean_ns,
+                mean_size > 0. ? mean_ns / mean_size : 0., exponent);
+    }
+    double denominator = nb_points * sum_xx - sum_x * sum_x;
+    if (nb_points >= 2 && denominator > 1e-12) {
+        fprintf(stream, "Apparent complexity : time ~ %s^%.2f (fitted over %u sizes)\n", specprof_size_params[func],
+                (nb_points * sum_xy - sum_x * sum_y) / denominator, nb_points);
+    } else {
+        fprintf(stream, "Apparent complexity : unknown (less than two sizes timed)\n");
+    }
+    free(merged);
+}
@@ -0,0 +1,189 @@
+// --------------------------------------------------------------
+// -- SNAPSHOTS
+// -- When SPECPROF_SNAPSHOT_DIR names a directory, a background
+// -- thread writes there the statistics of the calls ended since
+// -- the previous snapshot, every SPECPROF_SNAPSHOT_INTERVAL seconds
+// -- (if given), on SIGUSR1 and at the end of the program. Each
+// -- snapshot is a results file, written under a temporary name
+// -- then renamed : the snapshots already written survive a crash
+// -- or a SIGKILL of the program.
+// --------------------------------------------------------------
+static const char *specprof_snapshot_dir = NULL;
+static double specprof_snapshot_interval = 0.;
+static unsigned specprof_nb_snapshots = 0;
+static int specprof_snapshots_closed = 0;
+static sem_t specprof_snapshot_sem;
+static pthread_mutex_t specprof_snapshot_mutex = PTHREAD_MUTEX_INITIALIZER;
+// Merged statistics and end time of the previous snapshot
+static char *specprof_snapshot_previous = NULL;
+static char *specprof_snapshot_current = NULL;
+static uint64_t specprof_snapshot_end_ns = 0;
+
+// Statistics of the calls ended between two merges. The extrema of the interval are not known :
+// they are bounded by the non empty buckets of its histogram, the highest peak of the live bytes
+// and the highest recursion depth by the highest ones so far.
+static void specprof_delta_row(const char *current, const char *previous, char *delta)
+{
+    const uint64_t *current_values = (const uint64_t *) current;
+    const uint64_t *previous_values = (const uint64_t *) previous;
+    uint64_t *delta_values = (uint64_t *) delta;
+    unsigned func, bucket;
+    size_t index;
+    for (index = 0; index < SPECPROF_MERGED_ROW_SIZE / sizeof(uint64_t); ++index) {
+        delta_values[index] = current_values[index] - previous_values[index];
+    }
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        const struct specprof_stats *total = (const struct specprof_stats *) current + func;
+        struct specprof_stats *stats = (struct specprof_stats *) delta + func;
+        stats->min_ticks = 0;
+        stats->max_ticks = 0;
+        for (bucket = 0; bucket < SPECPROF_HIST_BUCKETS; ++bucket) {
+            if (stats->hist[bucket] == 0) {
+                continue;
+            }
+            if (stats->max_ticks == 0) {
+                uint64_t low = specprof_hist_low(bucket);
+                stats->min_ticks = low > total->min_ticks ? low : total->min_ticks;
+            }
+            uint64_t high = specprof_hist_high(bucket);
+            stats->max_ticks = high < total->max_ticks ? high : total->max_ticks;
+        }
+#if SPECPROF_ALLOCATIONS
+        specprof_alloc_stats((struct specprof_stats *) delta, func)->peak_max =
+            stats->call_count > 0 ? specprof_alloc_stats((struct specprof_stats *) current, func)->peak_max : 0;
+#endif
+#if SPECPROF_CALL_GRAPH
+        specprof_graph_stats((struct specprof_stats *) delta, func)->max_depth =
+            stats->call_count > 0 ? specprof_graph_stats((struct specprof_stats *) current, func)->max_depth : 0;
+#endif
+    }
+}
+
+// Write the statistics of the calls ended since the previous snapshot
+static void specprof_take_snapshot(uint32_t trigger)
+{
+    struct specprof_file_header header;
+    char path[4096], tmp_path[4096];
+    pthread_mutex_lock(&specprof_snapshot_mutex);
+    if (specprof_snapshots_closed) {
+        pthread_mutex_unlock(&specprof_snapshot_mutex);
+        return;
+    }
+    char *delta = (char *) calloc(1, SPECPROF_MERGED_ROW_SIZE);
+    specprof_file_header(&header, 1, SPECPROF_MERGED_ROW_SIZE);
+    header.ns_per_tick = specprof_ns_per_tick();
+    header.snapshot = ++specprof_nb_snapshots;
+    header.trigger = trigger;
+    header.period_start_ns = specprof_snapshot_end_ns;
+    header.period_end_ns = specprof_clock_ns(CLOCK_MONOTONIC) - specprof_start_ns;
+    specprof_merge_row(specprof_snapshot_current);
+    specprof_delta_row(specprof_snapshot_current, specprof_snapshot_previous, delta);
+    snprintf(path, sizeof(path), "%s/specprof.%u.%06u.bin", specprof_snapshot_dir, header.pid, header.snapshot);
+    snprintf(tmp_path, sizeof(tmp_path), "%s/.specprof.%u.%06u.tmp", specprof_snapshot_dir, header.pid,
+             header.snapshot);
+    if (specprof_write_merged(tmp_path, &header, delta) != 0 || rename(tmp_path, path) != 0) {
+        perror("SpecProf : unable to write a snapshot");
+        unlink(tmp_path);
+    }
+    // The current merge is the reference of the next snapshot
+    char *previous = specprof_snapshot_previous;
+    specprof_snapshot_previous = specprof_snapshot_current;
+    specprof_snapshot_current = previous;
+    specprof_snapshot_end_ns = header.period_end_ns;
+    // The last snapshot is closed under the same lock : the snapshot thread can't write one after it
+    if (trigger == SPECPROF_SNAPSHOT_EXIT) {
+        specprof_snapshots_closed = 1;
+    }
+    free(delta);
+    pthread_mutex_unlock(&specprof_snapshot_mutex);
+}
+
+// Handler of SIGUSR1 : only wakes up the snapshot thread (sem_post is async-signal-safe)
+static void specprof_snapshot_signal(int signum)
+{
+    int saved_errno = errno;
+    (void) signum;
+    sem_post(&specprof_snapshot_sem);
+    errno = saved_errno;
+}
+
+static void *specprof_snapshot_thread(void *arg)
+{
+    struct timespec deadline, now;
+    (void) arg;
+    clock_gettime(CLOCK_REALTIME, &deadline);
+    for (;;) {
+        int woken;
+        if (specprof_snapshot_interval > 0.) {
+            // The snapshots of the interval follow a fixed schedule, whatever the signals, unless
+            // it is late (program stopped for instance)
+            double next = (double) deadline.tv_sec + (double) deadline.tv_nsec * 1e-9 + specprof_snapshot_interval;
+            clock_gettime(CLOCK_REALTIME, &now);
+            if (next < (double) now.tv_sec + (double) now.tv_nsec * 1e-9) {
+                next = (double) now.tv_sec + (double) now.tv_nsec * 1e-9 + specprof_snapshot_interval;
+            }
+            deadline.tv_sec = (time_t) next;
+            deadline.tv_nsec = (long) ((next - (double) deadline.tv_sec) * 1e9);
+            while ((woken = sem_timedwait(&specprof_snapshot_sem, &deadline) == 0) || errno == EINTR) {
+                if (woken) {
+                    specprof_take_snapshot(SPECPROF_SNAPSHOT_SIGNAL);
+                }
+            }
+            specprof_take_snapshot(SPECPROF_SNAPSHOT_INTERVAL);
+        } else if (sem_wait(&specprof_snapshot_sem) == 0) {
+            specprof_take_snapshot(SPECPROF_SNAPSHOT_SIGNAL);
+        }
+    }
+    return NULL;
+}
+
+// Start of the snapshot thread, which blocks every signal : they are left to the threads of the program
+static void specprof_start_snapshot_thread(void)
+{
+    sigset_t all_signals, saved_signals;
+    pthread_t thread;
+    sigfillset(&all_signals);
+    pthread_sigmask(SIG_SETMASK, &all_signals, &saved_signals);
+    if (pthread_create(&thread, NULL, specprof_snapshot_thread, NULL) != 0) {
+        perror("SpecProf : unable to start the snapshot thread");
+    } else {
+        pthread_detach(thread);
+    }
+    pthread_sigmask(SIG_SETMASK, &saved_signals, NULL);
+}
+
+// Start of the snapshots, if SPECPROF_SNAPSHOT_DIR is given
+static void specprof_start_snapshots(void)
+{
+    const char *interval = getenv("SPECPROF_SNAPSHOT_INTERVAL");
+    struct sigaction action, previous_action;
+    specprof_snapshot_dir = getenv("SPECPROF_SNAPSHOT_DIR");
+    if (specprof_snapshot_dir == NULL || specprof_snapshot_dir[0] == '\0') {
+        specprof_snapshot_dir = NULL;
+        return;
+    }
+    specprof_snapshot_interval = interval ? atof(interval) : 0.;
+    specprof_snapshot_previous = (char *) calloc(1, SPECPROF_MERGED_ROW_SIZE);
+    specprof_snapshot_current = (char *) calloc(1, SPECPROF_MERGED_ROW_SIZE);
+    sem_init(&specprof_snapshot_sem, 0, 0);
+    // SIGUSR1 kills the program by default : it is only taken if the program doesn't handle it
+    memset(&action, 0, sizeof(action));
+    action.sa_handler = specprof_snapshot_signal;
+    action.sa_flags = SA_RESTART;
+    sigemptyset(&action.sa_mask);
+    if (sigaction(SIGUSR1, NULL, &previous_action) == 0 && previous_action.sa_handler == SIG_DFL) {
+        sigaction(SIGUSR1, &action, NULL);
+    } else {
+        fprintf(stderr, "SpecProf : SIGUSR1 is handled by the program, no snapshot on signal\n");
+    }
+    specprof_start_snapshot_thread();
+}
+
+// Last snapshot, at the end of the program : no snapshot is taken afterwards
+static void specprof_close_snapshots(void)
+{
+    if (specprof_snapshot_dir == NULL) {
+        return;
+    }
+    specprof_take_snapshot(SPECPROF_SNAPSHOT_EXIT);
+}
@@ -0,0 +1,155 @@
+// --------------------------------------------------------------
+// -- STATISTICS FILES
+// -- Binary layout, read by src/stats_file.py, of the results file
+// -- and of the live statistics file : a header, the names of the
+// -- scalar fields of the statistics, the names of the functions,
+// -- the names of their size parameters and the rows of statistics
+// -- (aligned on 64 bytes).
+// --------------------------------------------------------------
+#define SPECPROF_FILE_MAGIC "SPECPROF"
+#define SPECPROF_FILE_VERSION 8
+// Causes of a snapshot (0 for the results and live statistics files)
+#define SPECPROF_SNAPSHOT_INTERVAL 1
+#define SPECPROF_SNAPSHOT_SIGNAL 2
+#define SPECPROF_SNAPSHOT_EXIT 3
+
+struct specprof_file_header {
+    char magic[8];
+    uint32_t version;
+    uint32_t header_size;
+    uint32_t nb_functions;
+    uint32_t nb_rows;
+    uint64_t row_size;
+    uint32_t stats_size;
+    uint32_t nb_fields;
+    uint32_t hist_sub_bits;
+    uint32_t hist_buckets;
+    uint32_t timer;
+    uint32_t pid;
+    double ns_per_tick;
+    uint64_t fields_offset;
+    uint64_t names_offset;
+    uint64_t rows_offset;
+    double overhead_ns;
+    uint32_t size_buckets;
+    uint32_t nb_sized_functions;
+    // Offset of the size statistics in a row
+    uint64_t sizes_offset;
+    // Number and cause of the snapshot. The statistics of a snapshot are those of the calls
+    // ended between the two times, in nanoseconds since the start of the profiling.
+    uint32_t snapshot;
+    uint32_t trigger;
+    uint64_t period_start_ns;
+    uint64_t period_end_ns;
+    // Rank of the process in its MPI job (-1 if unknown) and pid of the profiled process it was
+    // forked from (0 if none)
+    int32_t rank;
+    uint32_t parent_pid;
+    // Number of performance counters of each function (0 without SPECPROF_COUNTERS), counters
+    // opened by at least one thread (bit i for the counter i) and offset of the counters in a row
+    uint32_t nb_counters;
+    uint32_t counters_available;
+    uint64_t counters_offset;
+    // Number of fields and size of the allocation statistics of each function (0 without
+    // SPECPROF_ALLOCATIONS) and their offset in a row
+    uint32_t nb_alloc_fields;
+    uint32_t alloc_stats_size;
+    uint64_t allocations_offset;
+    // Number of fields and size of the nesting statistics of each function (0 without
+    // SPECPROF_CALL_GRAPH) and their offset in a row
+    uint32_t nb_graph_fields;
+    uint32_t graph_stats_size;
+    uint64_t graph_offset;
+};
+
+// Header of the live statistics file, if any
+static struct specprof_file_header *specprof_stats_header = NULL;
+
+// Header of a statistics file holding nb_rows rows of statistics. Returns the size of the
+// header, field names and function names, padded to a cache line.
+static size_t specprof_file_header(struct specprof_file_header *header, uint32_t nb_rows, uint64_t row_size)
+{
+    unsigned func;
+    memset(header, 0, sizeof(*header));
+    memcpy(header->magic, SPECPROF_FILE_MAGIC, 8);
+    header->version = SPECPROF_FILE_VERSION;
+    header->header_size = sizeof(*header);
+    header->nb_functions = SPECPROF_NB_FUNCTIONS;
+    header->nb_rows = nb_rows;
+    header->row_size = row_size;
+    header->stats_size = sizeof(struct specprof_stats);
+    header->nb_fields = SPECPROF_NB_STATS_FIELDS;
+    header->hist_sub_bits = SPECPROF_HIST_SUB_BITS;
+    header->hist_buckets = SPECPROF_HIST_BUCKETS;
+    header->timer = SPECPROF_TIMER;
+    header->pid = (uint32_t) getpid();
+    header->rank = specprof_rank;
+    header->parent_pid = specprof_parent_pid;
+    header->overhead_ns = SPECPROF_OVERHEAD_NS;
+    header->size_buckets = SPECPROF_SIZE_BUCKETS;
+    header->nb_sized_functions = SPECPROF_NB_SIZED_FUNCTIONS;
+    header->sizes_offset = SPECPROF_NB_FUNCTIONS * sizeof(struct specprof_stats);
+    header->nb_counters = SPECPROF_COUNTERS * SPECPROF_NB_COUNTERS;
+    header->counters_available = __atomic_load_n(&specprof_counters_available, __ATOMIC_RELAXED);
+    header->counters_offset = SPECPROF_COUNTERS_OFFSET;
+    header->nb_alloc_fields = SPECPROF_ALLOCATIONS * SPECPROF_NB_ALLOC_FIELDS;
+    header->alloc_stats_size = SPECPROF_ALLOCATIONS * sizeof(struct specprof_alloc_stats);
+    header->allocations_offset = SPECPROF_ALLOCATIONS_OFFSET;
+    header->nb_graph_fields = SPECPROF_CALL_GRAPH * SPECPROF_NB_GRAPH_FIELDS;
+    header->graph_stats_size = SPECPROF_CALL_GRAPH * sizeof(struct specprof_graph_stats);
+    header->graph_offset = SPECPROF_GRAPH_OFFSET;
+    header->fields_offset = sizeof(*header);
+    header->names_offset = header->fields_offset + sizeof(SPECPROF_STATS_FIELDS);
+    size_t names_size = 0;
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        names_size += strlen(specprof_func_names[func]) + strlen(specprof_size_params[func]) + 2;
+    }
+    header->rows_offset = (header->names_offset + names_size + SPECPROF_CACHE_LINE - 1)
+                          / SPECPROF_CACHE_LINE * SPECPROF_CACHE_LINE;
+    return header->rows_offset;
+}
+
+// Live statistics file (SPECPROF_STATS_FILE in the environment) : the statistics table itself
+// is a shared mapping of the file, so that the measures can be read while the program runs.
+// Returns the address of the table or NULL if the file is not wanted or can't be created.
+static char *specprof_map_stats_file(size_t table_size)
+{
+    char path_buffer[4096];
+    const char *path = specprof_process_path("SPECPROF_STATS_FILE", path_buffer, sizeof(path_buffer));
+    struct specprof_file_header header;
+    unsigned func;
+    if (path == NULL) {
+        return NULL;
+    }
+    size_t rows_offset = specprof_file_header(&header, specprof_max_threads, specprof_row_size);
+    int fd = open(path, O_RDWR | O_CREAT | O_TRUNC, 0644);
+    if (fd < 0 || ftruncate(fd, (off_t) (rows_offset + table_size)) != 0) {
+        perror("SpecProf : unable to create the statistics file");
+        if (fd >= 0) {
+            close(fd);
+        }
+        return NULL;
+    }
+    void *mapping = mmap(NULL, rows_offset + table_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (mapping == MAP_FAILED) {
+        perror("SpecProf : unable to map the statistics file");
+        return NULL;
+    }
+    char *cursor = (char *) mapping + header.names_offset;
+    for (func = 0; func < 2 * SPECPROF_NB_FUNCTIONS; ++func) {
+        const char *name = func < SPECPROF_NB_FUNCTIONS ? specprof_func_names[func]
+                                                        : specprof_size_params[func - SPECPROF_NB_FUNCTIONS];
+        memcpy(cursor, name, strlen(name) + 1);
+        cursor += strlen(name) + 1;
+    }
+    memcpy((char *) mapping + header.fields_offset, SPECPROF_STATS_FIELDS, sizeof(SPECPROF_STATS_FIELDS));
+    // First calibration of the timer for the readers of the live file, refined at the end
+    header.ns_per_tick = specprof_ns_per_tick();
+    specprof_stats_header = (struct specprof_file_header *) mapping;
+    // The magic is written last : a reader never sees an incomplete header
+    memcpy((char *) mapping + 8, (char *) &header + 8, sizeof(header) - 8);
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+    memcpy(mapping, header.magic, 8);
+    return (char *) mapping + rows_offset;
+}
@@ -0,0 +1,35 @@
+// --------------------------------------------------------------
+// -- TARGETS
+// -- The target functions are resolved at their first call : first
+// -- in the modules loaded after the wrapper (RTLD_NEXT), where the
+// -- target library is when the program is linked with it, then in
+// -- the target library itself, opened only then.
+// --------------------------------------------------------------
+static void *specprof_target_handle = NULL;
+
+// Slow path : address of a target function. Aborts if it can't be found.
+static void *specprof_resolve_target(const char *library, const char *symbol)
+{
+    void *address = dlsym(RTLD_NEXT, symbol);
+    if (address != NULL) {
+        return address;
+    }
+    void *handle = __atomic_load_n(&specprof_target_handle, __ATOMIC_ACQUIRE);
+    if (handle == NULL) {
+        handle = dlopen(library, RTLD_LAZY);
+        if (handle == NULL) {
+            fprintf(stderr, "SpecProf : unable to open the target library %s : %s\n", library, dlerror());
+            abort();
+        }
+        __atomic_store_n(&specprof_target_handle, handle, __ATOMIC_RELEASE);
+    }
+    dlerror();
+    address = dlsym(handle, symbol);
+    if (address == NULL) {
+        const char *error = dlerror();
+        fprintf(stderr, "SpecProf : unable to resolve %s in %s : %s\n", symbol, library,
+                error != NULL ? error : "null address");
+        abort();
+    }
+    return address;
+}
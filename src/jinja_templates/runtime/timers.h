@@ -0,0 +1,76 @@
+// --------------------------------------------------------------
+// -- TIMERS
+// -- Timer backend of the measures and conversion of its ticks into
+// -- nanoseconds.
+// --------------------------------------------------------------
+#define SPECPROF_TIMER_MONOTONIC 0
+#define SPECPROF_TIMER_THREAD_CPUTIME 1
+#define SPECPROF_TIMER_TSC 2
+// Timer backend chosen at generation time
+#define SPECPROF_TIMER SPECPROF_TIMER_{{ timer|upper }}
+
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#else
+#error "The tsc timer is only available on x86 processors"
+#endif
+#endif
+
+// Reference points of the timer, used to convert tsc ticks into nanoseconds
+static uint64_t specprof_start_ns = 0;
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+static uint64_t specprof_start_ticks = 0;
+#endif
+
+static inline uint64_t specprof_clock_ns(clockid_t clock_id)
+{
+    struct timespec ts;
+    clock_gettime(clock_id, &ts);
+    return (uint64_t) ts.tv_sec * 1000000000ULL + (uint64_t) ts.tv_nsec;
+}
+
+// Current value of the timer, in ticks
+static inline uint64_t specprof_now(void)
+{
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+    return __rdtsc();
+#elif SPECPROF_TIMER == SPECPROF_TIMER_THREAD_CPUTIME
+    return specprof_clock_ns(CLOCK_THREAD_CPUTIME_ID);
+#else
+    return specprof_clock_ns(CLOCK_MONOTONIC);
+#endif
+}
+
+static const char *specprof_timer_name(void)
+{
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+    return "tsc";
+#elif SPECPROF_TIMER == SPECPROF_TIMER_THREAD_CPUTIME
+    return "thread cpu time";
+#else
+    return "monotonic clock";
+#endif
+}
+
+// Nanoseconds per tick of the timer (1 except for the tsc which is calibrated
+// against the monotonic clock over the lifetime of the process)
+static double specprof_ns_per_tick(void)
+{
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+    uint64_t end_ns = specprof_clock_ns(CLOCK_MONOTONIC);
+    // A too short interval gives an imprecise calibration
+    while (end_ns - specprof_start_ns < 1000000ULL) {
+        end_ns = specprof_clock_ns(CLOCK_MONOTONIC);
+    }
+    return (double) (end_ns - specprof_start_ns) / (double) (__rdtsc() - specprof_start_ticks);
+#else
+    return 1.;
+#endif
+}
+
+// A duration, in nanoseconds, without the overhead of the wrapper
+static inline double specprof_corrected_ns(double ns)
+{
+    return ns > SPECPROF_OVERHEAD_NS ? ns - SPECPROF_OVERHEAD_NS : 0.;
+}
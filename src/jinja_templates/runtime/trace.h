@@ -0,0 +1,245 @@
+// --------------------------------------------------------------
+// -- TRACE
+// -- When SPECPROF_TRACE_FILE is set, each thread records the start
+// -- and end of the timed calls in its own ring buffer, without any
+// -- lock. The buffer is appended to the trace file, read by
+// -- src/trace_export.py, when it is full, when the thread ends and
+// -- when the results are reported. The threads of the shared row
+// -- are not traced.
+// --------------------------------------------------------------
+#define SPECPROF_TRACE_MAGIC "SPECTRAC"
+#define SPECPROF_TRACE_VERSION 1
+// Default number of events of a buffer (SPECPROF_TRACE_EVENTS in the environment)
+#define SPECPROF_TRACE_DEFAULT_EVENTS 65536
+
+struct specprof_trace_header {
+    char magic[8];
+    uint32_t version;
+    uint32_t header_size;
+    uint32_t timer;
+    uint32_t pid;
+    uint32_t nb_functions;
+    // Size of the function names following the header
+    uint32_t names_size;
+    double ns_per_tick;
+    // Value of the timer, and of the monotonic clock, when the trace started
+    uint64_t start_ticks;
+    uint64_t start_ns;
+    uint64_t untraced_threads;
+};
+
+// Chunk of events of one thread, followed by the events
+struct specprof_trace_chunk {
+    uint32_t tid;
+    uint32_t nb_events;
+};
+
+// With the thread_cputime timer, start and end are on the monotonic clock : the cpu times of
+// the threads can't be compared
+struct specprof_trace_event {
+    uint64_t start;
+    uint64_t end;
+    uint32_t func;
+    uint32_t unused;
+};
+
+struct specprof_trace_buffer {
+    uint32_t tid;
+    // Number of events ever recorded and ever written in the file
+    uint64_t head;
+    uint64_t flushed;
+    struct specprof_trace_event *events;
+};
+
+static int specprof_trace_fd = -1;
+// Offset of the first chunk of events in the trace file, after the function names
+static off_t specprof_trace_events_offset = 0;
+// Number of events of a buffer, a power of two
+static uint64_t specprof_trace_capacity = 0;
+// Buffer of each row, reused by the threads taking the row
+static struct specprof_trace_buffer **specprof_trace_buffers = NULL;
+static uint64_t specprof_untraced_threads = 0;
+static pthread_mutex_t specprof_trace_mutex = PTHREAD_MUTEX_INITIALIZER;
+// Buffer of the current thread (NULL if it isn't traced)
+static SPECPROF_TLS struct specprof_trace_buffer *specprof_tls_trace = NULL;
+
+// Header of the trace file
+static void specprof_trace_header(struct specprof_trace_header *header)
+{
+    unsigned func;
+    memset(header, 0, sizeof(*header));
+    memcpy(header->magic, SPECPROF_TRACE_MAGIC, 8);
+    header->version = SPECPROF_TRACE_VERSION;
+    header->header_size = sizeof(*header);
+    header->timer = SPECPROF_TIMER;
+    header->pid = (uint32_t) getpid();
+    header->nb_functions = SPECPROF_NB_FUNCTIONS;
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        header->names_size += strlen(specprof_func_names[func]) + 1;
+    }
+    header->ns_per_tick = specprof_ns_per_tick();
+#if SPECPROF_TIMER == SPECPROF_TIMER_TSC
+    header->start_ticks = specprof_start_ticks;
+#else
+    header->start_ticks = specprof_start_ns;
+#endif
+    header->start_ns = specprof_start_ns;
+    header->untraced_threads = specprof_untraced_threads;
+}
+
+// Trace file (SPECPROF_TRACE_FILE in the environment), opened when the statistics table is created
+static void specprof_open_trace(void)
+{
+    char path_buffer[4096];
+    const char *path = specprof_process_path("SPECPROF_TRACE_FILE", path_buffer, sizeof(path_buffer));
+    const char *nb_events = getenv("SPECPROF_TRACE_EVENTS");
+    struct specprof_trace_header header;
+    unsigned func;
+    if (path == NULL) {
+        return;
+    }
+    uint64_t capacity = nb_events ? (uint64_t) atol(nb_events) : 0;
+    if (capacity < 2) {
+        capacity = SPECPROF_TRACE_DEFAULT_EVENTS;
+    }
+    specprof_trace_capacity = 1;
+    while (specprof_trace_capacity < capacity) {
+        specprof_trace_capacity <<= 1;
+    }
+    int fd = open(path, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+    if (fd < 0) {
+        perror("SpecProf : unable to create the trace file");
+        return;
+    }
+    specprof_trace_header(&header);
+    if (write(fd, &header, sizeof(header)) != (ssize_t) sizeof(header)) {
+        perror("SpecProf : unable to write the trace file");
+        close(fd);
+        return;
+    }
+    for (func = 0; func < SPECPROF_NB_FUNCTIONS; ++func) {
+        if (write(fd, specprof_func_names[func], strlen(specprof_func_names[func]) + 1) < 0) {
+            perror("SpecProf : unable to write the trace file");
+            close(fd);
+            return;
+        }
+    }
+    specprof_trace_buffers = (struct specprof_trace_buffer **) calloc(specprof_max_threads,
+                                                                      sizeof(struct specprof_trace_buffer *));
+    specprof_trace_events_offset = lseek(fd, 0, SEEK_CUR);
+    specprof_trace_fd = fd;
+}
+
+// Buffer of a row, given to the thread taking the row
+static struct specprof_trace_buffer *specprof_trace_buffer(unsigned row)
+{
+    struct specprof_trace_buffer *buffer = specprof_trace_buffers[row];
+    if (buffer == NULL) {
+        buffer = (struct specprof_trace_buffer *) calloc(1, sizeof(struct specprof_trace_buffer));
+        buffer->events = (struct specprof_trace_event *) malloc(specprof_trace_capacity *
+                                                                sizeof(struct specprof_trace_event));
+        if (buffer->events == NULL) {
+            free(buffer);
+            return NULL;
+        }
+        specprof_trace_buffers[row] = buffer;
+    }
+    buffer->tid = (uint32_t) syscall(SYS_gettid);
+    return buffer;
+}
+
+// Append the events of a buffer not yet written to the trace file (the writes are serialized
+// by the mutex : the file is not opened with O_APPEND, which would break the final pwrite)
+static void specprof_trace_flush(struct specprof_trace_buffer *buffer)
+{
+    struct specprof_trace_chunk chunk;
+    struct iovec chunks[3];
+    int nb_chunks = 1;
+    pthread_mutex_lock(&specprof_trace_mutex);
+    uint64_t head = __atomic_load_n(&buffer->head, __ATOMIC_ACQUIRE);
+    uint64_t flushed = __atomic_load_n(&buffer->flushed, __ATOMIC_RELAXED);
+    if (head != flushed) {
+        uint64_t first = flushed & (specprof_trace_capacity - 1);
+        uint64_t count = head - flushed;
+        chunk.tid = buffer->tid;
+        chunk.nb_events = (uint32_t) count;
+        chunks[0].iov_base = &chunk;
+        chunks[0].iov_len = sizeof(chunk);
+        // The events may wrap around the end of the ring
+        uint64_t first_part = first + count > specprof_trace_capacity ? specprof_trace_capacity - first : count;
+        chunks[nb_chunks].iov_base = buffer->events + first;
+        chunks[nb_chunks++].iov_len = first_part * sizeof(struct specprof_trace_event);
+        if (first_part < count) {
+            chunks[nb_chunks].iov_base = buffer->events;
+            chunks[nb_chunks++].iov_len = (count - first_part) * sizeof(struct specprof_trace_event);
+        }
+        if (writev(specprof_trace_fd, chunks, nb_chunks) < 0) {
+            perror("SpecProf : unable to write the trace file");
+        }
+        __atomic_store_n(&buffer->flushed, head, __ATOMIC_RELEASE);
+    }
+    pthread_mutex_unlock(&specprof_trace_mutex);
+}
+
+// Reset of the trace, the rows being locked : the events not yet written are dropped and the
+// chunks already written are truncated. The events of the other threads recorded while the
+// trace is reset may be dropped or kept.
+static void specprof_reset_trace(void)
+{
+    unsigned row;
+    if (specprof_trace_fd < 0) {
+        return;
+    }
+    pthread_mutex_lock(&specprof_trace_mutex);
+    for (row = 0; row < specprof_max_threads; ++row) {
+        struct specprof_trace_buffer *buffer = specprof_trace_buffers[row];
+        if (buffer != NULL) {
+            __atomic_store_n(&buffer->flushed, __atomic_load_n(&buffer->head, __ATOMIC_ACQUIRE), __ATOMIC_RELEASE);
+        }
+    }
+    if (ftruncate(specprof_trace_fd, specprof_trace_events_offset) != 0 ||
+        lseek(specprof_trace_fd, specprof_trace_events_offset, SEEK_SET) < 0) {
+        perror("SpecProf : unable to reset the trace file");
+    }
+    pthread_mutex_unlock(&specprof_trace_mutex);
+}
+
+// Write the events of all the buffers and the final calibration of the timer
+static void specprof_close_trace(void)
+{
+    struct specprof_trace_header header;
+    unsigned row;
+    if (specprof_trace_fd < 0) {
+        return;
+    }
+    for (row = 0; row < specprof_max_threads; ++row) {
+        if (specprof_trace_buffers[row] != NULL) {
+            specprof_trace_flush(specprof_trace_buffers[row]);
+        }
+    }
+    specprof_trace_header(&header);
+    if (pwrite(specprof_trace_fd, &header, sizeof(header), 0) != (ssize_t) sizeof(header)) {
+        perror("SpecProf : unable to write the trace file");
+    }
+}
+
+// Hot path : record of a timed call by a traced thread
+static inline void specprof_trace_record(unsigned func_index, uint64_t start, uint64_t end)
+{
+    struct specprof_trace_buffer *buffer = specprof_tls_trace;
+    uint64_t head = buffer->head;
+    struct specprof_trace_event *event = buffer->events + (head & (specprof_trace_capacity - 1));
+#if SPECPROF_TIMER == SPECPROF_TIMER_THREAD_CPUTIME
+    // The event is placed at its end on the monotonic clock and lasts its cpu time
+    uint64_t end_ns = specprof_clock_ns(CLOCK_MONOTONIC);
+    start = end_ns - (end - start);
+    end = end_ns;
+#endif
+    event->start = start;
+    event->end = end;
+    event->func = func_index;
+    __atomic_store_n(&buffer->head, head + 1, __ATOMIC_RELEASE);
+    if (SPECPROF_UNLIKELY(head + 1 - __atomic_load_n(&buffer->flushed, __ATOMIC_ACQUIRE) == specprof_trace_capacity)) {
+        specprof_trace_flush(buffer);
+    }
+}
@@ -2,8 +2,6 @@
 #include <stdio.h>
 #include <string.h>
 #include <signal.h>
-#include <time.h>
-#include <sys/time.h>
 #include <stdlib.h>
 // necessary for RTLD_NEXT in dlfcn.h
 #ifndef _GNU_SOURCE
@@ -12,6 +10,8 @@
 
 #include <dlfcn.h>
 
+{% include 'template_runtime.h' %}
+
 // --------------------------------------------------------------
 // -- Optional includes
 // --------------------------------------------------------------
@@ -27,85 +27,92 @@
 
 // Target library path
 static const char *target_library = "{{ target_library }}";
-// Target symbol
-static const char *target_symbol = "{{ target_symbol }}";
+// Target symbols
+static const char *target_symbols[SPECPROF_NB_FUNCTIONS] = {
+{% for func in functions %}
+    "{{ func.target_symbol }}",
+{% endfor %}
+};
+{% for func in functions %}
 // Specific pointer to function type
-typedef {{ return_type|safe }} (*func_ptr)({{ func_params|safe }});
+typedef {{ func.return_type|safe }} (*func_ptr_{{ func.index }})({{ func.func_params|safe }});
 // Address of the target function will be stored in :
-static func_ptr orig_func = NULL;
-// Total number of calls
-static long int call_count = 0;
-// Cumulative cpu time used by the function
-static double total_cpu_time_used = 0.;
-// Cumulative real time used by the function
-static double total_real_time_used = 0.;
+static func_ptr_{{ func.index }} orig_func_{{ func.index }} = NULL;
+{% endfor %}
 
 // --------------------------------------------------------------
 // -- FUNCTIONS
 // --------------------------------------------------------------
 
-//Library Initializer
+//Library Initializer : nothing is printed, the target functions are resolved at their first call
 void __attribute__((constructor)) setup()
 {
-    if (orig_func == NULL) {
-        printf("--------------------------------\n");
-        printf("Call of the library initializer!\n");
-        void *handle;  // Handle of the target library
-        dlerror();  // Cleaning of potential previous error message
-        handle = dlopen(target_library, RTLD_LAZY);
-        if (!handle) {
-            printf("Unable to access origin library!\n");
-            fputs(dlerror(), stderr);
-            exit(1);
-        } else {
-            printf("Library %s found and opened successfully!\n", target_library);
-        }
-        orig_func = dlsym(handle, target_symbol);
-        char *error_msg = dlerror();
-        if (error_msg != NULL) {
-            printf("Unable to resolve %s symbol!\n", target_symbol);
-            fputs(error_msg, stderr);
-            raise(SIGABRT);
-        } else {
-            printf("Symbol %s original address: %p\n", target_symbol, orig_func);
-        }
-        printf("--------------------------------\n");
-    }
+    specprof_loader_pid = (uint32_t) getpid();
+    specprof_init_control();
 }
 
+{% for func in functions %}
 // Function prototype
-{{ func_signature|safe }}
+{% set call %}(*orig_func_{{ func.index }})({{ func.func_params_names|safe }}){% endset %}
+{{ func.func_signature|safe }}
 {
-    clock_t start;
-    struct timeval start_r, end_r;
-    // Call of the original function and measurement of execution time
-    call_count += 1;
-    start = clock();
-    gettimeofday(&start_r, NULL);
-    printf("Call of the original function...");
-    {% if return_type != "void" %}
-    {{ return_type|safe }} ret_val = (*orig_func)({{ func_params_names|safe }});
+    // Address of the original function, resolved at the first call
+    if (SPECPROF_UNLIKELY(orig_func_{{ func.index }} == NULL)) {
+        orig_func_{{ func.index }} = (func_ptr_{{ func.index }}) specprof_resolve_target(target_library,
+                                                                                    target_symbols[{{ func.index }}]);
+    }
+    // Call of the original function alone while the measures are disabled
+    if (SPECPROF_UNLIKELY(!specprof_measuring())) {
+        {% if func.return_type != "void" %}
+        return {{ call|safe }};
+        {% else %}
+        {{ call|safe }};
+        return;
+        {% endif %}
+    }
+    // Call of the original function and measurement of execution time (if the call is sampled)
+    struct specprof_stats *stats = specprof_thread_stats({{ func.index }});
+    {% if func.size_param %}
+    // Value of the size parameter, read before the call which may change it
+    int64_t specprof_size = (int64_t) ({{ func.size_param }});
+    {% endif %}
+    {% if allocations %}
+    // Allocations of the thread before the call (every call is accounted)
+    struct specprof_alloc_mark allocs_before;
+    specprof_allocs_enter(&allocs_before);
+    {% endif %}
+    uint64_t start = specprof_start({{ func.index }});
+    {% if counters %}
+    // Performance counters of the thread before the call (read only if the call is timed)
+    struct specprof_counter_values counters_before;
+    start = specprof_counters_start(start, &counters_before);
+    {% endif %}
+    {% if func.return_type != "void" %}
+    {{ func.return_type|safe }} ret_val = {{ call|safe }};
+    {% else %}
+    {{ call|safe }};
+    {% endif %}
+    {% if func.size_param %}
+    specprof_stop(stats, start, __builtin_return_address(0), {{ func.size_slot }}, specprof_size);
     {% else %}
-    (*orig_func)({{ func_params_names|safe }});
+    specprof_stop(stats, start, __builtin_return_address(0), -1, 0);
     {% endif %}
-    printf("...done!");
-    gettimeofday(&end_r, NULL);
-    total_real_time_used += ((double) (end_r.tv_sec - start_r.tv_sec)) * 1e+06 +
-                            ((double) (end_r.tv_usec - start_r.tv_usec));
-    total_cpu_time_used += ((double) (clock() - start)) / CLOCKS_PER_SEC;
-    {% if return_type != "void" %}
+    {% if counters %}
+    specprof_counters_stop(stats, &counters_before);
+    {% endif %}
+    {% if allocations %}
+    specprof_allocs_leave(stats, &allocs_before);
+    {% endif %}
+    {% if func.return_type != "void" %}
     return ret_val;
     {% endif %}
 }
 
+{% endfor %}
 
 //Library finalizer
 void __attribute__((destructor)) finalize()
 {
     // Printing of the results
-    printf("--------------------------------\n");
-    printf("Call count = %ld\n", call_count);
-    printf("Cpu time consumed = %f seconds\n", total_cpu_time_used);
-    printf("Real time consumed = %f seconds\n", total_real_time_used / 1e+06);
-    printf("--------------------------------\n");
+    specprof_report();
 }
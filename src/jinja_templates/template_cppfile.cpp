@@ -1,8 +1,5 @@
 // Mandatory includes
-#include <iostream>
-#include <exception>
 #include <string>
-#include <chrono>
 #include <string.h>
 #include <stdlib.h>
 // necessary for RTLD_NEXT in dlfcn.h
@@ -12,6 +9,8 @@
 
 #include <dlfcn.h>
 
+{% include 'template_runtime.h' %}
+
 // --------------------------------------------------------------
 // -- Optional includes
 // --------------------------------------------------------------
@@ -21,9 +20,9 @@
 {% endfor %}
 {% endif %}
 
-{% if namespace is not none %}
+{% for namespace in namespaces %}
 using namespace {{ namespace }};
-{% endif %}
+{% endfor %}
 
 
 // --------------------------------------------------------------
@@ -32,97 +31,97 @@ using namespace {{ namespace }};
 
 // Target library path
 static const char *target_library = "{{ target_library }}";
-// Target symbol
-static const char *target_symbol = "{{ target_symbol }}";
+// Target symbols
+static const char *target_symbols[SPECPROF_NB_FUNCTIONS] = {
+{% for func in functions %}
+    "{{ func.target_symbol }}",
+{% endfor %}
+};
+{% for func in functions %}
 // Specific pointer to function type
-typedef {{ return_type|safe }} ({{ func_full_decl }}*func_ptr)({{ func_params|safe }});
+typedef {{ func.return_type|safe }} ({{ func.func_full_decl }}*func_ptr_{{ func.index }})({{ func.func_params|safe }}){% if func.qualifiers %} {{ func.qualifiers }}{% endif %};
 // Address of the target function will be stored in :
-static func_ptr orig_func(nullptr);
-// Total number of calls
-static long int call_count(0);
-// Cumulative time used by the function
-static std::chrono::microseconds total_time_used;
+static func_ptr_{{ func.index }} orig_func_{{ func.index }}(nullptr);
+{% endfor %}
 
 // --------------------------------------------------------------
 // -- FUNCTIONS
 // --------------------------------------------------------------
 
-//Library Initializer
+//Library Initializer : nothing is printed, the target functions are resolved at their first call
 void __attribute__((constructor)) setup()
 {
-    if (orig_func == nullptr) {
-        std::cout << "***********************************************" << std::endl;
-        std::cout << "Call of the library initializer!" << std::endl;
-        void *handle;  // Handle of the target library
-        dlerror();  // Cleaning of potential previous error message
-        std::cout << "Trying to open the target library...";
-        handle = dlopen(target_library, RTLD_LAZY);
-        std::cout << "...done!" << std::endl;
-        if (!handle) {
-            std::cout << "Unable to access origin library!" << std::endl;
-            std::cerr << dlerror() << std::endl;
-            std::terminate();
-        } else {
-            std::cout << "Library " << target_library << " found and opened successfully!" << std::endl;
-        }
-        std::cout << "Trying to acquire the target symbol...";
-        void * tmp_ptr = dlsym(handle, target_symbol);
-        memcpy(&orig_func, &tmp_ptr, sizeof(&tmp_ptr));
-        std::cout << "...done" << std::endl;
-        char *error_msg = dlerror();
-        if (error_msg != nullptr) {
-            std::cout << "Unable to resolve " << target_symbol << " symbol!" << std::endl;
-            std::cerr << error_msg << std::endl;
-            std::terminate();
-        } else {
-            std::cout << "Symbol " << target_symbol << " original address:" << tmp_ptr << std::endl;
-        }
-        std::cout << "***********************************************" << std::endl;
-    }
+    specprof_loader_pid = (uint32_t) getpid();
+    specprof_init_control();
 }
 
+{% for func in functions %}
 // Function prototype
-{% if namespace is not none %}
-namespace {{ namespace }} {
+{% if func.namespace is not none %}
+namespace {{ func.namespace }} {
 {% endif %}
-{{ func_signature|safe }}
+{% set call %}{% if func.class_name != "" %}(this->*orig_func_{{ func.index }}){% else %}(*orig_func_{{ func.index }}){% endif %}({{ func.func_params_names|safe }}){% endset %}
+{{ func.func_signature|safe }}
 {
-    std::chrono::system_clock::time_point start, end;
-    // Call of the original function and measurement of execution time
-    call_count += 1;
-    start = std::chrono::high_resolution_clock::now();
-    std::cout << "Call of the original function ...";
-    {% if return_type != "void" %}
-    {% if class_name != "" %}
-    {{ return_type|safe }} ret_val = (this->*orig_func)({{ func_params_names|safe }});
-    {% else %}
-    {{ return_type|safe }} ret_val = (*orig_func)({{ func_params_names|safe }});
+    // Address of the original function, resolved at the first call
+    if (SPECPROF_UNLIKELY(orig_func_{{ func.index }} == nullptr)) {
+        void *address = specprof_resolve_target(target_library, target_symbols[{{ func.index }}]);
+        memcpy(&orig_func_{{ func.index }}, &address, sizeof(address));
+    }
+    // Call of the original function alone while the measures are disabled
+    if (SPECPROF_UNLIKELY(!specprof_measuring())) {
+        {% if func.return_type != "void" %}
+        return {{ call|safe }};
+        {% else %}
+        {{ call|safe }};
+        return;
+        {% endif %}
+    }
+    // Call of the original function and measurement of execution time (if the call is sampled)
+    struct specprof_stats *stats = specprof_thread_stats({{ func.index }});
+    {% if func.size_param %}
+    // Value of the size parameter, read before the call which may change it
+    int64_t specprof_size = (int64_t) ({{ func.size_param }});
+    {% endif %}
+    {% if allocations %}
+    // Allocations of the thread before the call (every call is accounted)
+    struct specprof_alloc_mark allocs_before;
+    specprof_allocs_enter(&allocs_before);
+    {% endif %}
+    uint64_t start = specprof_start({{ func.index }});
+    {% if counters %}
+    // Performance counters of the thread before the call (read only if the call is timed)
+    struct specprof_counter_values counters_before;
+    start = specprof_counters_start(start, &counters_before);
     {% endif %}
+    {% if func.return_type != "void" %}
+    {{ func.return_type|safe }} ret_val = {{ call|safe }};
     {% else %}
-    {% if class_name != "" %}
-    (this->*orig_func)({{ func_params_names|safe }});
+    {{ call|safe }};
+    {% endif %}
+    {% if func.size_param %}
+    specprof_stop(stats, start, __builtin_return_address(0), {{ func.size_slot }}, specprof_size);
     {% else %}
-    (*orig_func)({{ func_params_names|safe }});
+    specprof_stop(stats, start, __builtin_return_address(0), -1, 0);
+    {% endif %}
+    {% if counters %}
+    specprof_counters_stop(stats, &counters_before);
     {% endif %}
+    {% if allocations %}
+    specprof_allocs_leave(stats, &allocs_before);
     {% endif %}
-    std::cout << "...done" << std::endl;
-    end = std::chrono::high_resolution_clock::now();
-    total_time_used += std::chrono::duration_cast<std::chrono::microseconds>(end - start);
-    {% if return_type != "void" %}
+    {% if func.return_type != "void" %}
     return ret_val;
     {% endif %}
 }
-{% if namespace is not none %}
+{% if func.namespace is not none %}
 }
 {% endif %}
 
+{% endfor %}
 //Library finalizer
 void __attribute__((destructor)) finalize()
 {
     // Printing of the results
-    std::cout << "***********************************************" << std::endl;
-    std::cout << "RESULTS FOR FUNCTION : " << "{{ func_name }}" << std::endl;
-    std::cout << "Call count = " << call_count << std::endl;
-    std::cout << "Total time consumed = " << total_time_used.count() << " microseconds" << std::endl;
-    std::cout << "***********************************************" << std::endl;
+    specprof_report();
 }
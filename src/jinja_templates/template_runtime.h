@@ -0,0 +1,49 @@
+// --------------------------------------------------------------
+// -- SPECPROF RUNTIME
+// -- Common to the C and C++ wrappers. Nothing is printed and no
+// -- lock is taken on the hot path : each thread accumulates its
+// -- measures in its own row of the statistics table and the rows
+// -- are merged when the results are reported.
+// -- Each feature of the runtime is in its own template of the
+// -- runtime directory, included in an order where everything is
+// -- defined before it is used.
+// --------------------------------------------------------------
+{% include 'runtime/core.h' %}
+
+{% include 'runtime/timers.h' %}
+
+{% include 'runtime/sampling.h' %}
+
+{% include 'runtime/histograms.h' %}
+
+{% include 'runtime/processes.h' %}
+
+{% include 'runtime/stats_file.h' %}
+
+{% include 'runtime/trace.h' %}
+
+{% include 'runtime/call_sites.h' %}
+
+{% include 'runtime/call_graph.h' %}
+
+{% include 'runtime/counters.h' %}
+
+{% include 'runtime/sizes.h' %}
+
+{% include 'runtime/allocations.h' %}
+
+{% include 'runtime/rows.h' %}
+
+{% include 'runtime/measures.h' %}
+
+{% include 'runtime/results.h' %}
+
+{% include 'runtime/snapshots.h' %}
+
+{% include 'runtime/fork.h' %}
+
+{% include 'runtime/targets.h' %}
+
+{% include 'runtime/control.h' %}
+
+{% include 'runtime/report.h' %}
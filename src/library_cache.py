@@ -0,0 +1,177 @@
+"""
+A module implementing the LibraryCache class, a persistent cache of the results
+of the analysis of shared objects
+"""
+import os
+import sys
+import time
+import marshal
+import sqlite3
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.library_cache")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "specprof")
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# marshal format depends on the major version of python. Version 2 : the prototypes list the headers
+# declaring the classes and namespaces of the functions
+CACHE_FORMAT = "2-py{:d}".format(sys.version_info[0])
+
+
+class LibraryIdentity(namedtuple("LibraryIdentity", ["path", "size", "mtime_ns", "build_id"])):
+    """
+    The identity of a shared object : if one of the fields changes, the cached results
+    obtained for the library are not valid anymore
+    """
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, path, elf_reader):
+        """
+        :param path: path to the shared object
+        :type path: str
+        :param elf_reader: reader of the shared object
+        :type elf_reader: elf_reader.ElfReader
+        :return: the identity of the shared object
+        :rtype: LibraryIdentity
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        return cls(path, stat.st_size, int(stat.st_mtime * 1e9), elf_reader.build_id() or "")
+
+
+def default_cache_dir():
+    """
+    :return: the directory of the caches of SpecProf, given by the environment variable
+     SPECPROF_CACHE_DIR or ~/.cache/specprof
+    :rtype: str
+    """
+    return os.path.expanduser(os.environ.get("SPECPROF_CACHE_DIR", DEFAULT_CACHE_DIR))
+
+
+def default_cache_path():
+    """
+    :return: path to the cache database, in the directory given by default_cache_dir()
+    :rtype: str
+    """
+    return os.path.join(default_cache_dir(), "library_cache.sqlite")
+
+
+class LibraryCache(object):
+    """
+    A persistent cache, stored in a sqlite database, of the results of the analysis
+    of shared objects.
+
+    Each entry is identified by the identity of the library and by the kind of
+    results it holds ('symbols' for example). When the total size of the entries
+    exceeds the maximum size, the least recently used ones are evicted.
+
+    The results are serialized with marshal, which is compact and fast to load. As its
+    format depends on the python version, the entries written by python 2 are ignored
+    by python 3 and conversely.
+    """
+    def __init__(self, path_to_db=None, max_size=None):
+        """
+        :param path_to_db: path to the database (default_cache_path() by default)
+        :type path_to_db: str
+        :param max_size: maximum size in bytes of the stored results (environment
+         variable SPECPROF_CACHE_MAX_SIZE or 256 MiB by default)
+        :type max_size: int
+        """
+        self._path_to_db = path_to_db or default_cache_path()
+        if max_size is None:
+            max_size = int(os.environ.get("SPECPROF_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE))
+        self._max_size = max_size
+        db_dir = os.path.dirname(self._path_to_db)
+        if db_dir and not os.path.isdir(db_dir):
+            os.makedirs(db_dir)
+        self._connection = sqlite3.connect(self._path_to_db, timeout=30.)
+        # The cache can be shared by concurrent runs and losing the last entries
+        # on a power failure is harmless : no need to sync the disk on each commit
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS entries ("""
+                """ path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"""
+                """ build_id TEXT NOT NULL, kind TEXT NOT NULL, format TEXT NOT NULL,"""
+                """ payload BLOB NOT NULL, payload_size INTEGER NOT NULL, last_access REAL NOT NULL,"""
+                """ PRIMARY KEY (path, kind))""")
+
+    @property
+    def path(self):
+        """
+        :return: path to the database
+        :rtype: str
+        """
+        return self._path_to_db
+
+    def close(self):
+        """
+        Close the connection to the database
+        """
+        self._connection.close()
+
+    def get(self, identity, kind):
+        """
+        :param identity: identity of the library
+        :type identity: LibraryIdentity
+        :param kind: kind of results
+        :type kind: str
+        :return: the cached results or None if there is no valid entry
+        """
+        row = self._connection.execute(
+            "SELECT size, mtime_ns, build_id, format, payload FROM entries WHERE path = ? AND kind = ?",
+            (identity.path, kind)).fetchone()
+        if row is None or tuple(row[:4]) != (identity.size, identity.mtime_ns, identity.build_id,
+                                             CACHE_FORMAT):
+            ADAPTER.info("No valid '{:s}' entry in the cache for {:s}".format(kind, identity.path))
+            return None
+        with self._connection:
+            self._connection.execute("UPDATE entries SET last_access = ? WHERE path = ? AND kind = ?",
+                                     (time.time(), identity.path, kind))
+        ADAPTER.info("'{:s}' entry found in the cache for {:s}".format(kind, identity.path))
+        return marshal.loads(bytes(row[4]))
+
+    def put(self, identity, kind, value):
+        """
+        Store the results, replacing any previous entry of the same kind for the library,
+        and evict the least recently used entries if the cache is full
+
+        :param identity: identity of the library
+        :type identity: LibraryIdentity
+        :param kind: kind of results
+        :type kind: str
+        :param value: results to store (made of python builtin types)
+        """
+        payload = marshal.dumps(value)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (identity.path, identity.size, identity.mtime_ns, identity.build_id, kind,
+                 CACHE_FORMAT, sqlite3.Binary(payload), len(payload), time.time()))
+            self._evict()
+        ADAPTER.info("'{:s}' entry of {:d} bytes stored in the cache for {:s}"
+                     .format(kind, len(payload), identity.path))
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the total size of the entries
+        fits in the maximum size
+        """
+        total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(payload_size), 0) FROM entries").fetchone()[0]
+        if total_size <= self._max_size:
+            return
+        rows = self._connection.execute(
+            "SELECT path, kind, payload_size FROM entries ORDER BY last_access").fetchall()
+        for path, kind, payload_size in rows:
+            if total_size <= self._max_size:
+                break
+            self._connection.execute("DELETE FROM entries WHERE path = ? AND kind = ?", (path, kind))
+            total_size -= payload_size
+            ADAPTER.info("'{:s}' entry for {:s} evicted from the cache".format(kind, path))
@@ -0,0 +1,99 @@
+"""
+A module to follow, while the profiled program runs, the live statistics file written by
+a wrapper generated by SpecProf (see the SPECPROF_STATS_FILE environment variable)
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import errno
+import logging
+from stats_file import StatsFile
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.live_monitor")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+LINE_FORMAT = "{:<32s} {:>14s} {:>12s} {:>14s} {:>12s} {:>12s} {:>12s}"
+
+
+def is_process_alive(pid):
+    """
+    :param pid: identifier of the process
+    :type pid: int
+    :return: True if the process is still running
+    :rtype: bool
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+def format_rates(previous, current, elapsed):
+    """
+    :param previous: statistics of the functions at the previous sample (None for the first one)
+    :type previous: list
+    :param current: statistics of the functions at the current sample
+    :type current: list
+    :param elapsed: time in seconds between the two samples
+    :type elapsed: float
+    :return: the table of the calls per second and of the mean time per call over the interval,
+     followed by the percentiles since the start of the program
+    :rtype: str
+    """
+    lines = [LINE_FORMAT.format("function", "calls", "calls/s", "mean ns (int)", "p50 ns", "p99 ns", "max ns")]
+    for index, stats in enumerate(current):
+        calls, total_ns = stats.call_count, stats.total_ns
+        if previous is not None:
+            calls -= previous[index].call_count
+            total_ns -= previous[index].total_ns
+        rate = "{:.1f}".format(calls / elapsed) if previous is not None and elapsed > 0 else "-"
+        mean = "{:.1f}".format(total_ns / calls) if calls else "-"
+        if stats.sampled_count:
+            p50, p99 = ["{:.0f}".format(stats.histogram.percentile(q)) for q in (0.5, 0.99)]
+            max_ns = "{:.0f}".format(stats.max_ns)
+        else:
+            p50 = p99 = max_ns = "-"
+        lines.append(LINE_FORMAT.format(stats.name[:32], "{:d}".format(stats.call_count), rate, mean,
+                                        p50, p99, max_ns))
+    return "\n".join(lines)
+
+
+def monitor(path, interval=1., count=0, stream=sys.stdout):
+    """
+    Print periodically the calls per second and the mean time per call of every function
+    of a live statistics file. The file is mapped in memory and read without any signal sent
+    to the profiled program, which is never paused.
+
+    :param path: path to the live statistics file
+    :type path: str
+    :param interval: time in seconds between two samples
+    :type interval: float
+    :param count: number of samples to print (0 to follow the program until it ends)
+    :type count: int
+    :param stream: stream where the samples are printed
+    """
+    with StatsFile(path) as stats_file:
+        pid = stats_file.header.pid
+        ADAPTER.info("Following the statistics of process {:d} (timer : {:s})".format(pid, stats_file.timer))
+        previous, previous_time = None, None
+        sample = 0
+        while True:
+            alive = is_process_alive(pid)
+            now = time.time()
+            current = stats_file.merged_stats()
+            elapsed = now - previous_time if previous_time is not None else 0.
+            print(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)), file=stream)
+            print(format_rates(previous, current, elapsed), file=stream)
+            stream.flush()
+            sample += 1
+            if not alive:
+                ADAPTER.info("Process {:d} has ended".format(pid))
+                break
+            if count and sample >= count:
+                break
+            previous, previous_time = current, now
+            time.sleep(interval)
@@ -0,0 +1,688 @@
+"""
+A module to measure, inside the Python process, the time of the calls of a function of a shared
+object. The library is loaded with ctypes and the function is called with the types of its
+prototype (given by the debugging information or by a signature) : the numbers are passed as
+they are, the pointers to numbers as NumPy arrays. After a warmup, the calls are timed in
+samples of many calls, as long as needed for a sample to last a minimum time, the process being
+pinned on a processor. The statistics of the samples are robust to the outliers : median, median
+absolute deviation and bootstrap confidence interval of the median. They may be stored as a
+baseline, to which the next measures are compared.
+"""
+from __future__ import print_function
+import os
+import re
+import gc
+import json
+import time
+import ctypes
+import logging
+import itertools
+import tempfile
+from timeit import default_timer
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from function_wrapper_writer import split_function_prototype, split_parameters
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed by the microbenchmarks
+    numpy = None
+
+LOGGER = logging.getLogger("SpecProf.microbench")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Number of elements of the generated arrays and value of the generated integers
+DEFAULT_SIZE = 1000
+# Time of the warmup, minimum time of a sample and maximum time of all the samples, in seconds
+DEFAULT_WARMUP = 0.2
+DEFAULT_MIN_SAMPLE = 0.001
+DEFAULT_MAX_TIME = 5.
+# Number of samples and of bootstrap resamplings
+DEFAULT_SAMPLES = 200
+DEFAULT_RESAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+# Relative slowdown of the median above which a change is a regression
+DEFAULT_THRESHOLD = 0.05
+# Minimum number of samples taken even when the maximum time is exceeded
+MIN_SAMPLES = 10
+# Maximum number of elements of the matrix of resampled samples built at once
+_BOOTSTRAP_CHUNK = 1 << 22
+
+# ctypes type of the numbers, by their words (sorted, 'int' being implied by the other words)
+_NUMBER_TYPES = {("char",): ctypes.c_byte, ("char", "signed"): ctypes.c_byte, ("char", "unsigned"): ctypes.c_ubyte,
+                 ("short",): ctypes.c_short, ("short", "unsigned"): ctypes.c_ushort,
+                 ("int",): ctypes.c_int, ("signed",): ctypes.c_int, ("unsigned",): ctypes.c_uint,
+                 ("long",): ctypes.c_long, ("long", "unsigned"): ctypes.c_ulong,
+                 ("long", "long"): ctypes.c_longlong, ("long", "long", "unsigned"): ctypes.c_ulonglong,
+                 ("float",): ctypes.c_float, ("double",): ctypes.c_double,
+                 ("double", "long"): ctypes.c_longdouble, ("bool",): ctypes.c_bool, ("_Bool",): ctypes.c_bool,
+                 ("size_t",): ctypes.c_size_t, ("ssize_t",): ctypes.c_ssize_t, ("ptrdiff_t",): ctypes.c_ssize_t,
+                 ("intptr_t",): ctypes.c_ssize_t, ("uintptr_t",): ctypes.c_size_t,
+                 ("int8_t",): ctypes.c_int8, ("int16_t",): ctypes.c_int16, ("int32_t",): ctypes.c_int32,
+                 ("int64_t",): ctypes.c_int64, ("uint8_t",): ctypes.c_uint8, ("uint16_t",): ctypes.c_uint16,
+                 ("uint32_t",): ctypes.c_uint32, ("uint64_t",): ctypes.c_uint64}
+_FLOAT_TYPES = (ctypes.c_float, ctypes.c_double, ctypes.c_longdouble)
+# Words of a declaration that don't change the ctypes type
+_IGNORED_WORDS = frozenset(("const", "volatile", "restrict", "__restrict", "__restrict__", "register"))
+# Words of the declaration of an unnamed parameter that may be taken for its name
+_TYPE_WORDS = frozenset(word for words in _NUMBER_TYPES for word in words) | _IGNORED_WORDS | frozenset(["void"])
+
+# A parameter of the benchmarked function : its name, its declaration, its ctypes type (the type
+# of the elements for a pointer) and whether it is a pointer (or a reference)
+Parameter = namedtuple("Parameter", ["name", "declaration", "ctype", "pointer"])
+# The benchmarked function : its symbol, its unmangled name, the ctypes type of its result (None
+# for void) and its parameters
+Target = namedtuple("Target", ["symbol", "name", "restype", "parameters"])
+# The time per call of the samples in nanoseconds and the number of calls of each sample
+Measure = namedtuple("Measure", ["samples_ns", "calls_per_sample"])
+# The statistics of the time per call in nanoseconds : number of samples, median, median absolute
+# deviation, bootstrap confidence interval of the median, minimum and mean
+Statistics = namedtuple("Statistics", ["nb_samples", "median_ns", "mad_ns", "ci_low_ns", "ci_high_ns",
+                                       "min_ns", "mean_ns"])
+
+
+class Comparison(namedtuple("Comparison", ["ratio", "ci_low", "ci_high", "threshold"])):
+    """
+    The comparison of the median time per call with the one of a baseline : their ratio and its
+    bootstrap confidence interval, and the relative change below which the change is ignored
+    """
+    __slots__ = ()
+
+    @property
+    def verdict(self):
+        """
+        :return: 'regression' if the function is slower (the confidence interval of the ratio is
+         above 1 and the ratio above 1 + threshold), 'improvement' if it is faster, 'unchanged'
+         otherwise
+        :rtype: str
+
+        >>> Comparison(1.2, 1.1, 1.3, 0.05).verdict
+        'regression'
+        >>> Comparison(1.2, 0.9, 1.3, 0.05).verdict
+        'unchanged'
+        >>> Comparison(0.5, 0.4, 0.6, 0.05).verdict
+        'improvement'
+        """
+        if self.ci_low > 1. and self.ratio > 1. + self.threshold:
+            return "regression"
+        if self.ci_high < 1. and self.ratio < 1. - self.threshold:
+            return "improvement"
+        return "unchanged"
+
+
+def _check_numpy():
+    """
+    :raise ImportError: if NumPy isn't installed
+    """
+    if numpy is None:
+        msg = "NumPy is needed to run the microbenchmarks"
+        ADAPTER.error(msg)
+        raise ImportError(msg)
+
+
+def ctypes_type(declaration):
+    """
+    :param declaration: declaration of a type, without name
+    :type declaration: str
+    :return: the ctypes type of the number (the type of the pointed numbers for a pointer or a
+     reference, None for void) and whether the type is a pointer
+    :rtype: tuple
+    :raise ValueError: if the type is neither a number nor a pointer to numbers
+
+    >>> ctypes_type("const double *") == (ctypes.c_double, True)
+    True
+    >>> ctypes_type("long unsigned int") == (ctypes.c_ulong, False)
+    True
+    >>> ctypes_type("std::size_t const") == (ctypes.c_size_t, False)
+    True
+    >>> ctypes_type("vec_t *")
+    Traceback (most recent call last):
+    ...
+    ValueError: the type 'vec_t *' is neither a number nor a pointer to numbers
+    """
+    pointers = declaration.count("*") + len(re.findall(r"&+", declaration))
+    words = [word[5:] if word.startswith("std::") else word for word in re.findall(r"[\w:]+", declaration)
+             if word not in _IGNORED_WORDS]
+    if "int" in words and len(words) > 1:
+        words.remove("int")
+    if words == ["void"] and pointers <= 1:
+        return (ctypes.c_ubyte if pointers else None), pointers == 1
+    ctype = _NUMBER_TYPES.get(tuple(sorted(words)))
+    if ctype is None or pointers > 1 or "(" in declaration or "[" in declaration:
+        raise ValueError("the type '{:s}' is neither a number nor a pointer to numbers".format(declaration.strip()))
+    return ctype, pointers == 1
+
+
+def _split_declaration(declaration, index):
+    """
+    :param declaration: declaration of a parameter
+    :type declaration: str
+    :param index: position of the parameter
+    :type index: int
+    :return: the name of the parameter (p<index> if it has none) and its type
+
+    >>> _split_declaration("const double *x", 0)
+    ('x', 'const double *')
+    >>> _split_declaration("unsigned int", 1)
+    ('p1', 'unsigned int')
+    """
+    match = re.search(r"(\w+)\s*$", declaration)
+    if match is None or match.group(1) in _TYPE_WORDS or not re.search(r"\w", declaration[:match.start()]):
+        return "p{:d}".format(index), declaration
+    return match.group(1), declaration[:match.start()]
+
+
+def make_target(symbol, name, return_type, declarations):
+    """
+    :param symbol: symbol of the function
+    :type symbol: str
+    :param name: unmangled name of the function
+    :type name: str
+    :param return_type: return type of the function
+    :type return_type: str
+    :param declarations: declarations of the parameters
+    :type declarations: list
+    :return: the function to benchmark, with the ctypes types of its result and parameters
+    :rtype: Target
+    :raise ValueError: if the types aren't numbers or pointers to numbers
+
+    >>> target = make_target("dot", "dot", "double", ["const double *x", "const double *y", "size_t n"])
+    >>> [(parameter.name, parameter.pointer) for parameter in target.parameters]
+    [('x', True), ('y', True), ('n', False)]
+    """
+    parameters = []
+    declarations = [declaration for declaration in declarations if declaration.strip() != "void"]
+    for index, declaration in enumerate(declarations):
+        param_name, param_type = _split_declaration(declaration, index)
+        try:
+            ctype, pointer = ctypes_type(param_type)
+        except ValueError as error:
+            msg = "The parameter {:s} of {:s} can't be passed : {:s}".format(param_name, name, str(error))
+            ADAPTER.error(msg)
+            raise ValueError(msg)
+        if ctype is None:
+            msg = "The parameter {:s} of {:s} can't be void".format(param_name, name)
+            ADAPTER.error(msg)
+            raise ValueError(msg)
+        parameters.append(Parameter(param_name, declaration.strip(), ctype, pointer))
+    try:
+        restype, pointer = ctypes_type(return_type)
+    except ValueError as error:
+        msg = "The result of {:s} can't be read : {:s}".format(name, str(error))
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    return Target(symbol, name, ctypes.c_void_p if pointer else restype, tuple(parameters))
+
+
+def target_from_prototype(prototype):
+    """
+    :param prototype: prototype of the function given by the debugging information
+    :type prototype: dwarf_reader.Prototype
+    :return: the function to benchmark
+    :rtype: Target
+    :raise ValueError: if the function is a method or if its types can't be passed by ctypes
+    """
+    qualified = "::".join(part for part in (prototype.namespace, prototype.class_name, prototype.name) if part)
+    if prototype.class_name and prototype.qualifiers != "static":
+        msg = "{:s} is a method : only the functions and the static methods can be called".format(qualified)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    if any(declaration == "..." for declaration, _ in prototype.parameters):
+        msg = "{:s} is a variadic function".format(qualified)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    return make_target(prototype.symbol, qualified, prototype.return_type,
+                       [declaration for declaration, _ in prototype.parameters])
+
+
+def target_from_signature(symbol, signature):
+    """
+    :param symbol: symbol of the function
+    :type symbol: str
+    :param signature: signature of the function
+    :type signature: str
+    :return: the function to benchmark
+    :rtype: Target
+    :raise ValueError: if its types can't be passed by ctypes
+
+    >>> target = target_from_signature("scale", "void scale(double *x, int n, double factor)")
+    >>> target.restype is None, [parameter.name for parameter in target.parameters]
+    (True, ['x', 'n', 'factor'])
+    """
+    return_type, class_name, func_name, parameters = split_function_prototype(signature)
+    name = "::".join(part for part in (class_name, func_name) if part)
+    return make_target(symbol, name, return_type, split_parameters(parameters))
+
+
+def find_target(analyser, query, signature=None):
+    """
+    :param analyser: analyser of the shared object
+    :type analyser: shared_library_analysis.SharedObjectAnalyser
+    :param query: symbol of the function, or a search of its unmangled name (see symbol_index)
+     giving a single best candidate
+    :type query: str
+    :param signature: signature of the function (by default, the one given by the debugging
+     information of the library)
+    :type signature: str
+    :return: the function to benchmark
+    :rtype: Target
+    :raise ValueError: if the function isn't found, has no known prototype or can't be called
+    """
+    functions = dict((function.name, function) for function in analyser.exported_functions)
+    if query in functions:
+        symbol = query
+    else:
+        candidates = analyser.search_symbols(query, 2)
+        if not candidates or (len(candidates) > 1 and candidates[1].score == candidates[0].score):
+            msg = "'{:s}' doesn't name a single function of the library ({:d} candidates, see the symbols " \
+                  "subcommand)".format(query, len(analyser.search_symbols(query, 0)))
+            ADAPTER.error(msg)
+            raise ValueError(msg)
+        symbol = candidates[0].symbol
+    if signature:
+        return target_from_signature(symbol, signature)
+    prototype = analyser.prototypes.get(symbol)
+    if prototype is None:
+        msg = "The prototype of {:s} isn't given by the debugging information : a signature is needed".format(symbol)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    return target_from_prototype(prototype)
+
+
+def _parse_value(parameter, text):
+    """
+    :return: the value of a number given on the command line
+    """
+    if parameter.ctype is ctypes.c_bool:
+        return text.lower() in ("1", "true", "yes")
+    if parameter.ctype in _FLOAT_TYPES:
+        return float(text)
+    return int(text, 0)
+
+
+def make_arguments(target, values=None, size=DEFAULT_SIZE, seed=0):
+    """
+    Build the arguments of the calls. The numbers given by values are passed as they are. The
+    pointers are given as a number of elements, as comma separated elements or as the path of a
+    .npy file prefixed with '@'. The missing integers are size, the floating point numbers 1
+    and the booleans true. The missing arrays have size random elements : uniform in [0, 1) for
+    the floating point numbers, in [0, size) for the integers, and a string of 'a' ended by a
+    null character for the characters.
+
+    :param target: the benchmarked function
+    :type target: Target
+    :param values: the given arguments, as texts, by parameter name
+    :type values: dict
+    :param size: number of elements of the missing arrays and value of the missing integers
+    :type size: int
+    :param seed: seed of the random elements
+    :type seed: int
+    :return: the arguments of the calls (ctypes objects) and the arrays behind the pointers
+    :rtype: tuple
+    :raise ValueError: if a value is invalid or isn't a parameter of the function
+    """
+    _check_numpy()
+    values = dict(values or {})
+    unknown = set(values) - set(parameter.name for parameter in target.parameters)
+    if unknown:
+        msg = "{:s} is not a parameter of {:s}".format(", ".join(sorted(unknown)), target.name)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    random = numpy.random.RandomState(seed)
+    arguments, arrays = [], {}
+    for parameter in target.parameters:
+        text = values.get(parameter.name)
+        try:
+            if not parameter.pointer:
+                value = _parse_value(parameter, text) if text is not None else \
+                    (1 if parameter.ctype in _FLOAT_TYPES or parameter.ctype is ctypes.c_bool else size)
+                arguments.append(parameter.ctype(value))
+                continue
+            dtype = numpy.dtype(parameter.ctype)
+            if text is not None and text.startswith("@"):
+                array = numpy.load(os.path.expanduser(text[1:])).ravel()
+            elif text is not None and "," in text:
+                array = numpy.array([_parse_value(parameter, element) for element in text.split(",") if element])
+            else:
+                length = int(text) if text is not None else size
+                if dtype.itemsize == 1 and dtype.kind in "iu":
+                    array = numpy.full(length, ord("a"))
+                    array[-1:] = 0
+                elif dtype.kind == "f":
+                    array = random.random_sample(length)
+                elif dtype.kind == "b":
+                    array = random.randint(0, 2, length)
+                else:
+                    array = random.randint(0, max(size, 1), length)
+        except (ValueError, TypeError) as error:
+            msg = "Invalid value of the parameter {:s} ({:s}) : {:s}".format(parameter.name, parameter.declaration,
+                                                                          str(error))
+            ADAPTER.error(msg)
+            raise ValueError(msg)
+        array = numpy.ascontiguousarray(array, dtype=dtype)
+        arrays[parameter.name] = array
+        arguments.append(array.ctypes.data_as(ctypes.POINTER(parameter.ctype)))
+    return arguments, arrays
+
+
+def load_function(path_to_so, target):
+    """
+    :param path_to_so: path to the shared object
+    :type path_to_so: str
+    :param target: the benchmarked function
+    :type target: Target
+    :return: the function of the shared object, with the types of its result and parameters
+    :rtype: ctypes function
+    :raise OSError: if the library can't be loaded
+    :raise ValueError: if the library doesn't define the symbol
+    """
+    library = ctypes.CDLL(path_to_so)
+    try:
+        function = library[target.symbol]
+    except AttributeError:
+        msg = "The symbol {:s} is not defined by {:s}".format(target.symbol, path_to_so)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    function.restype = target.restype
+    function.argtypes = [ctypes.POINTER(parameter.ctype) if parameter.pointer else parameter.ctype
+                         for parameter in target.parameters]
+    return function
+
+
+def _libc():
+    """
+    :return: the C library of the process
+    :rtype: ctypes.CDLL
+    """
+    return ctypes.CDLL(None, use_errno=True)
+
+
+def current_cpu():
+    """
+    :return: the processor the calling thread runs on (-1 if unknown)
+    :rtype: int
+    """
+    try:
+        return _libc().sched_getcpu()
+    except AttributeError:
+        return -1
+
+
+def get_affinity():
+    """
+    :return: the processors the process may run on
+    :rtype: set
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    mask = (ctypes.c_ulong * 16)()
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    if _libc().sched_getaffinity(0, ctypes.sizeof(mask), mask) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+    return set(cpu for cpu in range(len(mask) * bits) if mask[cpu // bits] >> (cpu % bits) & 1)
+
+
+def set_affinity(cpus):
+    """
+    :param cpus: the processors the process may run on
+    :type cpus: set
+    :raise OSError: if the affinity can't be changed
+    :raise ValueError: if a processor doesn't exist
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+        return
+    mask = (ctypes.c_ulong * 16)()
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    for cpu in cpus:
+        if not 0 <= cpu < len(mask) * bits:
+            raise ValueError("no processor {:d}".format(cpu))
+        mask[cpu // bits] |= 1 << (cpu % bits)
+    if _libc().sched_setaffinity(0, ctypes.sizeof(mask), mask) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+
+def _time_calls(function, arguments, number):
+    """
+    :return: the time, in seconds, of number calls of the function
+    :rtype: float
+    """
+    iterations = itertools.repeat(None, number)
+    start = default_timer()
+    for _ in iterations:
+        function(*arguments)
+    return default_timer() - start
+
+
+def measure(function, arguments, warmup=DEFAULT_WARMUP, min_sample=DEFAULT_MIN_SAMPLE, nb_samples=DEFAULT_SAMPLES,
+            max_time=DEFAULT_MAX_TIME):
+    """
+    Time the calls of a function. The function is called during the warmup, then the number of
+    calls of a sample is doubled until the sample lasts min_sample, to make the resolution of
+    the timer and the loop negligible. The garbage collector is disabled during the samples.
+
+    :param function: the called function
+    :type function: callable
+    :param arguments: arguments of the calls
+    :type arguments: list
+    :param warmup: minimum time of the calls before the samples, in seconds
+    :type warmup: float
+    :param min_sample: minimum time of a sample, in seconds
+    :type min_sample: float
+    :param nb_samples: number of samples
+    :type nb_samples: int
+    :param max_time: time after which no more sample is taken (once MIN_SAMPLES were taken), in seconds
+    :type max_time: float
+    :return: the time per call of each sample
+    :rtype: Measure
+    """
+    _check_numpy()
+    arguments = tuple(arguments)
+    start = default_timer()
+    function(*arguments)
+    while default_timer() - start < warmup:
+        function(*arguments)
+    number = 1
+    while True:
+        elapsed = _time_calls(function, arguments, number)
+        if elapsed >= min_sample:
+            break
+        number *= 2
+    samples = numpy.empty(max(nb_samples, 1))
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = default_timer() + max_time
+        for index in range(len(samples)):
+            samples[index] = _time_calls(function, arguments, number)
+            if index + 1 >= MIN_SAMPLES and default_timer() > deadline:
+                samples = samples[:index + 1]
+                ADAPTER.warning("Only {:d} samples were taken in {:.1f} s".format(len(samples), max_time))
+                break
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return Measure(samples * 1e9 / number, number)
+
+
+def _bootstrap_medians(samples, nb_resamples, random):
+    """
+    :return: the medians of nb_resamples resamplings with replacement of the samples, computed
+     on matrices of at most _BOOTSTRAP_CHUNK elements
+    :rtype: numpy.ndarray
+    """
+    medians = numpy.empty(nb_resamples)
+    chunk = max(1, _BOOTSTRAP_CHUNK // len(samples))
+    for start in range(0, nb_resamples, chunk):
+        count = min(chunk, nb_resamples - start)
+        medians[start:start + count] = numpy.median(samples[random.randint(0, len(samples), (count, len(samples)))],
+                                                    axis=1)
+    return medians
+
+
+def statistics(samples_ns, nb_resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, seed=0):
+    """
+    :param samples_ns: time per call of the samples, in nanoseconds
+    :type samples_ns: numpy.ndarray
+    :param nb_resamples: number of bootstrap resamplings
+    :type nb_resamples: int
+    :param confidence: level of the confidence interval of the median
+    :type confidence: float
+    :param seed: seed of the resamplings
+    :type seed: int
+    :return: the statistics of the samples
+    :rtype: Statistics
+
+    >>> stats = statistics(numpy.array([10., 11., 12., 10., 9., 100.]))
+    >>> stats.median_ns, stats.mad_ns, stats.min_ns
+    (10.5, 1.0, 9.0)
+    """
+    _check_numpy()
+    samples = numpy.asarray(samples_ns, dtype=float)
+    median = numpy.median(samples)
+    medians = _bootstrap_medians(samples, nb_resamples, numpy.random.RandomState(seed))
+    low, high = numpy.percentile(medians, [50. * (1. - confidence), 50. * (1. + confidence)])
+    return Statistics(len(samples), float(median), float(numpy.median(numpy.abs(samples - median))),
+                      float(low), float(high), float(samples.min()), float(samples.mean()))
+
+
+def compare(samples_ns, baseline_ns, threshold=DEFAULT_THRESHOLD, nb_resamples=DEFAULT_RESAMPLES,
+            confidence=DEFAULT_CONFIDENCE, seed=0):
+    """
+    :param samples_ns: time per call of the samples, in nanoseconds
+    :type samples_ns: numpy.ndarray
+    :param baseline_ns: time per call of the samples of the baseline, in nanoseconds
+    :type baseline_ns: numpy.ndarray
+    :param threshold: relative change of the median below which the change is ignored
+    :type threshold: float
+    :param nb_resamples: number of bootstrap resamplings
+    :type nb_resamples: int
+    :param confidence: level of the confidence interval of the ratio
+    :type confidence: float
+    :param seed: seed of the resamplings
+    :type seed: int
+    :return: the ratio of the median time per call over the one of the baseline, with the
+     confidence interval given by resampling both
+    :rtype: Comparison
+
+    >>> compare(numpy.array([20., 21., 19., 20.]), numpy.array([10., 11., 9., 10.])).verdict
+    'regression'
+    """
+    _check_numpy()
+    samples = numpy.asarray(samples_ns, dtype=float)
+    baseline = numpy.asarray(baseline_ns, dtype=float)
+    random = numpy.random.RandomState(seed)
+    ratios = _bootstrap_medians(samples, nb_resamples, random) / _bootstrap_medians(baseline, nb_resamples, random)
+    low, high = numpy.percentile(ratios, [50. * (1. - confidence), 50. * (1. + confidence)])
+    return Comparison(float(numpy.median(samples) / numpy.median(baseline)), float(low), float(high), threshold)
+
+
+def call_overhead_ns(min_sample=DEFAULT_MIN_SAMPLE, nb_samples=50):
+    """
+    :return: the median time, in nanoseconds, of a call of labs through ctypes : the part of the
+     measures spent by ctypes and the loop rather than in the function
+    :rtype: float
+    """
+    function = _libc().labs
+    function.restype = ctypes.c_long
+    function.argtypes = [ctypes.c_long]
+    return float(numpy.median(measure(function, [ctypes.c_long(1)], 0., min_sample, nb_samples).samples_ns))
+
+
+def save_baseline(path, path_to_so, target, values, size, measured):
+    """
+    Store the samples of a measure as a baseline
+
+    :param path: path to the baseline file
+    :type path: str
+    :param path_to_so: path to the shared object
+    :type path_to_so: str
+    :param target: the benchmarked function
+    :type target: Target
+    :param values: the given arguments, by parameter name
+    :type values: dict
+    :param size: size of the generated arguments
+    :type size: int
+    :param measured: the measure
+    :type measured: Measure
+    """
+    baseline = {'library': path_to_so, 'symbol': target.symbol, 'name': target.name, 'arguments': values,
+                'size': size, 'calls_per_sample': measured.calls_per_sample, 'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'samples_ns': [float(sample) for sample in measured.samples_ns]}
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    # Written in a temporary file then renamed : concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=directory or None, suffix=".tmp")
+    with os.fdopen(fd, "w") as stream:
+        json.dump(baseline, stream, indent=2, sort_keys=True, separators=(",", ": "))
+    os.rename(tmp_path, path)
+    ADAPTER.info("Baseline stored in {:s}".format(path))
+
+
+def load_baseline(path, target, values, size):
+    """
+    :param path: path to the baseline file
+    :type path: str
+    :param target: the benchmarked function
+    :type target: Target
+    :param values: the given arguments, by parameter name
+    :type values: dict
+    :param size: size of the generated arguments
+    :type size: int
+    :return: the time per call of the samples of the baseline, in nanoseconds
+    :rtype: numpy.ndarray
+    :raise IOError: if the file can't be read
+    :raise ValueError: if the file isn't a baseline or is the baseline of another function
+    """
+    with open(path) as stream:
+        try:
+            baseline = json.load(stream)
+            samples = numpy.array(baseline["samples_ns"], dtype=float)
+        except (ValueError, KeyError, TypeError) as error:
+            msg = "Invalid baseline file {:s} : {:s}".format(path, str(error))
+            ADAPTER.error(msg)
+            raise ValueError(msg)
+    if baseline.get("symbol") != target.symbol or not len(samples):
+        msg = "{:s} is not a baseline of {:s}".format(path, target.name)
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    if baseline.get("arguments") != values or baseline.get("size") != size:
+        ADAPTER.warning("The baseline {:s} was measured with other arguments".format(path))
+    return samples
+
+
+def format_measure(target, measured, stats, overhead_ns=None, comparison=None, confidence=DEFAULT_CONFIDENCE):
+    """
+    :param target: the benchmarked function
+    :type target: Target
+    :param measured: the measure
+    :type measured: Measure
+    :param stats: statistics of the measure
+    :type stats: Statistics
+    :param overhead_ns: time of a call of an empty function through ctypes, in nanoseconds
+    :type overhead_ns: float
+    :param comparison: comparison with the baseline
+    :type comparison: Comparison
+    :param confidence: level of the confidence intervals
+    :type confidence: float
+    :return: the report of the measure
+    :rtype: str
+    """
+    lines = ["SpecProf microbenchmark of {:s} ({:d} samples of {:d} calls)".format(target.name, stats.nb_samples,
+                                                                                  measured.calls_per_sample)]
+    line_format = "{:<34s} {:>14s}"
+    lines.append(line_format.format("median ns", "{:.1f}".format(stats.median_ns)))
+    lines.append(line_format.format("median absolute deviation ns", "{:.1f}".format(stats.mad_ns)))
+    lines.append(line_format.format("{:.0f}% confidence interval ns".format(100. * confidence),
+                                    "{:.1f} - {:.1f}".format(stats.ci_low_ns, stats.ci_high_ns)))
+    lines.append(line_format.format("min ns", "{:.1f}".format(stats.min_ns)))
+    lines.append(line_format.format("mean ns", "{:.1f}".format(stats.mean_ns)))
+    if overhead_ns is not None:
+        lines.append(line_format.format("ctypes call overhead ns", "{:.1f}".format(overhead_ns)))
+    if comparison is not None:
+        lines.append("BASELINE : {:s}, {:.3f} times the median of the baseline ({:.3f} - {:.3f}, threshold {:.0f}%)"
+                     .format(comparison.verdict.upper(), comparison.ratio, comparison.ci_low, comparison.ci_high,
+                             100. * comparison.threshold))
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+"""
+A module storing the measured overhead of the wrapper libraries, which is written into the
+generated wrappers and subtracted from their results
+"""
+import os
+import json
+import errno
+import logging
+import tempfile
+from colored_logger import ColoredLoggerAdapter
+from library_cache import default_cache_dir
+
+LOGGER = logging.getLogger("SpecProf.overhead_calibration")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+
+def default_calibration_path():
+    """
+    :return: path to the calibration file, in the directory given by default_cache_dir()
+    :rtype: str
+    """
+    return os.path.join(default_cache_dir(), "overhead_calibration.json")
+
+
+def load_calibration(path=None):
+    """
+    :param path: path to the calibration file (default_calibration_path() by default)
+    :type path: str
+    :return: the time, in nanoseconds, added by the wrapper to each measured call, by timer
+     (empty if the wrappers were never calibrated)
+    :rtype: dict
+    """
+    path = path or default_calibration_path()
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (IOError, OSError) as error:
+        if error.errno != errno.ENOENT:
+            ADAPTER.warning("Unable to read the calibration file {:s} : {:s}".format(path, str(error)))
+    except ValueError as error:
+        ADAPTER.warning("Invalid calibration file {:s} : {:s}".format(path, str(error)))
+    return {}
+
+
+def load_overhead_ns(timer, path=None):
+    """
+    :param timer: timer of the wrapper
+    :type timer: str
+    :param path: path to the calibration file (default_calibration_path() by default)
+    :type path: str
+    :return: the time, in nanoseconds, added by the wrapper to each call measured with the
+     timer (0 if the timer was never calibrated)
+    :rtype: float
+    """
+    return float(load_calibration(path).get(timer, 0.))
+
+
+def store_calibration(overheads, path=None):
+    """
+    Store the measured overheads, replacing those of the same timers
+
+    :param overheads: time, in nanoseconds, added by the wrapper to each measured call, by timer
+    :type overheads: dict
+    :param path: path to the calibration file (default_calibration_path() by default)
+    :type path: str
+    """
+    path = path or default_calibration_path()
+    calibration = load_calibration(path)
+    calibration.update(overheads)
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    # Written in a temporary file then renamed : concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=directory or None, suffix=".tmp")
+    with os.fdopen(fd, "w") as stream:
+        json.dump(calibration, stream, indent=2, sort_keys=True, separators=(",", ": "))
+    os.rename(tmp_path, path)
+    ADAPTER.info("Overheads of the wrappers stored in {:s}".format(path))
@@ -3,51 +3,96 @@ A module implementing the SharedObjectAnalyser class
 """
 from __future__ import print_function
 import os
+import sqlite3
 import logging
-import subprocess
-from src.colored_logger import ColoredLoggerAdapter
+from colored_logger import ColoredLoggerAdapter
+from demangler import demangle_symbols
+from dwarf_reader import Prototype, read_prototypes
+from elf_reader import ElfReader, ElfSymbol
+from library_cache import LibraryCache, LibraryIdentity
+from symbol_index import SymbolIndex, DEFAULT_LIMIT
 
 LOGGER = logging.getLogger("SpecProf.shared_library_analysis")
 LOGGER.setLevel(logging.DEBUG)
 ADAPTER = ColoredLoggerAdapter(LOGGER)
 
 
-def _exec_and_log(cmd, encoding='iso-8859-1'):
-    """
-    Execute the command in a subprocess and log the error or the success
-
-    :param cmd: command to execute
-    :type cmd: str
-    :param encoding: encoding of the output string
-    :type encoding: str
-    :return: the result of the command
-    :rtype: str
-    """
-    ADAPTER.info("Call of command : < {:s} >".format(cmd))
-    try:
-        output_bytes = subprocess.check_output(cmd, shell=True)
-    except subprocess.CalledProcessError as error:
-        ADAPTER.error("""The command {:s} doesn't succeed!"""
-                      """ Return code is : {:d}""".format(cmd, error.returncode))
-        ADAPTER.error("{:s}".format(error.output))
-        raise
-    ADAPTER.info("Command succeed!")
-    return output_bytes.decode(encoding).split(os.linesep)
-
-
 class SharedObjectAnalyser(object):
     """
     A class to analyse contents of a shared object
     """
-    def __init__(self, path_to_so):
+    def __init__(self, path_to_so, use_cache=True):
         """
         :param path_to_so: path to the shared object
         :type path_to_so: str
+        :param use_cache: if True, the results of the analysis are read from (or stored in)
+         the persistent cache of the analysed libraries
+        :type use_cache: bool
         """
         self.__path_to_so = self._check_path(os.path.expanduser(path_to_so))
+        self.__use_cache = use_cache
+        self.__symbol_index = None
+        self.__prototypes = None
+        with ElfReader(self.__path_to_so) as elf_reader:
+            self.__identity = LibraryIdentity.of(self.__path_to_so, elf_reader)
+            if use_cache and self._load_from_cache():
+                return
+            self.__elf_symbols = self._get_elf_symbols(elf_reader)
+            self.__needed_libraries = elf_reader.needed_libraries()
         self.__symbols = self._get_symbol_names()
         self.__language = self._determine_language()
         self.__mangling_map = self._get_symbol_unmangled_map()
+        if use_cache:
+            self._store_in_cache()
+
+    def _load_from_cache(self):
+        """
+        Read the results of a previous analysis of the same library in the cache
+
+        :return: True if the results have been found
+        :rtype: bool
+        """
+        try:
+            cache = LibraryCache()
+            try:
+                entry = cache.get(self.__identity, "symbols")
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError, ValueError) as error:
+            ADAPTER.warning("Unable to read the library cache : {:s}".format(str(error)))
+            return False
+        if entry is None:
+            return False
+        self.__symbol_columns = entry['symbol_columns']
+        self.__elf_symbols = None
+        self.__needed_libraries = entry['needed_libraries']
+        self.__symbols = self.__symbol_columns[0]
+        self.__language = entry['language']
+        if self.__language == "c++":
+            self.__mangling_map = dict(zip(*entry['mangling_map']))
+        else:
+            self.__mangling_map = dict(zip(self.__symbols, self.__symbols))
+        return True
+
+    def _store_in_cache(self):
+        """
+        Store the results of the analysis in the cache. The symbols are stored by
+        columns (names, values, sizes...) which is much faster to load.
+        """
+        entry = {'symbol_columns': [list(column) for column in zip(*self.__elf_symbols)]
+                                   or [[] for _ in ElfSymbol._fields],
+                 'needed_libraries': self.__needed_libraries,
+                 'language': self.__language,
+                 'mangling_map': ([list(self.__mangling_map.keys()), list(self.__mangling_map.values())]
+                                  if self.__language == "c++" else None)}
+        try:
+            cache = LibraryCache()
+            try:
+                cache.put(self.__identity, "symbols", entry)
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError) as error:
+            ADAPTER.warning("Unable to write in the library cache : {:s}".format(str(error)))
 
     @property
     def language(self):
@@ -59,6 +104,135 @@ class SharedObjectAnalyser(object):
         """
         return self.__language
 
+    @property
+    def symbols(self):
+        """
+        Symbols pty accessor
+
+        :return: the symbols of the library with their type, binding, size and version
+        :rtype: list of elf_reader.ElfSymbol
+        """
+        if self.__elf_symbols is None:
+            # Symbols loaded from the cache are only built on demand
+            self.__elf_symbols = [ElfSymbol(*fields) for fields in zip(*self.__symbol_columns)]
+        return self.__elf_symbols
+
+    @property
+    def defined_symbols(self):
+        """
+        :return: the symbols defined in the library
+        :rtype: list of elf_reader.ElfSymbol
+        """
+        return [sym for sym in self.symbols if sym.is_defined]
+
+    @property
+    def undefined_symbols(self):
+        """
+        :return: the symbols the library expects from its dependencies
+        :rtype: list of elf_reader.ElfSymbol
+        """
+        return [sym for sym in self.symbols if not sym.is_defined]
+
+    @property
+    def exported_functions(self):
+        """
+        :return: the functions defined in the library that a preloaded library can interpose
+        :rtype: list of elf_reader.ElfSymbol
+        """
+        return [sym for sym in self.defined_symbols
+                if sym.type in ("FUNC", "GNU_IFUNC") and sym.binding in ("GLOBAL", "WEAK")]
+
+    @property
+    def symbol_index(self):
+        """
+        :return: the search index of the exported functions by unmangled name, built at the first use
+        :rtype: symbol_index.SymbolIndex
+        """
+        if self.__symbol_index is None:
+            self.__symbol_index = SymbolIndex((sym.name, self.__mangling_map.get(sym.name, sym.name))
+                                              for sym in self.exported_functions)
+        return self.__symbol_index
+
+    def search_symbols(self, query, limit=DEFAULT_LIMIT):
+        """
+        :param query: a text, a glob such as 'ns::*' or a regular expression prefixed with 're:'
+         (see symbol_index.SymbolIndex.search)
+        :type query: str
+        :param limit: maximum number of candidates (all if 0 or None)
+        :type limit: int
+        :return: the exported functions found, ranked
+        :rtype: list of symbol_index.SymbolMatch
+        :raise ValueError: if the regular expression is invalid
+        """
+        return self.symbol_index.search(query, limit)
+
+    @property
+    def prototypes(self):
+        """
+        :return: the prototypes of the exported functions given by the debugging information of the
+         library (empty if it has none), by symbol. They are read at the first use, or taken from
+         the cache.
+        :rtype: dict of dwarf_reader.Prototype
+        """
+        if self.__prototypes is None:
+            self.__prototypes = self._cached_prototypes() if self.__use_cache else None
+            if self.__prototypes is None:
+                self.__prototypes = read_prototypes(self.__path_to_so,
+                                                    set(sym.name for sym in self.exported_functions))
+                if self.__use_cache:
+                    self._store_prototypes()
+        return self.__prototypes
+
+    def _cached_prototypes(self):
+        """
+        :return: the prototypes read by a previous analysis of the same library or None
+        :rtype: dict
+        """
+        try:
+            cache = LibraryCache()
+            try:
+                entry = cache.get(self.__identity, "prototypes")
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError, ValueError) as error:
+            ADAPTER.warning("Unable to read the library cache : {:s}".format(str(error)))
+            return None
+        if entry is None:
+            return None
+        return dict((fields[0], Prototype(*fields)) for fields in entry)
+
+    def _store_prototypes(self):
+        """
+        Store the prototypes in the cache, as tuples
+        """
+        try:
+            cache = LibraryCache()
+            try:
+                cache.put(self.__identity, "prototypes",
+                          [tuple(prototype) for prototype in self.__prototypes.values()])
+            finally:
+                cache.close()
+        except (sqlite3.Error, IOError, OSError) as error:
+            ADAPTER.warning("Unable to write in the library cache : {:s}".format(str(error)))
+
+    @property
+    def mangling_map(self):
+        """
+        :return: the unmangled name of each symbol (the symbol itself for a C library)
+        :rtype: dict
+        """
+        return self.__mangling_map
+
+    @property
+    def needed_libraries(self):
+        """
+        Needed libraries pty accessor
+
+        :return: the libraries the shared object directly depends on
+        :rtype: list
+        """
+        return self.__needed_libraries
+
     @staticmethod
     def _check_path(path):
         """
@@ -95,27 +269,45 @@ class SharedObjectAnalyser(object):
         ADAPTER.info("Trying to compute mapping between mangled and unmangled symbols "
                      "in the shared object")
         res = {}
+        to_demangle = []
         for _sym in self.__symbols:
             if _sym and self.__language == "c++":
-                cmd = "c++filt -it {:s}".format(_sym)
-                output_str = _exec_and_log(cmd)
-                if output_str[0] != _sym:
-                    res[_sym] = output_str[0]
+                to_demangle.append(_sym)
             else:
                 res[_sym] = _sym
+        for _sym, _unmangled in zip(to_demangle, demangle_symbols(to_demangle)):
+            if _unmangled != _sym:
+                res[_sym] = _unmangled
         return res
 
+    @staticmethod
+    def _get_elf_symbols(elf_reader):
+        """
+        Get the symbols of the shared object from its static symbol table or,
+        if the library is stripped, from its dynamic symbol table.
+        As nm does, the section and file symbols are ignored.
+
+        :param elf_reader: reader of the shared object
+        :type elf_reader: elf_reader.ElfReader
+        :return: the list of symbols found in the shared object
+        :rtype: list of elf_reader.ElfSymbol
+        """
+        table = '.symtab' if elf_reader.has_symbol_table('.symtab') else '.dynsym'
+        ADAPTER.info("Reading the {:s} symbol table of the shared object...".format(table))
+        symbols = [sym for sym in elf_reader.iter_symbols(table)
+                   if sym.name and sym.type not in ("SECTION", "FILE")]
+        ADAPTER.info("{:d} symbols found ({:d} defined)".format(
+            len(symbols), sum(1 for sym in symbols if sym.is_defined)))
+        return symbols
+
     def _get_symbol_names(self):
         """
-        Get the symbol name in the shared object thanks to nm utility
+        Get the symbol names in the shared object
 
         :return: the list of symbols found in the shared object
         :rtype: list
         """
-        ADAPTER.info("Trying to get symbol names for the shared object...")
-        cmd = "nm {:s}".format(self.__path_to_so)
-        output_str = _exec_and_log(cmd)
-        return [line.split(' ')[-1] for line in output_str]
+        return [sym.name for sym in self.__elf_symbols]
 
     def print_mangling_map(self):
         """
@@ -126,16 +318,40 @@ class SharedObjectAnalyser(object):
 
     def ask_for_symbol(self):
         """
-        Ask the user which symbol is relevant.
+        Ask the user which symbol is relevant : the exported functions are searched with the
+        queries typed until one of the candidates printed is chosen by its number (or the symbol of
+        an exported function is typed as is). The return type is asked only if the debugging information doesn't give it.
 
         :return: a triplet symbol/unmangled name of the symbol/return type
         :rtype: (symbol, unmangled_name, return type)
         """
-        self.print_mangling_map()
-        answer = raw_input("""Among all the preceeding symbols which one if of interest?"""
-                           + os.linesep)
+        candidates = []
+        exported = set(sym.name for sym in self.exported_functions)
+        while True:
+            answer = raw_input("""Search the function of interest (name, 'ns::*' or 're:REGEX')"""
+                               """ or type the number of a candidate :""" + os.linesep).strip()
+            if answer.isdigit() and 0 < int(answer) <= len(candidates):
+                answer = candidates[int(answer) - 1].symbol
+                break
+            if answer in exported:
+                break
+            if not answer:
+                continue
+            try:
+                candidates = self.search_symbols(answer)
+            except ValueError as error:
+                print(str(error))
+                continue
+            if not candidates:
+                print("No function found for '{:s}'".format(answer))
+            for number, candidate in enumerate(candidates, 1):
+                print("{:3d}. {:s} <==> {:s}".format(number, candidate.symbol, candidate.name))
+        prototype = self.prototypes.get(answer)
+        if prototype is not None:
+            print("Prototype given by the debugging information : {:s}".format(prototype.signature))
+            return (answer, self.__mangling_map.get(answer, answer), prototype.return_type)
         rtype = raw_input("""For the selected symbol what is the associated return type?""")
-        return (answer, self.__mangling_map[answer], rtype)
+        return (answer, self.__mangling_map.get(answer, answer), rtype)
 
     def _determine_language(self):
         """
@@ -144,10 +360,7 @@ class SharedObjectAnalyser(object):
         :return: the language used to build the shared library ('c'|'c++')
         """
         ADAPTER.info("Trying to determine the language (c or c++) of the shared object...")
-        cmd = "ldd {:s}".format(self.__path_to_so)
-        output_str = _exec_and_log(cmd)
-        for lib in output_str:
-            lib = lib.lstrip()
+        for lib in self.__needed_libraries:
             if lib.startswith('libstdc++'):
                 ADAPTER.info("The shared library seems to be a C++ one!")
                 return 'c++'
@@ -0,0 +1,115 @@
+"""
+A module to merge the snapshots written by the wrappers generated by SpecProf (see the
+SPECPROF_SNAPSHOT_DIR and SPECPROF_SNAPSHOT_INTERVAL environment variables) into a time
+series of the call rate and of the mean time per call of each function, interval by interval
+"""
+from __future__ import print_function
+import os
+import re
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from stats_file import StatsFile, SNAPSHOT_TRIGGERS
+
+LOGGER = logging.getLogger("SpecProf.snapshots")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Name of a snapshot : specprof.<pid>.<number>.bin
+SNAPSHOT_NAME = re.compile(r"^specprof\.(\d+)\.(\d+)\.bin$")
+
+# The calls of a function ended during the interval of a snapshot, the times in seconds since
+# the start of the profiling. The mean and the percentile, in nanoseconds, are those of the
+# timed calls of the interval, without the overhead of the wrapper (None if no call was timed).
+SeriesPoint = namedtuple("SeriesPoint", ["pid", "snapshot", "trigger", "start_s", "end_s", "function",
+                                         "call_count", "calls_per_s", "mean_ns", "p99_ns"])
+
+
+def find_snapshots(directory, pid=None):
+    """
+    :param directory: directory of the snapshots
+    :type directory: str
+    :param pid: identifier of the process of which the snapshots are wanted (all by default)
+    :type pid: int
+    :return: the paths of the snapshots, ordered by process and by number
+    :rtype: list
+    """
+    found = []
+    for name in os.listdir(directory):
+        match = SNAPSHOT_NAME.match(name)
+        if match and (pid is None or int(match.group(1)) == pid):
+            found.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    found.sort()
+    for (pid_a, number_a, _), (pid_b, number_b, _) in zip(found, found[1:]):
+        if pid_a == pid_b and number_b != number_a + 1:
+            ADAPTER.warning("Snapshots {:d} to {:d} of process {:d} are missing : their calls are lost"
+                            .format(number_a + 1, number_b - 1, pid_a))
+    return [path for _, _, path in found]
+
+
+def time_series(paths):
+    """
+    :param paths: paths of the snapshots
+    :type paths: list
+    :return: the points of the time series, one per snapshot and function
+    :rtype: list
+    """
+    points = []
+    for path in paths:
+        with StatsFile(path) as snapshot:
+            header = snapshot.header
+            if not header.snapshot:
+                ADAPTER.warning("{:s} is not a snapshot, it is skipped".format(path))
+                continue
+            start_s, end_s = header.period_start_ns * 1e-9, header.period_end_ns * 1e-9
+            trigger = SNAPSHOT_TRIGGERS[header.trigger] if header.trigger < len(SNAPSHOT_TRIGGERS) else "unknown"
+            for stats in snapshot.merged_stats():
+                timed = stats.sampled_count > 0
+                points.append(SeriesPoint(header.pid, header.snapshot, trigger, start_s, end_s, stats.name,
+                                          stats.call_count,
+                                          stats.call_count / (end_s - start_s) if end_s > start_s else None,
+                                          stats.mean_ns if timed else None,
+                                          stats.histogram.percentile(0.99) if timed else None))
+    return points
+
+
+def _format_value(value, value_format):
+    """
+    :return: the formatted value, or "-" if it is None
+    :rtype: str
+    """
+    return "-" if value is None else value_format.format(value)
+
+
+def format_time_series(points, output_format="table"):
+    """
+    :param points: points of the time series
+    :type points: list
+    :param output_format: 'table' to be read, 'csv' to be plotted
+    :type output_format: str
+    :return: the time series, one line per snapshot and function
+    :rtype: str
+    """
+    if output_format not in ("table", "csv"):
+        msg = "Available formats are : csv, table"
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    if output_format == "csv":
+        lines = [",".join(SeriesPoint._fields)]
+        for point in points:
+            lines.append(",".join([str(point.pid), str(point.snapshot), point.trigger,
+                                   "{:.6f}".format(point.start_s), "{:.6f}".format(point.end_s),
+                                   '"{:s}"'.format(point.function.replace('"', '""')), str(point.call_count),
+                                   _format_value(point.calls_per_s, "{:.3f}"), _format_value(point.mean_ns, "{:.1f}"),
+                                   _format_value(point.p99_ns, "{:.0f}")]))
+        return "\n".join(lines)
+    line_format = "{:>8s} {:>8s} {:>9s} {:>10s} {:>10s}  {:<32s} {:>12s} {:>12s} {:>12s} {:>10s}"
+    lines = [line_format.format("pid", "snapshot", "trigger", "start s", "end s", "function", "calls", "calls/s",
+                                "mean ns", "p99 ns")]
+    for point in points:
+        lines.append(line_format.format(str(point.pid), str(point.snapshot), point.trigger,
+                                        "{:.3f}".format(point.start_s), "{:.3f}".format(point.end_s),
+                                        point.function[:32], str(point.call_count),
+                                        _format_value(point.calls_per_s, "{:.1f}"),
+                                        _format_value(point.mean_ns, "{:.1f}"), _format_value(point.p99_ns, "{:.0f}")))
+    return "\n".join(lines)
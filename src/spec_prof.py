@@ -15,13 +15,23 @@ SpecProf, Specialized Profiler, generates a shared object that count calls and m
 @todo: test for a method
 @todo: test for namespace
 @todo: describe the usage in README.md
-@todo: list the prerequisits (jinja2, nm and ldd tools, g++, gcc) in README.md
+@todo: list the prerequisits (jinja2, c++filt, g++, gcc) in README.md
 """
 
+from __future__ import print_function
 import sys
 import logging
 import shared_library_analysis
 import function_wrapper_writer
+import live_monitor
+import batch_pipeline
+import overhead_calibration
+import trace_export
+import call_sites
+import snapshots
+import aggregate
+import symbol_index
+import microbench
 import os.path
 
 from argparse import ArgumentParser
@@ -100,25 +110,496 @@ def _epilog():
 
     SpecProf will generate a file named **libcompute_hydrodynamics_wrapper.cpp** and a shared object **libcompute_hydrodynamics_wrapper.so** in the /tmp/working_dir directory. 
 
+    # Profiling several functions
+
+    Several functions of the target library can be profiled by a single wrapper library. They are listed in a manifest,
+    one function per line, with the symbol of the function, its signature and optionally its namespace separated by '|' :
+
+    `waste_time | void waste_time(int seconds)`
+
+    `./spec_prof.py -o /path/to/libcompute_hydrodynamics.so -m /path/to/functions.manifest -w /tmp/working_dir`
+
+    **-m** : path to the manifest (replaces **-s**)
+
+    The wrapper library reports the results of every listed function when the program ends.
+
     # Postscript
 
     Once generated, the shared library wrapper is used thanks to the following command :
 
     `LD_PRELOAD=/tmp/working_dir/libcompute_hydrodynamics_wrapper.so /path/to/executable/using/the/target/library`
 
+    # Scaling
+
+    With **--size-param** (or **size=PARAMETER** in a manifest), the calls of a function are also accumulated by power
+    of two of an integer parameter giving the size of the problem. The report gives the mean time and the time per unit
+    of size of each size, and the exponent of the power law fitted on them :
+
+    `./spec_prof.py -o /path/to/libtimewaster.so -w /tmp/working_dir -s "void waste_time(int seconds)" --size-param seconds`
+
+    # Batch
+
+    The `batch` subcommand wraps, without any question, the functions of a whole tree of shared objects selected by
+    rules on their unmangled names. The libraries are processed in parallel :
+
+    `./spec_prof.py batch /path/to/lib_dir -w /tmp/working_dir -e "re:^hydro::.* | void | hydro" -j 8`
+
+    # Symbols
+
+    Without **-m**, the symbol of the function to profile is searched interactively among the exported functions of
+    the library : by name, by glob such as `hydro::*` or by regular expression prefixed with `re:`. The same search is
+    done by :
+
+    `./spec_prof.py symbols /path/to/libcompute_hydrodynamics.so computePressure "hydro::*"`
+
+    # Debugging information
+
+    When the library is built with **-g**, the prototypes of its functions (return type, named parameters, namespace,
+    class and headers) are read in its debugging information : neither **-s** nor the return type are asked, and a
+    manifest line may be reduced to the symbol of the function.
+
+    # Microbenchmark
+
+    The `bench` subcommand calls a function of the library from Python, through ctypes, with the types of its prototype
+    (given by the debugging information or by **-s**) and generated or given arguments, the pointers to numbers being
+    NumPy arrays. The median time per call and its confidence interval are compared with a baseline :
+
+    `./spec_prof.py bench /path/to/libcompute_hydrodynamics.so "hydro::update" -a n=4096 -b /tmp/update.json`
+
+    # Live statistics
+
+    When the **SPECPROF_STATS_FILE** environment variable gives the path of a file, the wrapper library keeps its
+    statistics in this memory-mapped file while the program runs. They are followed, without pausing the program, with :
+
+    `./spec_prof.py live /tmp/stats.bin`
+
+    # Snapshots
+
+    When the **SPECPROF_SNAPSHOT_DIR** environment variable names a directory, the wrapper library writes there the
+    statistics of the calls ended since its previous snapshot on SIGUSR1, every **SPECPROF_SNAPSHOT_INTERVAL** seconds if
+    given and at the end of the program. They are merged into a time series with :
+
+    `./spec_prof.py snapshots /tmp/snapshots -f csv`
+
+    # Processes
+
+    In the paths given by the environment variables, %p is replaced by the pid of the process and %r by its MPI rank.
+    A forked child starts from empty statistics and appends its pid to the paths without %p. The results files of all
+    the processes are aggregated, with the imbalance of each function and the outlier processes, by :
+
+    `./spec_prof.py aggregate /tmp/results`
+
+    # Trace
+
+    When the **SPECPROF_TRACE_FILE** environment variable gives the path of a file, the wrapper library records the start
+    and end of every timed call in it. The trace is converted for chrome://tracing or the Perfetto UI with :
+
+    `./spec_prof.py trace /tmp/trace.bin -f perfetto`
+
+    # Call sites
+
+    A wrapper generated with **--call-sites** also counts and times the calls by return address. When the
+    **SPECPROF_CALL_SITES_FILE** environment variable gives the path of a file, they are written in it and the callers
+    are named, with the symbol tables of the modules, by :
+
+    `./spec_prof.py sites /tmp/sites.bin -n 5`
+
+    # Performance counters
+
+    A wrapper generated with **--counters** reads the performance counters of the calling thread (cycles, instructions,
+    cache misses, task clock, page faults and context switches) around each timed call and reports their mean per call,
+    the instructions per cycle and the cache misses per 1000 instructions. The hardware counters refused by the kernel
+    are left out.
+
+    # Allocations
+
+    A wrapper generated with **--allocations** also interposes malloc, calloc, realloc, free and the aligned
+    allocations, and reports the allocations, bytes and peak live bytes per call of each function, counting only what
+    the threads allocate while they are inside a wrapped function.
+
+    # Control
+
+    With **SPECPROF_ENABLED=0**, the wrapper library starts with the measures disabled. When **SPECPROF_CONTROL_FILE**
+    names a file, SIGUSR2 makes it apply the commands written in it : enable, disable, toggle or reset.
+
+    # Call graph
+
+    A wrapper generated with **--call-graph** also reports the self time of each function (the time of its wrapped
+    callees subtracted), the time of its outermost calls, its recursion and the calls of each caller -> callee pair.
+
+    # Overhead
+
+    The time taken by the wrapper itself to read the timer and record a measure is subtracted from the results. It is
+    measured for each timer by `benchmarks/bench_wrapper_overhead.py --calibrate` and may be given with **--overhead-ns**.
+
     # Prerequisites
 
-    Standard unix/linux tools such as **ldd**, **nm** and a compilator able to deal with C++2011 are required.
+    The **c++filt** tool and a compilator able to deal with C++2011 are required.
     """
     return msg
 
 
+def live_main(argv):
+    """
+    Follow the live statistics file of a running program
+
+    :param argv: arguments of the live subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py live",
+                            description="Print the calls per second and the mean time per call of the functions"
+                                        " profiled by a running program, read from the live statistics file"
+                                        " written by the wrapper (SPECPROF_STATS_FILE)")
+    parser.add_argument('stats_file', metavar="PATH_TO_STATS_FILE", help="path to the live statistics file")
+    parser.add_argument('-i', '--interval', dest="interval", type=float, default=1.,
+                        help="time in seconds between two samples (default : 1)")
+    parser.add_argument('-c', '--count', dest="count", type=int, default=0,
+                        help="number of samples to print (default : 0, follow the program until it ends)")
+    args = parser.parse_args(argv)
+    try:
+        live_monitor.monitor(os.path.abspath(os.path.expanduser(args.stats_file)), args.interval, args.count)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def trace_main(argv):
+    """
+    Convert the trace file written by a wrapper
+
+    :param argv: arguments of the trace subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py trace",
+                            description="Convert the trace of the calls written by the wrapper (SPECPROF_TRACE_FILE)"
+                                        " into a trace readable by chrome://tracing or by the Perfetto UI")
+    parser.add_argument('trace_file', metavar="PATH_TO_TRACE_FILE", help="path to the trace file")
+    parser.add_argument('-f', '--format', dest="format", default="chrome", choices=sorted(trace_export.FORMATS),
+                        help="format of the converted trace (default : chrome)")
+    parser.add_argument('-o', '--output', dest="output",
+                        help="path to the converted trace (default : the trace file with the extension of the"
+                             " format appended)")
+    args = parser.parse_args(argv)
+    trace_file = os.path.abspath(os.path.expanduser(args.trace_file))
+    output = args.output or trace_file + trace_export.FORMATS[args.format][1]
+    try:
+        trace_export.export_trace(trace_file, os.path.abspath(os.path.expanduser(output)), args.format)
+    except IOError as error:
+        parser.error(str(error))
+    return 0
+
+
+def sites_main(argv):
+    """
+    Print the call sites recorded by a wrapper
+
+    :param argv: arguments of the sites subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py sites",
+                            description="Print the calls and the time of the profiled functions by calling"
+                                        " function, read from the call sites file written by a wrapper generated"
+                                        " with --call-sites (SPECPROF_CALL_SITES_FILE)")
+    parser.add_argument('sites_file', metavar="PATH_TO_CALL_SITES_FILE", help="path to the call sites file")
+    parser.add_argument('-n', '--top', dest="top", type=int, default=10,
+                        help="number of call sites printed for each function (default : 10, 0 for all)")
+    parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                        help="read the symbols of the modules again, without using the library cache")
+    args = parser.parse_args(argv)
+    try:
+        sites_file = call_sites.CallSitesFile(os.path.abspath(os.path.expanduser(args.sites_file)))
+    except IOError as error:
+        parser.error(str(error))
+    print(call_sites.format_call_sites(sites_file, call_sites.Symbolizer(args.use_cache), args.top))
+    return 0
+
+
+def snapshots_main(argv):
+    """
+    Print the time series of the snapshots written by a wrapper
+
+    :param argv: arguments of the snapshots subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py snapshots",
+                            description="Merge the snapshots written by the wrapper (SPECPROF_SNAPSHOT_DIR) into a"
+                                        " time series of the calls per second and of the mean time per call of the"
+                                        " profiled functions, interval by interval")
+    parser.add_argument('directory', metavar="PATH_TO_SNAPSHOT_DIR", help="directory of the snapshots")
+    parser.add_argument('-p', '--pid', dest="pid", type=int,
+                        help="process of which the snapshots are merged (default : all the processes)")
+    parser.add_argument('-f', '--format', dest="format", default="table", choices=("table", "csv"),
+                        help="format of the time series (default : table)")
+    args = parser.parse_args(argv)
+    try:
+        paths = snapshots.find_snapshots(os.path.abspath(os.path.expanduser(args.directory)), args.pid)
+        if not paths:
+            parser.error("no snapshot found")
+        print(snapshots.format_time_series(snapshots.time_series(paths), args.format))
+    except (IOError, OSError) as error:
+        parser.error(str(error))
+    return 0
+
+
+def aggregate_main(argv):
+    """
+    Aggregate the results files of many processes
+
+    :param argv: arguments of the aggregate subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py aggregate",
+                            description="Aggregate the results files of many processes (SPECPROF_RESULTS_FILE with"
+                                        " %%p or %%r) : totals of the profiled functions, imbalance of their time"
+                                        " between the processes and outlier processes")
+    parser.add_argument('paths', metavar="PATH", nargs="+",
+                        help="results files or directories holding them")
+    parser.add_argument('-z', '--threshold', dest="threshold", type=float, default=aggregate.DEFAULT_THRESHOLD,
+                        help="modified z-score above which a process is an outlier (default : {:.1f})"
+                             .format(aggregate.DEFAULT_THRESHOLD))
+    parser.add_argument('-n', '--top', dest="top", type=int, default=20,
+                        help="number of outliers printed (default : 20, 0 for all)")
+    args = parser.parse_args(argv)
+    try:
+        paths = aggregate.find_results([os.path.abspath(os.path.expanduser(path)) for path in args.paths])
+        results = aggregate.load_results(paths)
+        if not results.paths:
+            parser.error("no results file found")
+        summaries, outliers = aggregate.aggregate(results, args.threshold)
+    except (IOError, OSError, ImportError) as error:
+        parser.error(str(error))
+    print(aggregate.format_aggregate(results, summaries, outliers, args.threshold, args.top))
+    return 0
+
+
+def symbols_main(argv):
+    """
+    Search the functions of a shared object by their unmangled names
+
+    :param argv: arguments of the symbols subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py symbols",
+                            description="Search the exported functions of a shared object by their unmangled names :"
+                                        " a text (case insensitive), a glob such as 'ns::*' matched on the qualified"
+                                        " names or a regular expression prefixed with 're:'. The candidates are"
+                                        " ranked, the functions named by the text first")
+    parser.add_argument('library', metavar="PATH_TO_LIBRARY", help="path to the shared object")
+    parser.add_argument('queries', metavar="QUERY", nargs="+", help="the searched functions")
+    parser.add_argument('-n', '--top', dest="top", type=int, default=symbol_index.DEFAULT_LIMIT,
+                        help="number of candidates printed for each query (default : {:d}, 0 for all)"
+                             .format(symbol_index.DEFAULT_LIMIT))
+    parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                        help="analyse the library again, without using the library cache")
+    parser.add_argument('-v', '--verbose', dest="verbose", action="store_true",
+                        help="log the progress of the analysis of the library")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    try:
+        analyser = shared_library_analysis.SharedObjectAnalyser(os.path.abspath(os.path.expanduser(args.library)),
+                                                                use_cache=args.use_cache)
+        for query in args.queries:
+            candidates = analyser.search_symbols(query, args.top)
+            print("{:d} candidates for '{:s}' :".format(len(candidates), query))
+            for candidate in candidates:
+                print("  {:s} <==> {:s}".format(candidate.symbol, candidate.name))
+    except (IOError, ValueError) as error:
+        parser.error(str(error))
+    return 0
+
+
+def batch_main(argv):
+    """
+    Generate, without any question, the wrapper libraries of many shared objects in parallel
+
+    :param argv: arguments of the batch subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py batch",
+                            description="Generate in parallel the wrapper libraries of shared objects, wrapping"
+                                        " the functions selected by rules on their unmangled names. A rule is"
+                                        " 'pattern [| return type [| namespace [| parameters]]]', the pattern"
+                                        " being a glob or, prefixed with 're:', a regular expression")
+    parser.add_argument('libraries', metavar="PATH", nargs="+",
+                        help="shared objects or directories searched recursively for shared objects")
+    parser.add_argument('-w', '--path-to-working-dir', dest="wdir", metavar="PATH_TO_WORKING_DIR", required=True,
+                        help="path to a directory where a subdirectory is created for each library")
+    parser.add_argument('-r', '--rules', dest="rules", metavar="PATH_TO_RULES",
+                        help="path to a file of rules, one per line")
+    parser.add_argument('-e', '--rule', dest="rule", action="append", default=[],
+                        help="a rule (may be repeated, applied after the rules of the file)")
+    parser.add_argument('-j', '--jobs', dest="jobs", type=int,
+                        help="maximum number of libraries processed in parallel (default : number of processors)")
+    parser.add_argument('-t', '--timer', dest="timer", default="monotonic",
+                        choices=function_wrapper_writer.TIMERS,
+                        help="timer used by the wrappers to measure the calls (default : monotonic)")
+    parser.add_argument('-p', '--sample-period', dest="sample_period", type=int, default=1,
+                        help="count every call but time only one call in SAMPLE_PERIOD (default : 1)")
+    parser.add_argument('--sampling', dest="sampling", default="stride", choices=function_wrapper_writer.SAMPLINGS,
+                        help="way of choosing the timed calls (default : stride)")
+    parser.add_argument('-i', '--optional_includes', dest="opt_inc", metavar="OPTIONAL_HEADERS", nargs="+",
+                        help="optional headers to include in every generated src file")
+    parser.add_argument('--overhead-ns', dest="overhead_ns", type=float,
+                        help="time in nanoseconds added by the wrappers to each measured call, subtracted from "
+                             "the results (default : the calibration of the timer, 0 if none)")
+    parser.add_argument('--call-sites', dest="call_sites", action="store_true",
+                        help="count and time the calls by call site too (see the sites subcommand)")
+    parser.add_argument('--counters', dest="counters", action="store_true",
+                        help="read the performance counters of the thread around the timed calls (perf_event_open)")
+    parser.add_argument('--allocations', dest="allocations", action="store_true",
+                        help="account the allocations (malloc, free...) made inside the wrapped calls")
+    parser.add_argument('--call-graph', dest="call_graph", action="store_true",
+                        help="measure the self times, the recursion and the caller -> callee pairs of the "
+                             "nested wrapped calls")
+    parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                        help="analyse the libraries and compile the wrappers again, without using the caches")
+    parser.add_argument('-v', '--verbose', dest="verbose", action="store_true",
+                        help="log the progress of the analysis and of the compilation of every library")
+    args = parser.parse_args(argv)
+    try:
+        rules = batch_pipeline.read_rules(args.rules) if args.rules else []
+        rules += [batch_pipeline.parse_rule(rule) for rule in args.rule]
+    except (IOError, ValueError) as error:
+        parser.error(str(error))
+    if not rules:
+        parser.error("at least one rule should be given with -r or -e")
+    libraries = batch_pipeline.find_libraries(args.libraries)
+    if not libraries:
+        parser.error("no shared object found")
+    headers = [os.path.abspath(os.path.expanduser(x)) for x in args.opt_inc] if args.opt_inc else None
+    if args.overhead_ns is None:
+        args.overhead_ns = overhead_calibration.load_overhead_ns(args.timer)
+    writer_options = {'timer': args.timer, 'sample_period': args.sample_period, 'sampling': args.sampling,
+                      'overhead_ns': args.overhead_ns, 'call_sites': args.call_sites, 'counters': args.counters,
+                      'allocations': args.allocations, 'call_graph': args.call_graph}
+    tasks = batch_pipeline.make_tasks(libraries, os.path.abspath(os.path.expanduser(args.wdir)), rules,
+                                      headers, writer_options, args.use_cache, args.verbose)
+    results = batch_pipeline.run_batch(tasks, args.jobs)
+    print(batch_pipeline.format_report(results))
+    return 0 if all(result.success for result in results) else 1
+
+
+def bench_main(argv):
+    """
+    Measure the time of the calls of a function of a shared object, called from Python
+
+    :param argv: arguments of the bench subcommand
+    :type argv: list
+    """
+    parser = ArgumentParser(prog="spec_prof.py bench",
+                            description="Call a function of a shared object through ctypes, with the types of its"
+                                        " prototype, and measure the time of its calls : median, median absolute"
+                                        " deviation and bootstrap confidence interval of the median, compared with"
+                                        " a baseline. The pointers to numbers are passed as NumPy arrays")
+    parser.add_argument('library', metavar="PATH_TO_LIBRARY", help="path to the shared object")
+    parser.add_argument('query', metavar="FUNCTION",
+                        help="symbol of the function, or a search of its unmangled name (see the symbols subcommand)")
+    parser.add_argument('-s', '--signature', dest="signature",
+                        help="signature of the function (by default, the one given by the debugging information "
+                             "of the library)")
+    parser.add_argument('-a', '--arg', dest="args", metavar="NAME=VALUE", action="append", default=[],
+                        help="value of a parameter : a number, or for a pointer a number of elements, comma "
+                             "separated elements or @path/to/array.npy (may be repeated)")
+    parser.add_argument('--size', dest="size", type=int, default=microbench.DEFAULT_SIZE,
+                        help="number of elements of the generated arrays and value of the generated integers "
+                             "(default : {:d})".format(microbench.DEFAULT_SIZE))
+    parser.add_argument('--seed', dest="seed", type=int, default=0,
+                        help="seed of the generated arrays and of the bootstrap (default : 0)")
+    parser.add_argument('-n', '--samples', dest="samples", type=int, default=microbench.DEFAULT_SAMPLES,
+                        help="number of samples (default : {:d})".format(microbench.DEFAULT_SAMPLES))
+    parser.add_argument('--warmup', dest="warmup", type=float, default=microbench.DEFAULT_WARMUP,
+                        help="time of the calls before the samples in seconds (default : {:.1f})"
+                             .format(microbench.DEFAULT_WARMUP))
+    parser.add_argument('--min-sample', dest="min_sample", type=float, default=microbench.DEFAULT_MIN_SAMPLE,
+                        help="minimum time of a sample in seconds, the number of calls of a sample being doubled "
+                             "until it is reached (default : {:g})".format(microbench.DEFAULT_MIN_SAMPLE))
+    parser.add_argument('--max-time', dest="max_time", type=float, default=microbench.DEFAULT_MAX_TIME,
+                        help="time after which no more sample is taken in seconds (default : {:.1f})"
+                             .format(microbench.DEFAULT_MAX_TIME))
+    parser.add_argument('--cpu', dest="cpu", type=int,
+                        help="processor the process is pinned on (default : the current one, -1 to not pin it)")
+    parser.add_argument('-b', '--baseline', dest="baseline", metavar="PATH_TO_BASELINE",
+                        help="baseline file : the median is compared with the one of the baseline")
+    parser.add_argument('-u', '--update', dest="update", action="store_true",
+                        help="write the samples in the baseline file instead of comparing them")
+    parser.add_argument('--threshold', dest="threshold", type=float, default=microbench.DEFAULT_THRESHOLD,
+                        help="relative slowdown of the median above which a change is a regression "
+                             "(default : {:.2f})".format(microbench.DEFAULT_THRESHOLD))
+    parser.add_argument('--confidence', dest="confidence", type=float, default=microbench.DEFAULT_CONFIDENCE,
+                        help="level of the confidence intervals (default : {:.2f})"
+                             .format(microbench.DEFAULT_CONFIDENCE))
+    parser.add_argument('-v', '--verbose', dest="verbose", action="store_true",
+                        help="log the progress of the analysis of the library")
+    args = parser.parse_args(argv)
+    if args.update and not args.baseline:
+        parser.error("-u needs a baseline file given with -b")
+    if not 0. < args.confidence < 1.:
+        parser.error("the confidence level should be between 0 and 1")
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    path_to_so = os.path.abspath(os.path.expanduser(args.library))
+    values = {}
+    for arg in args.args:
+        name, separator, value = arg.partition("=")
+        if not separator:
+            parser.error("invalid argument '{:s}' : NAME=VALUE expected".format(arg))
+        values[name.strip()] = value.strip()
+    try:
+        analyser = shared_library_analysis.SharedObjectAnalyser(path_to_so)
+        target = microbench.find_target(analyser, args.query, args.signature)
+        arguments, arrays = microbench.make_arguments(target, values, args.size, args.seed)
+        function = microbench.load_function(path_to_so, target)
+        baseline = None
+        if args.baseline and not args.update:
+            baseline = microbench.load_baseline(os.path.expanduser(args.baseline), target, values, args.size)
+    except (IOError, OSError, ValueError, ImportError) as error:
+        parser.error(str(error))
+    cpu = microbench.current_cpu() if args.cpu is None else args.cpu
+    affinity = None
+    if cpu >= 0:
+        try:
+            affinity = microbench.get_affinity()
+            microbench.set_affinity(set([cpu]))
+        except (OSError, ValueError) as error:
+            adapter.warning("Unable to pin the process on the processor {:d} : {:s}".format(cpu, str(error)))
+            affinity = None
+    try:
+        measured = microbench.measure(function, arguments, args.warmup, args.min_sample, args.samples, args.max_time)
+        overhead_ns = microbench.call_overhead_ns(args.min_sample)
+    finally:
+        if affinity:
+            microbench.set_affinity(affinity)
+    stats = microbench.statistics(measured.samples_ns, confidence=args.confidence, seed=args.seed)
+    comparison = None
+    if baseline is not None:
+        comparison = microbench.compare(measured.samples_ns, baseline, args.threshold, confidence=args.confidence,
+                                        seed=args.seed)
+    print(microbench.format_measure(target, measured, stats, overhead_ns, comparison, args.confidence))
+    if args.update:
+        try:
+            microbench.save_baseline(os.path.expanduser(args.baseline), path_to_so, target, values, args.size,
+                                     measured)
+        except (IOError, OSError) as error:
+            parser.error(str(error))
+    return 1 if comparison is not None and comparison.verdict == "regression" else 0
+
+
+# Subcommands, given as first argument. Without subcommand, a wrapper library is generated.
+SUBCOMMANDS = {'live': live_main, 'batch': batch_main, 'trace': trace_main, 'sites': sites_main,
+               'snapshots': snapshots_main, 'aggregate': aggregate_main, 'symbols': symbols_main,
+               'bench': bench_main}
+
+
 def main(argv=None):  # IGNORE:C0111
     """Command line options."""
 
     if argv is not None:
         sys.argv.extend(argv)
 
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        return SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+
     program_author, program_copyright, program_license, program_shortdesc = _parse_docstring()
     program_version = "v%s" % __version__
     program_build_date = str(__updated__)
@@ -145,10 +626,46 @@ USAGE
         parser.add_argument('-w', '--path-to-working-dir', dest="wdir", metavar="PATH_TO_WORKING_DIR",
                             help="path to a directory where source file and shared object will be generated",
                             required=True)
+        parser.add_argument('-s', '--signature', dest="signature",
+                            help="signature of the function to profile (by default, the one given by the debugging "
+                                 "information of the library)")
+        parser.add_argument('-n', '--namespace', dest="namespace",
+                            help="namespace of the function to profile")
+        parser.add_argument('--size-param', dest="size_param", metavar="PARAMETER",
+                            help="integer parameter giving the size of the problem : the cost of the calls is also"
+                                 " reported by size (with a manifest, give it as 'size=PARAMETER' on each line)")
+        parser.add_argument('-m', '--manifest', dest="manifest", metavar="PATH_TO_MANIFEST",
+                            help="path to a manifest listing the symbols and signatures of the functions to profile"
+                                 " with a single wrapper library")
+        parser.add_argument('-t', '--timer', dest="timer", default="monotonic",
+                            choices=function_wrapper_writer.TIMERS,
+                            help="timer used by the wrapper to measure the calls (default : monotonic)")
+        parser.add_argument('-p', '--sample-period', dest="sample_period", type=int, default=1,
+                            help="count every call but time only one call in SAMPLE_PERIOD (default : 1)")
+        parser.add_argument('--sampling', dest="sampling", default="stride",
+                            choices=function_wrapper_writer.SAMPLINGS,
+                            help="way of choosing the timed calls (default : stride)")
+        parser.add_argument('--overhead-ns', dest="overhead_ns", type=float,
+                            help="time in nanoseconds added by the wrapper to each measured call, subtracted from "
+                                 "the results (default : the calibration of the timer, 0 if none)")
+        parser.add_argument('--call-sites', dest="call_sites", action="store_true",
+                            help="count and time the calls by call site too (see the sites subcommand)")
+        parser.add_argument('--counters', dest="counters", action="store_true",
+                            help="read the performance counters of the thread around the timed calls"
+                                 " (perf_event_open)")
+        parser.add_argument('--allocations', dest="allocations", action="store_true",
+                            help="account the allocations (malloc, free...) made inside the wrapped calls")
+        parser.add_argument('--call-graph', dest="call_graph", action="store_true",
+                            help="measure the self times, the recursion and the caller -> callee pairs of the "
+                                 "nested wrapped calls")
+        parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                            help="analyse the library and compile the wrapper again, without using the caches")
         parser.add_argument('-i', '--optional_includes', dest="opt_inc", metavar="OPTIONAL_HEADERS",
                             help="optional headers to include in the generated src file", nargs="+")
         # Process arguments
         args = parser.parse_args()
+        if args.manifest and args.size_param:
+            parser.error("with a manifest, the size parameter of each function is given as 'size=PARAMETER'")
 
         origin_library = os.path.abspath(os.path.expanduser(args.origin_library))
         working_dir = args.wdir
@@ -162,30 +679,65 @@ USAGE
                 # Try with a list of optional includes
                 optional_includes = [os.path.abspath(os.path.expanduser(x)) for x in args.opt_inc]
 
+        overhead_ns = args.overhead_ns
+        if overhead_ns is None:
+            overhead_ns = overhead_calibration.load_overhead_ns(args.timer)
+
         adapter.info("Analysing the shared library...")
-        _so_analyser = shared_library_analysis.SharedObjectAnalyser(origin_library)
-        f_symbol, f_signature, f_rtype = _so_analyser.ask_for_symbol()
-        adapter.info("Analysing the function prototype...")
-        import ipdb; ipdb.set_trace()
-        r_type, class_name, function_name, params =\
-            function_wrapper_writer.split_function_prototype(f_signature)
-        adapter.info("... done.")
-        if namespace:
-            adapter.info("|_> Namespace is : {:s}".format(namespace))
-        adapter.info("|_> Return type is : {:s}".format(f_rtype))
-        if class_name:
-            adapter.info("|_> Class name is : {:s}".format(class_name))
-        adapter.info("|_> Function name is : {:s}".format(function_name))
-        adapter.info("|_> Parameters are : {:s}".format(params))
-        adapter.info("... done.")
-        adapter.info("Generating source file...")
+        _so_analyser = shared_library_analysis.SharedObjectAnalyser(origin_library, use_cache=args.use_cache)
         wrapper_writer = function_wrapper_writer.FunctionWrapperWriter(
-            origin_library, working_dir, language=_so_analyser.language)
-        if namespace:
-            wrapper_writer.write_src_file(f_symbol, f_signature, namespace, optional_includes)
+            origin_library, working_dir, language=_so_analyser.language, timer=args.timer,
+            sample_period=args.sample_period, sampling=args.sampling, use_cache=args.use_cache,
+            overhead_ns=overhead_ns, call_sites=args.call_sites, counters=args.counters,
+            allocations=args.allocations, call_graph=args.call_graph)
+        if args.manifest:
+            adapter.info("Generating source file for the functions of the manifest...")
+            wrapper_writer.write_manifest_src_file(os.path.abspath(os.path.expanduser(args.manifest)),
+                                                   optional_includes, _so_analyser.prototypes)
+            adapter.info("...done.")
         else:
-            wrapper_writer.write_src_file(f_symbol, f_signature, optional_includes)
-        adapter.info("...done.")
+            f_symbol, f_unmangled, f_rtype = _so_analyser.ask_for_symbol()
+            prototype = None if args.signature else _so_analyser.prototypes.get(f_symbol)
+            if prototype is not None:
+                try:
+                    prototype.check_wrappable()
+                except ValueError as error:
+                    adapter.warning("The prototype given by the debugging information can't be used : "
+                                    "{:s}".format(str(error)))
+                    prototype = None
+            if prototype is not None:
+                f_signature = prototype.signature
+                namespace = args.namespace or prototype.namespace
+                r_type, class_name, function_name, params = (prototype.return_type, prototype.class_name,
+                                                              prototype.name, prototype.parameters_declaration)
+            else:
+                f_signature, namespace = args.signature, args.namespace
+                if not f_signature:
+                    # Signature rebuilt from the unmangled name, its parameters named p0, p1...
+                    try:
+                        f_signature, namespace = batch_pipeline.make_signature(
+                            f_unmangled, batch_pipeline.SymbolRule(None, None, f_rtype or None, namespace, None))
+                    except ValueError as error:
+                        msg = ("The signature of {:s} can't be rebuilt from its unmangled name ({:s}) : give it "
+                               "with --signature and its namespace with --namespace".format(f_unmangled, str(error)))
+                        adapter.error(msg)
+                        raise ValueError(msg)
+                adapter.info("Analysing the function prototype...")
+                r_type, class_name, function_name, params =\
+                    function_wrapper_writer.split_function_prototype(f_signature)
+                adapter.info("... done.")
+            if namespace:
+                adapter.info("|_> Namespace is : {:s}".format(namespace))
+            adapter.info("|_> Return type is : {:s}".format(f_rtype))
+            if class_name:
+                adapter.info("|_> Class name is : {:s}".format(class_name))
+            adapter.info("|_> Function name is : {:s}".format(function_name))
+            adapter.info("|_> Parameters are : {:s}".format(params))
+            adapter.info("... done.")
+            adapter.info("Generating source file...")
+            wrapper_writer.write_src_file(f_symbol, f_signature, namespace, optional_includes, args.size_param,
+                                          prototype)
+            adapter.info("...done.")
         adapter.info("Compiling source file...")
         wrapper_writer.compile_src_file()
         adapter.info("...done.")
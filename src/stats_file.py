@@ -0,0 +1,863 @@
+"""
+A module to read the binary statistics files written by the wrappers generated by SpecProf
+(see the SPECPROF_RESULTS_FILE and SPECPROF_STATS_FILE environment variables) and to decode
+their latency histograms and their scaling curves
+"""
+from __future__ import print_function
+import sys
+import math
+import mmap
+import struct
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.stats_file")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Layout of struct specprof_file_header in jinja_templates/runtime/stats_file.h
+HEADER_FORMAT = "=8sIIIIQIIIIIIdQQQdIIQIIQQiIIIQIIQIIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# The calibration of the timer is updated by the wrapper while it runs
+NS_PER_TICK_OFFSET = struct.calcsize(HEADER_FORMAT[:HEADER_FORMAT.index("d")])
+FILE_MAGIC = b"SPECPROF"
+FILE_VERSION = 8
+TIMER_NAMES = ("monotonic", "thread_cputime", "tsc")
+
+FileHeader = namedtuple("FileHeader", ["magic", "version", "header_size", "nb_functions", "nb_rows",
+                                       "row_size", "stats_size", "nb_fields", "hist_sub_bits",
+                                       "hist_buckets", "timer", "pid", "ns_per_tick", "fields_offset",
+                                       "names_offset", "rows_offset", "overhead_ns", "size_buckets",
+                                       "nb_sized_functions", "sizes_offset", "snapshot", "trigger",
+                                       "period_start_ns", "period_end_ns", "rank", "parent_pid", "nb_counters",
+                                       "counters_available", "counters_offset", "nb_alloc_fields",
+                                       "alloc_stats_size", "allocations_offset", "nb_graph_fields",
+                                       "graph_stats_size", "graph_offset"])
+# Causes of the snapshots (the header of the other files has trigger 0)
+SNAPSHOT_TRIGGERS = ("none", "interval", "signal", "exit")
+# Fields of each size bucket of struct specprof_size_stats
+SIZE_FIELDS = ("call_count", "sampled_count", "total_ticks", "size_sum")
+# Performance counters of struct specprof_counter_stats (SPECPROF_COUNTER_NAMES), the hardware ones first
+COUNTER_NAMES = ("cycles", "instructions", "cache_misses", "task_clock_ns", "page_faults", "context_switches")
+# Fields of struct specprof_alloc_stats (SPECPROF_ALLOC_FIELDS)
+ALLOC_FIELDS = ("allocations", "frees", "bytes", "peak_sum", "peak_max")
+# Fields of struct specprof_graph_stats (SPECPROF_GRAPH_FIELDS)
+GRAPH_FIELDS = ("self_ticks", "inclusive_ticks", "outer_sampled", "recursive_calls", "max_depth")
+
+
+class LatencyHistogram(object):
+    """
+    A log-linear histogram of latencies, as accumulated by the wrappers.
+
+    Values below 2^sub_bits have their own bucket. Above, each power of two is split
+    into 2^sub_bits buckets of the same width.
+    """
+    def __init__(self, counts, sub_bits, ns_per_tick=1., min_ns=None, max_ns=None, overhead_ns=0.):
+        """
+        :param counts: number of values in each bucket
+        :type counts: list
+        :param sub_bits: log2 of the number of buckets per power of two
+        :type sub_bits: int
+        :param ns_per_tick: nanoseconds per tick of the timer
+        :type ns_per_tick: float
+        :param min_ns: shortest value, used to bound the percentiles
+        :type min_ns: float
+        :param max_ns: longest value, used to bound the percentiles
+        :type max_ns: float
+        :param overhead_ns: overhead of the wrapper, subtracted from the percentiles
+        :type overhead_ns: float
+        """
+        self._counts = list(counts)
+        self._sub_bits = sub_bits
+        self._ns_per_tick = ns_per_tick
+        self._min_ns = min_ns
+        self._max_ns = max_ns
+        self._overhead_ns = overhead_ns
+
+    @property
+    def count(self):
+        """
+        :return: the number of values in the histogram
+        :rtype: int
+        """
+        return sum(self._counts)
+
+    def bucket_bounds(self, index):
+        """
+        :param index: index of the bucket
+        :type index: int
+        :return: the lowest and highest values, in nanoseconds, of the bucket
+        :rtype: tuple
+
+        >>> LatencyHistogram([], 4).bucket_bounds(3)
+        (3.0, 3.0)
+        >>> LatencyHistogram([], 4).bucket_bounds(16)
+        (16.0, 16.0)
+        >>> LatencyHistogram([], 4).bucket_bounds(33)
+        (34.0, 35.0)
+        """
+        return (self._ns_per_tick * self._bucket_low(index),
+                self._ns_per_tick * (self._bucket_low(index + 1) - 1))
+
+    def _bucket_low(self, index):
+        """
+        :param index: index of the bucket
+        :type index: int
+        :return: the lowest value, in ticks, of the bucket
+        :rtype: int
+        """
+        sub_count = 1 << self._sub_bits
+        if index < sub_count:
+            return index
+        return (index % sub_count + sub_count) << (index // sub_count - 1)
+
+    def nonzero_buckets(self):
+        """
+        :return: the list of (lowest value, highest value, count) of the non empty buckets,
+         suitable for plotting
+        :rtype: list
+        """
+        return [self.bucket_bounds(index) + (count,)
+                for index, count in enumerate(self._counts) if count]
+
+    def _bucket_value(self, index):
+        """
+        :param index: index of the bucket
+        :type index: int
+        :return: the value, in nanoseconds, standing for the values of the bucket : its middle,
+         bounded by the shortest and longest values, minus the overhead of the wrapper
+        :rtype: float
+        """
+        low, high = self.bucket_bounds(index)
+        value = 0.5 * (low + high)
+        if self._min_ns is not None:
+            value = max(value, self._min_ns)
+        if self._max_ns is not None:
+            value = min(value, self._max_ns)
+        return max(value - self._overhead_ns, 0.)
+
+    def percentile(self, fraction):
+        """
+        :param fraction: fraction of the values (0.99 for the 99th percentile)
+        :type fraction: float
+        :return: the value, in nanoseconds, under which the given fraction of the values lie
+         (middle of the bucket, bounded by the shortest and longest values, minus the overhead
+         of the wrapper) or None if the histogram is empty
+        :rtype: float
+        """
+        total = self.count
+        if total == 0:
+            return None
+        rank = fraction * total
+        cumulated = 0
+        for index, count in enumerate(self._counts):
+            cumulated += count
+            if cumulated and cumulated >= rank:
+                return self._bucket_value(index)
+        return None if self._max_ns is None else max(self._max_ns - self._overhead_ns, 0.)
+
+    def variance(self, mean_ns):
+        """
+        :param mean_ns: mean of the values, in nanoseconds, without the overhead of the wrapper
+        :type mean_ns: float
+        :return: the variance of the values, estimated with the values standing for the buckets
+        :rtype: float
+        """
+        total = self.count
+        if total < 2:
+            return 0.
+        sum_sq = 0.
+        for index, count in enumerate(self._counts):
+            if count:
+                sum_sq += count * (self._bucket_value(index) - mean_ns) ** 2
+        return sum_sq / (total - 1)
+
+
+class FunctionStats(namedtuple("FunctionStats", ["name", "call_count", "sampled_count", "total_ns", "min_ns",
+                                                 "max_ns", "histogram"])):
+    """
+    The statistics of one wrapped function, converted in nanoseconds, without the overhead of
+    the wrapper. When only some of the calls are timed (sampled_count < call_count), total_ns is
+    extrapolated from the timed calls and min_ns, max_ns and the histogram describe the timed
+    calls only.
+    """
+    __slots__ = ()
+
+    def total_ns_interval(self, z_score=1.96):
+        """
+        :param z_score: number of standard errors of the half width (1.96 for 95% confidence)
+        :type z_score: float
+        :return: the half width, in nanoseconds, of the confidence interval of the extrapolated
+         total time (0 if every call is timed)
+        :rtype: float
+        """
+        if self.sampled_count < 2 or self.sampled_count >= self.call_count:
+            return 0.
+        std_dev = self.histogram.variance(self.total_ns / self.call_count) ** 0.5
+        # Finite population correction : the interval vanishes when every call is timed
+        return (z_score * self.call_count * std_dev / self.sampled_count ** 0.5 *
+                (1. - float(self.sampled_count) / self.call_count) ** 0.5)
+
+    @property
+    def mean_ns(self):
+        """
+        :return: the mean time per call, in nanoseconds (None if the function was not called)
+        :rtype: float
+        """
+        if not self.call_count:
+            return None
+        return self.total_ns / self.call_count
+
+
+class SizeBucket(namedtuple("SizeBucket", ["low", "high", "call_count", "sampled_count", "mean_size",
+                                           "mean_ns"])):
+    """
+    The calls of a function of which the size parameter was between low and high (a power of
+    two and the next one minus one). The mean size and the mean time, in nanoseconds, without
+    the overhead of the wrapper, are those of the timed calls (None if no call was timed).
+    """
+    __slots__ = ()
+
+    @property
+    def ns_per_unit(self):
+        """
+        :return: the mean time per unit of size, in nanoseconds (None if unknown)
+        :rtype: float
+        """
+        if not self.mean_size or self.mean_ns is None:
+            return None
+        return self.mean_ns / self.mean_size
+
+
+class CounterStats(namedtuple("CounterStats", ["measured_calls", "unmeasured_calls", "values"])):
+    """
+    The deltas of the performance counters summed over the measured calls of a function, by
+    name of counter (None for the counters that no thread could open). The calls during which
+    the counters were multiplexed with other events are not measured.
+    """
+    __slots__ = ()
+
+    def per_call(self, name):
+        """
+        :param name: name of the counter
+        :type name: str
+        :return: the mean delta of the counter per measured call (None if unknown)
+        :rtype: float
+        """
+        if self.values.get(name) is None or not self.measured_calls:
+            return None
+        return float(self.values[name]) / self.measured_calls
+
+    @property
+    def ipc(self):
+        """
+        :return: the instructions per cycle (None if unknown)
+        :rtype: float
+
+        >>> CounterStats(10, 0, {"cycles": 2000, "instructions": 5000}).ipc
+        2.5
+        >>> CounterStats(10, 0, {"cycles": None, "instructions": None}).ipc is None
+        True
+        """
+        if not self.values.get("cycles") or self.values.get("instructions") is None:
+            return None
+        return float(self.values["instructions"]) / self.values["cycles"]
+
+    @property
+    def misses_per_kilo_instructions(self):
+        """
+        :return: the cache misses per 1000 instructions (None if unknown)
+        :rtype: float
+        """
+        if not self.values.get("instructions") or self.values.get("cache_misses") is None:
+            return None
+        return 1000. * self.values["cache_misses"] / self.values["instructions"]
+
+
+class AllocationStats(namedtuple("AllocationStats", ["call_count", "allocations", "frees", "bytes", "peak_sum",
+                                                     "peak_max"])):
+    """
+    The allocations made inside the calls of a function, summed over its calls : number of
+    allocations and of frees, bytes requested, and peak of the live bytes (usable sizes of the
+    blocks allocated minus freed) above their level at the start of each call, summed and
+    highest over the calls
+    """
+    __slots__ = ()
+
+    @property
+    def allocations_per_call(self):
+        """
+        :return: the mean number of allocations per call
+        :rtype: float
+
+        >>> AllocationStats(4, 10, 6, 4000, 2000, 900).allocations_per_call
+        2.5
+        """
+        return float(self.allocations) / self.call_count if self.call_count else 0.
+
+    @property
+    def bytes_per_call(self):
+        """
+        :return: the mean number of bytes allocated per call
+        :rtype: float
+        """
+        return float(self.bytes) / self.call_count if self.call_count else 0.
+
+    @property
+    def mean_peak(self):
+        """
+        :return: the mean peak of the live bytes per call
+        :rtype: float
+        """
+        return float(self.peak_sum) / self.call_count if self.call_count else 0.
+
+
+class GraphStats(namedtuple("GraphStats", ["call_count", "sampled_count", "self_ns", "inclusive_ns",
+                                           "outer_sampled", "recursive_calls", "max_depth"])):
+    """
+    The nesting of the calls of a function, without the overhead of the wrapper : self time (the
+    time of the wrapped callees subtracted) summed over the sampled calls, time summed over the
+    sampled outermost calls (those made while the function wasn't already in progress in the
+    thread), number of recursive calls and highest number of calls in progress in a thread. The
+    callees timed only because their caller is timed are left out.
+    """
+    __slots__ = ()
+
+    @property
+    def outer_calls(self):
+        """
+        :return: the number of outermost calls
+        :rtype: int
+        """
+        return self.call_count - self.recursive_calls
+
+    @property
+    def total_self_ns(self):
+        """
+        :return: the self time of all the calls, extrapolated from the timed calls (None if no
+         call was timed)
+        :rtype: float
+
+        >>> GraphStats(10, 5, 500., 2000., 2, 6, 4).total_self_ns
+        1000.0
+        """
+        if not self.sampled_count:
+            return None
+        return self.self_ns * self.call_count / self.sampled_count
+
+    @property
+    def total_inclusive_ns(self):
+        """
+        :return: the time of all the outermost calls, extrapolated from the timed ones (None if
+         none was timed)
+        :rtype: float
+
+        >>> GraphStats(10, 5, 500., 2000., 2, 6, 4).total_inclusive_ns
+        4000.0
+        """
+        if not self.outer_sampled:
+            return None
+        return self.inclusive_ns * self.outer_calls / self.outer_sampled
+
+
+def fit_exponent(curve):
+    """
+    :param curve: the size buckets of a function
+    :type curve: list
+    :return: the exponent of the power law fitted, by least squares on the logarithms, on the
+     mean times of the buckets and the number of buckets used, or None if less than two
+     buckets were timed
+    :rtype: tuple
+
+    >>> curve = [SizeBucket(2 ** k, 2 ** (k + 1) - 1, 1, 1, 1.5 * 2 ** k, 3. * (1.5 * 2 ** k) ** 2)
+    ...          for k in range(1, 5)]
+    >>> exponent, nb_points = fit_exponent(curve)
+    >>> round(exponent, 6), nb_points
+    (2.0, 4)
+    >>> fit_exponent(curve[:1]) is None
+    True
+    """
+    points = [(math.log(bucket.mean_size), math.log(bucket.mean_ns)) for bucket in curve
+              if bucket.mean_size and bucket.mean_ns]
+    nb_points = len(points)
+    sum_x = sum(x for x, _ in points)
+    sum_y = sum(y for _, y in points)
+    denominator = nb_points * sum(x * x for x, _ in points) - sum_x * sum_x
+    if nb_points < 2 or denominator <= 1e-12:
+        return None
+    return (nb_points * sum(x * y for x, y in points) - sum_x * sum_y) / denominator, nb_points
+
+
+class StatsFile(object):
+    """
+    A statistics file written by a wrapper. It holds one or several rows (one per thread
+    in the live file, a single merged one in the results file) of statistics for each of
+    the wrapped functions.
+    """
+    def __init__(self, path):
+        """
+        :param path: path to the file
+        :type path: str
+        """
+        self._path = path
+        with open(path, "rb") as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER_SIZE:
+            self.close()
+            ADAPTER.error("{:s} is too small to be a SpecProf statistics file!".format(path))
+            raise IOError("{:s} is too small to be a SpecProf statistics file!".format(path))
+        self._header = FileHeader._make(struct.unpack_from(HEADER_FORMAT, self._map, 0))
+        if self._header.magic != FILE_MAGIC or self._header.version != FILE_VERSION:
+            self.close()
+            ADAPTER.error("{:s} is not a SpecProf statistics file of version {:d}!"
+                          .format(path, FILE_VERSION))
+            raise IOError("{:s} is not a SpecProf statistics file of version {:d}!"
+                          .format(path, FILE_VERSION))
+        header = self._header
+        if header.rows_offset + header.nb_rows * header.row_size > len(self._map):
+            self.close()
+            ADAPTER.error("{:s} is truncated!".format(path))
+            raise IOError("{:s} is truncated!".format(path))
+        self._fields = self._read_strings(header.fields_offset, 1)[0].split(",")
+        names = self._read_strings(header.names_offset, 2 * header.nb_functions)
+        self._functions = names[:header.nb_functions]
+        self._size_params = [name or None for name in names[header.nb_functions:]]
+        # Slot of the size statistics of each function with a size parameter
+        self._size_slots = {}
+        for index, size_param in enumerate(self._size_params):
+            if size_param:
+                self._size_slots[index] = len(self._size_slots)
+        self._stats_format = "={:d}Q".format(header.nb_fields + header.hist_buckets)
+        self._sizes_format = "={:d}Q".format(len(SIZE_FIELDS) * header.size_buckets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Unmap the file
+        """
+        self._map.close()
+
+    def _read_strings(self, offset, number):
+        """
+        :param offset: offset of the first string
+        :type offset: int
+        :param number: number of NUL terminated strings to read
+        :type number: int
+        :return: the strings
+        :rtype: list
+        """
+        strings = []
+        for _ in range(number):
+            end = self._map.find(b"\0", offset)
+            strings.append(self._map[offset:end].decode("iso-8859-1"))
+            offset = end + 1
+        return strings
+
+    @property
+    def header(self):
+        """
+        :return: the header of the file
+        :rtype: FileHeader
+        """
+        return self._header
+
+    @property
+    def functions(self):
+        """
+        :return: the names of the wrapped functions
+        :rtype: list
+        """
+        return self._functions
+
+    @property
+    def size_params(self):
+        """
+        :return: the name of the size parameter of each wrapped function (None if it has none)
+        :rtype: list
+        """
+        return self._size_params
+
+    @property
+    def fields(self):
+        """
+        :return: the names of the scalar fields of the statistics
+        :rtype: list
+        """
+        return self._fields
+
+    @property
+    def ns_per_tick(self):
+        """
+        :return: the nanoseconds per tick of the timer, as last written by the wrapper
+        :rtype: float
+        """
+        return struct.unpack_from("=d", self._map, NS_PER_TICK_OFFSET)[0]
+
+    @property
+    def timer(self):
+        """
+        :return: the name of the timer used by the wrapper
+        :rtype: str
+        """
+        return TIMER_NAMES[self._header.timer]
+
+    def raw_rows(self):
+        """
+        :return: the bytes of all the rows of statistics, each row holding the statistics of
+         every function (stats_size bytes each, the scalar fields then the histogram) followed
+         by the size statistics
+        :rtype: bytes
+        """
+        header = self._header
+        return self._map[header.rows_offset:header.rows_offset + header.nb_rows * header.row_size]
+
+    def raw_stats(self, row, func_index):
+        """
+        :param row: index of the row
+        :type row: int
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the values of the scalar fields by name and the histogram counts
+        :rtype: tuple
+        """
+        header = self._header
+        offset = header.rows_offset + row * header.row_size + func_index * header.stats_size
+        values = struct.unpack_from(self._stats_format, self._map, offset)
+        return dict(zip(self._fields, values[:header.nb_fields])), values[header.nb_fields:]
+
+    def merged_raw_stats(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the values of the scalar fields by name and the histogram counts, merged
+         over all the rows. Fields named min_* or max_* are merged by min or max, the
+         others are summed.
+        :rtype: tuple
+        """
+        header = self._header
+        merged, merged_hist = None, None
+        for row in range(header.nb_rows):
+            # Most of the rows of a live file are unused : check the call count first
+            offset = header.rows_offset + row * header.row_size + func_index * header.stats_size
+            if not struct.unpack_from("=Q", self._map, offset)[0]:
+                continue
+            fields, hist = self.raw_stats(row, func_index)
+            if merged is None:
+                merged, merged_hist = fields, list(hist)
+                continue
+            for name, value in fields.items():
+                if name.startswith("min_"):
+                    # A row may hold calls of which none was timed : its minimum is unset
+                    merged[name] = min(merged[name] or value, value or merged[name])
+                elif name.startswith("max_"):
+                    merged[name] = max(merged[name], value)
+                else:
+                    merged[name] += value
+            merged_hist = [total + count for total, count in zip(merged_hist, hist)]
+        if merged is None:
+            return dict((name, 0) for name in self._fields), [0] * self._header.hist_buckets
+        # A minimum of 0 tick is not distinguishable from an unset one
+        if merged_hist[0]:
+            merged["min_ticks"] = 0
+        return merged, merged_hist
+
+    def function_stats(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the statistics of the function, merged over all the rows
+        :rtype: FunctionStats
+        """
+        fields, hist = self.merged_raw_stats(func_index)
+        ns_per_tick, overhead_ns = self.ns_per_tick, self._header.overhead_ns
+        min_ns = fields["min_ticks"] * ns_per_tick
+        max_ns = fields["max_ticks"] * ns_per_tick
+        histogram = LatencyHistogram(hist, self._header.hist_sub_bits, ns_per_tick, min_ns, max_ns, overhead_ns)
+        call_count, sampled_count = fields["call_count"], fields["sampled_count"]
+        total_ns = 0.
+        if sampled_count:
+            # The overhead is subtracted from the mean of the timed calls
+            total_ns = max(fields["total_ticks"] * ns_per_tick / sampled_count - overhead_ns, 0.) * call_count
+        return FunctionStats(self._functions[func_index], call_count, sampled_count, total_ns,
+                             max(min_ns - overhead_ns, 0.), max(max_ns - overhead_ns, 0.), histogram)
+
+    def scaling_curve(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the non empty size buckets of the function, merged over all the rows (empty if
+         the function has no size parameter)
+        :rtype: list
+        """
+        header = self._header
+        if func_index not in self._size_slots:
+            return []
+        merged = [0] * (len(SIZE_FIELDS) * header.size_buckets)
+        for row in range(header.nb_rows):
+            row_offset = header.rows_offset + row * header.row_size
+            if not struct.unpack_from("=Q", self._map, row_offset + func_index * header.stats_size)[0]:
+                continue
+            offset = (row_offset + header.sizes_offset +
+                      self._size_slots[func_index] * struct.calcsize(self._sizes_format))
+            values = struct.unpack_from(self._sizes_format, self._map, offset)
+            merged = [total + value for total, value in zip(merged, values)]
+        ns_per_tick, overhead_ns = self.ns_per_tick, header.overhead_ns
+        curve = []
+        for index in range(header.size_buckets):
+            call_count, sampled_count, total_ticks, size_sum = merged[index * len(SIZE_FIELDS):
+                                                                      (index + 1) * len(SIZE_FIELDS)]
+            if not call_count:
+                continue
+            mean_size, mean_ns = None, None
+            if sampled_count:
+                mean_size = float(size_sum) / sampled_count
+                mean_ns = max(total_ticks * ns_per_tick / sampled_count - overhead_ns, 0.)
+            low, high = (0, 0) if index == 0 else (1 << (index - 1), (1 << index) - 1)
+            curve.append(SizeBucket(low, high, call_count, sampled_count, mean_size, mean_ns))
+        return curve
+
+    def counter_stats(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the performance counters of the function, merged over all the rows (None if
+         the wrapper didn't read the counters)
+        :rtype: CounterStats
+        """
+        header = self._header
+        if not header.nb_counters:
+            return None
+        counters_format = "={:d}Q".format(2 + header.nb_counters)
+        merged = [0] * (2 + header.nb_counters)
+        for row in range(header.nb_rows):
+            row_offset = header.rows_offset + row * header.row_size
+            if not struct.unpack_from("=Q", self._map, row_offset + func_index * header.stats_size)[0]:
+                continue
+            values = struct.unpack_from(counters_format, self._map, row_offset + header.counters_offset +
+                                        func_index * struct.calcsize(counters_format))
+            merged = [total + value for total, value in zip(merged, values)]
+        values = dict((name, merged[2 + index] if header.counters_available & (1 << index) else None)
+                      for index, name in enumerate(COUNTER_NAMES[:header.nb_counters]))
+        return CounterStats(merged[0], merged[1], values)
+
+    def allocation_stats(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the allocations made inside the calls of the function, merged over all the rows
+         (None if the wrapper didn't account the allocations)
+        :rtype: AllocationStats
+        """
+        header = self._header
+        if not header.nb_alloc_fields:
+            return None
+        alloc_format = "={:d}Q".format(header.nb_alloc_fields)
+        merged = dict((name, 0) for name in ALLOC_FIELDS)
+        call_count = 0
+        for row in range(header.nb_rows):
+            row_offset = header.rows_offset + row * header.row_size
+            calls = struct.unpack_from("=Q", self._map, row_offset + func_index * header.stats_size)[0]
+            if not calls:
+                continue
+            call_count += calls
+            values = dict(zip(ALLOC_FIELDS, struct.unpack_from(
+                alloc_format, self._map, row_offset + header.allocations_offset + func_index * header.alloc_stats_size)))
+            for name in ALLOC_FIELDS:
+                merged[name] = max(merged[name], values[name]) if name == "peak_max" else merged[name] + values[name]
+        return AllocationStats(call_count, **merged)
+
+    def graph_stats(self, func_index):
+        """
+        :param func_index: index of the function
+        :type func_index: int
+        :return: the nesting of the calls of the function, merged over all the rows (None if the
+         wrapper didn't follow the nested calls)
+        :rtype: GraphStats
+        """
+        header = self._header
+        if not header.nb_graph_fields:
+            return None
+        graph_format = "={:d}Q".format(header.nb_graph_fields)
+        merged = dict((name, 0) for name in GRAPH_FIELDS)
+        call_count = sampled_count = 0
+        for row in range(header.nb_rows):
+            row_offset = header.rows_offset + row * header.row_size
+            calls, sampled = struct.unpack_from("=QQ", self._map, row_offset + func_index * header.stats_size)
+            if not calls:
+                continue
+            call_count += calls
+            sampled_count += sampled
+            values = dict(zip(GRAPH_FIELDS, struct.unpack_from(
+                graph_format, self._map, row_offset + header.graph_offset + func_index * header.graph_stats_size)))
+            for name in GRAPH_FIELDS:
+                merged[name] = max(merged[name], values[name]) if name == "max_depth" else merged[name] + values[name]
+        overhead_ns = header.overhead_ns
+        return GraphStats(call_count, sampled_count,
+                          max(0., merged["self_ticks"] * header.ns_per_tick - overhead_ns * sampled_count),
+                          max(0., merged["inclusive_ticks"] * header.ns_per_tick -
+                              overhead_ns * merged["outer_sampled"]),
+                          merged["outer_sampled"], merged["recursive_calls"], merged["max_depth"])
+
+    def merged_stats(self):
+        """
+        :return: the statistics of all the functions
+        :rtype: list
+        """
+        return [self.function_stats(index) for index in range(len(self._functions))]
+
+
+def format_stats(stats):
+    """
+    :param stats: statistics of a function
+    :type stats: FunctionStats
+    :return: the report of the statistics, as printed by the wrappers
+    :rtype: str
+    """
+    lines = ["RESULTS FOR FUNCTION : {:s}".format(stats.name),
+             "Call count = {:d}".format(stats.call_count)]
+    if stats.sampled_count != stats.call_count:
+        lines.append("Timed calls = {:d}".format(stats.sampled_count))
+    if stats.call_count and not stats.sampled_count:
+        lines.append("Total time consumed = unknown (no timed call)")
+    elif stats.sampled_count != stats.call_count:
+        lines.append("Total time consumed = {:.6f} +/- {:.6f} seconds (95% confidence)"
+                     .format(stats.total_ns * 1e-9, stats.total_ns_interval() * 1e-9))
+    else:
+        lines.append("Total time consumed = {:.6f} seconds".format(stats.total_ns * 1e-9))
+    if stats.sampled_count:
+        percentiles = [stats.histogram.percentile(q) for q in (0.5, 0.9, 0.99, 0.999)]
+        lines.append("Mean time per call = {:.1f} nanoseconds".format(stats.mean_ns))
+        lines.append("Latency (ns) : min = {:.0f}, p50 = {:.0f}, p90 = {:.0f}, p99 = {:.0f}, "
+                     "p99.9 = {:.0f}, max = {:.0f}".format(stats.min_ns, *(percentiles + [stats.max_ns])))
+    return "\n".join(lines)
+
+
+def format_scaling(size_param, curve):
+    """
+    :param size_param: name of the size parameter
+    :type size_param: str
+    :param curve: the size buckets of a function
+    :type curve: list
+    :return: the report of the cost of the calls by size, as printed by the wrappers : for each
+     size bucket, the mean time, the time per unit of size and the exponent of the cost since
+     the previous bucket, then the exponent of the power law fitted on all the buckets
+    :rtype: str
+    """
+    line_format = "  {:<27s} {:>12s} {:>14s} {:>14s} {:>14s} {:>9s}"
+    lines = ["Scaling with {:s} :".format(size_param),
+             line_format.format("size range", "calls", "mean size", "mean ns", "ns per unit", "exponent")]
+    previous = None
+    for bucket in curve:
+        size_range = "< 1" if bucket.high == 0 else "[{:d}, {:d}]".format(bucket.low, bucket.high)
+        if bucket.mean_ns is None:
+            lines.append(line_format.format(size_range, str(bucket.call_count), "-", "-", "-", "-"))
+            continue
+        exponent = "-"
+        if bucket.mean_size and bucket.mean_ns:
+            if previous is not None and bucket.mean_size > previous.mean_size:
+                exponent = "{:.2f}".format(math.log(bucket.mean_ns / previous.mean_ns) /
+                                           math.log(bucket.mean_size / previous.mean_size))
+            previous = bucket
+        lines.append(line_format.format(size_range, str(bucket.call_count), "{:.1f}".format(bucket.mean_size),
+                                        "{:.1f}".format(bucket.mean_ns), "{:.3f}".format(bucket.ns_per_unit or 0.),
+                                        exponent))
+    fit = fit_exponent(curve)
+    if fit is None:
+        lines.append("Apparent complexity : unknown (less than two sizes timed)")
+    else:
+        lines.append("Apparent complexity : time ~ {:s}^{:.2f} (fitted over {:d} sizes)".format(size_param, *fit))
+    return "\n".join(lines)
+
+
+def format_counters(counters):
+    """
+    :param counters: performance counters of a function
+    :type counters: CounterStats
+    :return: the report of the counters, as printed by the wrappers : the mean of each counter
+     per call, the instructions per cycle and the cache misses per 1000 instructions
+    :rtype: str
+    """
+    available = [name for name in COUNTER_NAMES if counters.values.get(name) is not None]
+    if not available:
+        return "Counters : unavailable (perf_event_open refused, see /proc/sys/kernel/perf_event_paranoid)"
+    header = "Counters per call ({:d} calls measured".format(counters.measured_calls)
+    if counters.unmeasured_calls:
+        header += ", {:d} calls dropped : counters multiplexed".format(counters.unmeasured_calls)
+    if not any(name in available for name in COUNTER_NAMES[:3]):
+        header += ", software counters only"
+    if not counters.measured_calls:
+        return header + ") : -"
+    lines = [header + ") : " + ", ".join("{:s} = {:.2f}".format(name.replace("_", " "), counters.per_call(name))
+                                         for name in available)]
+    if counters.ipc is not None:
+        line = "IPC = {:.2f} instructions per cycle".format(counters.ipc)
+        if counters.misses_per_kilo_instructions is not None:
+            line += ", {:.2f} cache misses per 1000 instructions".format(counters.misses_per_kilo_instructions)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_allocations(allocations):
+    """
+    :param allocations: allocations made inside the calls of a function
+    :type allocations: AllocationStats
+    :return: the report of the allocations, as printed by the wrappers
+    :rtype: str
+    """
+    return ("Allocations per call = {:.2f} ({:.2f} frees), bytes allocated per call = {:.1f}\n"
+            "Peak live bytes per call : mean = {:.1f}, max = {:d}"
+            .format(allocations.allocations_per_call, float(allocations.frees) / allocations.call_count,
+                    allocations.bytes_per_call, allocations.mean_peak, allocations.peak_max))
+
+
+def format_graph(graph):
+    """
+    :param graph: nesting of the calls of a function
+    :type graph: GraphStats
+    :return: the report of the nesting, as printed by the wrappers : self time, time of the
+     outermost calls and recursion
+    :rtype: str
+    """
+    lines = []
+    if graph.sampled_count:
+        lines.append("Self time = {:.6f} seconds ({:.1f} nanoseconds per call)"
+                     .format(graph.total_self_ns * 1e-9, graph.total_self_ns / graph.call_count))
+    if graph.outer_sampled:
+        lines.append("Outermost calls = {:d}, inclusive time = {:.6f} seconds"
+                     .format(graph.outer_calls, graph.total_inclusive_ns * 1e-9))
+    lines.append("Recursive calls = {:d}, max recursion depth = {:d}".format(graph.recursive_calls, graph.max_depth))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.stderr.write("Usage: {:s} PATH_TO_STATS_FILE\n".format(sys.argv[0]))
+        sys.exit(1)
+    with StatsFile(sys.argv[1]) as stats_file:
+        process = "pid : {:d}".format(stats_file.header.pid)
+        if stats_file.header.rank >= 0:
+            process += ", rank : {:d}".format(stats_file.header.rank)
+        if stats_file.header.parent_pid:
+            process += ", forked from : {:d}".format(stats_file.header.parent_pid)
+        print("SpecProf results (timer : {:s}, {:s})".format(stats_file.timer, process))
+        if stats_file.header.overhead_ns:
+            print("Overhead subtracted = {:.1f} nanoseconds per call".format(stats_file.header.overhead_ns))
+        for index, function_stats in enumerate(stats_file.merged_stats()):
+            print(format_stats(function_stats))
+            if stats_file.size_params[index] and function_stats.call_count:
+                print(format_scaling(stats_file.size_params[index], stats_file.scaling_curve(index)))
+            counters = stats_file.counter_stats(index)
+            if counters is not None and function_stats.sampled_count:
+                print(format_counters(counters))
+            allocations = stats_file.allocation_stats(index)
+            if allocations is not None and function_stats.call_count:
+                print(format_allocations(allocations))
+            graph = stats_file.graph_stats(index)
+            if graph is not None and function_stats.call_count:
+                print(format_graph(graph))
@@ -0,0 +1,411 @@
+"""
+A module implementing the search of the functions of a shared object by their unmangled names :
+an index of the components of the names (namespaces, classes, function) answers plain, glob and
+regular expression queries with candidates ranked by relevance
+"""
+import re
+import time
+import bisect
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+
+LOGGER = logging.getLogger("SpecProf.symbol_index")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# A candidate of a search : the symbol, its unmangled name and its score (the higher the better)
+SymbolMatch = namedtuple("SymbolMatch", ["symbol", "name", "score"])
+
+# Number of candidates returned by default
+DEFAULT_LIMIT = 20
+
+# Scores of the candidates of a plain query, by decreasing relevance : the query is the name of
+# the function, a namespace or a class, begins the name of the function, begins a component or a
+# word (camelCase or snake_case) of the qualified name, is in the qualified name or only in the
+# parameters. The candidates of the same score are ranked by length then by name.
+SCORE_FUNCTION = 100
+SCORE_COMPONENT = 80
+SCORE_FUNCTION_PREFIX = 60
+SCORE_WORD_PREFIX = 50
+SCORE_QUALIFIED = 30
+SCORE_PARAMETERS = 10
+
+_WORDS_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+# ABI tags of the unmangled names (getName[abi:cxx11]() for a function returning a std::string)
+_ABI_TAG_RE = re.compile(r"\[abi:[^\]]*\]")
+# Characters of the overloaded operators (operator<<, operator->*, operator[]...)
+_OPERATOR_CHARACTERS = "<>=!+-*/%&|^~[],"
+
+
+def split_qualified_name(unmangled):
+    """
+    :param unmangled: unmangled name of a function
+    :type unmangled: str
+    :return: the components of its qualified name (namespaces, classes and function, without
+     the return type of a function template) and what follows them : the parameters and the
+     qualifiers ('' if none), without the ABI tags
+    :rtype: tuple
+
+    >>> split_qualified_name("ns::Vector<std::pair<int, int> >::norm(double) const")
+    (['ns', 'Vector<std::pair<int, int> >', 'norm'], '(double) const')
+    >>> split_qualified_name("(anonymous namespace)::Grid::operator()(int)")
+    (['(anonymous namespace)', 'Grid', 'operator()'], '(int)')
+    >>> split_qualified_name("std::vector<int> ns::make<int>(unsigned long)")
+    (['ns', 'make<int>'], '(unsigned long)')
+    >>> split_qualified_name("compute_pressure")
+    (['compute_pressure'], '')
+    >>> split_qualified_name("ns::Vec::getName[abi:cxx11]() const")
+    (['ns', 'Vec', 'getName'], '() const')
+    """
+    if "[abi:" in unmangled:
+        unmangled = _ABI_TAG_RE.sub("", unmangled)
+    if "<" not in unmangled and "(anonymous" not in unmangled and "operator" not in unmangled:
+        # Fast path of the names without templates
+        position = unmangled.find("(")
+        name = unmangled if position < 0 else unmangled[:position]
+        return name[name.rfind(" ") + 1:].split("::"), "" if position < 0 else unmangled[position:]
+    components, depth, start, position = [], 0, 0, 0
+    while position < len(unmangled):
+        character = unmangled[position]
+        if depth == 0 and position == start and unmangled.startswith("operator", position):
+            position += len("operator")
+            if unmangled.startswith("()", position):
+                position += 2
+            while position < len(unmangled) and unmangled[position] in _OPERATOR_CHARACTERS:
+                position += 1
+            continue
+        if character == "<":
+            depth += 1
+        elif character == ">":
+            depth -= 1
+        elif depth == 0 and character == "(":
+            if position != start:
+                break
+            # (anonymous namespace)
+            position = unmangled.find(")", position)
+        elif depth == 0 and character == " " and not unmangled.startswith("operator", start):
+            # The return type of a function template
+            components, start = [], position + 1
+        elif depth == 0 and unmangled.startswith("::", position):
+            components.append(unmangled[start:position])
+            start = position + 2
+            position += 1
+        position += 1
+    components.append(unmangled[start:position])
+    return components, unmangled[position:]
+
+
+def _is_word_start(text, position):
+    """
+    :param text: a text
+    :type text: str
+    :param position: position of a character of the text, after the first one
+    :type position: int
+    :return: True if a word (see _WORDS_RE) begins at the position : after a character other than
+     a letter or a digit, at a change of case or between letters and digits
+    :rtype: bool
+
+    >>> [_is_word_start("\\nHTTPServer_get2", position) for position in (1, 2, 5, 6, 12, 15)]
+    [True, False, True, False, True, True]
+    """
+    previous, character = text[position - 1], text[position]
+    if not previous.isalnum():
+        return True
+    if character.isupper():
+        return (previous.islower() or previous.isdigit() or
+                previous.isupper() and text[position + 1:position + 2].islower())
+    return character.isdigit() and previous.isalpha()
+
+
+def _is_template_arguments(text):
+    """
+    :param text: a text
+    :type text: str
+    :return: True if the text is a list of template arguments, '<' and its matching '>' being its
+     first and its last characters
+    :rtype: bool
+
+    >>> _is_template_arguments("<int, std::less<int> >"), _is_template_arguments("<int>::pair<int>")
+    (True, False)
+    >>> _is_template_arguments("<double> > >")
+    False
+    """
+    depth = 0
+    for position, character in enumerate(text):
+        if character == "<":
+            depth += 1
+        elif character == ">":
+            depth -= 1
+        if depth <= 0:
+            return depth == 0 and position == len(text) - 1
+    return False
+
+
+class SymbolIndex(object):
+    """
+    An in-memory search index of the functions of a shared object.
+
+    The functions are sorted by length then by name of their unmangled names. Their qualified names
+    (without the parameters) and their unmangled names are joined in this order, one per line, in
+    two strings searched by str.find or by the regular expression engine : the functions are found
+    already ranked, and a search stops as soon as it has found enough candidates. The lowercase
+    components of the qualified names and their words are kept sorted, so that the searches of the
+    names beginning with a query are skipped after a bisection when no component nor word does.
+    """
+    def __init__(self, functions):
+        """
+        :param functions: the symbols of the functions and their unmangled names (the symbol itself
+         for a C function). The symbols of the same unmangled name (complete and base object
+         constructors...) are indexed once.
+        :type functions: iterable of tuple
+        """
+        start = time.time()
+        symbols = {}
+        for symbol, name in functions:
+            symbols.setdefault(name, symbol)
+        self._names = sorted(symbols)
+        self._names.sort(key=len)
+        self._symbols = [symbols[name] for name in self._names]
+        qualified_names = ["::".join(split_qualified_name(name)[0]) for name in self._names]
+        # Each name is between two line feeds
+        self._names_text = "\n" + "\n".join(self._names) + "\n"
+        self._lower_names_text = self._names_text.lower()
+        self._qualified_text = "\n" + "\n".join(qualified_names) + "\n"
+        self._lower_qualified_text = self._qualified_text.lower()
+        self._names_offsets = self._offsets(self._names)
+        self._qualified_offsets = self._offsets(qualified_names)
+        components = set(self._qualified_text.replace("\n", "::").split("::"))
+        vocabulary = set(component.lower() for component in components)
+        for component in components:
+            vocabulary.update(word.lower() for word in _WORDS_RE.findall(component))
+        self._tokens = sorted(vocabulary)
+        ADAPTER.info("{:d} functions indexed in {:.3f} s".format(len(self._symbols), time.time() - start))
+
+    @staticmethod
+    def _offsets(names):
+        """
+        :param names: names joined, one per line after a line feed
+        :type names: list
+        :return: the offset of each name in the joined names
+        :rtype: list
+        """
+        offsets, offset = [], 1
+        for name in names:
+            offsets.append(offset)
+            offset += len(name) + 1
+        return offsets
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def has_prefix(self, prefix):
+        """
+        :param prefix: lowercase prefix
+        :type prefix: str
+        :return: True if a component of a qualified name, or one of its words, begins with the
+         prefix
+        :rtype: bool
+
+        >>> index = SymbolIndex([("_ZN2ns12computeForceEv", "ns::computeForce()")])
+        >>> index.has_prefix("forc"), index.has_prefix("ns"), index.has_prefix("solve")
+        (True, True, False)
+        """
+        position = bisect.bisect_left(self._tokens, prefix)
+        return position < len(self._tokens) and self._tokens[position].startswith(prefix)
+
+    @staticmethod
+    def _scan(text, offsets, find, limit, skipped):
+        """
+        :param text: names joined one per line
+        :type text: str
+        :param offsets: offset of each name in the text
+        :type offsets: list
+        :param find: function returning a position in the next line matched from a position (-1 if
+         none)
+        :type find: function
+        :param limit: maximum number of functions found (all if 0 or None)
+        :type limit: int
+        :param skipped: indices of functions which aren't counted
+        :type skipped: set
+        :return: the indices of the functions matched, in the order of the text
+        :rtype: list
+        """
+        entries = []
+        position = find(text, 0)
+        while position >= 0 and not (limit and len(entries) >= limit):
+            index = bisect.bisect_right(offsets, position) - 1
+            if index not in skipped:
+                entries.append(index)
+            # Next line
+            position = find(text, text.find("\n", position))
+        return entries
+
+    @staticmethod
+    def _finder(pattern, shift=0, check=None):
+        """
+        :param pattern: searched string
+        :type pattern: str
+        :param shift: offset of the returned position from the beginning of the occurrence
+        :type shift: int
+        :param check: function telling if an occurrence (given the text and its position) is a match
+        :type check: function
+        :return: a function returning the position of the next match in a text from a position (-1
+         if none)
+        :rtype: function
+        """
+        def find(text, position):
+            position = text.find(pattern, position)
+            while position >= 0 and check is not None and not check(text, position):
+                position = text.find(pattern, position + 1)
+            return position if position < 0 else position + shift
+        return find
+
+    def _levels(self, query, words_only=False):
+        """
+        :param query: plain query
+        :type query: str
+        :param words_only: if True, only the levels where a component or a word begins with the query
+        :type words_only: bool
+        :return: the levels of relevance, by decreasing scores : the score and the searches of each
+         level, a search being a text, its offsets and a finder (see _scan)
+        :rtype: list
+        """
+        lower_query = query.lower()
+        qualified = (self._lower_qualified_text, self._qualified_offsets)
+        levels = []
+        if "::" in query or self.has_prefix(lower_query):
+            def rest(text, position):
+                """
+                :return: the end of the line following the occurrence of the query at the position
+                """
+                end = text.index(lower_query, position) + len(lower_query)
+                return text[end:text.find("\n", end)]
+
+            def is_template(text, position):
+                """
+                :return: True if only the template arguments of the query follow its occurrence, not
+                 the end of the template arguments of an enclosing name
+                """
+                return _is_template_arguments(rest(text, position))
+
+            def is_function_prefix(text, position):
+                """
+                :return: True if the occurrence of the query is the beginning of the function name
+                """
+                return "::" not in rest(text, position)
+
+            starts = (("\n", 1), ("::", 2))
+            levels.append((SCORE_FUNCTION, [qualified + (self._finder(separator + lower_query + end, shift, check),)
+                                            for separator, shift in starts
+                                            for end, check in (("\n", None), ("<", is_template))]))
+            levels.append((SCORE_COMPONENT, [qualified + (self._finder(separator + lower_query + "::", shift),)
+                                             for separator, shift in starts]))
+            levels.append((SCORE_FUNCTION_PREFIX, [qualified + (self._finder(separator + lower_query, shift,
+                                                                             is_function_prefix),)
+                                                   for separator, shift in starts]))
+            levels.append((SCORE_WORD_PREFIX, [qualified + (self._finder(
+                lower_query, check=lambda text, position: _is_word_start(self._qualified_text, position)),)]))
+        if not words_only:
+            levels.append((SCORE_QUALIFIED, [qualified + (self._finder(lower_query),)]))
+            levels.append((SCORE_PARAMETERS, [(self._lower_names_text, self._names_offsets,
+                                               self._finder(lower_query))]))
+        return levels
+
+    def _ranked(self, levels, limit):
+        """
+        :param levels: the levels of relevance, by decreasing scores (see _levels)
+        :type levels: list
+        :param limit: maximum number of candidates (all if 0 or None)
+        :type limit: int
+        :return: the candidates of the levels, each one at its first level, sorted by decreasing
+         score then by length and name. The levels below the limit aren't searched.
+        :rtype: list of SymbolMatch
+        """
+        matches, seen = [], set()
+        for score, searches in levels:
+            remaining = limit - len(matches) if limit else None
+            if remaining is not None and remaining <= 0:
+                break
+            entries = set()
+            for text, offsets, find in searches:
+                entries.update(self._scan(text, offsets, find, remaining, seen))
+            # The indices are the ranks of the functions
+            for index in sorted(entries)[:remaining]:
+                matches.append(SymbolMatch(self._symbols[index], self._names[index], score))
+            seen.update(entries)
+        return matches
+
+    def prefix(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        :param prefix: beginning of a namespace, of a class, of a function or of a word of a
+         qualified name (case insensitive)
+        :type prefix: str
+        :param limit: maximum number of candidates (all if 0 or None)
+        :type limit: int
+        :return: the functions found, ranked
+        :rtype: list of SymbolMatch
+
+        >>> index = SymbolIndex([("_ZN2ns12computeForceEv", "ns::computeForce()"), ("solve", "solve")])
+        >>> [match.name for match in index.prefix("forc")]
+        ['ns::computeForce()']
+        """
+        return self._ranked(self._levels(prefix, words_only=True), limit)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        :param query: a query :
+            - a glob (with '*' or '?') matched on the whole qualified names, without the parameters
+            - a regular expression prefixed with 're:', searched in the unmangled names
+            - else a text searched, case insensitive, in the unmangled names
+        :type query: str
+        :param limit: maximum number of candidates (all if 0 or None)
+        :type limit: int
+        :return: the functions found, ranked
+        :rtype: list of SymbolMatch
+        :raise ValueError: if the regular expression is invalid
+
+        >>> index = SymbolIndex([("_ZN4hydro15computePressureEv", "hydro::computePressure()"),
+        ...                      ("_ZN4hydro22computePressureGradientEv", "hydro::computePressureGradient()"),
+        ...                      ("_ZN4hydro4Cell8pressureEv", "hydro::Cell::pressure()"),
+        ...                      ("_Z6updatePd", "update(double*)")])
+        >>> [match.name for match in index.search("computePressure")]
+        ['hydro::computePressure()', 'hydro::computePressureGradient()']
+        >>> [(match.name, match.score) for match in index.search("pressure")]
+        [('hydro::Cell::pressure()', 100), ('hydro::computePressure()', 50), ('hydro::computePressureGradient()', 50)]
+        >>> [match.symbol for match in index.search("hydro::*")]
+        ['_ZN4hydro4Cell8pressureEv', '_ZN4hydro15computePressureEv', '_ZN4hydro22computePressureGradientEv']
+        >>> [match.name for match in index.search("re:double\\*")]
+        ['update(double*)']
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if query.startswith("re:"):
+            try:
+                regex = re.compile(query[len("re:"):], re.MULTILINE)
+            except re.error as error:
+                msg = "Invalid regular expression '{:s}' : {:s}".format(query[len("re:"):], str(error))
+                ADAPTER.error(msg)
+                raise ValueError(msg)
+            # A match spanning several lines is checked again on the name alone
+            def find(text, position):
+                match = regex.search(text, position)
+                while match is not None:
+                    # A line feed begins the next line
+                    index = bisect.bisect_right(self._names_offsets, match.start() + 1) - 1
+                    if index >= len(self._names):
+                        break
+                    if regex.search(self._names[index]) is not None:
+                        return self._names_offsets[index]
+                    match = regex.search(text, self._names_offsets[index] + len(self._names[index]) + 1)
+                return -1
+            return self._ranked([(0, [(self._names_text, self._names_offsets, find)])], limit)
+        if "*" in query or "?" in query:
+            glob = "".join("[^\n]*" if character == "*" else "[^\n]" if character == "?" else re.escape(character)
+                           for character in query)
+            regex = re.compile(glob + "$", re.MULTILINE)
+            literal = query[:min(position for position in (query.find("*"), query.find("?")) if position >= 0)]
+            find = self._finder("\n" + literal, 1, lambda text, position: regex.match(text, position + 1) is not None)
+            return self._ranked([(0, [(self._qualified_text, self._qualified_offsets, find)])], limit)
+        return self._ranked(self._levels(query), limit)
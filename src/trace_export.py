@@ -0,0 +1,283 @@
+"""
+A module to convert the binary trace files written by the wrappers generated by SpecProf
+(see the SPECPROF_TRACE_FILE environment variable) into the trace event JSON format of
+Chrome or into the protobuf format of Perfetto. The traces are streamed : the events are
+read and written chunk by chunk, whatever the size of the file.
+"""
+import json
+import struct
+import logging
+from collections import namedtuple
+from colored_logger import ColoredLoggerAdapter
+from stats_file import TIMER_NAMES
+
+LOGGER = logging.getLogger("SpecProf.trace_export")
+LOGGER.setLevel(logging.DEBUG)
+ADAPTER = ColoredLoggerAdapter(LOGGER)
+
+# Layout of struct specprof_trace_header, specprof_trace_chunk and specprof_trace_event
+# in jinja_templates/runtime/trace.h
+TRACE_HEADER_FORMAT = "=8sIIIIIIdQQQ"
+TRACE_HEADER_SIZE = struct.calcsize(TRACE_HEADER_FORMAT)
+CHUNK_STRUCT = struct.Struct("=II")
+EVENT_STRUCT = struct.Struct("=QQII")
+TRACE_MAGIC = b"SPECTRAC"
+TRACE_VERSION = 1
+# Number of events read at once
+EVENTS_PER_READ = 4096
+
+TraceHeader = namedtuple("TraceHeader", ["magic", "version", "header_size", "timer", "pid", "nb_functions",
+                                         "names_size", "ns_per_tick", "start_ticks", "start_ns",
+                                         "untraced_threads"])
+# A call : its thread, the index of the function and its start and end in nanoseconds since
+# the start of the trace
+TraceEvent = namedtuple("TraceEvent", ["tid", "func", "start_ns", "end_ns"])
+
+
+class TraceFile(object):
+    """
+    A trace file written by a wrapper : a header, the names of the functions and chunks of
+    events, each one written by a thread when its buffer was full or when it ended.
+    """
+    def __init__(self, path):
+        """
+        :param path: path to the file
+        :type path: str
+        """
+        self._path = path
+        self._stream = open(path, "rb")
+        data = self._stream.read(TRACE_HEADER_SIZE)
+        if len(data) < TRACE_HEADER_SIZE:
+            self.close()
+            ADAPTER.error("{:s} is too small to be a SpecProf trace file!".format(path))
+            raise IOError("{:s} is too small to be a SpecProf trace file!".format(path))
+        self._header = TraceHeader._make(struct.unpack(TRACE_HEADER_FORMAT, data))
+        if self._header.magic != TRACE_MAGIC or self._header.version != TRACE_VERSION:
+            self.close()
+            ADAPTER.error("{:s} is not a SpecProf trace file of version {:d}!".format(path, TRACE_VERSION))
+            raise IOError("{:s} is not a SpecProf trace file of version {:d}!".format(path, TRACE_VERSION))
+        self._stream.seek(self._header.header_size)
+        names = self._stream.read(self._header.names_size).decode("iso-8859-1")
+        self._functions = names.split("\0")[:self._header.nb_functions]
+        self._events_offset = self._header.header_size + self._header.names_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close the file
+        """
+        self._stream.close()
+
+    @property
+    def header(self):
+        """
+        :return: the header of the file
+        :rtype: TraceHeader
+        """
+        return self._header
+
+    @property
+    def functions(self):
+        """
+        :return: the names of the traced functions
+        :rtype: list
+        """
+        return self._functions
+
+    @property
+    def timer(self):
+        """
+        :return: the name of the timer used by the wrapper
+        :rtype: str
+        """
+        return TIMER_NAMES[self._header.timer]
+
+    def events(self):
+        """
+        Generate the events of the file, in the order they were written : by chunk of one
+        thread, and in each chunk by order of end
+
+        :return: a generator of TraceEvent
+        """
+        header = self._header
+        # With the thread_cputime timer, the events are on the monotonic clock
+        ns_per_tick = header.ns_per_tick if header.timer == TIMER_NAMES.index("tsc") else 1.
+        start_ticks = header.start_ticks if header.timer == TIMER_NAMES.index("tsc") else header.start_ns
+        self._stream.seek(self._events_offset)
+        while True:
+            data = self._stream.read(CHUNK_STRUCT.size)
+            if len(data) < CHUNK_STRUCT.size:
+                break
+            tid, nb_events = CHUNK_STRUCT.unpack(data)
+            while nb_events:
+                count = min(nb_events, EVENTS_PER_READ)
+                data = self._stream.read(count * EVENT_STRUCT.size)
+                if len(data) < count * EVENT_STRUCT.size:
+                    ADAPTER.warning("{:s} is truncated!".format(self._path))
+                    count = len(data) // EVENT_STRUCT.size
+                    nb_events = count
+                for index in range(count):
+                    start, end, func, _ = EVENT_STRUCT.unpack_from(data, index * EVENT_STRUCT.size)
+                    yield TraceEvent(tid, func, (start - start_ticks) * ns_per_tick,
+                                     (end - start_ticks) * ns_per_tick)
+                nb_events -= count
+
+
+def write_chrome_trace(trace, stream):
+    """
+    Write a trace in the trace event JSON format of Chrome (chrome://tracing, also opened by
+    the Perfetto UI). Each call is a complete event, timed in microseconds since the start
+    of the trace.
+
+    :param trace: trace to convert
+    :type trace: TraceFile
+    :param stream: binary stream where the JSON is written
+    :return: the number of events written
+    :rtype: int
+    """
+    pid = trace.header.pid
+    names = [json.dumps(name) for name in trace.functions]
+    stream.write('{{"displayTimeUnit": "ns", "otherData": {{"timer": "{:s}"}}, "traceEvents": [\n'
+                 .format(trace.timer).encode("utf-8"))
+    stream.write('{{"name": "process_name", "ph": "M", "pid": {:d}, "args": {{"name": "SpecProf {:d}"}}}}'
+                 .format(pid, pid).encode("utf-8"))
+    tids = set()
+    nb_events = 0
+    for event in trace.events():
+        if event.tid not in tids:
+            tids.add(event.tid)
+            stream.write(',\n{{"name": "thread_name", "ph": "M", "pid": {:d}, "tid": {:d}, '
+                         '"args": {{"name": "thread {:d}"}}}}'.format(pid, event.tid, event.tid).encode("utf-8"))
+        stream.write(',\n{{"name": {:s}, "cat": "specprof", "ph": "X", "ts": {:.3f}, "dur": {:.3f}, '
+                     '"pid": {:d}, "tid": {:d}}}'.format(names[event.func], event.start_ns * 1e-3,
+                                                        (event.end_ns - event.start_ns) * 1e-3, pid,
+                                                        event.tid).encode("utf-8"))
+        nb_events += 1
+    stream.write(b"\n]}\n")
+    return nb_events
+
+
+def _varint(value):
+    """
+    :param value: a positive integer
+    :type value: int
+    :return: the protobuf encoding of the integer
+    :rtype: bytes
+
+    >>> _varint(300) == b"\\xac\\x02"
+    True
+    """
+    data = bytearray()
+    while value > 0x7f:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _field(number, value):
+    """
+    :param number: number of the protobuf field
+    :type number: int
+    :param value: an integer (varint field) or bytes (length delimited field)
+    :return: the protobuf encoding of the field
+    :rtype: bytes
+    """
+    if isinstance(value, bytes):
+        return _varint(number << 3 | 2) + _varint(len(value)) + value
+    return _varint(number << 3) + _varint(value)
+
+
+# Numbers of the fields of the Perfetto protos (protos/perfetto/trace/)
+TRACE_PACKET = 1
+PACKET_TIMESTAMP, PACKET_SEQUENCE_ID, PACKET_TRACK_EVENT, PACKET_SEQUENCE_FLAGS, PACKET_TRACK_DESCRIPTOR = \
+    8, 10, 11, 13, 60
+EVENT_TYPE, EVENT_TRACK_UUID, EVENT_NAME = 9, 11, 23
+SLICE_BEGIN, SLICE_END = 1, 2
+DESCRIPTOR_UUID, DESCRIPTOR_PROCESS, DESCRIPTOR_THREAD, DESCRIPTOR_PARENT_UUID = 1, 3, 4, 5
+PROCESS_PID, PROCESS_NAME = 1, 6
+THREAD_PID, THREAD_TID, THREAD_NAME = 1, 2, 5
+SEQUENCE_ID = 1
+SEQ_INCREMENTAL_STATE_CLEARED = 1
+
+
+def _write_packet(stream, *fields):
+    """
+    Write a TracePacket made of the encoded fields, and of the sequence identifier
+    """
+    packet = b"".join(fields) + _field(PACKET_SEQUENCE_ID, SEQUENCE_ID)
+    stream.write(_field(TRACE_PACKET, packet))
+
+
+def write_perfetto_trace(trace, stream):
+    """
+    Write a trace in the protobuf format of Perfetto. Each thread gets a track and each call
+    a slice, timed in nanoseconds on the monotonic clock.
+
+    :param trace: trace to convert
+    :type trace: TraceFile
+    :param stream: binary stream where the protobuf is written
+    :return: the number of events written
+    :rtype: int
+    """
+    pid = trace.header.pid
+    start_ns = trace.header.start_ns
+    names = [_field(EVENT_NAME, name.encode("utf-8")) for name in trace.functions]
+    process_uuid = pid << 32
+    process = _field(PROCESS_PID, pid) + _field(PROCESS_NAME, "SpecProf {:d}".format(pid).encode("utf-8"))
+    _write_packet(stream, _field(PACKET_SEQUENCE_FLAGS, SEQ_INCREMENTAL_STATE_CLEARED),
+                  _field(PACKET_TRACK_DESCRIPTOR, _field(DESCRIPTOR_UUID, process_uuid) +
+                         _field(DESCRIPTOR_PROCESS, process)))
+    tids = set()
+    nb_events = 0
+    for event in trace.events():
+        track = _field(EVENT_TRACK_UUID, process_uuid | event.tid)
+        if event.tid not in tids:
+            tids.add(event.tid)
+            thread = (_field(THREAD_PID, pid) + _field(THREAD_TID, event.tid) +
+                      _field(THREAD_NAME, "thread {:d}".format(event.tid).encode("utf-8")))
+            _write_packet(stream, _field(PACKET_TRACK_DESCRIPTOR,
+                                         _field(DESCRIPTOR_UUID, process_uuid | event.tid) +
+                                         _field(DESCRIPTOR_PARENT_UUID, process_uuid) +
+                                         _field(DESCRIPTOR_THREAD, thread)))
+        _write_packet(stream, _field(PACKET_TIMESTAMP, start_ns + int(event.start_ns)),
+                      _field(PACKET_TRACK_EVENT, _field(EVENT_TYPE, SLICE_BEGIN) + track + names[event.func]))
+        _write_packet(stream, _field(PACKET_TIMESTAMP, start_ns + int(event.end_ns)),
+                      _field(PACKET_TRACK_EVENT, _field(EVENT_TYPE, SLICE_END) + track))
+        nb_events += 1
+    return nb_events
+
+
+# Output formats and their usual file extensions
+FORMATS = {'chrome': (write_chrome_trace, ".json"), 'perfetto': (write_perfetto_trace, ".perfetto-trace")}
+
+
+def export_trace(path, output_path, output_format='chrome'):
+    """
+    Convert a trace file
+
+    :param path: path to the trace file
+    :type path: str
+    :param output_path: path to the converted trace
+    :type output_path: str
+    :param output_format: format of the converted trace ('chrome'|'perfetto')
+    :type output_format: str
+    :return: the number of events converted
+    :rtype: int
+    """
+    if output_format not in FORMATS:
+        msg = "Available formats are : {:s}".format(", ".join(sorted(FORMATS)))
+        ADAPTER.error(msg)
+        raise ValueError(msg)
+    with TraceFile(path) as trace, open(output_path, "wb") as stream:
+        if trace.header.untraced_threads:
+            ADAPTER.warning("{:d} threads, sharing the last row of statistics, were not traced"
+                            .format(trace.header.untraced_threads))
+        nb_events = FORMATS[output_format][0](trace, stream)
+    ADAPTER.info("{:d} events written in {:s}".format(nb_events, output_path))
+    return nb_events
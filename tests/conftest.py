@@ -0,0 +1,254 @@
+"""
+Fixtures of the tests : the C and C++ examples, built with their makefiles and debugging
+information in a temporary directory, a workload of which the calls are chosen by each test, and
+the caches of SpecProf kept in a temporary directory too
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction  # pylint: disable=wrong-import-position
+
+WORKLOAD_LIBRARY = r"""
+#include <stdlib.h>
+#include <string.h>
+
+volatile double specprof_test_sink;
+
+double work(int n)
+{
+    double sum = 0.;
+    int i;
+    for (i = 0; i < n; ++i) {
+        sum += i * 0.5;
+    }
+    specprof_test_sink = sum;
+    return sum;
+}
+
+int allocate(int count, int size)
+{
+    char *blocks[64];
+    int i;
+    for (i = 0; i < count && i < 64; ++i) {
+        blocks[i] = (char *) malloc(size);
+        memset(blocks[i], i, size);
+    }
+    for (i = 0; i < count && i < 64; ++i) {
+        free(blocks[i]);
+    }
+    return count;
+}
+"""
+
+# Each argument of the program is a command :
+#   threads=T : the next calls are made by T threads (1 by default), each making all of them
+#   work=N*C : C calls of work(N)
+#   allocate=N,S*C : C calls of allocate(N, S)
+#   control=COMMANDS : write the commands in the control file and apply them (SIGUSR2)
+#   snapshot : ask for a snapshot (SIGUSR1)
+#   fork : the rest of the commands are run by the process and by a forked child
+#   wait : print 'waiting' and wait for a line on the standard input
+WORKLOAD_PROGRAM = r"""
+#include <pthread.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/wait.h>
+
+double work(int n);
+int allocate(int count, int size);
+
+struct calls {
+    int allocations;
+    int n;
+    int size;
+    int count;
+};
+
+static void *make_calls(void *argument)
+{
+    const struct calls *calls = (const struct calls *) argument;
+    int i;
+    for (i = 0; i < calls->count; ++i) {
+        if (calls->allocations) {
+            allocate(calls->n, calls->size);
+        } else {
+            work(calls->n);
+        }
+    }
+    return NULL;
+}
+
+int main(int argc, char **argv)
+{
+    pthread_t threads[64];
+    int nb_threads = 1, i, t;
+    pid_t child = 0;
+    for (i = 1; i < argc; ++i) {
+        struct calls calls = {0, 0, 0, 0};
+        if (sscanf(argv[i], "threads=%d", &nb_threads) == 1) {
+            continue;
+        }
+        if (sscanf(argv[i], "work=%d*%d", &calls.n, &calls.count) == 2 ||
+            sscanf(argv[i], "allocate=%d,%d*%d", &calls.n, &calls.size, &calls.count) == 3) {
+            calls.allocations = argv[i][0] == 'a';
+            for (t = 0; t < nb_threads; ++t) {
+                pthread_create(&threads[t], NULL, make_calls, &calls);
+            }
+            for (t = 0; t < nb_threads; ++t) {
+                pthread_join(threads[t], NULL);
+            }
+        } else if (strncmp(argv[i], "control=", 8) == 0) {
+            FILE *stream = fopen(getenv("SPECPROF_CONTROL_FILE"), "w");
+            fputs(argv[i] + 8, stream);
+            fclose(stream);
+            raise(SIGUSR2);
+        } else if (strcmp(argv[i], "snapshot") == 0) {
+            raise(SIGUSR1);
+        } else if (strcmp(argv[i], "fork") == 0) {
+            child = fork();
+        } else if (strcmp(argv[i], "wait") == 0) {
+            char line[16];
+            printf("waiting\n");
+            fflush(stdout);
+            if (fgets(line, sizeof(line), stdin) == NULL) {
+                return 1;
+            }
+        } else {
+            fprintf(stderr, "unknown command %s\n", argv[i]);
+            return 1;
+        }
+    }
+    if (child > 0) {
+        waitpid(child, NULL, 0);
+    }
+    return 0;
+}
+"""
+
+
+def run(cmd, cwd=None, env=None):
+    """
+    :param cmd: command to run
+    :type cmd: list
+    :param cwd: working directory of the command
+    :type cwd: str
+    :param env: environment of the command
+    :type env: dict
+    :return: the output of the command
+    :rtype: str
+    """
+    output = subprocess.check_output(cmd, cwd=cwd, env=env, stderr=subprocess.STDOUT)
+    return output.decode("utf-8", "replace")
+
+
+def build_example(tmp_path_factory, example, targets):
+    """
+    Copy an example in a new temporary directory and build it there with its makefile : the
+    debugging information of the libraries refers to the sources of the copy
+
+    :param example: path of the example, relative to the repository
+    :type example: str
+    :param targets: targets of the makefile
+    :type targets: list
+    :return: the directory of the built example
+    :rtype: str
+    """
+    build_dir = os.path.join(str(tmp_path_factory.mktemp("examples")), os.path.basename(example))
+    shutil.copytree(os.path.join(REPO_DIR, example), build_dir)
+    run(["make", "LIBRARY=true", "DBG=true"] + targets, cwd=build_dir)
+    return build_dir
+
+
+@pytest.fixture(scope="session")
+def c_example(tmp_path_factory):
+    """
+    :return: the directory of the TimeWaster C example (libtimewaster.so, time_waster.exe)
+    :rtype: str
+    """
+    return build_example(tmp_path_factory, os.path.join("C_example", "TimeWaster"),
+                         ["libtimewaster.so", "time_waster.exe"])
+
+
+@pytest.fixture(scope="session")
+def cpp_example(tmp_path_factory):
+    """
+    :return: the directory of the MoveSemantics C++ example (libvector.so,
+     libtest_move_semantics.so, move_semantics_test.exe)
+    :rtype: str
+    """
+    return build_example(tmp_path_factory, os.path.join("C++_example", "MoveSemantics"),
+                         ["libvector.so", "libtest_move_semantics.so", "move_semantics_test.exe"])
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    :return: the directory of the caches of SpecProf, empty for each test
+    :rtype: str
+    """
+    path = str(tmp_path / "cache")
+    monkeypatch.setenv("SPECPROF_CACHE_DIR", path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def workload(tmp_path_factory):
+    """
+    :return: the directory of the workload : libworkload.so (work and allocate) and workload.exe
+    :rtype: str
+    """
+    directory = str(tmp_path_factory.mktemp("workload"))
+    with open(os.path.join(directory, "workload.c"), "w") as fo:
+        fo.write(WORKLOAD_LIBRARY)
+    with open(os.path.join(directory, "main.c"), "w") as fo:
+        fo.write(WORKLOAD_PROGRAM)
+    run(["gcc", "-O1", "-g", "-shared", "-fPIC", "workload.c", "-o", "libworkload.so"], cwd=directory)
+    run(["gcc", "-O1", "main.c", "-o", "workload.exe", "-L.", "-lworkload", "-Wl,-rpath," + directory,
+         "-lpthread"], cwd=directory)
+    return directory
+
+
+def wrap_workload(workload, size_param=None, **options):
+    """
+    Generate and compile a wrapper of the functions of the workload (work then allocate) in a new
+    directory of the workload
+
+    :param size_param: size parameter of work (n), if any
+    :type size_param: str
+    :param options: options of the wrapper writer
+    :return: path to the wrapper
+    :rtype: str
+    """
+    working_dir = tempfile.mkdtemp(prefix="wrapper_", dir=workload)
+    writer = FunctionWrapperWriter(os.path.join(workload, "libworkload.so"), working_dir, use_cache=False,
+                                   **options)
+    writer.write_multi_src_file([WrappedFunction("work", "double work(int n)", None, size_param),
+                                 WrappedFunction("allocate", "int allocate(int count, int size)", None)])
+    writer.compile_src_file()
+    return os.path.join(working_dir, "libworkload_wrapper.so")
+
+
+def run_workload(workload, wrapper, commands, **variables):
+    """
+    Run the workload with the wrapper
+
+    :param commands: commands of the program (see WORKLOAD_PROGRAM)
+    :type commands: list
+    :param variables: environment variables of the wrapper
+    :return: the output of the program, the report of the wrapper included
+    :rtype: str
+    """
+    return run([os.path.join(workload, "workload.exe")] + commands, cwd=workload,
+               env=dict(os.environ, LD_PRELOAD=wrapper, **variables))
@@ -0,0 +1,75 @@
+"""
+Tests of the statistics of many processes : a forked child has its own statistics and files,
+each process of a job writes its results file, and the files are aggregated by process
+"""
+import os
+
+import pytest
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile
+
+numpy = pytest.importorskip("numpy")
+
+from aggregate import ALL_FUNCTIONS, aggregate, find_results, format_aggregate, load_results  # noqa: E402
+
+
+def _counts(path):
+    """
+    :return: the pid, the parent pid and the calls of each function of a results file
+    :rtype: tuple
+    """
+    with StatsFile(path) as stats_file:
+        header = stats_file.header
+        return header.pid, header.parent_pid, [stats.call_count for stats in stats_file.merged_stats()]
+
+
+def test_forked_child_statistics(workload, tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir()
+    wrapper = wrap_workload(workload)
+    # The calls made before the fork are only counted by the parent
+    run_workload(workload, wrapper, ["work=10*100", "fork", "work=10*50", "allocate=1,8*3"],
+                 SPECPROF_RESULTS_FILE=str(directory / "results.%p.bin"))
+    (parent_pid, parent_parent, parent_calls), (child_pid, child_parent, child_calls) = sorted(
+        (_counts(path) for path in find_results([str(directory)])), key=lambda counts: counts[1])
+    assert (parent_parent, child_parent) == (0, parent_pid)
+    assert (parent_calls, child_calls) == ([150, 3], [50, 3])
+    assert sorted(os.listdir(str(directory))) == sorted(["results.{:d}.bin".format(pid)
+                                                         for pid in (parent_pid, child_pid)])
+    # Without %p, the child appends its pid to the path of its parent's file
+    results = str(tmp_path / "results.bin")
+    run_workload(workload, wrapper, ["fork", "work=10*50"], SPECPROF_RESULTS_FILE=results)
+    pid = _counts(results)[0]
+    child_results = [name for name in os.listdir(str(tmp_path)) if name.startswith("results.bin.")]
+    assert len(child_results) == 1
+    assert _counts(str(tmp_path / child_results[0]))[1:] == (pid, [50, 0])
+
+
+def test_aggregate_of_ranks(workload, tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir()
+    wrapper = wrap_workload(workload)
+    # The last rank works 20 times more than the other ones
+    for rank in range(6):
+        run_workload(workload, wrapper, ["work={:d}*200".format(20000 if rank == 5 else 1000)],
+                     SPECPROF_RESULTS_FILE=str(directory / "results.%r.bin"),
+                     SPECPROF_STATS_FILE=str(directory / "live.%r.bin"), SLURM_PROCID=str(rank))
+    paths = find_results([str(directory)])
+    assert len(paths) == 12
+    # The live file and the results file of a process hold the same calls : one is kept
+    results = load_results(paths)
+    assert sorted(results.ranks.tolist()) == list(range(6))
+    assert all(os.path.basename(path).startswith("results.") for path in results.paths)
+    assert results.functions == ["work", "allocate"]
+    assert results.call_count.tolist() == [[200, 0]] * 6
+    summaries, outliers = aggregate(results)
+    work, allocate, all_functions = summaries
+    assert (work.nb_processes, work.call_count, work.slowest) == (6, 1200, "rank 5")
+    assert work.total_ns == pytest.approx(results.total_ns[:, 0].sum())
+    assert work.imbalance > 2.
+    assert (allocate.nb_processes, allocate.call_count, allocate.imbalance) == (0, 0, None)
+    assert all_functions.function == ALL_FUNCTIONS and all_functions.total_ns == pytest.approx(work.total_ns)
+    assert outliers and outliers[0].process == "rank 5"
+    report = format_aggregate(results, summaries, outliers)
+    assert report.startswith("SpecProf aggregate of 6 processes (6 with a rank)")
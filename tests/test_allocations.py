@@ -0,0 +1,32 @@
+"""
+Tests of the allocations of the wrappers : the allocations, frees and bytes of the calls of every
+thread are counted by function, and the allocations made outside the wrapped calls are not
+"""
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile, format_allocations
+
+
+def test_allocations_of_the_calls(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    output = run_workload(workload, wrap_workload(workload, allocations=True),
+                          ["threads=4", "allocate=10,100*50", "allocate=2,5000*25", "work=100*100"],
+                          SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        work = stats_file.allocation_stats(0)
+        allocate = stats_file.allocation_stats(1)
+    assert (allocate.call_count, allocate.allocations, allocate.frees) == (300, 2200, 2200)
+    assert allocate.bytes == 200 * 10 * 100 + 100 * 2 * 5000
+    # The live bytes are the usable sizes of the blocks, a little larger than their sizes
+    assert 10000 <= allocate.peak_max <= 10000 + 2 * 64
+    assert 200 * 1000 + 100 * 10000 <= allocate.peak_sum <= allocate.peak_max * 300
+    assert format_allocations(allocate) in output
+    # work allocates nothing : the allocations of the threads and of the program aren't counted
+    assert (work.call_count, work.allocations, work.frees, work.bytes, work.peak_max) == (400, 0, 0, 0, 0)
+
+
+def test_no_allocations(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    output = run_workload(workload, wrap_workload(workload), ["allocate=10,100*5"], SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        assert stats_file.allocation_stats(1) is None
+    assert "Allocations per call" not in output
@@ -0,0 +1,152 @@
+"""
+Tests of the call graph of the wrappers with sampling : the callees of a timed call are timed for
+the self time of their caller only, the other measures are extrapolated from the sampled calls
+"""
+import os
+import re
+import tempfile
+
+import pytest
+
+from conftest import run
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction
+from stats_file import StatsFile
+
+# leaf is called with a long loop by the program and with a short one by outer : the calls forced
+# to be timed by a timed outer are all short ones. The program calls leaf four times per iteration :
+# the sample period is 3 so that the stride sampling times each of these calls in turn.
+LIBRARY_SOURCE = r"""
+volatile double specprof_test_sink;
+
+double leaf(int n)
+{
+    double sum = 0.;
+    int i;
+    for (i = 0; i < n; ++i) {
+        sum += i * 0.5;
+    }
+    specprof_test_sink = sum;
+    return sum;
+}
+
+double outer(int n)
+{
+    double sum = 0.;
+    int i;
+    for (i = 0; i < n; ++i) {
+        sum += leaf(20);
+    }
+    return sum;
+}
+"""
+
+PROGRAM_SOURCE = r"""
+#include <stdio.h>
+double leaf(int n);
+double outer(int n);
+
+int main(void)
+{
+    double sum = 0.;
+    int i;
+    for (i = 0; i < 2000; ++i) {
+        sum += outer(3);
+        sum += leaf(20000);
+    }
+    printf("%g\n", sum);
+    return 0;
+}
+"""
+
+
+@pytest.fixture(scope="module")
+def nested_program(tmp_path_factory):
+    """
+    :return: the directory of a library of nested functions and of a program calling them
+    :rtype: str
+    """
+    directory = str(tmp_path_factory.mktemp("nested"))
+    with open(os.path.join(directory, "nested.c"), "w") as fo:
+        fo.write(LIBRARY_SOURCE)
+    with open(os.path.join(directory, "main.c"), "w") as fo:
+        fo.write(PROGRAM_SOURCE)
+    run(["gcc", "-O1", "-g", "-shared", "-fPIC", "nested.c", "-o", "libnested.so"], cwd=directory)
+    run(["gcc", "-O1", "main.c", "-o", "main.exe", "-L.", "-lnested", "-Wl,-rpath," + directory], cwd=directory)
+    return directory
+
+
+def _build_wrapper(directory, sample_period, sampling):
+    """
+    Wrap leaf and outer with the call graph
+
+    :return: path to the wrapper
+    :rtype: str
+    """
+    wrapper_dir = tempfile.mkdtemp("_{:d}_{:s}".format(sample_period, sampling), dir=directory)
+    writer = FunctionWrapperWriter(os.path.join(directory, "libnested.so"), wrapper_dir,
+                                   sample_period=sample_period, sampling=sampling, use_cache=False, call_graph=True)
+    writer.write_multi_src_file([WrappedFunction("leaf", "double leaf(int n)", None),
+                                 WrappedFunction("outer", "double outer(int n)", None)])
+    writer.compile_src_file()
+    return os.path.join(wrapper_dir, "libnested_wrapper.so")
+
+
+def _profile(directory, wrapper):
+    """
+    Run the program with the wrapper
+
+    :return: the call and timed call counts of leaf and outer, and their times (total, self or
+     inclusive, caller -> callee pairs of the report), by name
+    :rtype: dict
+    """
+    results = os.path.join(os.path.dirname(wrapper), "results.bin")
+    report = run([os.path.join(directory, "main.exe")],
+                 env=dict(os.environ, LD_PRELOAD=wrapper, SPECPROF_RESULTS_FILE=results))
+    edges = dict((pair, float(seconds) * 1e9) for pair, seconds
+                 in re.findall(r"^(\S+ -> \S+) : \d+ calls, ([0-9.]+) seconds$", report, re.MULTILINE))
+    with StatsFile(results) as stats_file:
+        leaf, outer = [stats_file.function_stats(index) for index in range(2)]
+        leaf_graph, outer_graph = [stats_file.graph_stats(index) for index in range(2)]
+    return {"counts": (leaf.call_count, leaf.sampled_count, outer.call_count, outer.sampled_count),
+            "leaf": leaf.total_ns, "outer": outer.total_ns,
+            "leaf self": leaf_graph.total_self_ns, "outer self": outer_graph.total_self_ns,
+            "outer inclusive": outer_graph.total_inclusive_ns,
+            "calls of leaf": edges["<root> -> leaf"] + edges["outer -> leaf"]}
+
+
+@pytest.fixture(scope="module")
+def unsampled_wrapper(nested_program):
+    """
+    :return: path to the wrapper timing every call
+    :rtype: str
+    """
+    return _build_wrapper(nested_program, 1, "stride")
+
+
+@pytest.mark.parametrize("sampling", ["stride", "random"])
+def test_sampled_totals_match_unsampled_run(nested_program, unsampled_wrapper, sampling):
+    sampled_wrapper = _build_wrapper(nested_program, 3, sampling)
+    # The runs with and without sampling alternate : the ratios of their times don't depend on
+    # the load of the machine, their median not on a single noisy run
+    ratios = {}
+    for _ in range(5):
+        unsampled = _profile(nested_program, unsampled_wrapper)
+        sampled = _profile(nested_program, sampled_wrapper)
+        for name in sampled:
+            if name != "counts":
+                ratios.setdefault(name, []).append(sampled[name] / unsampled[name])
+    leaf_calls, leaf_timed, outer_calls, outer_timed = sampled["counts"]
+    assert (leaf_calls, outer_calls) == (8000, 2000)
+    assert unsampled["counts"] == (8000, 8000, 2000, 2000)
+    # Only the sampled calls are timed in the statistics, not the calls of leaf timed for outer
+    if sampling == "stride":
+        assert (leaf_timed, outer_timed) == (2666, 666)
+    else:
+        assert 2300 < leaf_timed < 3050
+    medians = dict((name, sorted(values)[len(values) // 2]) for name, values in ratios.items())
+    for name in ("leaf", "leaf self", "calls of leaf"):
+        assert medians[name] == pytest.approx(1., abs=0.15), name
+    for name in ("outer", "outer inclusive"):
+        assert medians[name] == pytest.approx(1., abs=0.3), name
+    # The self time of outer doesn't include the time of its calls of leaf
+    assert sampled["outer self"] < sampled["outer"]
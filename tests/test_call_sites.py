@@ -0,0 +1,59 @@
+"""
+Tests of the call sites written by a wrapper of the MoveSemantics example and of their names
+"""
+import os
+
+import pytest
+
+from call_sites import CallSitesFile, Symbolizer, format_call_sites
+from conftest import run
+from dwarf_reader import read_prototypes
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction
+
+TEST_FUNCTIONS = ["testReturnValueOptimization", "testWithoutMoveCtor", "testWithMoveCtor",
+                  "testWithoutMoveOperator", "testWithMoveOperator"]
+
+
+@pytest.fixture(scope="module")
+def sites_file(cpp_example, tmp_path_factory):
+    """
+    :return: the call sites of the functions of the test_functions namespace, called once each by
+     the main function of the example
+    :rtype: CallSitesFile
+    """
+    library = os.path.join(cpp_example, "libtest_move_semantics.so")
+    prototypes = read_prototypes(library)
+    functions = [WrappedFunction(symbol, prototype.signature, prototype.namespace, None, prototype)
+                 for name in TEST_FUNCTIONS
+                 for symbol, prototype in prototypes.items() if prototype.namespace == "test_functions"
+                 and prototype.name == name]
+    working_dir = str(tmp_path_factory.mktemp("call_sites"))
+    writer = FunctionWrapperWriter(library, working_dir, language="c++", use_cache=False, call_sites=True)
+    writer.write_multi_src_file(functions)
+    writer.compile_src_file()
+    path = os.path.join(working_dir, "sites.bin")
+    run([os.path.join(cpp_example, "move_semantics_test.exe")], cwd=cpp_example,
+        env=dict(os.environ, LD_LIBRARY_PATH=cpp_example, SPECPROF_CALL_SITES_FILE=path,
+                 LD_PRELOAD=os.path.join(working_dir, "libtest_move_semantics_wrapper.so")))
+    return CallSitesFile(path)
+
+
+def test_one_call_site_per_function(sites_file, cpp_example):
+    assert sites_file.header.unattributed_calls == 0
+    assert len(sites_file.functions) == len(TEST_FUNCTIONS)
+    assert sorted(site.function for site in sites_file.sites) == sorted(sites_file.functions)
+    for site in sites_file.sites:
+        assert (site.call_count, site.sampled_count) == (1, 1)
+        assert site.total_ns > 0
+        assert os.path.realpath(site.module) == os.path.realpath(os.path.join(cpp_example, "move_semantics_test.exe"))
+    # The functions are called in turn by main : the return addresses follow each other
+    offsets = [site.offset for function in sites_file.functions
+               for site in sites_file.sites if site.function == function]
+    assert len(set(offsets)) == len(offsets)
+
+
+def test_call_sites_in_main(sites_file):
+    names = Symbolizer(use_cache=False).symbolize(sites_file.sites)
+    assert all(name.startswith("main+0x") for name in names)
+    report = format_call_sites(sites_file, Symbolizer(use_cache=False))
+    assert report.count("(1 call sites, 1 calls)") == len(TEST_FUNCTIONS)
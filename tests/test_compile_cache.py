@@ -0,0 +1,85 @@
+"""
+Tests of the cache of the compiled wrappers : a wrapper is taken from the cache until a header
+it includes, directly or not, changes
+"""
+import os
+
+import pytest
+
+from compile_cache import CompileCache
+from conftest import build_example
+from dwarf_reader import read_prototypes
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction
+
+SYMBOL = "_ZN14test_functions16testWithMoveCtorERKN19move_semantics_test17VectorWithMoveSemES3_"
+FOUND = "Compiled library found in the cache"
+
+
+@pytest.fixture
+def move_semantics(tmp_path_factory):
+    """
+    :return: the directory of the MoveSemantics example built for the test, which may change its
+     headers
+    :rtype: str
+    """
+    return build_example(tmp_path_factory, os.path.join("C++_example", "MoveSemantics"),
+                         ["libtest_move_semantics.so"])
+
+
+def _wrap(directory, name):
+    """
+    Generate and compile, with the compile cache, the wrapper of testWithMoveCtor in a new
+    working directory
+    """
+    library = os.path.join(directory, "libtest_move_semantics.so")
+    prototype = read_prototypes(library, set([SYMBOL]))[SYMBOL]
+    working_dir = os.path.join(directory, name)
+    os.mkdir(working_dir)
+    writer = FunctionWrapperWriter(library, working_dir, language="c++")
+    writer.write_multi_src_file([WrappedFunction(SYMBOL, prototype.signature, prototype.namespace, None, prototype)])
+    writer.compile_src_file()
+
+
+def _entries(cache_dir):
+    """
+    :return: the number of compiled libraries in the cache
+    :rtype: int
+    """
+    return len([name for name in os.listdir(os.path.join(cache_dir, "compiled")) if name.endswith(".so")])
+
+
+def test_wrapper_taken_from_cache(move_semantics, cache_dir, caplog):
+    _wrap(move_semantics, "first")
+    assert FOUND not in caplog.text and _entries(cache_dir) == 1
+    caplog.clear()
+    _wrap(move_semantics, "second")
+    assert FOUND in caplog.text and _entries(cache_dir) == 1
+    assert os.path.isfile(os.path.join(move_semantics, "second", "libtest_move_semantics_wrapper.so"))
+
+
+@pytest.mark.parametrize("header", ["test_move_semantics.h", "vector_without_move_sem.h"])
+def test_changed_header_compiled_again(move_semantics, cache_dir, caplog, header):
+    # test_move_semantics.h is included by the wrapper, vector_without_move_sem.h only by the
+    # headers it includes
+    _wrap(move_semantics, "first")
+    with open(os.path.join(move_semantics, header), "a") as fo:
+        fo.write("\n#define SPECPROF_TEST_CHANGE 1\n")
+    caplog.clear()
+    _wrap(move_semantics, "second")
+    assert FOUND not in caplog.text and _entries(cache_dir) == 2
+
+
+def test_key_of_unchanged_sources(move_semantics):
+    _wrap(move_semantics, "first")
+    path_to_src = os.path.join(move_semantics, "first", "libtest_move_semantics_wrapper.cpp")
+    command = ["g++", "-std=c++11", "-O2", path_to_src]
+    key = CompileCache.key(path_to_src, command)
+    assert CompileCache.key(path_to_src, command) == key
+    assert CompileCache.key(path_to_src, command[:2] + ["-O3"] + command[3:]) != key
+    with open(os.path.join(move_semantics, "vector-Impl.h"), "a") as fo:
+        # Not included by the wrapper
+        fo.write("\n#define SPECPROF_TEST_CHANGE 1\n")
+    assert CompileCache.key(path_to_src, command) == key
+    with open(os.path.join(move_semantics, "vector_with_move_sem.h"), "a") as fo:
+        fo.write("\n#define SPECPROF_TEST_CHANGE 1\n")
+    assert CompileCache.key(path_to_src, command) != key
@@ -0,0 +1,68 @@
+"""
+Tests of the control of the measures of a wrapper while the program runs : the calls are measured
+once enabled, and a reset clears the statistics and every table of the wrapper
+"""
+import os
+import re
+
+import pytest
+
+from call_sites import CallSitesFile
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile
+from trace_export import TraceFile
+
+
+@pytest.fixture(scope="module")
+def wrapper(workload):
+    """
+    :return: path to a wrapper with all the optional tables : sizes, call sites, call graph and
+     allocations
+    :rtype: str
+    """
+    return wrap_workload(workload, size_param="n", call_sites=True, allocations=True, call_graph=True)
+
+
+def _files(tmp_path):
+    """
+    :return: the files written by the wrapper, by environment variable
+    :rtype: dict
+    """
+    return dict((variable, str(tmp_path / name)) for variable, name in [
+        ("SPECPROF_RESULTS_FILE", "results.bin"), ("SPECPROF_CONTROL_FILE", "control"),
+        ("SPECPROF_CALL_SITES_FILE", "sites.bin"), ("SPECPROF_TRACE_FILE", "trace.bin")])
+
+
+def test_measured_once_enabled(workload, wrapper, tmp_path):
+    files = _files(tmp_path)
+    run_workload(workload, wrapper, ["work=100*10", "control=enable", "work=100*7", "control=disable",
+                                     "work=100*5", "control=toggle", "work=100*3"], SPECPROF_ENABLED="0", **files)
+    with StatsFile(files["SPECPROF_RESULTS_FILE"]) as stats_file:
+        assert stats_file.function_stats(0).call_count == 10
+    # No report, nor results file, if the measures are never enabled
+    os.remove(files["SPECPROF_RESULTS_FILE"])
+    output = run_workload(workload, wrapper, ["work=100*10"], SPECPROF_ENABLED="0", **files)
+    assert "SpecProf results" not in output
+    assert not os.path.exists(files["SPECPROF_RESULTS_FILE"])
+
+
+def test_reset_clears_every_table(workload, wrapper, tmp_path):
+    files = _files(tmp_path)
+    # The reset is applied by the next wrapped call, which is measured : only the calls made by
+    # the last thread remain
+    output = run_workload(workload, wrapper, ["threads=3", "work=2000*50", "allocate=4,32*20", "control=reset",
+                                              "threads=1", "work=2000*7", "allocate=2,16*3"], **files)
+    with StatsFile(files["SPECPROF_RESULTS_FILE"]) as stats_file:
+        work, allocate = stats_file.function_stats(0), stats_file.function_stats(1)
+        assert (work.call_count, work.sampled_count, allocate.call_count) == (7, 7, 3)
+        assert work.histogram.count == 7
+        assert sum(bucket.call_count for bucket in stats_file.scaling_curve(0)) == 7
+        allocations = stats_file.allocation_stats(1)
+        assert (allocations.allocations, allocations.frees, allocations.bytes) == (6, 6, 6 * 16)
+        assert stats_file.graph_stats(0).outer_sampled == 7
+    sites_file = CallSitesFile(files["SPECPROF_CALL_SITES_FILE"])
+    assert sites_file.header.unattributed_calls == 0
+    assert sorted(site.call_count for site in sites_file.sites) == [3, 7]
+    assert re.findall(r"^<root> -> (\w+) : (\d+) calls", output, re.MULTILINE) == [("work", "7"), ("allocate", "3")]
+    with TraceFile(files["SPECPROF_TRACE_FILE"]) as trace:
+        assert sorted(event.func for event in trace.events()) == [0] * 7 + [1] * 3
@@ -0,0 +1,53 @@
+"""
+Tests of the performance counters of the wrappers : read around the timed calls of every thread,
+summed by function, and reported per call
+"""
+import pytest
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile, format_counters
+
+
+def _stats(workload, wrapper, results, commands):
+    """
+    :return: the statistics and the counters of work and allocate, and the output of the run
+    :rtype: tuple
+    """
+    output = run_workload(workload, wrapper, commands, SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        return ([(stats_file.function_stats(func), stats_file.counter_stats(func)) for func in (0, 1)],
+                output)
+
+
+def test_counters_of_timed_calls(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    wrapper = wrap_workload(workload, counters=True, sample_period=2, timer="thread_cputime")
+    [(work, work_counters), (allocate, allocate_counters)], output = _stats(
+        workload, wrapper, results, ["threads=2", "work=100000*200", "allocate=4,1000*10"])
+    assert (work.call_count, work.sampled_count, allocate.sampled_count) == (400, 200, 10)
+    # Each timed call is measured, unless the counters were multiplexed
+    for stats, counters in ((work, work_counters), (allocate, allocate_counters)):
+        assert counters.measured_calls + counters.unmeasured_calls == stats.sampled_count
+        assert format_counters(counters) in output
+    # The task clock of the thread runs during the calls, as their cpu time
+    if work_counters.values["task_clock_ns"] is not None:
+        assert work_counters.per_call("task_clock_ns") == pytest.approx(work.mean_ns, rel=0.5)
+
+
+def test_no_counters(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    [(_, counters), _], output = _stats(workload, wrap_workload(workload), results, ["work=10*10"])
+    assert counters is None
+    assert "Counters" not in output
+
+
+def test_hardware_counters(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    wrapper = wrap_workload(workload, counters=True)
+    [(_, small), _], _ = _stats(workload, wrapper, results, ["work=1000*100"])
+    if small.values["instructions"] is None:
+        pytest.skip("the hardware counters can't be opened (perf_event_paranoid or virtual machine)")
+    [(_, large), _], _ = _stats(workload, wrapper, results, ["work=100000*100"])
+    # The instructions of work grow with its loop
+    assert large.per_call("instructions") > 50 * small.per_call("instructions")
+    assert large.ipc > 0
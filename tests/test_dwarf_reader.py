@@ -0,0 +1,91 @@
+"""
+Tests of the prototypes read in the debugging information of the examples and of the wrappers
+generated from them
+"""
+import os
+
+import pytest
+
+from dwarf_reader import read_prototypes
+from conftest import run
+from function_wrapper_writer import FunctionWrapperWriter, WrappedFunction
+from stats_file import StatsFile
+
+GET_NAME = "_ZN19move_semantics_test20VectorWithoutMoveSem7getNameB5cxx11Ev"
+COMPUTE_SUM = "_ZNK19move_semantics_test20VectorWithoutMoveSem10computeSumEv"
+TEST_FUNCTIONS = ["testReturnValueOptimization", "testWithoutMoveCtor", "testWithMoveCtor",
+                  "testWithoutMoveOperator", "testWithMoveOperator"]
+
+
+def _test_function_symbol(name):
+    """
+    :return: the symbol of a function of the test_functions namespace
+    :rtype: str
+    """
+    return "_ZN14test_functions{:d}{:s}ERKN19move_semantics_test17VectorWithMoveSemES3_".format(len(name), name)
+
+
+def test_prototype_of_c_function(c_example):
+    prototype = read_prototypes(os.path.join(c_example, "libtimewaster.so"))["_Z10waste_timei"]
+    assert prototype.namespace is None
+    assert prototype.signature == "void waste_time(int seconds)"
+    assert prototype.parameters_names == ["seconds"]
+
+
+def test_prototype_of_method(cpp_example):
+    prototype = read_prototypes(os.path.join(cpp_example, "libvector.so"), set([GET_NAME]))[GET_NAME]
+    assert (prototype.namespace, prototype.class_name, prototype.name) == ("move_semantics_test",
+                                                                           "VectorWithoutMoveSem", "getName")
+    assert prototype.signature == "std::string VectorWithoutMoveSem::getName()"
+    # The declaration of the method is attributed to the source file : the header is the one of its class
+    assert prototype.headers == (os.path.join(cpp_example, "vector_without_move_sem.h"),)
+
+
+def test_prototypes_of_namespace_functions(cpp_example):
+    symbols = set(_test_function_symbol(name) for name in TEST_FUNCTIONS)
+    prototypes = read_prototypes(os.path.join(cpp_example, "libtest_move_semantics.so"), symbols)
+    assert sorted(prototypes) == sorted(symbols)
+    for name in TEST_FUNCTIONS:
+        prototype = prototypes[_test_function_symbol(name)]
+        assert (prototype.namespace, prototype.class_name, prototype.name) == ("test_functions", "", name)
+        assert prototype.signature == ("void {:s}(move_semantics_test::VectorWithMoveSem const &vec_a, "
+                                       "move_semantics_test::VectorWithMoveSem const &vec_b)".format(name))
+        # The header of the namespace first, then the one of the type of the parameters
+        assert prototype.headers == (os.path.join(cpp_example, "test_move_semantics.h"),
+                                     os.path.join(cpp_example, "vector_with_move_sem.h"))
+
+
+@pytest.mark.parametrize("library, symbols", [
+    ("libvector.so", [GET_NAME, COMPUTE_SUM]),
+    ("libtest_move_semantics.so", [_test_function_symbol(name) for name in TEST_FUNCTIONS])])
+def test_wrapper_of_symbols_manifest(cpp_example, tmp_path, library, symbols):
+    path = os.path.join(cpp_example, library)
+    manifest = str(tmp_path / "functions.manifest")
+    with open(manifest, "w") as fo:
+        fo.write("\n".join(symbols) + "\n")
+    writer = FunctionWrapperWriter(path, str(tmp_path), language="c++", use_cache=False)
+    writer.write_manifest_src_file(manifest, prototypes=read_prototypes(path, set(symbols)))
+    writer.compile_src_file()
+    wrapper = os.path.splitext(library)[0] + "_wrapper"
+    # The names of the prototypes are qualified : the namespaces are not used
+    with open(str(tmp_path / (wrapper + ".cpp"))) as fi:
+        assert "using namespace" not in fi.read()
+    assert os.path.isfile(str(tmp_path / (wrapper + ".so")))
+
+
+def test_wrapper_of_const_method(cpp_example, tmp_path):
+    path = os.path.join(cpp_example, "libvector.so")
+    prototype = read_prototypes(path, set([COMPUTE_SUM]))[COMPUTE_SUM]
+    prototype.check_wrappable()
+    assert prototype.signature == "double VectorWithoutMoveSem::computeSum() const"
+    writer = FunctionWrapperWriter(path, str(tmp_path), language="c++", use_cache=False)
+    writer.write_multi_src_file([WrappedFunction(COMPUTE_SUM, prototype.signature, prototype.namespace, None,
+                                                 prototype)])
+    writer.compile_src_file()
+    # The method is called on each of the two vectors of the main function of the example
+    results = str(tmp_path / "results.bin")
+    run([os.path.join(cpp_example, "move_semantics_test.exe")], cwd=cpp_example,
+        env=dict(os.environ, LD_LIBRARY_PATH=cpp_example, SPECPROF_RESULTS_FILE=results,
+                 LD_PRELOAD=str(tmp_path / "libvector_wrapper.so")))
+    with StatsFile(results) as stats_file:
+        assert stats_file.function_stats(0).call_count == 2
@@ -0,0 +1,62 @@
+"""
+Tests of the native ELF reader against nm and objdump on the libraries of the examples
+"""
+import os
+import re
+import shutil
+
+import pytest
+
+from conftest import run
+from elf_reader import ElfReader
+from shared_library_analysis import SharedObjectAnalyser
+
+LIBRARIES = [("c_example", "libtimewaster.so"), ("cpp_example", "libvector.so"),
+             ("cpp_example", "libtest_move_semantics.so")]
+
+
+@pytest.fixture(params=LIBRARIES, ids=[library for _, library in LIBRARIES])
+def library(request):
+    """
+    :return: path to a library of the examples
+    :rtype: str
+    """
+    example, name = request.param
+    return os.path.join(request.getfixturevalue(example), name)
+
+
+def _nm(path, *options):
+    """
+    :return: the names of the symbols listed by nm, with their version for the undefined ones
+    :rtype: list
+    """
+    return [line.split()[-1] for line in run(["nm"] + list(options) + [path]).splitlines() if line.strip()]
+
+
+def test_dynamic_symbols(library):
+    with ElfReader(library) as elf_reader:
+        symbols = list(elf_reader.iter_symbols('.dynsym'))
+    defined = [symbol.name for symbol in symbols if symbol.is_defined]
+    undefined = [symbol.name + ("@" + symbol.version if symbol.version else "")
+                 for symbol in symbols if not symbol.is_defined]
+    assert sorted(defined) == sorted(_nm(library, "-D", "--defined-only"))
+    assert sorted(undefined) == sorted(_nm(library, "-D", "--undefined-only"))
+
+
+def test_needed_libraries(library):
+    needed = re.findall(r"^\s*NEEDED\s+(\S+)$", run(["objdump", "-p", library]), re.MULTILINE)
+    with ElfReader(library) as elf_reader:
+        assert elf_reader.needed_libraries() == needed
+
+
+def test_symbols_of_stripped_library(library, tmp_path):
+    # The static symbol table is read if there is one, else the dynamic one
+    analyser = SharedObjectAnalyser(library, use_cache=False)
+    assert len(analyser.symbols) == len(_nm(library))
+    assert len(analyser.defined_symbols) == len(_nm(library, "--defined-only"))
+    stripped = str(tmp_path / os.path.basename(library))
+    shutil.copy(library, stripped)
+    run(["strip", "--strip-all", stripped])
+    analyser = SharedObjectAnalyser(stripped, use_cache=False)
+    assert len(analyser.symbols) == len(_nm(stripped, "-D"))
+    assert len(analyser.defined_symbols) == len(_nm(stripped, "-D", "--defined-only"))
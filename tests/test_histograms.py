@@ -0,0 +1,29 @@
+"""
+Tests of the latency histograms of the wrappers, decoded by stats_file : every timed call is in
+the histogram of its function, which keeps the same size whatever the number of calls
+"""
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile, format_stats
+
+
+def test_histogram_of_short_and_long_calls(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    wrapper = wrap_workload(workload)
+    # 90 % of short calls, 10 % of calls a thousand times longer
+    output = run_workload(workload, wrapper, ["work=10*900", "work=1000000*100"], SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        row_size = stats_file.header.row_size
+        work = stats_file.function_stats(0)
+    histogram = work.histogram
+    assert histogram.count == work.call_count == 1000
+    assert sum(count for _, _, count in histogram.nonzero_buckets()) == 1000
+    p50, p90, p99, p999 = [histogram.percentile(fraction) for fraction in (0.5, 0.9, 0.99, 0.999)]
+    assert work.min_ns <= p50 <= p90 <= p99 <= p999 <= work.max_ns
+    # p90 is the longest short call, which is much longer if it was preempted
+    assert p99 > 100 * p50
+    # The report of the wrapper is the one of the decoded statistics
+    assert format_stats(work) in output
+    run_workload(workload, wrapper, ["work=10*20000"], SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        assert stats_file.header.row_size == row_size
+        assert stats_file.function_stats(0).histogram.count == 20000
@@ -0,0 +1,41 @@
+"""
+Tests of the measures of the wrappers : the calls of every thread are counted in the rows of the
+threads, or in the shared row when all the rows are taken, with each timer
+"""
+import pytest
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile
+
+
+@pytest.mark.parametrize("timer", ["monotonic", "thread_cputime", "tsc"])
+def test_calls_of_all_threads(workload, tmp_path, timer):
+    results = str(tmp_path / "results.bin")
+    output = run_workload(workload, wrap_workload(workload, timer=timer), ["threads=8", "work=20000*500"],
+                          SPECPROF_RESULTS_FILE=results)
+    # Nothing is printed by the calls, the report is printed once
+    assert output.count("RESULTS FOR FUNCTION : work") == 1
+    with StatsFile(results) as stats_file:
+        assert stats_file.timer == timer
+        assert stats_file.header.nb_rows == 1
+        work, allocate = stats_file.merged_stats()
+        assert (work.call_count, work.sampled_count, allocate.call_count) == (4000, 4000, 0)
+        assert 0 < work.min_ns <= work.total_ns / work.call_count <= work.max_ns
+
+
+def test_rows_of_threads(workload, tmp_path):
+    live = str(tmp_path / "live.bin")
+    wrapper = wrap_workload(workload)
+    # The rows of the ended threads are taken by the next ones : the 4 threads use 2 rows at most
+    run_workload(workload, wrapper, ["threads=2", "work=100*300", "work=100*200"], SPECPROF_STATS_FILE=live)
+    with StatsFile(live) as stats_file:
+        counts = [stats_file.raw_stats(row, 0)[0]["call_count"] for row in range(stats_file.header.nb_rows)]
+    assert len([count for count in counts if count]) <= 2 and sum(counts) == 1000
+    # With 3 rows, the threads beyond the second one share the last row
+    run_workload(workload, wrapper, ["threads=8", "work=20000*2000"], SPECPROF_STATS_FILE=live,
+                 SPECPROF_MAX_THREADS="3")
+    with StatsFile(live) as stats_file:
+        assert stats_file.header.nb_rows == 3
+        counts = [stats_file.raw_stats(row, 0)[0]["call_count"] for row in range(3)]
+        assert counts[2] > 0 and sum(counts) == 16000
+        assert stats_file.function_stats(0).sampled_count == 16000
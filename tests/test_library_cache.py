@@ -0,0 +1,68 @@
+"""
+Tests of the cache of the analysis of the libraries : an unchanged library is read from the
+cache, a rebuilt one is analysed again
+"""
+import os
+
+import pytest
+
+import shared_library_analysis
+from conftest import build_example, run
+from shared_library_analysis import SharedObjectAnalyser
+
+NEW_FUNCTION = """
+void waste_more_time(int seconds)
+{
+	waste_time(2 * seconds);
+}
+"""
+
+
+@pytest.fixture
+def time_waster(tmp_path_factory):
+    """
+    :return: the directory of the TimeWaster example built for the test, which may rebuild it
+    :rtype: str
+    """
+    return build_example(tmp_path_factory, os.path.join("C_example", "TimeWaster"), ["libtimewaster.so"])
+
+
+def _analyse(path):
+    """
+    :return: the exported functions of the library and its prototypes, read with the cache
+    :rtype: tuple
+    """
+    analyser = SharedObjectAnalyser(path)
+    return sorted(sym.name for sym in analyser.exported_functions), analyser.prototypes
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("the library is analysed again")
+
+
+def test_unchanged_library_read_from_cache(time_waster, monkeypatch, cache_dir):
+    path = os.path.join(time_waster, "libtimewaster.so")
+    functions, prototypes = _analyse(path)
+    assert functions == ["_Z10waste_timei"]
+    assert os.path.isfile(os.path.join(cache_dir, "library_cache.sqlite"))
+    monkeypatch.setattr(SharedObjectAnalyser, "_get_elf_symbols", staticmethod(_fail))
+    monkeypatch.setattr(shared_library_analysis, "read_prototypes", _fail)
+    assert _analyse(path) == (functions, prototypes)
+
+
+def test_rebuilt_library_analysed_again(time_waster, monkeypatch):
+    path = os.path.join(time_waster, "libtimewaster.so")
+    functions, prototypes = _analyse(path)
+    assert functions == list(prototypes) == ["_Z10waste_timei"]
+    with open(os.path.join(time_waster, "TimeWaster.c"), "a") as fo:
+        fo.write(NEW_FUNCTION)
+    stat = os.stat(path)
+    run(["make", "LIBRARY=true", "DBG=true", "libtimewaster.so"], cwd=time_waster)
+    # Even with the same modification time, the size and the build-id of the library have changed
+    os.utime(path, (stat.st_atime, stat.st_mtime))
+    functions, prototypes = _analyse(path)
+    assert functions == sorted(prototypes) == ["_Z10waste_timei", "_Z15waste_more_timei"]
+    # The entries of the rebuilt library replace those of the previous one
+    monkeypatch.setattr(SharedObjectAnalyser, "_get_elf_symbols", staticmethod(_fail))
+    monkeypatch.setattr(shared_library_analysis, "read_prototypes", _fail)
+    assert _analyse(path) == (functions, prototypes)
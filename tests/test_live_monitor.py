@@ -0,0 +1,47 @@
+"""
+Tests of the live statistics file of a wrapper, read while the profiled program runs and followed
+by the live monitor
+"""
+import io
+import os
+import subprocess
+
+from conftest import wrap_workload
+from live_monitor import monitor
+from stats_file import StatsFile
+
+
+def _counts(stream):
+    """
+    :return: the call counts of the table printed by the monitor, by function
+    :rtype: dict
+    """
+    lines = stream.getvalue().splitlines()
+    return dict((fields[0], int(fields[1])) for fields in (line.split() for line in lines[2:]))
+
+
+def test_statistics_read_while_running(workload, tmp_path):
+    live = str(tmp_path / "live.bin")
+    env = dict(os.environ, LD_PRELOAD=wrap_workload(workload), SPECPROF_STATS_FILE=live)
+    process = subprocess.Popen([os.path.join(workload, "workload.exe"), "threads=2", "work=100*300", "wait",
+                                "allocate=1,8*7"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+    try:
+        assert process.stdout.readline().strip() == b"waiting"
+        with StatsFile(live) as stats_file:
+            # The program is waiting : the file is read without stopping it
+            assert stats_file.header.pid == process.pid
+            assert [stats.call_count for stats in stats_file.merged_stats()] == [600, 0]
+            stream = io.StringIO()
+            monitor(live, interval=0.01, count=1, stream=stream)
+            assert _counts(stream) == {"work": 600, "allocate": 0}
+            process.communicate(b"\n")
+            # The file is mapped : the calls made since it was opened are seen
+            assert [stats.call_count for stats in stats_file.merged_stats()] == [600, 14]
+    finally:
+        if process.poll() is None:
+            process.kill()
+    assert process.returncode == 0
+    # The monitor stops once the program has ended
+    stream = io.StringIO()
+    monitor(live, interval=0.01, stream=stream)
+    assert _counts(stream) == {"work": 600, "allocate": 14}
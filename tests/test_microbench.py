@@ -0,0 +1,74 @@
+"""
+Tests of the microbenchmarks : a function of a shared object, found with its prototype, is called
+through ctypes, timed by samples and compared with a baseline
+"""
+import ctypes
+import os
+
+import pytest
+
+from shared_library_analysis import SharedObjectAnalyser
+
+numpy = pytest.importorskip("numpy")
+
+import microbench  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def work(workload):
+    """
+    :return: the work function of the workload and its target
+    :rtype: tuple
+    """
+    path_to_so = os.path.join(workload, "libworkload.so")
+    target = microbench.find_target(SharedObjectAnalyser(path_to_so, use_cache=False), "work")
+    return microbench.load_function(path_to_so, target), target
+
+
+def _measure(function, arguments):
+    """
+    :return: a short measure of the function
+    :rtype: microbench.Measure
+    """
+    return microbench.measure(function, arguments, warmup=0.01, min_sample=0.0005, nb_samples=30)
+
+
+def test_target_from_debugging_information(workload, work):
+    function, target = work
+    assert (target.symbol, target.restype) == ("work", ctypes.c_double)
+    assert [(parameter.name, parameter.ctype, parameter.pointer) for parameter in target.parameters] == \
+        [("n", ctypes.c_int, False)]
+    arguments, arrays = microbench.make_arguments(target, {"n": "4"})
+    assert arrays == {} and function(*arguments) == 0.5 * (0 + 1 + 2 + 3)
+    # The missing integers are the size
+    assert microbench.make_arguments(target, size=7)[0][0].value == 7
+    with pytest.raises(ValueError):
+        microbench.make_arguments(target, {"m": "4"})
+    with pytest.raises(ValueError):
+        microbench.find_target(SharedObjectAnalyser(os.path.join(workload, "libworkload.so"), use_cache=False),
+                               "no_such_function")
+
+
+def test_measure_and_baseline(work, tmp_path):
+    function, target = work
+    short_calls = _measure(function, microbench.make_arguments(target, {"n": "10"})[0])
+    long_calls = _measure(function, microbench.make_arguments(target, {"n": "20000"})[0])
+    assert len(short_calls.samples_ns) == len(long_calls.samples_ns) == 30
+    # The number of calls of a sample is the one lasting the minimum time of a sample
+    assert long_calls.calls_per_sample < short_calls.calls_per_sample
+    assert numpy.all(short_calls.samples_ns * short_calls.calls_per_sample >= 0.0005 * 1e9 * 0.5)
+    short_stats = microbench.statistics(short_calls.samples_ns)
+    long_stats = microbench.statistics(long_calls.samples_ns)
+    assert short_stats.min_ns <= short_stats.ci_low_ns <= short_stats.median_ns <= short_stats.ci_high_ns
+    assert long_stats.median_ns > 5 * short_stats.median_ns
+    # The baseline stored is read back and the longer calls are a regression
+    baseline = str(tmp_path / "baselines" / "work.json")
+    microbench.save_baseline(baseline, "libworkload.so", target, {"n": "10"}, 1000, short_calls)
+    samples_ns = microbench.load_baseline(baseline, target, {"n": "10"}, 1000)
+    assert numpy.array_equal(samples_ns, short_calls.samples_ns)
+    assert microbench.compare(long_calls.samples_ns, samples_ns).verdict == "regression"
+    assert microbench.compare(samples_ns, long_calls.samples_ns).verdict == "improvement"
+    comparison = microbench.compare(long_calls.samples_ns, samples_ns)
+    assert "BASELINE : REGRESSION" in microbench.format_measure(target, long_calls, long_stats, comparison=comparison)
+    with pytest.raises(ValueError):
+        microbench.load_baseline(baseline, target._replace(symbol="allocate"), {"n": "10"}, 1000)
@@ -0,0 +1,60 @@
+"""
+Tests of the calibration of the overhead of the wrappers : measured by the benchmark, stored in
+the cache directory, written into the next wrappers and subtracted from their results
+"""
+import os
+import sys
+import json
+
+import pytest
+
+import overhead_calibration
+from conftest import REPO_DIR, run_workload, wrap_workload
+from stats_file import StatsFile, format_stats
+
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import bench_wrapper_overhead  # pylint: disable=wrong-import-position
+
+
+def test_calibration_stored(cache_dir):
+    assert overhead_calibration.load_calibration() == {}
+    assert overhead_calibration.load_overhead_ns("tsc") == 0.
+    overhead_calibration.store_calibration({"monotonic": 40., "tsc": 12.5})
+    overhead_calibration.store_calibration({"tsc": 10.})
+    assert overhead_calibration.default_calibration_path() == os.path.join(cache_dir, "overhead_calibration.json")
+    assert overhead_calibration.load_calibration() == {"monotonic": 40., "tsc": 10.}
+    with open(overhead_calibration.default_calibration_path(), "w") as fo:
+        fo.write("{")
+    assert overhead_calibration.load_overhead_ns("monotonic") == 0.
+
+
+def test_benchmark_calibrates_the_wrappers(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    assert bench_wrapper_overhead.main(["--target", "empty_c", "-t", "monotonic", "-p", "1", "-n", "20000",
+                                        "-r", "2", "--calibrate", "--update-baseline", "-b", baseline]) == 0
+    with open(baseline) as fi:
+        result = json.load(fi)["results"]["empty_c/monotonic/1"]
+    assert result["overhead_ns"] == pytest.approx(result["wrapped_ns"] - result["bare_ns"], abs=0.02)
+    assert overhead_calibration.load_calibration() == {"monotonic": max(result["bias_ns"], 0.)}
+    # A new measure is compared with the baseline
+    assert bench_wrapper_overhead.compare({"empty_c/monotonic/1": dict(result, overhead_ns=result["overhead_ns"])},
+                                          {"empty_c/monotonic/1": result}, 0.25, 10., 0.05) == []
+    assert len(bench_wrapper_overhead.compare({"empty_c/monotonic/1": dict(result, overhead_ns=1e6)},
+                                              {"empty_c/monotonic/1": result}, 0.25, 10., 0.05)) == 1
+
+
+def test_overhead_subtracted_from_results(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    output = run_workload(workload, wrap_workload(workload, overhead_ns=500.), ["work=10000*300", "work=1*10"],
+                          SPECPROF_RESULTS_FILE=results)
+    assert "Overhead subtracted = 500.0 nanoseconds per call" in output
+    with StatsFile(results) as stats_file:
+        assert stats_file.header.overhead_ns == 500.
+        fields, _ = stats_file.merged_raw_stats(0)
+        raw_mean_ns = fields["total_ticks"] * stats_file.ns_per_tick / fields["sampled_count"]
+        work = stats_file.function_stats(0)
+    assert work.mean_ns == pytest.approx(raw_mean_ns - 500.)
+    # The shortest calls take less than the overhead
+    assert work.min_ns == 0.
+    assert format_stats(work) in output
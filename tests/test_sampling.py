@@ -0,0 +1,52 @@
+"""
+Tests of the sampling of the wrappers : every call is counted, one call in the sample period is
+timed, and the total time of all the calls is extrapolated from the timed ones
+"""
+import pytest
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile, format_stats
+
+
+def _work_stats(workload, wrapper, results, commands):
+    """
+    :return: the statistics of work in a run of the workload and the output of the run
+    :rtype: tuple
+    """
+    output = run_workload(workload, wrapper, commands, SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        return stats_file.function_stats(0), output
+
+
+@pytest.mark.parametrize("sampling", ["stride", "random"])
+def test_one_call_in_period_timed(workload, tmp_path, sampling):
+    results = str(tmp_path / "results.bin")
+    wrapper = wrap_workload(workload, sample_period=4, sampling=sampling)
+    work, output = _work_stats(workload, wrapper, results, ["threads=3", "work=2000*1000"])
+    assert work.call_count == 3000
+    if sampling == "stride":
+        # Each thread times one call in 4 of its calls
+        assert work.sampled_count == 750
+    else:
+        assert 600 < work.sampled_count < 900
+    assert work.histogram.count == work.sampled_count
+    assert work.total_ns == pytest.approx(work.mean_ns * work.call_count)
+    assert work.total_ns_interval() > 0
+    # The sample period isn't written in the results file
+    assert "Timed calls = {:d} (one in 4)".format(work.sampled_count) in output
+    assert format_stats(work) in output.replace(" (one in 4)", "")
+
+
+def test_extrapolated_total_matches_unsampled_run(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    unsampled_wrapper = wrap_workload(workload)
+    sampled_wrapper = wrap_workload(workload, sample_period=8)
+    # The runs with and without sampling alternate : their ratio doesn't depend on the load of the
+    # machine, their median not on a single noisy run
+    ratios = []
+    for _ in range(5):
+        unsampled, _ = _work_stats(workload, unsampled_wrapper, results, ["work=5000*2000"])
+        sampled, _ = _work_stats(workload, sampled_wrapper, results, ["work=5000*2000"])
+        assert (unsampled.sampled_count, sampled.sampled_count) == (2000, 250)
+        ratios.append(sampled.total_ns / unsampled.total_ns)
+    assert sorted(ratios)[len(ratios) // 2] == pytest.approx(1., abs=0.2)
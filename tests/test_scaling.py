@@ -0,0 +1,42 @@
+"""
+Tests of the size buckets of the wrappers : the calls of a function with a size parameter are
+counted and timed by power of two of their size, and the cost of the function is fitted on them
+"""
+import pytest
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile, fit_exponent, format_scaling
+
+
+def test_calls_by_size(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    output = run_workload(workload, wrap_workload(workload, size_param="n"),
+                          ["work=0*10", "work=1*10", "work=3000*100", "work=30000*100", "work=300000*100",
+                           "allocate=1,8*5"], SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        assert stats_file.size_params == ["n", None]
+        curve = stats_file.scaling_curve(0)
+        assert stats_file.scaling_curve(1) == []
+        call_count = stats_file.function_stats(0).call_count
+    assert [(bucket.low, bucket.high) for bucket in curve] == [(0, 0), (1, 1), (2048, 4095), (16384, 32767),
+                                                               (262144, 524287)]
+    assert [bucket.call_count for bucket in curve] == [10, 10, 100, 100, 100]
+    assert sum(bucket.call_count for bucket in curve) == call_count == 320
+    assert [bucket.mean_size for bucket in curve] == [0., 1., 3000., 30000., 300000.]
+    assert curve[2].mean_ns < curve[3].mean_ns < curve[4].mean_ns
+    # The loop of work is linear : the overhead of the calls is negligible for the largest sizes
+    exponent, nb_points = fit_exponent(curve[2:])
+    assert nb_points == 3 and exponent == pytest.approx(1., abs=0.2)
+    # The bucket of the size 0 isn't fitted
+    assert fit_exponent(curve)[1] == 4
+    assert format_scaling("n", curve) in output
+
+
+def test_sampled_calls_by_size(workload, tmp_path):
+    results = str(tmp_path / "results.bin")
+    run_workload(workload, wrap_workload(workload, size_param="n", sample_period=5),
+                 ["work=100*200", "work=1000*300"], SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        curve = stats_file.scaling_curve(0)
+    assert [(bucket.call_count, bucket.sampled_count) for bucket in curve] == [(200, 40), (300, 60)]
+    assert [bucket.mean_size for bucket in curve] == [100., 1000.]
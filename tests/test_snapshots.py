@@ -0,0 +1,75 @@
+"""
+Tests of the snapshots of the wrappers : each snapshot holds the calls ended since the previous
+one, on SIGUSR1, every interval and at the end of the program, and they add up to the results
+"""
+import os
+import subprocess
+import time
+
+from conftest import run_workload, wrap_workload
+from snapshots import find_snapshots, format_time_series, time_series
+from stats_file import StatsFile
+
+
+def _totals(paths):
+    """
+    :return: the sum, over the snapshots, of the calls and of the timed calls of each function
+    :rtype: list
+    """
+    totals = {}
+    for path in paths:
+        with StatsFile(path) as snapshot:
+            for index, stats in enumerate(snapshot.merged_stats()):
+                calls, timed = totals.get(index, (0, 0))
+                totals[index] = (calls + stats.call_count, timed + stats.histogram.count)
+    return [totals[index] for index in sorted(totals)]
+
+
+def test_snapshot_on_signal(workload, tmp_path):
+    directory = str(tmp_path / "snapshots")
+    os.mkdir(directory)
+    results = str(tmp_path / "results.bin")
+    env = dict(os.environ, LD_PRELOAD=wrap_workload(workload), SPECPROF_SNAPSHOT_DIR=directory,
+               SPECPROF_RESULTS_FILE=results)
+    process = subprocess.Popen([os.path.join(workload, "workload.exe"), "threads=2", "work=10*100", "snapshot",
+                                "wait", "work=10*200", "allocate=1,8*5"],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+    try:
+        assert process.stdout.readline().strip() == b"waiting"
+        # The snapshot is written by a thread of the wrapper, woken up by the signal
+        deadline = time.time() + 10.
+        while not find_snapshots(directory) and time.time() < deadline:
+            time.sleep(0.01)
+        process.communicate(b"\n")
+    finally:
+        if process.poll() is None:
+            process.kill()
+    assert process.returncode == 0
+    paths = find_snapshots(directory)
+    assert len(paths) == 2
+    assert find_snapshots(directory, process.pid) == paths and find_snapshots(directory, process.pid + 1) == []
+    with StatsFile(results) as stats_file:
+        assert [(stats.call_count, stats.histogram.count) for stats in stats_file.merged_stats()] == \
+            [(600, 600), (10, 10)]
+    # The calls made before the signal are in the first snapshot, the other ones in the last
+    with StatsFile(paths[0]) as snapshot:
+        assert snapshot.header.snapshot == 1
+        assert [stats.call_count for stats in snapshot.merged_stats()] == [200, 0]
+    assert _totals(paths) == [(600, 600), (10, 10)]
+    points = time_series(paths)
+    assert [(point.snapshot, point.trigger, point.function) for point in points] == \
+        [(1, "signal", "work"), (1, "signal", "allocate"), (2, "exit", "work"), (2, "exit", "allocate")]
+    # The intervals of the snapshots follow each other
+    assert points[0].start_s <= points[0].end_s == points[2].start_s <= points[2].end_s
+    assert len(format_time_series(points, "csv").splitlines()) == 5
+
+
+def test_snapshots_every_interval(workload, tmp_path):
+    directory = str(tmp_path / "snapshots")
+    os.mkdir(directory)
+    run_workload(workload, wrap_workload(workload, sample_period=3), ["work=100000*3000"],
+                 SPECPROF_SNAPSHOT_DIR=directory, SPECPROF_SNAPSHOT_INTERVAL="0.02")
+    paths = find_snapshots(directory)
+    triggers = [point.trigger for point in time_series(paths) if point.function == "work"]
+    assert len(triggers) > 2 and set(triggers[:-1]) == {"interval"} and triggers[-1] == "exit"
+    assert _totals(paths) == [(3000, 1000), (0, 0)]
@@ -0,0 +1,97 @@
+"""
+Tests of the ranking of the searches of the functions of the examples
+"""
+import os
+
+import pytest
+
+import shared_library_analysis
+from symbol_index import SCORE_COMPONENT, SCORE_FUNCTION, SCORE_FUNCTION_PREFIX, SCORE_WORD_PREFIX
+from shared_library_analysis import SharedObjectAnalyser
+
+
+@pytest.fixture(scope="module")
+def libvector(cpp_example):
+    """
+    :return: the analyser of the vectors library of the C++ example
+    :rtype: SharedObjectAnalyser
+    """
+    return SharedObjectAnalyser(os.path.join(cpp_example, "libvector.so"), use_cache=False)
+
+
+def _scores(matches):
+    return [match.score for match in matches]
+
+
+def test_function_name_first(libvector):
+    # The ABI tag of getName[abi:cxx11] is not a part of its name
+    matches = libvector.search_symbols("getname")
+    assert [match.name for match in matches] == [
+        "move_semantics_test::VectorWithoutMoveSem::getName[abi:cxx11]()",
+        "move_semantics_test::VectorWithoutMoveSem::getName[abi:cxx11]() const"]
+    assert _scores(matches) == [SCORE_FUNCTION] * 2
+
+
+def test_ranking_by_relevance_then_length(libvector):
+    matches = libvector.search_symbols("VectorWithMoveSem", 0)
+    scores = _scores(matches)
+    assert scores == sorted(scores, reverse=True)
+    # The constructors, then the other methods of the class, then the functions of which a
+    # parameter or a template argument is the class
+    constructors = [match for match in matches if match.score == SCORE_FUNCTION]
+    assert len(constructors) == 4
+    assert all(match.name.startswith("move_semantics_test::VectorWithMoveSem::VectorWithMoveSem(")
+               for match in constructors)
+    assert [len(match.name) for match in constructors] == sorted(len(match.name) for match in constructors)
+    assert [match.name for match in matches if match.score == SCORE_COMPONENT] == [
+        "move_semantics_test::VectorWithMoveSem::operator=(move_semantics_test::VectorWithMoveSem&&)",
+        "move_semantics_test::VectorWithMoveSem::operator=(move_semantics_test::VectorWithMoveSem const&)"]
+    assert all(match.name.startswith("std::") for match in matches if match.score < SCORE_COMPONENT)
+
+
+def test_template_arguments_are_not_names(libvector):
+    # std::vector<double> appears in the template arguments of many functions of the standard
+    # library : only its constructors are named vector
+    matches = libvector.search_symbols("vector", 0)
+    named = [match.name for match in matches if match.score == SCORE_FUNCTION]
+    assert len(named) == 4
+    assert all(name.startswith("std::vector<double, std::allocator<double> >::vector(") for name in named)
+    assert matches[len(named)].score == SCORE_FUNCTION_PREFIX
+    assert matches[len(named)].name.startswith("move_semantics_test::VectorWith")
+
+
+def test_words_and_globs(libvector, cpp_example):
+    assert [(match.name, match.score) for match in libvector.search_symbols("sum")] == [
+        ("move_semantics_test::VectorWithoutMoveSem::computeSum() const", SCORE_WORD_PREFIX)]
+    assert ([match.name for match in libvector.search_symbols("*::getName")] ==
+            [match.name for match in libvector.search_symbols("getName")])
+    analyser = SharedObjectAnalyser(os.path.join(cpp_example, "libtest_move_semantics.so"), use_cache=False)
+    matches = analyser.search_symbols("test_functions::*")
+    assert sorted(match.name.split("(")[0] for match in matches) == [
+        "test_functions::testReturnValueOptimization", "test_functions::testWithMoveCtor",
+        "test_functions::testWithMoveOperator", "test_functions::testWithoutMoveCtor",
+        "test_functions::testWithoutMoveOperator"]
+    assert [match.name.split("(")[0] for match in analyser.search_symbols("re:With(out)?MoveCtor")] == [
+        "test_functions::testWithMoveCtor", "test_functions::testWithoutMoveCtor"]
+
+
+def _answer(monkeypatch, answers):
+    """
+    Answer the questions of SharedObjectAnalyser.ask_for_symbol in turn
+    """
+    answers = iter(answers)
+    monkeypatch.setattr(shared_library_analysis, "raw_input", lambda prompt="": next(answers), raising=False)
+
+
+def test_ask_for_symbol(libvector, monkeypatch, capsys):
+    # An invalid regular expression is reported, a symbol that isn't an exported function is
+    # searched as a text
+    _answer(monkeypatch, ["re:(", "_ZTVN19move_semantics_test20VectorWithoutMoveSemE", "re:computeSum", "1"])
+    assert libvector.ask_for_symbol() == ("_ZNK19move_semantics_test20VectorWithoutMoveSem10computeSumEv",
+                                          "move_semantics_test::VectorWithoutMoveSem::computeSum() const",
+                                          "double")
+    output = capsys.readouterr().out
+    assert "Invalid regular expression '('" in output
+    assert "No function found for '_ZTVN19move_semantics_test20VectorWithoutMoveSemE'" in output
+    _answer(monkeypatch, ["_ZNK19move_semantics_test20VectorWithoutMoveSem10computeSumEv"])
+    assert libvector.ask_for_symbol()[0] == "_ZNK19move_semantics_test20VectorWithoutMoveSem10computeSumEv"
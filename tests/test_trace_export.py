@@ -0,0 +1,73 @@
+"""
+Tests of the traces of the wrappers : every timed call of the traced threads is an event of the
+trace file, flushed from the ring buffer of its thread, and exported for Chrome or Perfetto
+"""
+import json
+
+from conftest import run_workload, wrap_workload
+from stats_file import StatsFile
+from trace_export import TraceFile, export_trace
+
+
+def test_events_of_all_calls(workload, tmp_path):
+    trace = str(tmp_path / "trace.bin")
+    # The buffers of 64 events are flushed many times by each thread
+    run_workload(workload, wrap_workload(workload), ["threads=3", "work=10*500", "allocate=2,16*20"],
+                 SPECPROF_TRACE_FILE=trace, SPECPROF_TRACE_EVENTS="64")
+    with TraceFile(trace) as trace_file:
+        assert trace_file.functions == ["work", "allocate"]
+        assert trace_file.header.untraced_threads == 0
+        events = list(trace_file.events())
+    assert len(events) == 3 * 500 + 3 * 20
+    threads = {}
+    for event in events:
+        assert 0 <= event.start_ns <= event.end_ns
+        threads.setdefault(event.tid, []).append(event)
+    # The allocate calls are made by other threads than the work calls
+    assert sorted(len(thread_events) for thread_events in threads.values()) == [20] * 3 + [500] * 3
+    for thread_events in threads.values():
+        assert len(set(event.func for event in thread_events)) == 1
+        # The calls of a thread don't overlap
+        for previous, event in zip(thread_events, thread_events[1:]):
+            assert previous.end_ns <= event.start_ns
+
+
+def test_only_timed_calls_traced(workload, tmp_path):
+    trace = str(tmp_path / "trace.bin")
+    results = str(tmp_path / "results.bin")
+    run_workload(workload, wrap_workload(workload, sample_period=4), ["work=10*1000"],
+                 SPECPROF_TRACE_FILE=trace, SPECPROF_RESULTS_FILE=results)
+    with StatsFile(results) as stats_file:
+        sampled_count = stats_file.function_stats(0).sampled_count
+    with TraceFile(trace) as trace_file:
+        assert len(list(trace_file.events())) == sampled_count == 250
+
+
+def test_shared_row_not_traced(workload, tmp_path):
+    trace = str(tmp_path / "trace.bin")
+    live = str(tmp_path / "live.bin")
+    run_workload(workload, wrap_workload(workload), ["threads=8", "work=20000*2000"],
+                 SPECPROF_TRACE_FILE=trace, SPECPROF_STATS_FILE=live, SPECPROF_MAX_THREADS="3")
+    with StatsFile(live) as stats_file:
+        counts = [stats_file.raw_stats(row, 0)[0]["call_count"] for row in range(3)]
+    with TraceFile(trace) as trace_file:
+        assert trace_file.header.untraced_threads > 0
+        assert len(list(trace_file.events())) == counts[0] + counts[1]
+
+
+def test_exported_traces(workload, tmp_path):
+    trace = str(tmp_path / "trace.bin")
+    run_workload(workload, wrap_workload(workload), ["threads=2", "work=10*300"], SPECPROF_TRACE_FILE=trace,
+                 SPECPROF_TRACE_EVENTS="100")
+    chrome = str(tmp_path / "trace.json")
+    assert export_trace(trace, chrome) == 600
+    with open(chrome) as fi:
+        trace_events = json.load(fi)["traceEvents"]
+    calls = [event for event in trace_events if event["ph"] == "X"]
+    assert len(calls) == 600 and set(event["name"] for event in calls) == {"work"}
+    assert all(event["dur"] >= 0 for event in calls)
+    assert len([event for event in trace_events if event["name"] == "thread_name"]) == 2
+    perfetto = str(tmp_path / "trace.perfetto-trace")
+    assert export_trace(trace, perfetto, "perfetto") == 600
+    with open(perfetto, "rb") as fi:
+        assert fi.read(1) == b"\x0a"